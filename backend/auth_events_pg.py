@@ -7,6 +7,8 @@ import logging
 import os
 from typing import Optional
 
+from backend.pg_pool import pg_connection
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,8 +22,8 @@ def log_auth_event(tenant_id: Optional[int], email: str, event: str, context: Op
     if not url:
         return
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
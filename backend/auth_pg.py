@@ -13,6 +13,8 @@ import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional, Tuple
 
+from backend.pg_pool import pg_connection
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,8 +31,8 @@ def pg_get_tenant_user_by_email(email: str) -> Optional[Tuple[int, int, str]]:
     if not url:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT tenant_id, id, role FROM tenant_users WHERE email = %s",
@@ -54,8 +56,8 @@ def pg_get_tenant_user_by_email_for_login(email: str) -> Optional[Dict[str, Any]
     if not url:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT tenant_id, id AS user_id, role, password_hash FROM tenant_users WHERE email = %s LIMIT 1",
@@ -83,8 +85,8 @@ def pg_get_tenant_user_by_email_for_google(email: str) -> Optional[Dict[str, Any
     if not url:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT tenant_id, id, role, google_sub FROM tenant_users WHERE email = %s LIMIT 1",
@@ -112,8 +114,8 @@ def pg_link_google_sub(user_id: Any, google_sub: str, google_email: str) -> str:
     if not url:
         return "conflict"
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT google_sub FROM tenant_users WHERE id = %s",
@@ -182,8 +184,8 @@ def pg_get_tenant_user_for_impersonation(tenant_id: int) -> Optional[Dict[str, A
     if not url:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -230,8 +232,8 @@ def pg_create_tenant_user(
         if password_value:
             import bcrypt
             password_hash = bcrypt.hashpw(password_value.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -264,8 +266,8 @@ def pg_add_tenant_user(tenant_id: int, email: str, role: str = "owner") -> dict:
     if not email_norm:
         raise ValueError("Email required")
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT tenant_id, email, role FROM tenant_users WHERE email = %s",
@@ -325,8 +327,8 @@ def pg_create_password_reset(email: str, ttl_minutes: int = 60) -> Optional[str]
     token_hash = hashlib.sha256(token.encode()).hexdigest()
     expires_at = _now_utc() + timedelta(minutes=ttl_minutes)
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -358,8 +360,8 @@ def pg_get_tenant_user_for_reset_check(email: str) -> Optional[Dict[str, Any]]:
     if not email:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -394,8 +396,8 @@ def pg_update_password_and_clear_reset(user_id: int, password_hash: str) -> None
     if not url:
         raise ValueError("DB not configured")
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -419,8 +421,8 @@ def pg_update_password(user_id: int, password_hash: str) -> None:
     if not url:
         raise ValueError("DB not configured")
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -446,8 +448,8 @@ def pg_reset_password_with_token(token: str, new_password_hash: str) -> bool:
         return False
     token_hash = hashlib.sha256(token.encode()).hexdigest()
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -482,8 +484,8 @@ def pg_get_tenant_name(tenant_id: int) -> Optional[str]:
     if not url:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT name FROM tenants WHERE tenant_id = %s", (tenant_id,))
                 row = cur.fetchone()
@@ -0,0 +1,130 @@
+# backend/billing_cache.py
+"""
+Cache "billing state" par tenant pour le hot path vocal (gate suspension / quota à chaque tour).
+
+- Suspension + minutes incluses : cache TTL court (BILLING_STATE_TTL_SEC, défaut 30s).
+- Minutes consommées du mois : compteur maintenu en mémoire, amorcé par le SUM(vapi_call_usage)
+  puis incrémenté à chaque end-of-call-report ingéré (vapi_usage_pg). Resynchronisé depuis PG
+  toutes les BILLING_USAGE_RESYNC_SEC (défaut 300s) pour rattraper les appels ingérés par un autre worker.
+- Invalidation : écritures billing_pg (webhooks Stripe, suspend/unsuspend admin, job past_due).
+
+Les lectures passent par billing_pg (get_tenant_suspension, get_quota_snapshot_month...) : même
+sémantique que l'accès direct, seulement moins d'allers-retours.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+_TTL_SECONDS = float(os.getenv("BILLING_STATE_TTL_SEC", "30"))
+_USAGE_RESYNC_SECONDS = float(os.getenv("BILLING_USAGE_RESYNC_SEC", "300"))
+_LOCK = threading.Lock()
+
+
+@dataclass
+class _Suspension:
+    is_suspended: bool
+    reason: Optional[str]
+    mode: str
+    ts: float
+
+
+@dataclass
+class _Quota:
+    month_utc: str
+    included_minutes: int
+    included_ts: float
+    used_minutes: float
+    used_synced_ts: float
+
+
+_suspensions: Dict[int, _Suspension] = {}
+_quotas: Dict[int, _Quota] = {}
+
+
+def get_tenant_suspension(tenant_id: int) -> Tuple[bool, Optional[str], str]:
+    """Même contrat que billing_pg.get_tenant_suspension, avec cache TTL."""
+    tid = int(tenant_id)
+    now = time.monotonic()
+    hit = _suspensions.get(tid)
+    if hit and now - hit.ts < _TTL_SECONDS:
+        return (hit.is_suspended, hit.reason, hit.mode)
+    from backend import billing_pg
+
+    is_suspended, reason, mode = billing_pg.get_tenant_suspension(tid)
+    with _LOCK:
+        _suspensions[tid] = _Suspension(bool(is_suspended), reason, mode or "hard", now)
+    return (is_suspended, reason, mode)
+
+
+def get_quota_snapshot_month(tenant_id: int, month_utc: str) -> Tuple[int, float]:
+    """
+    Même contrat que billing_pg.get_quota_snapshot_month : (included_minutes, used_minutes).
+    Les minutes incluses suivent le TTL ; les minutes consommées viennent du compteur incrémental.
+    """
+    tid = int(tenant_id)
+    now = time.monotonic()
+    from backend import billing_pg
+
+    hit = _quotas.get(tid)
+    if hit is None or hit.month_utc != month_utc or now - hit.used_synced_ts >= _USAGE_RESYNC_SECONDS:
+        included, used = billing_pg.get_quota_snapshot_month(tid, month_utc)
+        with _LOCK:
+            _quotas[tid] = _Quota(month_utc, int(included or 0), now, float(used or 0.0), now)
+        return (included, used)
+    if now - hit.included_ts >= _TTL_SECONDS:
+        included = billing_pg.get_quota_included_minutes(tid)
+        with _LOCK:
+            hit.included_minutes = int(included or 0)
+            hit.included_ts = now
+    return (hit.included_minutes, round(hit.used_minutes, 2))
+
+
+def record_call_usage(tenant_id: int, ended_at: Optional[datetime], duration_sec: Optional[float]) -> None:
+    """
+    Incrémente le compteur du mois (UTC) de ended_at, si ce mois est celui en cache.
+    Appelé après l'insertion d'une nouvelle ligne vapi_call_usage (pas sur une mise à jour : évite le double comptage).
+    """
+    if ended_at is None or not duration_sec or duration_sec <= 0:
+        return
+    if ended_at.tzinfo is not None:
+        ended_at = ended_at.astimezone(timezone.utc)
+    month_utc = ended_at.strftime("%Y-%m")
+    with _LOCK:
+        hit = _quotas.get(int(tenant_id))
+        if hit is not None and hit.month_utc == month_utc:
+            hit.used_minutes += float(duration_sec) / 60.0
+
+
+def invalidate_usage(tenant_id: int) -> None:
+    """Force un resync du compteur de minutes (ex. durée d'un appel existant corrigée)."""
+    with _LOCK:
+        _quotas.pop(int(tenant_id), None)
+
+
+def invalidate_tenant_billing_state(tenant_id: Optional[int] = None) -> None:
+    """
+    Invalide suspension + minutes incluses d'un tenant (ou de tous si tenant_id est None).
+    Le compteur de minutes consommées est conservé (il ne dépend pas du plan ni de la suspension).
+    """
+    with _LOCK:
+        if tenant_id is None:
+            _suspensions.clear()
+            for hit in _quotas.values():
+                hit.included_ts = float("-inf")
+            return
+        _suspensions.pop(int(tenant_id), None)
+        hit = _quotas.get(int(tenant_id))
+        if hit is not None:
+            hit.included_ts = float("-inf")
+
+
+def clear() -> None:
+    """Vide tout le cache (tests, rechargement)."""
+    with _LOCK:
+        _suspensions.clear()
+        _quotas.clear()
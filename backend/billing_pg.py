@@ -10,6 +10,9 @@ import os
 from datetime import datetime
 from typing import Any, Dict, Optional, Tuple
 
+from backend.billing_cache import invalidate_tenant_billing_state
+from backend.pg_pool import pg_connection
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,9 +26,7 @@ def get_tenant_billing(tenant_id: int) -> Optional[Dict[str, Any]]:
     if not url:
         return None
     try:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
+        with pg_connection(url) as conn:
             with conn.cursor() as cur:
                 try:
                     cur.execute(
@@ -74,8 +75,8 @@ def set_stripe_customer_id(tenant_id: int, stripe_customer_id: str) -> bool:
     if not url or not (stripe_customer_id or "").strip():
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -109,8 +110,8 @@ def upsert_billing_from_subscription(
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cid = (stripe_customer_id or "").strip() or None
                 sub_id_val = (stripe_subscription_id or "").strip() or None
@@ -141,6 +142,7 @@ def upsert_billing_from_subscription(
                     ),
                 )
                 conn.commit()
+        invalidate_tenant_billing_state(tenant_id)
         return True
     except Exception as e:
         logger.warning("upsert_billing_from_subscription failed: %s", e)
@@ -154,8 +156,8 @@ def set_stripe_metered_item_id(tenant_id: int, stripe_metered_item_id: str | Non
         return False
     item_id = (stripe_metered_item_id or "").strip() or None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -180,8 +182,8 @@ def clear_subscription(tenant_id: int, set_status_canceled: bool = True) -> bool
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -195,6 +197,7 @@ def clear_subscription(tenant_id: int, set_status_canceled: bool = True) -> bool
                     (set_status_canceled, tenant_id),
                 )
                 conn.commit()
+        invalidate_tenant_billing_state(tenant_id)
         return True
     except Exception as e:
         logger.warning("clear_subscription failed: %s", e)
@@ -207,8 +210,8 @@ def update_billing_status(tenant_id: int, billing_status: str) -> bool:
     if not url or not (billing_status or "").strip():
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -218,6 +221,7 @@ def update_billing_status(tenant_id: int, billing_status: str) -> bool:
                     (billing_status.strip(), tenant_id),
                 )
                 conn.commit()
+        invalidate_tenant_billing_state(tenant_id)
         return True
     except Exception as e:
         logger.warning("update_billing_status failed: %s", e)
@@ -234,8 +238,8 @@ def try_acquire_stripe_event(event_id: str) -> bool:
     if not url or not (event_id or "").strip():
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO stripe_webhook_events (event_id) VALUES (%s) ON CONFLICT (event_id) DO NOTHING RETURNING 1",
@@ -256,8 +260,8 @@ def tenant_id_by_stripe_customer_id(stripe_customer_id: str) -> Optional[int]:
     if not url or not (stripe_customer_id or "").strip():
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT tenant_id FROM tenant_billing WHERE stripe_customer_id = %s",
@@ -281,8 +285,8 @@ def get_tenant_suspension(tenant_id: int) -> tuple[bool, Optional[str], str]:
     if not url:
         return (False, None, "hard")
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 try:
                     cur.execute(
@@ -333,8 +337,8 @@ def set_tenant_suspended(tenant_id: int, reason: str = "past_due", mode: str = "
         mode = "hard"
     mode = "soft" if (mode or "hard").strip().lower() == "soft" else "hard"
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 try:
                     cur.execute(
@@ -359,6 +363,7 @@ def set_tenant_suspended(tenant_id: int, reason: str = "past_due", mode: str = "
                         (tenant_id, reason),
                     )
                 conn.commit()
+        invalidate_tenant_billing_state(tenant_id)
         from backend.log_events import (
             TENANT_SUSPENDED_MANUAL_HARD,
             TENANT_SUSPENDED_MANUAL_SOFT,
@@ -378,8 +383,8 @@ def set_tenant_unsuspended(tenant_id: int) -> bool:
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 try:
                     cur.execute(
@@ -398,6 +403,7 @@ def set_tenant_unsuspended(tenant_id: int) -> bool:
                         (tenant_id,),
                     )
                 conn.commit()
+        invalidate_tenant_billing_state(tenant_id)
         logger.info("TENANT_UNSUSPENDED_ADMIN tenant_id=%s", tenant_id)
         return True
     except Exception as e:
@@ -413,8 +419,8 @@ def set_force_active(tenant_id: int, days: int) -> bool:
     try:
         from datetime import datetime, timezone, timedelta
         until = (datetime.now(timezone.utc) + timedelta(days=max(1, min(days, 90)))).replace(microsecond=0)
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -426,6 +432,7 @@ def set_force_active(tenant_id: int, days: int) -> bool:
                     (tenant_id, until),
                 )
                 conn.commit()
+        invalidate_tenant_billing_state(tenant_id)
         logger.info("TENANT_FORCE_ACTIVE_ENABLED tenant_id=%s days=%s until=%s", tenant_id, days, until.isoformat())
         return True
     except Exception as e:
@@ -445,8 +452,8 @@ def run_suspension_past_due_job(days_after_period_end: int = 7) -> int:
     from datetime import datetime, timezone, timedelta
     now = datetime.now(timezone.utc)
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 try:
                     cur.execute(
@@ -478,6 +485,7 @@ def run_suspension_past_due_job(days_after_period_end: int = 7) -> int:
                 conn.commit()
                 from backend.log_events import TENANT_SUSPENDED_PAST_DUE
                 for r in rows:
+                    invalidate_tenant_billing_state(r[0])
                     logger.info("TENANT_SUSPENDED_PAST_DUE tenant_id=%s (job)", r[0], extra={"event": TENANT_SUSPENDED_PAST_DUE})
                 return len(rows)
     except Exception as e:
@@ -511,8 +519,8 @@ def ensure_billing_plans() -> None:
     if not url:
         return
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     CREATE TABLE IF NOT EXISTS billing_plans (
@@ -542,9 +550,7 @@ def get_billing_plans() -> list:
     if not url:
         return [{"plan_key": k, "included_minutes_month": v} for k, v in DEFAULT_PLANS]
     try:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
+        with pg_connection(url) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT plan_key, included_minutes_month FROM billing_plans ORDER BY included_minutes_month ASC")
                 rows = cur.fetchall()
@@ -563,8 +569,8 @@ def get_plan_included_minutes(plan_key: Optional[str]) -> int:
     url = _pg_url()
     if url:
         try:
-            import psycopg
-            with psycopg.connect(url) as conn:
+            from psycopg.rows import tuple_row
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT included_minutes_month FROM billing_plans WHERE plan_key = %s", (plan_key,))
                     row = cur.fetchone()
@@ -592,8 +598,8 @@ def get_tenant_ids_with_active_subscription() -> list:
     if not url:
         return []
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -635,34 +641,14 @@ def get_tenant_minutes_in_current_period(tenant_id: int) -> Tuple[float, Optiona
     return (used, start_str, end_str)
 
 
-def _get_tenant_params_for_quota(tenant_id: int) -> dict:
-    """Lit params_json (tenant_config) pour résolution quota (plan_key, custom_included_minutes_month)."""
-    url = _pg_url()
-    if not url:
-        return {}
-    try:
-        import json
-        import psycopg
-        with psycopg.connect(url) as conn:
-            with conn.cursor() as cur:
-                cur.execute("SELECT params_json FROM tenant_config WHERE tenant_id = %s", (tenant_id,))
-                row = cur.fetchone()
-                if row and row[0]:
-                    return json.loads(row[0]) if isinstance(row[0], str) else (row[0] or {})
-    except Exception as e:
-        if "does not exist" not in str(e).lower():
-            logger.debug("_get_tenant_params_for_quota: %s", e)
-    return {}
-
-
 def _get_quota_used_minutes_pg(tenant_id: int, start: str, end: str) -> float:
     """Somme duration_sec/60 pour le tenant sur [start, end[ (mois UTC)."""
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL") or _pg_url()
     if not url:
         return 0.0
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -685,28 +671,39 @@ def get_quota_snapshot_month(tenant_id: int, month_utc: str) -> tuple[int, float
     Snapshot quota pour un mois UTC (YYYY-MM).
     Returns (included_minutes_month, used_minutes_month).
     Si included == 0 : ne pas bloquer par quota (plan non configuré / gratuit).
+    Une requête (quota_engine.snapshot_month) au lieu de billing + params + plan + usage ;
+    snapshot indisponible (erreur PG) → lectures séparées (plan par défaut, usage du mois).
     """
-    if not month_utc or len(month_utc) != 7 or month_utc[4] != "-":
-        return (0, 0.0)
-    try:
-        y, m = int(month_utc[:4]), int(month_utc[5:7])
-        start = f"{month_utc}-01 00:00:00"
-        end = f"{y}-{m + 1:02d}-01 00:00:00" if m < 12 else f"{y + 1}-01-01 00:00:00"
-    except ValueError:
+    from backend import quota_engine
+
+    q = quota_engine.snapshot_month(month_utc, tenant_ids=[tenant_id]).get(int(tenant_id))
+    if q is not None:
+        return (q.included_minutes, q.used_minutes)
+    bounds = quota_engine.month_bounds(month_utc)
+    if not bounds:
         return (0, 0.0)
+    return (_quota_included_fallback(tenant_id), _get_quota_used_minutes_pg(tenant_id, *bounds))
 
-    billing = get_tenant_billing(tenant_id)
-    params = _get_tenant_params_for_quota(tenant_id)
-    plan_key = (billing or {}).get("plan_key") or (params.get("plan_key") or "").strip() or "free"
 
-    if plan_key == "custom":
-        try:
-            custom_val = int(params.get("custom_included_minutes_month") or 0)
-            included = custom_val if custom_val > 0 else get_plan_included_minutes("custom")
-        except (TypeError, ValueError):
-            included = get_plan_included_minutes("custom")
-    else:
-        included = get_plan_included_minutes(plan_key)
+def get_quota_included_minutes(tenant_id: int) -> int:
+    """Minutes incluses / mois selon le plan (tenant_billing.plan_key, sinon params_json ; custom_included_minutes_month)."""
+    from backend import quota_engine
 
-    used = _get_quota_used_minutes_pg(tenant_id, start, end)
-    return (included, used)
+    month_utc = datetime.utcnow().strftime("%Y-%m")
+    q = quota_engine.snapshot_month(month_utc, tenant_ids=[tenant_id]).get(int(tenant_id))
+    return q.included_minutes if q is not None else _quota_included_fallback(tenant_id)
+
+
+def _quota_included_fallback(tenant_id: int) -> int:
+    """Snapshot indisponible : tenant_billing + params, minutes via billing_plans sinon DEFAULT_PLANS."""
+    from backend import quota_engine
+    from backend.tenant_config import get_params
+
+    billing = get_tenant_billing(tenant_id) or {}
+    try:
+        params = get_params(tenant_id)
+    except Exception as e:
+        logger.debug("_quota_included_fallback params: %s", e)
+        params = {}
+    plan_key, included, source = quota_engine.resolve_included(billing.get("plan_key"), params, {})
+    return included if source == "custom" else get_plan_included_minutes(plan_key)
@@ -0,0 +1,229 @@
+# backend/cache_warmup.py
+"""
+Warmup périodique des caches pour tous les tenants actifs (remplace le warmup keep-alive
+limité au tenant de démo) : adapter calendrier, params tenant (→ booking rules), flags tenant
+(lus au 1er tour de chaque appel), index FAQ compilé et cache de créneaux pour chaque préférence
+(sans / matin / après-midi).
+
+Planification à chaque cycle (CACHE_WARMUP_INTERVAL_S, + jitter) :
+  - tenants = tenants_pg.pg_fetch_tenants (actifs) ∪ tenants épinglés (DEFAULT / TEST_TENANT_ID) ;
+  - priorité au volume d'appels récent (vapi_calls : dernière heure, puis 7 jours) ;
+  - tenants hors horaires booking_rules ignorés (ouverture avancée de CACHE_WARMUP_LEAD_MIN) ;
+    les tenants épinglés sont toujours réchauffés ;
+  - cible de fraîcheur par tenant : appels dans l'heure → HOT_S (sous le TTL slots, le cache ne
+    refroidit pas), appels sur 7 jours → WARM_S, sinon COLD_S ;
+  - au plus MAX_PER_CYCLE tenants dus, CONCURRENCY en parallèle, chacun décalé d'un jitter.
+Désactivé avec DISABLE_WARMUP (comme le keep-alive) ou CACHE_WARMUP_ENABLED=false.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+
+_ENABLED = os.getenv("CACHE_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+INTERVAL_S = _float_env("CACHE_WARMUP_INTERVAL_S", 60.0)
+JITTER_S = _float_env("CACHE_WARMUP_JITTER_S", 5.0)
+CONCURRENCY = max(1, int(_float_env("CACHE_WARMUP_CONCURRENCY", 4)))
+MAX_PER_CYCLE = max(1, int(_float_env("CACHE_WARMUP_MAX_PER_CYCLE", 50)))
+LEAD_MIN = _float_env("CACHE_WARMUP_LEAD_MIN", 30.0)
+HOT_S = _float_env("CACHE_WARMUP_HOT_S", 110.0)
+WARM_S = _float_env("CACHE_WARMUP_WARM_S", 600.0)
+COLD_S = _float_env("CACHE_WARMUP_COLD_S", 1800.0)
+
+PREFS: Tuple[Optional[str], ...] = (None, "matin", "après-midi")
+
+# tenant_id → dernier warmup réussi (time.monotonic)
+_last_warm: Dict[int, float] = {}
+_last_run: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+@dataclass
+class TenantPlan:
+    tenant_id: int
+    calls_last_hour: int = 0
+    calls_recent: int = 0
+    pinned: bool = False
+
+    @property
+    def target_s(self) -> float:
+        """Âge maximal toléré des caches de ce tenant."""
+        if self.calls_last_hour or self.pinned:
+            return HOT_S
+        return WARM_S if self.calls_recent else COLD_S
+
+
+def pinned_tenants() -> List[int]:
+    """Tenants toujours réchauffés (démo / défaut), comme l'ancien keep-alive."""
+    default = int(getattr(config, "DEFAULT_TENANT_ID", 1) or 1)
+    test = int(getattr(config, "TEST_TENANT_ID", default) or default)
+    return sorted({default, test})
+
+
+def active_tenants() -> List[int]:
+    try:
+        from backend.tenants_pg import pg_fetch_tenants
+        res = pg_fetch_tenants()
+    except Exception as e:
+        logger.debug("[CACHE_WARMUP] pg_fetch_tenants failed: %s", e)
+        res = None
+    if not res:
+        return []
+    return [int(t["tenant_id"]) for t in res[0] if t.get("tenant_id")]
+
+
+def call_volume() -> Dict[int, Tuple[int, int]]:
+    from backend.vapi_calls_pg import call_volume_by_tenant
+    return call_volume_by_tenant(days=7)
+
+
+def in_booking_hours(rules: Dict[str, Any], now: Optional[datetime] = None, lead_min: float = LEAD_MIN) -> bool:
+    """now (heure agenda) dans [start_hour - lead_min, end_hour[ un jour de booking_days."""
+    if now is None:
+        from zoneinfo import ZoneInfo
+
+        from backend.google_calendar import CALENDAR_TZ
+        now = datetime.now(ZoneInfo(CALENDAR_TZ))
+    if now.weekday() not in (rules.get("booking_days") or []):
+        return False
+    minute = now.hour * 60 + now.minute
+    return int(rules["start_hour"]) * 60 - lead_min <= minute < int(rules["end_hour"]) * 60
+
+
+def plan(now: Optional[datetime] = None) -> Tuple[List[TenantPlan], int]:
+    """(tenants à considérer triés par priorité, nb ignorés hors horaires)."""
+    from backend.tenant_config import get_booking_rules
+
+    volume = call_volume()
+    pinned = set(pinned_tenants())
+    plans: List[TenantPlan] = []
+    closed = 0
+    for tid in sorted(set(active_tenants()) | pinned):
+        last_hour, recent = volume.get(tid, (0, 0))
+        p = TenantPlan(tid, last_hour, recent, pinned=tid in pinned)
+        if not p.pinned:
+            try:
+                if not in_booking_hours(get_booking_rules(tid), now):
+                    closed += 1
+                    continue
+            except Exception as e:
+                logger.debug("[CACHE_WARMUP] booking rules failed tenant_id=%s: %s", tid, e)
+        plans.append(p)
+    plans.sort(key=lambda p: (-p.calls_last_hour, -p.calls_recent, not p.pinned, p.tenant_id))
+    return plans, closed
+
+
+def due(plans: Iterable[TenantPlan], now_mono: Optional[float] = None) -> List[TenantPlan]:
+    """Tenants dont le dernier warmup dépasse la cible de fraîcheur, au plus MAX_PER_CYCLE."""
+    now_mono = time.monotonic() if now_mono is None else now_mono
+    with _lock:
+        out = [p for p in plans if now_mono - _last_warm.get(p.tenant_id, float("-inf")) >= p.target_s]
+    return out[:MAX_PER_CYCLE]
+
+
+def warm_tenant(tenant_id: int, target_s: float = HOT_S) -> Dict[str, Any]:
+    """Réchauffe un tenant ; les créneaux ne sont recalculés que si l'entrée a plus de target_s."""
+    from backend import slot_prefetch, tools_booking, tools_faq
+    from backend.calendar_adapter import warmup_calendar_adapter
+    from backend.tenant_config import get_params
+    from backend.tenant_flags_cache import get_tenant_flags
+
+    out: Dict[str, Any] = {"tenant_id": tenant_id}
+    get_params(tenant_id)
+    get_tenant_flags(tenant_id)
+    out["adapter"] = warmup_calendar_adapter(tenant_id)
+    tools_faq.tenant_faq_store(tenant_id)
+    refreshed = []
+    if not tools_booking._DISABLE_SLOT_CACHE:
+        for pref in PREFS:
+            age = tools_booking.slots_cache_age(tenant_id, pref)
+            if age is None or age >= target_s:
+                slot_prefetch.refresh(tenant_id, pref)
+                refreshed.append(pref or "none")
+    out["slots_refreshed"] = refreshed
+    return out
+
+
+def _warm_with_jitter(p: TenantPlan) -> Dict[str, Any]:
+    if JITTER_S > 0:
+        time.sleep(random.uniform(0, JITTER_S))
+    # Slots un peu avant la cible : le cycle suivant tombe avant l'expiration.
+    res = warm_tenant(p.tenant_id, max(0.0, p.target_s - INTERVAL_S))
+    with _lock:
+        _last_warm[p.tenant_id] = time.monotonic()
+    return res
+
+
+def run_once(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Un cycle complet (bloquant) ; résumé aussi exposé par stats()."""
+    t0 = time.monotonic()
+    plans, closed = plan(now)
+    todo = due(plans)
+    warmed, errors = [], 0
+    if todo:
+        with ThreadPoolExecutor(max_workers=min(CONCURRENCY, len(todo)), thread_name_prefix="cache-warmup") as pool:
+            for p, fut in [(p, pool.submit(_warm_with_jitter, p)) for p in todo]:
+                try:
+                    warmed.append(fut.result())
+                except Exception as e:
+                    errors += 1
+                    logger.warning("[CACHE_WARMUP] tenant_id=%s failed: %s", p.tenant_id, e)
+    summary = {
+        "tenants": len(plans) + closed,
+        "closed": closed,
+        "due": len(todo),
+        "warmed": [w["tenant_id"] for w in warmed],
+        "slots_refreshed": sum(len(w["slots_refreshed"]) for w in warmed),
+        "errors": errors,
+        "duration_ms": round((time.monotonic() - t0) * 1000, 1),
+        "at": time.time(),
+    }
+    with _lock:
+        _last_run.clear()
+        _last_run.update(summary)
+    if todo:
+        logger.info(
+            "[CACHE_WARMUP] tenants=%s closed=%s warmed=%s slots=%s errors=%s %.0fms",
+            summary["tenants"], closed, len(warmed), summary["slots_refreshed"], errors, summary["duration_ms"],
+        )
+    return summary
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {"last_run": dict(_last_run), "tracked_tenants": len(_last_warm)}
+
+
+def enabled() -> bool:
+    return _ENABLED and os.getenv("DISABLE_WARMUP", "").lower() not in ("1", "true", "yes")
+
+
+async def run_forever(initial_delay_s: float = 10.0) -> None:
+    """Boucle de fond (startup) : un cycle toutes les INTERVAL_S secondes + jitter."""
+    await asyncio.sleep(initial_delay_s)
+    while True:
+        try:
+            await asyncio.to_thread(run_once)
+        except Exception as e:
+            logger.warning("[CACHE_WARMUP] cycle failed: %s", e)
+        await asyncio.sleep(INTERVAL_S + random.uniform(0, JITTER_S))
@@ -0,0 +1,240 @@
+# backend/calendar_busy_index.py
+"""
+Index mémoire des plages occupées d'un calendrier Google (un index par GoogleCalendarService,
+donc par tenant via le cache d'adapters de calendar_adapter).
+
+Au lieu d'un events().list complet sur la plage à chaque cache miss de get_slots, on garde
+les events de la fenêtre [aujourd'hui, aujourd'hui + CALENDAR_BUSY_INDEX_HORIZON_DAYS] en mémoire :
+  - full sync (timeMin/timeMax, paginé) au premier appel, quand la fenêtre ne couvre plus la
+    demande, ou toutes les CALENDAR_BUSY_INDEX_FULL_RESYNC_SEC ;
+  - sync incrémentale via nextSyncToken (seuls les events modifiés / supprimés reviennent) ;
+    410 Gone → full sync.
+Fraîcheur :
+  - âge < CALENDAR_BUSY_INDEX_SYNC_SEC : index servi tel quel ;
+  - âge < CALENDAR_BUSY_INDEX_MAX_STALE_SEC : index servi + sync incrémentale en arrière-plan ;
+  - au-delà : sync incrémentale dans le thread appelant (un seul sync en vol, les autres attendent).
+Les RDV pris / annulés / déplacés via GoogleCalendarService sont reportés immédiatement dans l'index.
+Les créneaux (toute préférence / contrainte horaire) se calculent ensuite localement.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, tzinfo
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.slot_engine import BusyTimeline, Interval
+
+logger = logging.getLogger(__name__)
+
+BUSY_INDEX_ENABLED = os.getenv("CALENDAR_BUSY_INDEX", "true").lower() in ("1", "true", "yes")
+_HORIZON_DAYS = int(os.getenv("CALENDAR_BUSY_INDEX_HORIZON_DAYS", "21"))
+_MAX_HORIZON_DAYS = 62
+_SYNC_SEC = float(os.getenv("CALENDAR_BUSY_INDEX_SYNC_SEC", "20"))
+_MAX_STALE_SEC = float(os.getenv("CALENDAR_BUSY_INDEX_MAX_STALE_SEC", "120"))
+_FULL_RESYNC_SEC = float(os.getenv("CALENDAR_BUSY_INDEX_FULL_RESYNC_SEC", "21600"))
+_PAGE_SIZE = 2500
+
+
+def event_interval(event: Dict[str, Any], tz: tzinfo) -> Optional[Interval]:
+    """Event API Google → (début, fin) dans tz. Dates sans heure (journée entière) = minuit local."""
+    try:
+        raw_start = event["start"].get("dateTime", event["start"].get("date", ""))
+        raw_end = event["end"].get("dateTime", event["end"].get("date", ""))
+        start = datetime.fromisoformat(raw_start.replace("Z", "+00:00"))
+        end = datetime.fromisoformat(raw_end.replace("Z", "+00:00"))
+    except (KeyError, AttributeError, ValueError):
+        return None
+    if start.tzinfo is not None:
+        return start.astimezone(tz), end.astimezone(tz)
+    return start.replace(tzinfo=tz), end.replace(tzinfo=tz)
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat().replace("+00:00", "Z") if dt.tzinfo else dt.isoformat() + "Z"
+
+
+class CalendarBusyIndex:
+    """Plages occupées d'un calendrier, synchronisées par syncToken."""
+
+    def __init__(self, service: Any, calendar_id: str, tz: tzinfo, horizon_days: int = _HORIZON_DAYS):
+        self._service = service
+        self._calendar_id = calendar_id
+        self._tz = tz
+        self._horizon_days = max(1, horizon_days)
+        self._lock = threading.Lock()  # état (events, intervalles fusionnés)
+        self._sync_lock = threading.Lock()  # un seul sync en vol
+        self._events: Dict[str, Interval] = {}
+        self._timeline: Optional[BusyTimeline] = None  # plages fusionnées, reconstruites après changement
+        self._window: Optional[Interval] = None
+        self._sync_token: Optional[str] = None
+        self._synced_at = 0.0
+        self._full_synced_at = 0.0
+        self._refreshing = False
+        self._stats = {"full_syncs": 0, "incremental_syncs": 0, "events_changed": 0, "background_syncs": 0, "errors": 0}
+
+    # ---------- Lecture ----------
+
+    def busy_between(self, start: datetime, end: datetime) -> Optional[List[Interval]]:
+        """
+        Plages occupées (fusionnées, triées) qui chevauchent [start, end).
+        None si la plage n'est pas indexable (passé, trop loin) → l'appelant interroge l'API directement.
+        Les erreurs API de sync remontent (HttpError) comme un events().list direct.
+        """
+        if not self._ensure_fresh(start, end):
+            return None
+        with self._lock:
+            if self._timeline is None:
+                self._timeline = BusyTimeline(self._events.values())
+            return self._timeline.between(start, end)
+
+    # ---------- Mises à jour locales (RDV pris via ce service) ----------
+
+    def upsert(self, event_id: str, start_iso: str, end_iso: str) -> None:
+        interval = event_interval({"start": {"dateTime": start_iso}, "end": {"dateTime": end_iso}}, self._tz)
+        if not event_id or interval is None:
+            return
+        with self._lock:
+            self._events[event_id] = interval
+            self._timeline = None
+
+    def remove(self, event_id: str) -> None:
+        with self._lock:
+            if self._events.pop(event_id, None) is not None:
+                self._timeline = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["events"] = len(self._events)
+            out["age_sec"] = round(time.monotonic() - self._synced_at, 1) if self._synced_at else None
+            return out
+
+    # ---------- Sync ----------
+
+    def _today(self) -> datetime:
+        return datetime.now(self._tz).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _window_ok(self, today: datetime, end: datetime) -> bool:
+        # Fenêtre glissante : elle démarre aujourd'hui (pas de jours passés) et couvre la demande
+        return self._window is not None and self._window[0] == today and end <= self._window[1]
+
+    def _ensure_fresh(self, start: datetime, end: datetime) -> bool:
+        today = self._today()
+        if start < today or end > today + timedelta(days=_MAX_HORIZON_DAYS):
+            return False
+        now = time.monotonic()
+        age = now - self._synced_at
+        if not self._window_ok(today, end) or now - self._full_synced_at > _FULL_RESYNC_SEC:
+            self._sync(full_until=max(end, today + timedelta(days=self._horizon_days)))
+        elif age > _MAX_STALE_SEC:
+            self._sync()
+        elif age > _SYNC_SEC:
+            self._refresh_in_background()
+        return True
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._stats["background_syncs"] += 1
+
+        def _run():
+            try:
+                self._sync()
+            except Exception as e:
+                logger.warning("calendar busy index background sync failed calendar=%s: %s", self._calendar_id[:20], e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=_run, name="calendar-busy-sync", daemon=True).start()
+
+    def _sync(self, full_until: Optional[datetime] = None) -> None:
+        requested = time.monotonic()
+        with self._sync_lock:
+            if self._synced_at >= requested and (full_until is None or self._window_ok(self._today(), full_until)):
+                return  # synchronisé par un autre thread pendant l'attente
+            try:
+                if full_until is not None or self._sync_token is None:
+                    self._full_sync(full_until)
+                else:
+                    self._incremental_sync()
+            except Exception as e:
+                from googleapiclient.errors import HttpError
+                if isinstance(e, HttpError) and getattr(e.resp, "status", None) == 410:
+                    logger.info("calendar busy index: syncToken expiré calendar=%s → full sync", self._calendar_id[:20])
+                    self._full_sync(None)
+                    return
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+
+    def _list_pages(self, **params) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        items: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            kwargs = dict(calendarId=self._calendar_id, singleEvents=True, maxResults=_PAGE_SIZE, **params)
+            if page_token:
+                kwargs["pageToken"] = page_token
+            result = self._service.events().list(**kwargs).execute()
+            items.extend(result.get("items", []))
+            page_token = result.get("nextPageToken")
+            if not isinstance(page_token, str) or not page_token:
+                sync_token = result.get("nextSyncToken")
+                return items, sync_token if isinstance(sync_token, str) else None
+
+    def _full_sync(self, until: Optional[datetime]) -> None:
+        t0 = time.perf_counter()
+        window_start = self._today()
+        window_end = until or (window_start + timedelta(days=self._horizon_days))
+        window_end = max(window_end, window_start + timedelta(days=self._horizon_days))
+        items, sync_token = self._list_pages(timeMin=_iso(window_start), timeMax=_iso(window_end))
+        events: Dict[str, Interval] = {}
+        for event in items:
+            if event.get("status") == "cancelled":
+                continue
+            interval = event_interval(event, self._tz)
+            if interval is not None:
+                events[event.get("id") or f"__anon_{len(events)}"] = interval
+        now = time.monotonic()
+        with self._lock:
+            self._events = events
+            self._timeline = None
+            self._window = (window_start, window_end)
+            self._sync_token = sync_token
+            self._synced_at = now
+            self._full_synced_at = now
+            self._stats["full_syncs"] += 1
+        logger.info(
+            "calendar busy index full sync calendar=%s events=%s days=%s ms=%.0f",
+            self._calendar_id[:20], len(events), (window_end - window_start).days, (time.perf_counter() - t0) * 1000,
+        )
+
+    def _incremental_sync(self) -> None:
+        t0 = time.perf_counter()
+        items, sync_token = self._list_pages(syncToken=self._sync_token)
+        with self._lock:
+            for event in items:
+                event_id = event.get("id")
+                if not event_id:
+                    continue
+                interval = None if event.get("status") == "cancelled" else event_interval(event, self._tz)
+                if interval is None:
+                    self._events.pop(event_id, None)
+                else:
+                    self._events[event_id] = interval
+            if items:
+                self._timeline = None
+                self._stats["events_changed"] += len(items)
+            self._sync_token = sync_token or self._sync_token
+            self._synced_at = time.monotonic()
+            self._stats["incremental_syncs"] += 1
+        logger.debug(
+            "calendar busy index incremental sync calendar=%s changed=%s ms=%.0f",
+            self._calendar_id[:20], len(items), (time.perf_counter() - t0) * 1000,
+        )
+
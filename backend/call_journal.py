@@ -0,0 +1,304 @@
+# backend/call_journal.py
+"""
+Journal d'appel write-behind (call_sessions / call_messages / call_state_checkpoints).
+
+Le tour vocal ne fait plus d'aller-retour PG pour journaliser : les opérations sont posées dans
+une file bornée (CALL_JOURNAL_QUEUE_MAX) et un thread de fond les vide toutes les CALL_JOURNAL_FLUSH_MS.
+Chaque flush regroupe les opérations par appel et les écrit dans UNE transaction par tenant :
+  - UPSERT call_sessions (ensure),
+  - réservation des seq en un seul UPDATE (last_seq = last_seq + n),
+  - INSERT multi-lignes dans call_messages,
+  - dernier last_state et dernier checkpoint de l'appel seulement (coalescence).
+
+Garanties de durabilité :
+  - flush() synchrone : tout ce qui a été posé avant l'appel est écrit au retour
+    (utilisé pour les checkpoints sur changement d'état, avant la réponse HTTP) ;
+  - file pleine : flush synchrone dans le thread appelant (backpressure, pas de perte) ;
+  - shutdown() : flush final à l'arrêt du serveur.
+Si PG est down : log WARN (comme le dual-write Phase 1), le tour continue.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.pg_pool import pg_connection
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_MAX = int(os.getenv("CALL_JOURNAL_QUEUE_MAX", "5000"))
+_FLUSH_INTERVAL_SEC = float(os.getenv("CALL_JOURNAL_FLUSH_MS", "50")) / 1000.0
+_BATCH_MAX = int(os.getenv("CALL_JOURNAL_BATCH_MAX", "500"))
+
+_queue: "queue.Queue[_Op]" = queue.Queue(maxsize=max(1, _QUEUE_MAX))
+_wake = threading.Event()
+_stop = threading.Event()
+_write_lock = threading.Lock()
+_worker_lock = threading.Lock()
+_worker: Optional[threading.Thread] = None
+
+_stats: Dict[str, int] = {
+    "flushes": 0,
+    "sync_flushes": 0,
+    "messages_written": 0,
+    "checkpoints_written": 0,
+    "queue_full": 0,
+    "errors": 0,
+}
+
+
+@dataclass
+class _Op:
+    kind: str  # "ensure" | "message" | "state" | "checkpoint"
+    tenant_id: int
+    call_id: str
+    role: Optional[str] = None
+    text: Optional[str] = None
+    state: Optional[str] = None
+    ts: Optional[datetime] = None
+    state_json: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class _CallBatch:
+    """Opérations coalescées d'un appel pour un flush."""
+    initial_state: Optional[str] = None
+    messages: List[Tuple[str, str, datetime]] = field(default_factory=list)  # (role, text, ts)
+    last_state: Optional[str] = None
+    checkpoint: Optional[Tuple[int, Dict[str, Any]]] = None  # (nb messages avant le checkpoint, state_json)
+
+
+def _pg_url() -> Optional[str]:
+    return os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
+
+
+def enabled() -> bool:
+    return _pg_url() is not None
+
+
+# ---------- API (thread appelant) ----------
+
+def ensure_call_session(tenant_id: int, call_id: str, initial_state: str = "START") -> None:
+    _enqueue(_Op("ensure", int(tenant_id), call_id, state=initial_state))
+
+
+def add_message(tenant_id: int, call_id: str, role: str, text: str) -> None:
+    _enqueue(_Op("message", int(tenant_id), call_id, role=role, text=(text or "")[:10000], ts=datetime.now(timezone.utc)))
+
+
+def update_last_state(tenant_id: int, call_id: str, state: str) -> None:
+    _enqueue(_Op("state", int(tenant_id), call_id, state=state))
+
+
+def write_checkpoint(tenant_id: int, call_id: str, state_json: Dict[str, Any]) -> None:
+    """Checkpoint rattaché au dernier message posé pour cet appel (seq attribuée au flush)."""
+    _enqueue(_Op("checkpoint", int(tenant_id), call_id, state_json=state_json))
+
+
+def flush() -> None:
+    """Écrit de façon synchrone tout ce qui est en file (durabilité avant réponse)."""
+    if _queue.empty():
+        return
+    _stats["sync_flushes"] += 1
+    _drain_and_write()
+
+
+def pending() -> int:
+    return _queue.qsize()
+
+
+def stats() -> Dict[str, int]:
+    out = dict(_stats)
+    out["pending"] = _queue.qsize()
+    return out
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """Arrêt serveur : stoppe le worker puis flush final."""
+    global _worker
+    _stop.set()
+    _wake.set()
+    w = _worker
+    if w is not None and w.is_alive():
+        w.join(timeout)
+    _worker = None
+    _drain_and_write()
+    _stop.clear()
+
+
+# ---------- Worker ----------
+
+def _enqueue(op: _Op) -> None:
+    if not enabled():
+        return
+    _ensure_worker()
+    try:
+        _queue.put_nowait(op)
+    except queue.Full:
+        # Backpressure : on vide dans le thread appelant plutôt que de perdre des messages.
+        _stats["queue_full"] += 1
+        logger.warning("[CALL_JOURNAL_WARN] queue_full size=%s → flush synchrone", _queue.qsize())
+        _drain_and_write()
+        _queue.put(op)
+    _wake.set()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=_run, name="call-journal", daemon=True)
+        _worker.start()
+
+
+def _run() -> None:
+    while not _stop.is_set():
+        _wake.wait()
+        _wake.clear()
+        if _stop.is_set():
+            break
+        # Petite fenêtre pour regrouper les opérations d'un même tour (user + agent + checkpoint)
+        _stop.wait(_FLUSH_INTERVAL_SEC)
+        try:
+            _drain_and_write()
+        except Exception as e:
+            logger.warning("[CALL_JOURNAL_WARN] worker err=%s", e, exc_info=True)
+
+
+def _drain_and_write() -> None:
+    """
+    Vide la file par lots et écrit. Le verrou couvre drain + écriture : quand flush() rend la main,
+    aucune opération posée avant n'est encore en vol dans le worker (ordre message → checkpoint préservé).
+    """
+    with _write_lock:
+        while True:
+            ops: List[_Op] = []
+            while len(ops) < _BATCH_MAX:
+                try:
+                    ops.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not ops:
+                return
+            _write_batch(ops)
+
+
+def _coalesce(ops: List[_Op]) -> Dict[int, Dict[str, _CallBatch]]:
+    """Regroupe par tenant puis par appel, en conservant l'ordre des messages."""
+    by_tenant: Dict[int, Dict[str, _CallBatch]] = {}
+    for op in ops:
+        batch = by_tenant.setdefault(op.tenant_id, {}).setdefault(op.call_id, _CallBatch())
+        if op.kind == "ensure":
+            if batch.initial_state is None:
+                batch.initial_state = op.state or "START"
+        elif op.kind == "message":
+            batch.messages.append((op.role or "", op.text or "", op.ts or datetime.now(timezone.utc)))
+        elif op.kind == "state":
+            batch.last_state = op.state
+        elif op.kind == "checkpoint":
+            batch.checkpoint = (len(batch.messages), op.state_json or {})
+    return by_tenant
+
+
+def _write_batch(ops: List[_Op]) -> None:
+    url = _pg_url()
+    if not url:
+        return
+    from backend import checkpoint_delta
+    from backend.session_pg import _execute_with_retry
+
+    for tenant_id, calls in _coalesce(ops).items():
+        planned: List[Any] = []
+
+        def _do(tenant_id=tenant_id, calls=calls, planned=planned):
+            from psycopg.rows import tuple_row
+            planned.clear()  # retry : on repart de zéro
+            with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
+                with conn.cursor() as cur:
+                    for call_id, batch in calls.items():
+                        ck = _write_call(cur, tenant_id, call_id, batch)
+                        if ck is not None:
+                            planned.append(ck)
+            return True
+
+        if _execute_with_retry("call_journal_flush", _do) is True:
+            _stats["flushes"] += 1
+            for ck in planned:
+                checkpoint_delta.commit(ck)
+            for batch in calls.values():
+                _stats["messages_written"] += len(batch.messages)
+                _stats["checkpoints_written"] += 1 if batch.checkpoint else 0
+        else:
+            _stats["errors"] += 1
+            for call_id, batch in calls.items():
+                if batch.checkpoint is not None:
+                    checkpoint_delta.forget(tenant_id, call_id)
+
+
+def _write_call(cur, tenant_id: int, call_id: str, batch: _CallBatch):
+    """Écrit un appel. Returns le checkpoint delta planifié (à valider après commit) ou None."""
+    cur.execute(
+        """
+        INSERT INTO call_sessions (tenant_id, call_id, status, last_state, last_seq)
+        VALUES (%s, %s, 'active', %s, 0)
+        ON CONFLICT (tenant_id, call_id) DO NOTHING
+        """,
+        (tenant_id, call_id, batch.initial_state or "START"),
+    )
+    n = len(batch.messages)
+    cur.execute(
+        """
+        UPDATE call_sessions
+        SET last_seq = last_seq + %s, last_state = COALESCE(%s, last_state), updated_at = now()
+        WHERE tenant_id = %s AND call_id = %s
+        RETURNING last_seq
+        """,
+        (n, batch.last_state, tenant_id, call_id),
+    )
+    row = cur.fetchone()
+    base_seq = (int(row[0]) if row else n) - n
+    if n:
+        values_sql = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * n)
+        params: List[Any] = []
+        for i, (role, text, ts) in enumerate(batch.messages, start=1):
+            params.extend((tenant_id, call_id, base_seq + i, role, text, ts))
+        cur.execute(
+            f"INSERT INTO call_messages (tenant_id, call_id, seq, role, text, ts) VALUES {values_sql}",
+            params,
+        )
+        logger.info(
+            "[CALL_JOURNAL] tenant_id=%s call_id=%s seq=%s..%s n=%s",
+            tenant_id, call_id[:16], base_seq + 1, base_seq + n, n,
+        )
+    if batch.checkpoint is None:
+        return None
+    from backend import checkpoint_delta
+    from backend.session_codec import checkpoint_state, packed_to_json
+    msgs_before, state_json = batch.checkpoint
+    ck_seq = base_seq + msgs_before
+    planned = None
+    if checkpoint_delta.delta_enabled():
+        planned = checkpoint_delta.plan(tenant_id, call_id, ck_seq, state_json)
+        checkpoint_delta.execute_write(cur, planned)
+    else:
+        cur.execute(
+            """
+            INSERT INTO call_state_checkpoints (tenant_id, call_id, seq, state_json)
+            VALUES (%s, %s, %s, %s::jsonb)
+            ON CONFLICT (tenant_id, call_id, seq) DO NOTHING
+            """,
+            (tenant_id, call_id, ck_seq, packed_to_json(state_json)),
+        )
+    logger.info(
+        "[CHECKPOINT] tenant_id=%s call_id=%s seq=%s state=%s kind=%s",
+        tenant_id, call_id[:16], ck_seq, checkpoint_state(state_json), planned.kind if planned else "full",
+    )
+    return planned
@@ -0,0 +1,489 @@
+# backend/call_replay.py
+"""
+Rejeu hors ligne d'appels pour mesurer les performances du moteur (scripts/replay_calls.py).
+
+Les conversations (transcripts stockés call_messages / call_transcripts, fichier JSONL ou scénarios
+synthétiques) sont rejouées tour par tour :
+  - mode "engine" : Engine.handle_message(call_id, texte) ;
+  - mode "voice"  : routes.voice._compute_voice_response_sync (chemin Vapi complet, sans HTTP).
+Le calendrier est un faux en mémoire (InMemoryCalendar : vrai calcul de créneaux, pas d'API Google),
+le stockage une base SQLite temporaire (store="sqlite") ou la base PG locale configurée (store="pg").
+
+Par tour : latence, requêtes DB (instructions SQLite + execute psycopg, threads de fond inclus),
+pic d'allocation (tracemalloc, optionnel) et durée par étape (spans turn_trace).
+summarize() → p50/p95/p99 ; compare() → régressions par rapport à une baseline.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from backend.google_calendar import CALENDAR_TZ, GoogleCalendarService
+
+logger = logging.getLogger(__name__)
+
+MODES = ("engine", "voice")
+STORES = ("sqlite", "pg")
+
+
+@dataclass
+class ReplayCall:
+    call_id: str
+    turns: List[str]
+    tenant_id: int = 1
+    source: str = "synthetic"
+
+
+@dataclass
+class TurnSample:
+    call_id: str
+    turn: int
+    text: str
+    response: str
+    ms: float
+    db_roundtrips: int
+    alloc_kib: Optional[float] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+
+
+# ---------- Conversations ----------
+
+SYNTHETIC_SCENARIOS: Dict[str, List[str]] = {
+    "booking": ["je veux un rdv", "Jean Dupont", "consultation", "matin", "oui", "1", "jean@example.com", "oui"],
+    "booking_hesitant": [
+        "euh bonjour", "je voudrais prendre rendez-vous", "euh je sais pas", "Paul Durand",
+        "un contrôle", "plutôt l'après-midi", "oui", "le deuxième",
+        "zéro six douze trente-quatre cinquante-six soixante-dix-huit", "oui",
+    ],
+    "faq": ["quels sont vos horaires", "et vous êtes où exactement", "merci au revoir"],
+    "cancel": ["je veux annuler mon rendez-vous", "Martin Dupont", "oui"],
+    "modify": ["je voudrais déplacer mon rendez-vous", "Claire Martin", "jeudi après-midi"],
+    "transfer": ["bonjour", "je veux parler à un humain"],
+    "medical": ["j'ai mal à la gorge depuis trois jours", "je veux un rendez-vous", "Lucie Bernard", "le matin", "oui"],
+}
+
+
+def synthetic_calls(n: int = 50, tenant_id: int = 1, seed: int = 0) -> List[ReplayCall]:
+    """n appels tirés des scénarios synthétiques (tirage déterministe pour une graine donnée)."""
+    rng = random.Random(seed)
+    names = sorted(SYNTHETIC_SCENARIOS)
+    out = []
+    for i in range(n):
+        name = names[i % len(names)] if i < len(names) else rng.choice(names)
+        out.append(ReplayCall(f"replay-{name}-{i:04d}", list(SYNTHETIC_SCENARIOS[name]), tenant_id, f"synthetic:{name}"))
+    return out
+
+
+def _user_turns(messages: Iterable[Dict[str, Any]]) -> List[str]:
+    turns = []
+    for m in messages:
+        if (m.get("role") or "").lower() != "user":
+            continue
+        text = (m.get("text") or m.get("content") or m.get("transcript") or "").strip()
+        if text:
+            turns.append(text)
+    return turns
+
+
+def load_jsonl(path: str, default_tenant_id: int = 1) -> List[ReplayCall]:
+    """
+    Une ligne par appel :
+      {"call_id": "...", "tenant_id": 1, "turns": ["je veux un rdv", ...]}
+      {"call_id": "...", "messages": [{"role": "user", "text": "..."}, {"role": "assistant", ...}]}
+    """
+    calls = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            row = json.loads(line)
+            turns = [str(t).strip() for t in row.get("turns") or [] if str(t).strip()]
+            if not turns:
+                turns = _user_turns(row.get("messages") or [])
+            if not turns:
+                logger.warning("[REPLAY] ligne %s ignorée : aucun tour utilisateur", n)
+                continue
+            calls.append(ReplayCall(
+                str(row.get("call_id") or f"replay-file-{n:04d}"),
+                turns,
+                int(row.get("tenant_id") or default_tenant_id),
+                f"file:{os.path.basename(path)}",
+            ))
+    return calls
+
+
+def load_pg_calls(tenant_id: int, limit: int = 100, table: str = "call_messages") -> List[ReplayCall]:
+    """Derniers appels d'un tenant depuis call_messages (seq) ou call_transcripts (is_final, created_at)."""
+    from backend.pg_pool import pg_connection
+
+    if table == "call_messages":
+        sql = (
+            "SELECT call_id, role, text FROM call_messages WHERE tenant_id = %s AND call_id IN ("
+            " SELECT call_id FROM call_messages WHERE tenant_id = %s GROUP BY call_id ORDER BY max(ts) DESC LIMIT %s"
+            ") ORDER BY call_id, seq"
+        )
+    elif table == "call_transcripts":
+        sql = (
+            "SELECT call_id, role, transcript AS text FROM call_transcripts WHERE tenant_id = %s AND is_final AND call_id IN ("
+            " SELECT call_id FROM call_transcripts WHERE tenant_id = %s GROUP BY call_id ORDER BY max(created_at) DESC LIMIT %s"
+            ") ORDER BY call_id, created_at, id"
+        )
+    else:
+        raise ValueError(f"table inconnue: {table}")
+    by_call: Dict[str, List[Dict[str, Any]]] = {}
+    with pg_connection(tenant_id=tenant_id) as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, (tenant_id, tenant_id, limit))
+            for row in cur.fetchall():
+                by_call.setdefault(row["call_id"], []).append(row)
+    calls = []
+    for call_id, rows in by_call.items():
+        turns = _user_turns(rows)
+        if turns:
+            calls.append(ReplayCall(call_id, turns, tenant_id, f"pg:{table}"))
+    return calls
+
+
+# ---------- Faux calendrier ----------
+
+class InMemoryCalendar(GoogleCalendarService):
+    """
+    GoogleCalendarService sans API : plages occupées en mémoire, calcul de créneaux inchangé
+    (get_free_slots / get_free_slots_range). latency_ms simule l'aller-retour Google par appel.
+    """
+
+    def __init__(self, busy: Optional[List[Tuple[datetime, datetime]]] = None, latency_ms: float = 0.0):
+        self.calendar_id = "replay@in-memory"
+        self.service = None
+        self._busy_index = None
+        self._busy_index_lock = threading.Lock()
+        self._latency_s = max(0.0, latency_ms) / 1000
+        self._lock = threading.Lock()
+        self._events: Dict[str, Dict[str, Any]] = {}
+        for start, end in busy or []:
+            self._add(start, end, "Occupé", "")
+
+    @classmethod
+    def seeded(cls, days: int = 14, per_day: int = 4, seed: int = 0, latency_ms: float = 0.0) -> "InMemoryCalendar":
+        """Agenda pré-rempli : per_day RDV aléatoires (9h-18h) sur les days prochains jours."""
+        rng = random.Random(seed)
+        tz = ZoneInfo(CALENDAR_TZ)
+        today = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        busy = []
+        for d in range(days):
+            for _ in range(per_day):
+                start = today + timedelta(days=d, hours=rng.randint(9, 17), minutes=rng.choice([0, 15, 30, 45]))
+                busy.append((start, start + timedelta(minutes=rng.choice([15, 30, 45]))))
+        return cls(busy, latency_ms)
+
+    def _wait(self) -> None:
+        if self._latency_s:
+            time.sleep(self._latency_s)
+
+    def _add(self, start: datetime, end: datetime, summary: str, description: str) -> str:
+        event_id = uuid.uuid4().hex
+        self._events[event_id] = {
+            "id": event_id,
+            "summary": summary,
+            "description": description,
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+            "_interval": (start, end),
+        }
+        return event_id
+
+    @staticmethod
+    def _parse(iso: str) -> datetime:
+        dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
+        return dt if dt.tzinfo else dt.replace(tzinfo=ZoneInfo(CALENDAR_TZ))
+
+    def _busy_intervals(self, range_start: datetime, range_end: datetime, tz) -> List[Tuple[datetime, datetime]]:
+        self._wait()
+        with self._lock:
+            return [
+                (s.astimezone(tz), e.astimezone(tz))
+                for s, e in (ev["_interval"] for ev in self._events.values())
+                if s < range_end and e > range_start
+            ]
+
+    def book_appointment(self, start_time: str, end_time: str, patient_name: str, patient_contact: str, motif: str) -> Optional[str]:
+        self._wait()
+        start, end = self._parse(start_time), self._parse(end_time)
+        with self._lock:
+            if any(s < end and e > start for s, e in (ev["_interval"] for ev in self._events.values())):
+                return None
+            return self._add(start, end, f"RDV - {patient_name}", f"Patient: {patient_name}\nContact: {patient_contact}\nMotif: {motif}")
+
+    def list_upcoming_events(self, days: int = 30) -> List[Dict]:
+        self._wait()
+        now = datetime.now(ZoneInfo(CALENDAR_TZ))
+        with self._lock:
+            events = [ev for ev in self._events.values() if now <= ev["_interval"][0] <= now + timedelta(days=days)]
+        return [{k: v for k, v in ev.items() if k != "_interval"} for ev in sorted(events, key=lambda ev: ev["_interval"][0])]
+
+    def cancel_appointment(self, event_id: str) -> bool:
+        self._wait()
+        with self._lock:
+            return self._events.pop(event_id, None) is not None
+
+    def reschedule_appointment(self, event_id: str, start_time: str, end_time: str) -> bool:
+        self._wait()
+        with self._lock:
+            ev = self._events.get(event_id)
+            if ev is None:
+                return False
+            start, end = self._parse(start_time), self._parse(end_time)
+            ev["_interval"] = (start, end)
+            ev["start"], ev["end"] = {"dateTime": start.isoformat()}, {"dateTime": end.isoformat()}
+            return True
+
+
+# ---------- Compteur d'allers-retours DB ----------
+
+class DbRoundTrips:
+    """
+    Compte les instructions SQLite (connexions ouvertes pendant le rejeu, trace callback) et les
+    execute/executemany psycopg. Les connexions ouvertes avant install() ne sont pas comptées.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+        self._patches: List[Any] = []
+
+    def _hit(self, *_: Any) -> None:
+        with self._lock:
+            self.count += 1
+
+    def install(self) -> None:
+        real_connect = sqlite3.connect
+
+        def connect(*args, **kwargs):
+            conn = real_connect(*args, **kwargs)
+            conn.set_trace_callback(self._hit)
+            return conn
+
+        self._patches.append(mock.patch.object(sqlite3, "connect", connect))
+        try:
+            import psycopg
+        except ImportError:
+            psycopg = None
+        if psycopg is not None:
+            for name in ("execute", "executemany"):
+                real = getattr(psycopg.Cursor, name)
+
+                def wrapped(cur, *args, _real=real, **kwargs):
+                    self._hit()
+                    return _real(cur, *args, **kwargs)
+
+                self._patches.append(mock.patch.object(psycopg.Cursor, name, wrapped))
+        for p in self._patches:
+            p.start()
+
+    def uninstall(self) -> None:
+        for p in reversed(self._patches):
+            p.stop()
+        self._patches.clear()
+
+
+# ---------- Rejeu ----------
+
+@contextmanager
+def replay_env(store: str = "sqlite", calendar: Optional[InMemoryCalendar] = None, workdir: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Environnement de rejeu : faux calendrier branché sur get_calendar_adapter / _get_calendar_service,
+    caches vidés en entrée et en sortie, et pour store="sqlite" une base SQLite temporaire (PG désactivé).
+    """
+    from backend import billing_cache, config, db, shared_cache, tools_booking
+    from backend.calendar_adapter import _GoogleCalendarAdapter
+    from backend.engine import ENGINE
+    from backend.session_store_hybrid import HybridSessionStore
+
+    if store not in STORES:
+        raise ValueError(f"store inconnu: {store}")
+    calendar = calendar or InMemoryCalendar.seeded()
+    adapter = _GoogleCalendarAdapter(calendar.calendar_id)
+    adapter._service = calendar
+    tmp = None
+    if workdir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="uwi_replay_")
+        workdir = tmp.name
+    session_store = HybridSessionStore(db_path=os.path.join(workdir, "sessions.db"))
+    patches = [
+        mock.patch("backend.calendar_adapter.get_calendar_adapter", lambda session: adapter),
+        mock.patch.object(tools_booking, "_get_calendar_service", lambda: calendar),
+        mock.patch.object(ENGINE, "session_store", session_store),
+    ]
+    if store == "sqlite":
+        patches += [
+            mock.patch.object(db, "DB_PATH", os.path.join(workdir, "agent.db")),
+            mock.patch.dict(os.environ, {"DATABASE_URL": "", "PG_EVENTS_URL": "", "SHARED_CACHE_BACKEND": "memory"}),
+        ]
+        patches += [mock.patch.object(config, flag, False) for flag in (
+            "USE_PG_EVENTS", "USE_PG_TENANTS", "USE_PG_SLOTS", "USE_PG_CALL_JOURNAL",
+        )]
+    for p in patches:
+        p.start()
+    try:
+        if store == "sqlite":
+            db.init_db()
+        billing_cache.clear()
+        shared_cache._clear_memory_tiers()
+        yield {"calendar": calendar, "session_store": session_store, "workdir": workdir}
+    finally:
+        for p in reversed(patches):
+            p.stop()
+        # Rien de la base de rejeu ne doit rester en cache (params tenant, créneaux, quotas)
+        billing_cache.clear()
+        shared_cache._clear_memory_tiers()
+        if tmp is not None:
+            tmp.cleanup()
+
+
+def _stage_totals(trace: Any) -> Dict[str, float]:
+    totals: Dict[str, float] = {}
+    for s in getattr(trace, "spans", None) or []:
+        totals[s["stage"]] = round(totals.get(s["stage"], 0.0) + s["duration_ms"], 3)
+    return totals
+
+
+def replay(
+    calls: List[ReplayCall],
+    mode: str = "engine",
+    store: str = "sqlite",
+    track_alloc: bool = False,
+    calendar: Optional[InMemoryCalendar] = None,
+    warmup_calls: int = 1,
+) -> List[TurnSample]:
+    """
+    Rejoue calls et renvoie un TurnSample par tour. Les warmup_calls premiers appels
+    (imports paresseux, caches, compilation des index) sont joués mais non mesurés.
+    """
+    from backend import turn_trace
+    from backend.engine import Engine
+    from backend.tools_faq import default_faq_store
+
+    if mode not in MODES:
+        raise ValueError(f"mode inconnu: {mode}")
+    samples: List[TurnSample] = []
+    counter = DbRoundTrips()
+    with replay_env(store, calendar) as env:
+        if mode == "engine":
+            engine = Engine(session_store=env["session_store"], faq_store=default_faq_store())
+        else:
+            from backend.routes.voice import _compute_voice_response_sync
+        counter.install()
+        if track_alloc:
+            tracemalloc.start()
+        try:
+            for i, call in enumerate(calls):
+                measured = i >= warmup_calls
+                call_id = call.call_id if measured else f"{call.call_id}-warmup"
+                messages: List[Dict[str, str]] = []
+                for n, text in enumerate(call.turns):
+                    messages.append({"role": "user", "content": text})
+                    if track_alloc:
+                        tracemalloc.reset_peak()
+                        alloc_base = tracemalloc.get_traced_memory()[0]
+                    db_base = counter.count
+                    t0 = time.perf_counter()
+                    with turn_trace.turn(call_id, kind="replay", channel=mode, tenant_id=call.tenant_id) as trace:
+                        if mode == "engine":
+                            events = engine.handle_message(call_id, text)
+                            response = events[0].text if events else ""
+                        else:
+                            response, _ = _compute_voice_response_sync(call.tenant_id, call_id, text, None, list(messages))
+                    ms = (time.perf_counter() - t0) * 1000
+                    alloc_kib = None
+                    if track_alloc:
+                        alloc_kib = round((tracemalloc.get_traced_memory()[1] - alloc_base) / 1024, 1)
+                    messages.append({"role": "assistant", "content": response or ""})
+                    if measured:
+                        samples.append(TurnSample(
+                            call.call_id, n, text, response or "", round(ms, 3),
+                            counter.count - db_base, alloc_kib, _stage_totals(trace),
+                        ))
+        finally:
+            if track_alloc:
+                tracemalloc.stop()
+            counter.uninstall()
+    return samples
+
+
+# ---------- Statistiques / régressions ----------
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile q (0-100) par interpolation linéaire ; 0.0 si vide."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _dist(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3) if values else 0.0,
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+    }
+
+
+def summarize(samples: List[TurnSample]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "turns": len(samples),
+        "calls": len({s.call_id for s in samples}),
+        "latency_ms": _dist([s.ms for s in samples]),
+        "db_roundtrips": _dist([float(s.db_roundtrips) for s in samples]),
+    }
+    allocs = [s.alloc_kib for s in samples if s.alloc_kib is not None]
+    if allocs:
+        out["alloc_kib"] = _dist(allocs)
+    stages: Dict[str, List[float]] = {}
+    for s in samples:
+        for stage, ms in s.stages.items():
+            stages.setdefault(stage, []).append(ms)
+    out["stages_ms"] = {stage: _dist(v) for stage, v in sorted(stages.items())}
+    return out
+
+
+# (métrique, percentile, plancher absolu en dessous duquel un écart n'est pas une régression)
+_GATED = (
+    ("latency_ms", "p50", 1.0),
+    ("latency_ms", "p95", 2.0),
+    ("latency_ms", "p99", 5.0),
+    ("db_roundtrips", "mean", 0.5),
+    ("alloc_kib", "p95", 64.0),
+)
+
+
+def compare(summary: Dict[str, Any], baseline: Dict[str, Any], max_regression: float = 0.2) -> List[str]:
+    """Régressions de summary par rapport à baseline (hausse relative > max_regression et > plancher)."""
+    regressions = []
+    for metric, stat, floor in _GATED:
+        new = (summary.get(metric) or {}).get(stat)
+        old = (baseline.get(metric) or {}).get(stat)
+        if new is None or old is None:
+            continue
+        if new - old > floor and new > old * (1 + max_regression):
+            regressions.append(f"{metric}.{stat}: {old:g} → {new:g} (+{(new / old - 1) * 100 if old else float('inf'):.0f}%)")
+    return regressions
@@ -0,0 +1,256 @@
+# backend/checkpoint_delta.py
+"""
+Checkpoints delta pour call_state_checkpoints (migration 032).
+
+Mode delta (CALL_CHECKPOINT_DELTA=true) : un snapshot complet (kind='full') tous les
+CALL_CHECKPOINT_BASE_EVERY checkpoints d'un appel, et entre deux des patchs JSON (RFC 6902 :
+add / remove / replace) contre le checkpoint précédent (kind='delta', prev_seq = seq du parent).
+Les appels longs (propositions de créneaux répétées) n'écrivent plus que les champs modifiés.
+
+Le diff se fait sur la forme "indexée" du dict packé v2 : la liste plate f=[idx, val, ...] devient
+un objet {"idx": val} pour que l'ajout / retrait d'un champ ne décale pas les autres.
+
+Le suivi du dernier checkpoint écrit est en mémoire (par process) : sans historique connu
+(redémarrage, autre replica, échec d'écriture) on repart d'un snapshot complet.
+Lecture : fold() reconstruit l'état depuis le dernier full + deltas chaînés ; une chaîne cassée
+s'arrête au dernier état cohérent.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.session_codec import packed_to_json
+
+logger = logging.getLogger(__name__)
+
+KIND_FULL = "full"
+KIND_DELTA = "delta"
+
+_TRACK_MAX = 10000
+
+_UPSERT_SQL = """
+    INSERT INTO call_state_checkpoints (tenant_id, call_id, seq, state_json, kind, prev_seq)
+    VALUES (%s, %s, %s, %s::jsonb, %s, %s)
+    ON CONFLICT (tenant_id, call_id, seq)
+    DO UPDATE SET state_json = EXCLUDED.state_json, kind = EXCLUDED.kind, prev_seq = EXCLUDED.prev_seq, ts = now()
+"""
+
+# Dernier full de l'appel + checkpoints suivants (index partiel idx_call_state_checkpoints_full)
+_CHAIN_SQL = """
+    SELECT seq, kind, prev_seq, state_json
+    FROM call_state_checkpoints
+    WHERE tenant_id = %s AND call_id = %s
+      AND seq >= COALESCE((
+          SELECT MAX(seq) FROM call_state_checkpoints
+          WHERE tenant_id = %s AND call_id = %s AND kind = 'full'
+      ), 0)
+    ORDER BY seq ASC
+"""
+
+_tracked: "OrderedDict[Tuple[int, str], _Tracked]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def delta_enabled() -> bool:
+    """Lu au runtime (comme PG_POOL_*) pour permettre l'activation en tests."""
+    return (os.environ.get("CALL_CHECKPOINT_DELTA") or "false").lower() in ("true", "1", "yes")
+
+
+def base_every() -> int:
+    try:
+        return max(1, int((os.environ.get("CALL_CHECKPOINT_BASE_EVERY") or "").strip() or 10))
+    except ValueError:
+        return 10
+
+
+@dataclass
+class _Tracked:
+    seq: int
+    doc: Dict[str, Any]  # forme indexée du dernier checkpoint écrit
+    since_base: int  # deltas écrits depuis le dernier full
+
+
+@dataclass
+class PlannedCheckpoint:
+    """Ligne à écrire : payload = snapshot packé (full) ou liste d'opérations (delta)."""
+    tenant_id: int
+    call_id: str
+    seq: int
+    kind: str
+    prev_seq: Optional[int]
+    payload: Any
+    doc: Dict[str, Any]
+    since_base: int
+
+
+# ---------- Forme indexée ----------
+
+def _keyed(packed: Dict[str, Any]) -> Dict[str, Any]:
+    doc = dict(packed)
+    flat = doc.get("f")
+    if isinstance(flat, list):
+        doc["f"] = {str(flat[i]): flat[i + 1] for i in range(0, len(flat) - 1, 2)}
+    return doc
+
+
+def _unkeyed(doc: Dict[str, Any]) -> Dict[str, Any]:
+    packed = dict(doc)
+    fields = packed.get("f")
+    if isinstance(fields, dict):
+        flat: List[Any] = []
+        for idx in sorted(fields, key=int):
+            flat.extend((int(idx), fields[idx]))
+        packed["f"] = flat
+    return packed
+
+
+# ---------- JSON Patch (sous-ensemble RFC 6902) ----------
+
+def _escape(token: str) -> str:
+    return token.replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def make_patch(old: Dict[str, Any], new: Dict[str, Any], path: str = "") -> List[Dict[str, Any]]:
+    """Opérations pour passer de old à new. Objets comparés clé par clé, listes remplacées en bloc."""
+    ops: List[Dict[str, Any]] = []
+    for key in old:
+        if key not in new:
+            ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+    for key, value in new.items():
+        p = f"{path}/{_escape(key)}"
+        if key not in old:
+            ops.append({"op": "add", "path": p, "value": value})
+        elif old[key] != value or type(old[key]) is not type(value):
+            if isinstance(old[key], dict) and isinstance(value, dict):
+                ops.extend(make_patch(old[key], value, p))
+            else:
+                ops.append({"op": "replace", "path": p, "value": value})
+    return ops
+
+
+def apply_patch(doc: Dict[str, Any], ops: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Applique les opérations sur une copie de doc. ValueError si un chemin est introuvable."""
+    out = copy.deepcopy(doc)
+    for op in ops:
+        tokens = [_unescape(t) for t in op["path"].split("/")[1:]]
+        if not tokens:
+            raise ValueError("chemin racine non supporté")
+        parent: Any = out
+        for token in tokens[:-1]:
+            if isinstance(parent, list):
+                parent = parent[int(token)]
+            elif isinstance(parent, dict) and token in parent:
+                parent = parent[token]
+            else:
+                raise ValueError(f"chemin introuvable: {op['path']}")
+        last = tokens[-1]
+        if not isinstance(parent, dict):
+            raise ValueError(f"parent non objet: {op['path']}")
+        kind = op["op"]
+        if kind == "remove":
+            if last not in parent:
+                raise ValueError(f"remove sur clé absente: {op['path']}")
+            del parent[last]
+        elif kind in ("add", "replace"):
+            if kind == "replace" and last not in parent:
+                raise ValueError(f"replace sur clé absente: {op['path']}")
+            parent[last] = copy.deepcopy(op["value"])
+        else:
+            raise ValueError(f"op non supportée: {kind}")
+    return out
+
+
+# ---------- Écriture ----------
+
+def plan(tenant_id: int, call_id: str, seq: int, packed: Dict[str, Any]) -> PlannedCheckpoint:
+    """
+    Décide full / delta pour le checkpoint (tenant_id, call_id, seq). N'altère pas le suivi :
+    appeler commit() une fois la transaction validée, forget() sinon.
+    """
+    # Round-trip JSON : détache des objets vivants de la session et compare ce qui sera stocké
+    packed = json.loads(packed_to_json(packed))
+    doc = _keyed(packed)
+    with _lock:
+        prev = _tracked.get((tenant_id, call_id))
+    if prev is not None and seq > prev.seq and prev.since_base + 1 < base_every():
+        ops = make_patch(prev.doc, doc)
+        return PlannedCheckpoint(tenant_id, call_id, seq, KIND_DELTA, prev.seq, ops, doc, prev.since_base + 1)
+    return PlannedCheckpoint(tenant_id, call_id, seq, KIND_FULL, None, packed, doc, 0)
+
+
+def execute_write(cur, planned: PlannedCheckpoint) -> None:
+    """Écrit la ligne planifiée (même seq déjà présente → remplacée, le suivi repart de cette ligne)."""
+    cur.execute(
+        _UPSERT_SQL,
+        (planned.tenant_id, planned.call_id, planned.seq, packed_to_json(planned.payload), planned.kind, planned.prev_seq),
+    )
+
+
+def commit(planned: PlannedCheckpoint) -> None:
+    key = (planned.tenant_id, planned.call_id)
+    with _lock:
+        _tracked[key] = _Tracked(planned.seq, planned.doc, planned.since_base)
+        _tracked.move_to_end(key)
+        while len(_tracked) > _TRACK_MAX:
+            _tracked.popitem(last=False)
+
+
+def forget(tenant_id: int, call_id: str) -> None:
+    """Historique incertain (échec d'écriture) → le prochain checkpoint sera un full."""
+    with _lock:
+        _tracked.pop((tenant_id, call_id), None)
+
+
+def reset() -> None:
+    with _lock:
+        _tracked.clear()
+
+
+# ---------- Lecture ----------
+
+def read_latest(cur, tenant_id: int, call_id: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Reconstruit le dernier checkpoint : (seq, dict packé) ou None."""
+    cur.execute(_CHAIN_SQL, (tenant_id, call_id, tenant_id, call_id))
+    rows = [
+        (r[0], r[1], r[2], r[3] if isinstance(r[3], (dict, list)) else json.loads(r[3]))
+        for r in cur.fetchall()
+    ]
+    return fold(rows)
+
+
+def fold(rows: Iterable[Tuple[int, Optional[str], Optional[int], Dict[str, Any]]]) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    rows : (seq, kind, prev_seq, state_json) triés par seq croissant, à partir du dernier full.
+    Returns (seq, dict packé) du dernier état reconstructible, ou None sans full de départ.
+    """
+    seq: Optional[int] = None
+    doc: Optional[Dict[str, Any]] = None
+    for row_seq, kind, prev_seq, state_json in rows:
+        if (kind or KIND_FULL) == KIND_FULL:
+            seq, doc = int(row_seq), _keyed(state_json)
+            continue
+        if doc is None:
+            continue
+        if prev_seq != seq:
+            logger.warning("[CHECKPOINT_WARN] delta chain broken seq=%s prev_seq=%s expected=%s", row_seq, prev_seq, seq)
+            break
+        try:
+            doc = apply_patch(doc, state_json or [])
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logger.warning("[CHECKPOINT_WARN] delta apply failed seq=%s err=%s", row_seq, e)
+            break
+        seq = int(row_seq)
+    if doc is None or seq is None:
+        return None
+    return (seq, _unkeyed(doc))
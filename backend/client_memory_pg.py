@@ -10,7 +10,7 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 from backend.client_memory import Client, BookingHistory
-from backend.pg_tenant_context import set_tenant_id_on_connection
+from backend.pg_pool import pg_connection
 
 logger = logging.getLogger(__name__)
 
@@ -101,12 +101,11 @@ def pg_get_client_by_phone(tenant_id: int, phone: str) -> Optional[Client]:
     if not url:
         return None
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
         p = _normalize_phone(phone)
         if not p:
             return None
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             _ensure_tables(conn)
             with conn.cursor() as cur:
                 cur.execute(
@@ -125,12 +124,11 @@ def pg_get_client_by_name(tenant_id: int, name: str) -> Optional[Client]:
     if not url:
         return None
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
         name_lower = (name or "").lower().strip()
         if not name_lower:
             return None
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             _ensure_tables(conn)
             with conn.cursor() as cur:
                 cur.execute(
@@ -183,9 +181,8 @@ def pg_create_client(
     url = _pg_url()
     if not url:
         raise RuntimeError("client_memory_pg: no DATABASE_URL")
-    import psycopg
-    with psycopg.connect(url) as conn:
-        set_tenant_id_on_connection(conn, tenant_id)
+    from psycopg.rows import tuple_row
+    with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
         _ensure_tables(conn)
         with conn.cursor() as cur:
             cur.execute(
@@ -207,15 +204,14 @@ def pg_update_client(tenant_id: int, client_id: int, **kwargs: Any) -> None:
     url = _pg_url()
     if not url:
         return
-    import psycopg
+    from psycopg.rows import tuple_row
     allowed = {"phone", "name", "email", "last_contact", "last_motif", "preferred_time", "notes"}
     updates = {k: v for k, v in kwargs.items() if k in allowed}
     if not updates:
         return
     set_parts = [f"{k} = %s" for k in updates]
     values = list(updates.values()) + [tenant_id, client_id]
-    with psycopg.connect(url) as conn:
-        set_tenant_id_on_connection(conn, tenant_id)
+    with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
         with conn.cursor() as cur:
             cur.execute(
                 f"UPDATE tenant_clients SET {', '.join(set_parts)} WHERE tenant_id = %s AND id = %s",
@@ -235,9 +231,8 @@ def pg_record_booking(
     if not url:
         return 0
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             _ensure_tables(conn)
             with conn.cursor() as cur:
                 cur.execute(
@@ -269,9 +264,8 @@ def pg_get_history(tenant_id: int, client_id: int, limit: int = 10) -> List[Book
     if not url:
         return []
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -295,9 +289,8 @@ def pg_get_clients_with_email(tenant_id: int) -> List[Tuple[int, str, str]]:
     if not url:
         return []
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT id, name, email FROM tenant_clients WHERE tenant_id = %s AND email IS NOT NULL AND email != ''",
@@ -314,10 +307,9 @@ def pg_get_stats(tenant_id: int, days: int = 30) -> Dict[str, Any]:
     if not url:
         return {"total_clients": 0, "new_clients": 0, "active_clients": 0, "total_bookings": 0, "top_clients": [], "period_days": days}
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
         since = datetime.utcnow() - timedelta(days=days)
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT COUNT(*) FROM tenant_clients WHERE tenant_id = %s", (tenant_id,))
                 total_clients = cur.fetchone()[0]
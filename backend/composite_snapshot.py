@@ -0,0 +1,147 @@
+# backend/composite_snapshot.py
+"""
+Snapshots composites des payloads admin (dashboard, operations, quality) : sections indépendantes
+lancées en parallèle, chacune avec son timeout et un cache stale-while-revalidate ; la réponse est
+partielle si besoin, avec la fraîcheur de chaque section. Temps de réponse ≈ section la plus lente
+(bornée par son timeout) au lieu de la somme des sections.
+
+Par section (clé de cache = snapshot + section + arguments) :
+  - entrée de moins de ttl_s → servie telle quelle (fresh) ;
+  - entrée plus vieille mais de moins de stale_s → servie (stale) + recalcul en arrière-plan ;
+  - sinon calcul, attendu au plus timeout_s ; au-delà, valeur par défaut (timeout / error) —
+    le calcul continue et remplit le cache pour le chargement suivant.
+refresh=True ignore le cache à la lecture (bouton « actualiser ») mais garde les timeouts.
+Calculs d'une même clé fusionnés (SingleFlight "admin_snapshot") ; entrées {"value", "computed_at",
+"duration_ms"} dans shared_cache "admin_snapshot" (partagé entre workers selon SHARED_CACHE_BACKEND).
+ADMIN_SNAPSHOT_WORKERS (8), ADMIN_SNAPSHOT_CACHE=false pour désactiver le cache.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from backend.shared_cache import cache_key, get_cache
+from backend.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_WORKERS = max(1, int(os.getenv("ADMIN_SNAPSHOT_WORKERS", "8") or 8))
+_CACHE_ENABLED = os.getenv("ADMIN_SNAPSHOT_CACHE", "true").lower() in ("1", "true", "yes")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_flights = SingleFlight("admin_snapshot")
+_cache = get_cache("admin_snapshot", ttl_seconds=600, max_entries=500)
+# {statut: nb de sections servies} → /health
+_counts: Dict[str, int] = {"fresh": 0, "stale": 0, "computed": 0, "timeout": 0, "error": 0}
+_counts_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Section:
+    fn: Callable[[], Any]
+    key: Tuple[Any, ...] = ()  # arguments de fn (clé de cache)
+    ttl_s: float = 60.0
+    stale_s: float = 600.0
+    timeout_s: float = 8.0
+    default: Any = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix="admin-snapshot")
+        return _executor
+
+
+def _count(status: str) -> None:
+    with _counts_lock:
+        _counts[status] += 1
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _compute(ck: str, section: Section) -> Dict[str, Any]:
+    t0 = time.monotonic()
+    value = section.fn()
+    entry = {"value": value, "computed_at": time.time(), "duration_ms": round((time.monotonic() - t0) * 1000, 1)}
+    if _CACHE_ENABLED:
+        _cache.set(ck, entry, ttl_seconds=section.stale_s)
+    return entry
+
+
+def _start(ck: str, section: Section) -> Future:
+    return _flights.submit(ck, lambda: _compute(ck, section), _get_executor())
+
+
+def _meta(status: str, entry: Optional[Dict[str, Any]], error: Optional[str] = None) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"status": status, "age_s": None, "computed_at": None}
+    if entry:
+        out["age_s"] = round(max(0.0, time.time() - entry["computed_at"]), 1)
+        out["computed_at"] = _iso(entry["computed_at"])
+        out["duration_ms"] = entry.get("duration_ms")
+    if error:
+        out["error"] = error
+    return out
+
+
+def assemble(
+    snapshot: str, sections: Mapping[str, Section], refresh: bool = False,
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    ({section: valeur}, {section: {status, age_s, computed_at, duration_ms?, error?}}).
+    status : fresh (cache frais), stale (cache périmé, recalcul lancé), computed (calculé pour
+    cette requête), timeout / error (valeur par défaut).
+    """
+    t0 = time.monotonic()
+    values: Dict[str, Any] = {}
+    meta: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, Tuple[str, Section, Future]] = {}
+    now = time.time()
+    for name, section in sections.items():
+        ck = cache_key(snapshot, name, *section.key)
+        entry = _cache.get(ck) if _CACHE_ENABLED and not refresh else None
+        if entry is not None and now - entry["computed_at"] < section.stale_s:
+            values[name] = entry["value"]
+            if now - entry["computed_at"] < section.ttl_s:
+                meta[name] = _meta("fresh", entry)
+            else:
+                meta[name] = _meta("stale", entry)
+                _start(ck, section)
+            continue
+        pending[name] = (ck, section, _start(ck, section))
+
+    for name, (_ck, section, fut) in pending.items():
+        remaining = section.timeout_s - (time.monotonic() - t0)
+        try:
+            entry = fut.result(timeout=max(0.0, remaining))
+            values[name], meta[name] = entry["value"], _meta("computed", entry)
+        except FutureTimeout:
+            logger.warning("admin snapshot %s.%s timeout after %.1fs", snapshot, name, section.timeout_s)
+            values[name], meta[name] = section.default, _meta("timeout", None)
+        except Exception as e:
+            logger.warning("admin snapshot %s.%s failed: %s", snapshot, name, e)
+            values[name], meta[name] = section.default, _meta("error", None, str(e)[:200])
+
+    for m in meta.values():
+        _count(m["status"])
+    return {name: values[name] for name in sections}, {name: meta[name] for name in sections}
+
+
+def stats() -> Dict[str, Any]:
+    with _counts_lock:
+        out: Dict[str, Any] = dict(_counts)
+    out["inflight"] = _flights.inflight()
+    return out
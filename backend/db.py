@@ -1,12 +1,17 @@
 # backend/db.py
 from __future__ import annotations
 
+import logging
 import os
 import re
 import sqlite3
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
+from backend.pg_pool import pg_connection
+
+logger = logging.getLogger(__name__)
+
 DB_PATH = "agent.db"
 
 SLOT_TIMES = ["10:00", "14:00", "16:00"]
@@ -279,10 +284,7 @@ def get_call_followup(tenant_id: int, call_id: str) -> Optional[Dict[str, Any]]:
     url = _pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 _ensure_call_followups_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -337,10 +339,7 @@ def list_call_followups(tenant_id: int, call_ids: List[str]) -> Dict[str, Dict[s
     url = _pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 _ensure_call_followups_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -402,9 +401,9 @@ def upsert_call_followup(tenant_id: int, call_id: str, followup_state: str, note
     url = _pg_events_url()
     if url:
         try:
-            import psycopg
+            from psycopg.rows import tuple_row
 
-            with psycopg.connect(url) as conn:
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 _ensure_call_followups_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -541,10 +540,7 @@ def get_cabinet_client_by_phone(tenant_id: int, phone: str) -> Optional[Dict[str
     url = _pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 _ensure_cabinet_clients_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -596,10 +592,7 @@ def get_cabinet_clients_by_phones(tenant_id: int, phones: List[str]) -> Dict[str
     url = _pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 _ensure_cabinet_clients_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -673,9 +666,9 @@ def upsert_cabinet_client(
     url = _pg_events_url()
     if url:
         try:
-            import psycopg
+            from psycopg.rows import tuple_row
 
-            with psycopg.connect(url) as conn:
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 _ensure_cabinet_clients_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -807,6 +800,7 @@ def create_ivr_event(
     """
     Insertion dans ivr_events (rapport quotidien).
     Dual-write : SQLite + Postgres si USE_PG_EVENTS=true.
+    Incrémente aussi les rollups du jour (stats_rollup) dans la même transaction.
     created_at partagé pour idempotence PG (ON CONFLICT DO NOTHING sur retry).
     """
     created_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")[:26]  # microsec
@@ -820,6 +814,11 @@ def create_ivr_event(
                VALUES (?, ?, ?, ?, ?, ?)""",
             (client_id, call_id_norm, event, context or None, reason or None, created_at),
         )
+        try:
+            from backend import stats_rollup
+            stats_rollup.record_event(conn, False, client_id, call_id_norm, event, created_at)
+        except Exception as e:
+            logger.debug("stats_rollup record_event failed: %s", e)
         conn.commit()
     finally:
         conn.close()
@@ -0,0 +1,350 @@
+# backend/email_outbox.py
+"""
+Outbox email durable : les emails transactionnels (rapports quotidiens, liens onboarding / paiement,
+reset mot de passe) sont insérés dans email_outbox par la requête, puis envoyés par un worker de fond
+(run_forever au startup). La latence des requêtes n'inclut plus le round-trip Postmark / SMTP.
+
+Table email_outbox (PG : migrations/034_email_outbox.sql, aussi créée à la volée ; SQLite : à la volée) :
+  idempotency_key UNIQUE — INSERT ... ON CONFLICT DO NOTHING : une même clé (ex. rapport
+  tenant/client/jour) n'est mise en file qu'une fois ; sans clé fournie, clé aléatoire.
+  status : pending → sending (réservé par un worker) → sent | failed (retry) | dead (abandon).
+
+Worker (run_once) : réserve jusqu'à EMAIL_OUTBOX_BATCH messages dus (FOR UPDATE SKIP LOCKED en PG :
+plusieurs workers sans double envoi), les envoie en un appel batch Postmark (email_service.deliver_batch,
+client keep-alive partagé) ou une seule connexion SMTP, puis écrit les résultats en lot.
+Échec → failed, prochain essai après EMAIL_OUTBOX_BACKOFF_S × 2^(essais-1) (plafond 1 h) ;
+échec définitif (adresse invalide / inactive) ou EMAIL_OUTBOX_MAX_ATTEMPTS atteint → dead.
+Message resté en sending plus de STALE_LOCK_S (worker mort) → repris : livraison au moins une fois.
+
+Rétention : le HTML (liens reset / paiement / onboarding) est vidé dès qu'un message est sent ou dead ;
+les lignes sent / dead sont supprimées après EMAIL_OUTBOX_RETENTION_DAYS (purge horaire dans run_once).
+Clé déjà en file mais dead : enqueue retourne False (l'appelant envoie en direct et voit l'erreur).
+
+EMAIL_OUTBOX : auto (défaut, actif si PG configuré) | true (SQLite hors PG, dev/tests) | false (envoi direct).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from backend.pg_pool import pg_connection
+
+logger = logging.getLogger(__name__)
+
+MODE = (os.getenv("EMAIL_OUTBOX", "auto") or "auto").strip().lower()
+POLL_S = float(os.getenv("EMAIL_OUTBOX_POLL_S", "5") or 5)
+BATCH_SIZE = max(1, int(os.getenv("EMAIL_OUTBOX_BATCH", "200") or 200))
+MAX_ATTEMPTS = max(1, int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "6") or 6))
+BACKOFF_S = float(os.getenv("EMAIL_OUTBOX_BACKOFF_S", "30") or 30)
+BACKOFF_MAX_S = 3600.0
+STALE_LOCK_S = 600.0
+RETENTION_DAYS = max(1, int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "14") or 14))
+PURGE_EVERY_S = 3600.0
+
+_wake = threading.Event()
+_counts: Dict[str, int] = {
+    "enqueued": 0, "duplicate": 0, "duplicate_dead": 0, "sent": 0, "failed": 0, "dead": 0, "batches": 0, "purged": 0,
+}
+_counts_lock = threading.Lock()
+_last_run: Dict[str, Any] = {}
+_last_purge = 0.0
+
+_PG_DDL = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT '',
+    to_addr TEXT NOT NULL,
+    from_addr TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    provider_message_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sent_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at) WHERE status IN ('pending', 'failed');
+CREATE INDEX IF NOT EXISTS idx_email_outbox_sending ON email_outbox (locked_at) WHERE status = 'sending'
+"""
+_SQLITE_DDL = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT '',
+    to_addr TEXT NOT NULL,
+    from_addr TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    locked_at TEXT,
+    last_error TEXT,
+    provider_message_id TEXT,
+    created_at TEXT NOT NULL,
+    sent_at TEXT
+)
+"""
+_pg_tables_ready = False
+
+
+@dataclass
+class OutboxMessage:
+    id: int
+    key: str
+    kind: str
+    to: str
+    from_addr: str
+    subject: str
+    html: str
+    attempts: int
+
+
+def _pg_url() -> Optional[str]:
+    return os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL") or os.environ.get("PG_EVENTS_URL")
+
+
+def active() -> bool:
+    """Outbox utilisée par email_service (sinon envoi direct)."""
+    if MODE in ("0", "false", "no", "off"):
+        return False
+    if MODE in ("1", "true", "yes", "on"):
+        return True
+    return bool(_pg_url())
+
+
+@contextmanager
+def connect() -> Iterator[Tuple[Any, bool]]:
+    """(conn, is_pg) : PG si configuré, sinon SQLite (backend.db)."""
+    global _pg_tables_ready
+    url = _pg_url()
+    if url:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
+            if not _pg_tables_ready:
+                with conn.cursor() as cur:
+                    for stmt in _PG_DDL.split(";"):
+                        if stmt.strip():
+                            cur.execute(stmt)
+                _pg_tables_ready = True
+            yield conn, True
+        return
+    from backend import db
+    conn = db.get_conn()
+    try:
+        conn.execute(_SQLITE_DDL)
+        yield conn, False
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _exec(conn: Any, is_pg: bool, sql: str, params: Sequence[Any] = ()) -> Any:
+    """Requête écrite avec '?' pour les deux backends."""
+    if is_pg:
+        cur = conn.cursor()
+        cur.execute(sql.replace("?", "%s"), tuple(params))
+        return cur
+    return conn.execute(sql, tuple(params))
+
+
+def _execmany(conn: Any, is_pg: bool, sql: str, rows: Sequence[Sequence[Any]]) -> None:
+    if not rows:
+        return
+    if is_pg:
+        with conn.cursor() as cur:
+            cur.executemany(sql.replace("?", "%s"), [tuple(r) for r in rows])
+        return
+    conn.executemany(sql, [tuple(r) for r in rows])
+
+
+def _ts(ts: datetime, is_pg: bool) -> Any:
+    return ts if is_pg else ts.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _counts_lock:
+        _counts[key] += n
+
+
+def backoff_s(attempts: int) -> float:
+    return min(BACKOFF_MAX_S, BACKOFF_S * (2 ** max(0, attempts - 1)))
+
+
+def enqueue(
+    to: str, subject: str, html: str, *, kind: str = "", from_addr: str = "", idempotency_key: Optional[str] = None,
+) -> bool:
+    """
+    Met un email en file. True si accepté (nouvelle ligne ou clé déjà en file : idempotent),
+    False si la base est indisponible ou si la clé existe déjà en dead (l'appelant envoie alors en direct).
+    """
+    key = (idempotency_key or "").strip() or f"{kind or 'email'}:{uuid.uuid4().hex}"
+    now = datetime.now(timezone.utc)
+    try:
+        with connect() as (conn, is_pg):
+            cur = _exec(
+                conn, is_pg,
+                """
+                INSERT INTO email_outbox (idempotency_key, kind, to_addr, from_addr, subject, html, status,
+                                          attempts, next_attempt_at, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?)
+                ON CONFLICT (idempotency_key) DO NOTHING
+                """,
+                (key, kind, to.strip(), from_addr or "", subject, html, _ts(now, is_pg), _ts(now, is_pg)),
+            )
+            inserted = (cur.rowcount or 0) > 0
+            existing = None
+            if not inserted:
+                row = _exec(conn, is_pg, "SELECT status FROM email_outbox WHERE idempotency_key = ?", (key,)).fetchone()
+                existing = row[0] if row else None
+    except Exception as e:
+        logger.warning("email_outbox enqueue failed kind=%s: %s", kind, e)
+        return False
+    if existing == "dead":
+        _count("duplicate_dead")
+        logger.info("email_outbox duplicate of dead message key=%s", key[:80])
+        return False
+    _count("enqueued" if inserted else "duplicate")
+    if not inserted:
+        logger.info("email_outbox duplicate key=%s", key[:80])
+    _wake.set()
+    return True
+
+
+_CLAIM = """
+UPDATE email_outbox SET status = 'sending', attempts = attempts + 1, locked_at = ?
+WHERE id IN (
+    SELECT id FROM email_outbox
+    WHERE (status IN ('pending', 'failed') AND next_attempt_at <= ?) OR (status = 'sending' AND locked_at < ?)
+    ORDER BY id LIMIT ?{lock}
+)
+RETURNING id, idempotency_key, kind, to_addr, from_addr, subject, html, attempts
+"""
+
+
+def _claim(conn: Any, is_pg: bool, limit: int) -> List[OutboxMessage]:
+    now = datetime.now(timezone.utc)
+    stale = now - timedelta(seconds=STALE_LOCK_S)
+    sql = _CLAIM.format(lock=" FOR UPDATE SKIP LOCKED" if is_pg else "")
+    rows = _exec(conn, is_pg, sql, (_ts(now, is_pg), _ts(now, is_pg), _ts(stale, is_pg), limit)).fetchall()
+    return sorted((OutboxMessage(*r) for r in rows), key=lambda m: m.id)
+
+
+def _record(conn: Any, is_pg: bool, results: Sequence[Tuple[OutboxMessage, Tuple[bool, Optional[str], Optional[str], bool]]]) -> Dict[str, int]:
+    now = datetime.now(timezone.utc)
+    sent, retry, dead = [], [], []
+    for msg, (ok, err, message_id, permanent) in results:
+        if ok:
+            sent.append((_ts(now, is_pg), message_id, msg.id))
+        elif permanent or msg.attempts >= MAX_ATTEMPTS:
+            dead.append(((err or "")[:500], msg.id))
+        else:
+            retry.append(((err or "")[:500], _ts(now + timedelta(seconds=backoff_s(msg.attempts)), is_pg), msg.id))
+    _execmany(conn, is_pg, """
+        UPDATE email_outbox SET status = 'sent', sent_at = ?, provider_message_id = ?, last_error = NULL, locked_at = NULL,
+                                html = ''
+        WHERE id = ?
+    """, sent)
+    _execmany(conn, is_pg, """
+        UPDATE email_outbox SET status = 'failed', last_error = ?, next_attempt_at = ?, locked_at = NULL WHERE id = ?
+    """, retry)
+    _execmany(conn, is_pg, """
+        UPDATE email_outbox SET status = 'dead', last_error = ?, locked_at = NULL, html = '' WHERE id = ?
+    """, dead)
+    for err, mid in dead:
+        logger.warning("email_outbox dead id=%s error=%s", mid, err[:120])
+    return {"sent": len(sent), "failed": len(retry), "dead": len(dead)}
+
+
+def purge(retention_days: int = RETENTION_DAYS) -> int:
+    """Supprime les messages sent / dead créés il y a plus de retention_days. Retourne le nombre supprimé."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    with connect() as (conn, is_pg):
+        cur = _exec(
+            conn, is_pg,
+            "DELETE FROM email_outbox WHERE status IN ('sent', 'dead') AND created_at < ?",
+            (_ts(cutoff, is_pg),),
+        )
+        n = max(0, cur.rowcount or 0)
+    if n:
+        _count("purged", n)
+        logger.info("email_outbox purged %s message(s) older than %sd", n, retention_days)
+    return n
+
+
+def _maybe_purge() -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < PURGE_EVERY_S:
+        return
+    _last_purge = now
+    try:
+        purge()
+    except Exception as e:
+        logger.warning("email_outbox purge failed: %s", e)
+
+
+def run_once(limit: int = BATCH_SIZE) -> Dict[str, Any]:
+    """Un cycle : réserve, envoie en lot, enregistre. Retourne {claimed, sent, failed, dead}."""
+    from backend.services.email_service import deliver_batch
+
+    t0 = time.monotonic()
+    _maybe_purge()
+    with connect() as (conn, is_pg):
+        claimed = _claim(conn, is_pg, limit)
+        if is_pg:
+            conn.commit()  # réservation visible des autres workers avant l'envoi
+    out: Dict[str, Any] = {"claimed": len(claimed), "sent": 0, "failed": 0, "dead": 0}
+    if claimed:
+        messages = [
+            {"to": m.to, "from_addr": m.from_addr, "subject": m.subject, "html": m.html, "kind": m.kind, "key": m.key}
+            for m in claimed
+        ]
+        try:
+            delivered = deliver_batch(messages)
+        except Exception as e:
+            logger.warning("email_outbox deliver_batch failed: %s", e)
+            delivered = [(False, str(e)[:200], None, False)] * len(claimed)
+        with connect() as (conn, is_pg):
+            out.update(_record(conn, is_pg, list(zip(claimed, delivered, strict=True))))
+        _count("batches")
+        for k in ("sent", "failed", "dead"):
+            _count(k, out[k])
+    out["duration_ms"] = round((time.monotonic() - t0) * 1000, 1)
+    _last_run.clear()
+    _last_run.update(out, at=datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+    return out
+
+
+async def run_forever(initial_delay_s: float = 2.0) -> None:
+    """Worker de fond (startup) : cycle dès qu'un email est mis en file (wake) ou toutes les POLL_S secondes."""
+    await asyncio.sleep(initial_delay_s)
+    while True:
+        claimed = 0
+        try:
+            _wake.clear()
+            claimed = (await asyncio.to_thread(run_once))["claimed"]
+        except Exception as e:
+            logger.warning("email_outbox cycle failed: %s", e)
+        if claimed < BATCH_SIZE:
+            await asyncio.to_thread(_wake.wait, POLL_S)
+
+
+def stats() -> Dict[str, Any]:
+    with _counts_lock:
+        out: Dict[str, Any] = dict(_counts)
+    out["active"] = active()
+    out["last_run"] = dict(_last_run)
+    return out
@@ -11,18 +11,14 @@ import json
 import logging
 import re
 
-from backend import config, prompts, guards, tools_booking, intent_parser, contact_parser
+from backend import config, prompts, guards, tools_booking, intent_parser, contact_parser, turn_trace
 from backend.guards_medical import is_medical_emergency  # legacy / tests
-from backend.guards_medical_triage import (
-    detect_medical_red_flag,
-    classify_medical_symptoms,
-    extract_symptom_motif_short,
-)
+from backend.guards_medical_triage import extract_symptom_motif_short
 from backend.log_events import MEDICAL_RED_FLAG_TRIGGERED
 from backend import db as backend_db
 from backend.session import Session, SessionStore, reset_slots_reading, set_reading_slots
 from backend.slot_choice import detect_slot_choice_early
-from backend.time_constraints import extract_time_constraint
+from backend.utterance import NormalizedUtterance, current_utterance, utterance_for
 from backend.session_store_hybrid import HybridSessionStore
 from backend.tools_faq import FaqStore, FaqResult
 from backend.llm_assist import (
@@ -32,7 +28,6 @@ from backend.llm_assist import (
     LLM_ASSIST_MAX_TEXT_LEN,
 )
 from backend.entity_extraction import (
-    extract_entities,
     get_next_missing_field,
     extract_pref,
     infer_preference_from_context,
@@ -393,7 +388,7 @@ def detect_intent(text: str, state: str = "") -> str:
     Returns:
         str: "YES", "NO", "BOOKING", "FAQ", "CANCEL", "MODIFY", "TRANSFER", "ABANDON", "REPEAT", "UNCLEAR"
     """
-    return intent_parser.detect_intent(text or "", state).value
+    return utterance_for(text).intent(state)
 
 
 def detect_slot_choice(text: str, num_slots: int = 3) -> Optional[int]:
@@ -526,8 +521,7 @@ def detect_strong_intent(text: str) -> Optional[str]:
     Détecte les intents qui préemptent le flow (priorité: TRANSFER > CANCEL > MODIFY > ABANDON > ORDONNANCE > FAQ).
     Délégation au module intent_parser (pur, testable).
     """
-    r = intent_parser.detect_strong_intent(text or "", "")
-    return r.value if r else None
+    return utterance_for(text).strong_intent
 
 
 def detect_ordonnance_choice(user_text: str) -> Optional[str]:
@@ -899,14 +893,25 @@ class Engine:
     def handle_message(self, conv_id: str, user_text: str) -> List[Event]:
         """
         Pipeline déterministe (ordre STRICT).
+        L'énoncé normalisé du tour (NormalizedUtterance) est partagé par tous les détecteurs via
+        current_utterance : normalisation, tokens, intents et entités calculés une fois.
         
         Returns:
             Liste d'events à envoyer via SSE
         """
+        token = current_utterance.set(NormalizedUtterance(user_text))
+        try:
+            with turn_trace.turn(conv_id):
+                return self._handle_message_turn(conv_id, user_text)
+        finally:
+            current_utterance.reset(token)
+
+    def _handle_message_turn(self, conv_id: str, user_text: str) -> List[Event]:
         import time
         t_load_start = time.time()
         
-        session = self.session_store.get_or_create(conv_id)
+        with turn_trace.span("session_load"):
+            session = self.session_store.get_or_create(conv_id)
         t_load_end = time.time()
         logger.debug("[SESSION] conv_id=%s loaded in %.0fms", conv_id, (t_load_end - t_load_start) * 1000)
 
@@ -926,6 +931,7 @@ class Engine:
             )
 
         setattr(session, "_turn_state_before", session.state)
+        turn_trace.tag(tenant_id=session.tenant_id, channel=getattr(session, "channel", None), state=session.state)
         session.add_message("user", user_text)
         
         turn_count = getattr(session, "turn_count", 0)
@@ -951,7 +957,10 @@ class Engine:
         # RÈGLE -1 : TRIAGE MÉDICAL (priorité absolue, avant tout le reste)
         # ========================
         # 1) Urgence vitale (red flags) → hard stop + log d'audit (catégorie uniquement, pas de symptôme)
-        red_flag_category = detect_medical_red_flag(user_text) if user_text else None
+        utterance = utterance_for(user_text)
+        with turn_trace.span("medical_triage"):
+            red_flag_category = utterance.red_flag if user_text else None
+            medical_class = utterance.medical_class if user_text and not red_flag_category else None
         if red_flag_category:
             logger.warning(
                 MEDICAL_RED_FLAG_TRIGGERED,
@@ -972,21 +981,19 @@ class Engine:
             return [Event("final", msg, conv_state=session.state)]
         
         # 2) Non vital / escalade douce → note motif, enchaîne sur créneau (QUALIF_PREF)
-        if user_text:
-            medical_class = classify_medical_symptoms(user_text)
-            if medical_class:
-                motif = extract_symptom_motif_short(user_text)
-                setattr(session, "medical_motif", motif)
-                session.qualif_data.motif = motif
-                session.state = "QUALIF_PREF"
-                if medical_class == "CAUTION":
-                    reply = prompts.MSG_MEDICAL_CAUTION
-                else:
-                    reply = prompts.MSG_MEDICAL_NON_URGENT_ACK.format(motif=motif)
-                session.last_question_asked = reply
-                session.add_message("agent", reply)
-                self._save_session(session)
-                return safe_reply([Event("final", reply, conv_state=session.state)], session)
+        if medical_class:
+            motif = extract_symptom_motif_short(user_text)
+            setattr(session, "medical_motif", motif)
+            session.qualif_data.motif = motif
+            session.state = "QUALIF_PREF"
+            if medical_class == "CAUTION":
+                reply = prompts.MSG_MEDICAL_CAUTION
+            else:
+                reply = prompts.MSG_MEDICAL_NON_URGENT_ACK.format(motif=motif)
+            session.last_question_asked = reply
+            session.add_message("agent", reply)
+            self._save_session(session)
+            return safe_reply([Event("final", reply, conv_state=session.state)], session)
         
         # ========================
         # TERMINAL GATE (mourir proprement)
@@ -1214,7 +1221,7 @@ class Engine:
         pending = session.pending_slots or []
         num_slots = len(pending) if pending else 0
         if getattr(session, "is_reading_slots", False) and num_slots > 0 and user_text and user_text.strip():
-            _t_ascii = intent_parser.normalize_stt_text(user_text or "")
+            _t_ascii = utterance.stt
             # Fix 5: strong intent AVANT slot_choice (annuler/humain pendant énumération → route direct)
             strong = detect_strong_intent(user_text or "")
             if strong in ("CANCEL", "MODIFY", "TRANSFER", "ABANDON"):
@@ -1314,7 +1321,8 @@ class Engine:
         # ========================
         
         # Détecter l'intent (state utilisé pour garde-fou START+YES => UNCLEAR)
-        intent = detect_intent(user_text, session.state)
+        with turn_trace.span("intent_router"):
+            intent = detect_intent(user_text, session.state)
         # Garde-fou "rien" : ABANDON seulement en POST_FAQ / POST_FAQ_CHOICE, sinon UNCLEAR
         if intent == "ABANDON" and (user_text or "").strip().lower() == "rien":
             if session.state not in ("POST_FAQ", "POST_FAQ_CHOICE"):
@@ -1441,8 +1449,9 @@ class Engine:
             ev = InputEvent(
                 kind=InputKind.TEXT,
                 text=user_text or "",
-                text_normalized=(user_text or "").strip().lower(),
+                text_normalized=utterance.lower,
                 strong_intent=intent,
+                utterance=utterance,
             )
             events = dispatch_handle(session, ev, self)
             if events:
@@ -1639,7 +1648,7 @@ class Engine:
             if intent == "BOOKING":
                 session.start_unclear_count = 0
                 raw = (user_text or "").strip()[:80]
-                normalized = (intent_parser.normalize_stt_text(user_text or "") or "")[:80]
+                normalized = utterance.stt[:80]
                 logger.info(
                     "[INTENT_START_KEYWORD] conv_id=%s state=%s intent=BOOKING_START_KEYWORD text=%s normalized=%s",
                     session.conv_id,
@@ -1893,6 +1902,7 @@ class Engine:
         session.start_unclear_count = 0
         return self._trigger_intent_router(session, "llm_unclear_3", user_text)
 
+    @turn_trace.traced("faq")
     def _handle_faq(self, session: Session, user_text: str, include_low: bool = True) -> List[Event]:
         """
         Cherche dans FAQ.
@@ -1987,7 +1997,7 @@ class Engine:
         channel = getattr(session, "channel", "web")
         
         # Extraction conservatrice
-        entities = extract_entities(user_text)
+        entities = utterance_for(user_text).entities
         
         # Pré-remplir les champs extraits
         if entities.name:
@@ -2306,7 +2316,7 @@ class Engine:
             # --- RÈGLE 7: contrainte horaire explicite (ex: "je finis à 17h") ---
             if getattr(config, "TIME_CONSTRAINT_ENABLED", False):
                 try:
-                    tc = extract_time_constraint(user_text)
+                    tc = utterance_for(user_text).time_constraint
                 except Exception:
                     tc = None
 
@@ -4075,6 +4085,7 @@ class Engine:
             session,
         )
 
+    @turn_trace.traced("intent_router")
     def _handle_intent_router(self, session: Session, user_text: str) -> List[Event]:
         """Menu 1/2/3/4. Délégation à intent_parser.parse_router_choice (hein/de => None ; cat/catre=>4)."""
         channel = getattr(session, "channel", "web")
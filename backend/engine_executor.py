@@ -0,0 +1,191 @@
+# backend/engine_executor.py
+"""
+Executor partagé pour les tours engine (web /chat, Vapi /chat/completions) et les lectures bloquantes
+avec timeout (tools Vapi : FAQ fast path, get_slots cache froid).
+
+- Pool de threads borné : ENGINE_EXECUTOR_WORKERS (défaut 32).
+- Sérialisation par conversation : un seul tour en vol par conv_id ; les tours suivants du même
+  conv_id attendent dans une file dédiée sans occuper de thread.
+- Backpressure : au-delà de ENGINE_EXECUTOR_MAX_PENDING tâches (en file + en cours), submit lève
+  EngineBusy au lieu d'empiler indéfiniment.
+- Métriques : profondeur de file, tâches en cours, latence d'attente et d'exécution (stats()).
+
+Remplace les ThreadPoolExecutor(max_workers=1) créés à chaque requête : ceux-ci attendaient la fin
+de la tâche à la sortie du `with` (shutdown(wait=True)), ce qui annulait le timeout.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class EngineBusy(RuntimeError):
+    """File de l'executor pleine : le tour doit être refusé (fallback côté appelant)."""
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+_Task = Tuple[Callable[..., Any], tuple, dict, concurrent.futures.Future, float]
+
+
+class EngineExecutor:
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="engine")
+        self._lock = threading.Lock()
+        self._keyed: Dict[str, Deque[_Task]] = {}
+        self._pending = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_ms_total = 0.0
+        self._wait_ms_max = 0.0
+        self._run_ms_total = 0.0
+        self._run_ms_max = 0.0
+
+    def submit(self, key: Optional[str], fn: Callable[..., Any], *args, **kwargs) -> concurrent.futures.Future:
+        """
+        Planifie fn(*args, **kwargs). key=conv_id → exécution sérialisée avec les autres tâches de ce key ;
+        key=None → pas de sérialisation. Lève EngineBusy si la file est pleine.
+        """
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        task: _Task = (fn, args, kwargs, fut, time.monotonic())
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise EngineBusy(f"engine executor saturated pending={self._pending}")
+            self._pending += 1
+            self._submitted += 1
+            if key is not None:
+                waiting = self._keyed.get(key)
+                if waiting is not None:
+                    # Un tour est déjà en vol pour ce conv_id : on attend son tour sans prendre de thread
+                    waiting.append(task)
+                    return fut
+                self._keyed[key] = deque()
+        self._pool.submit(self._run, key, task)
+        return fut
+
+    def _run(self, key: Optional[str], task: _Task) -> None:
+        while task is not None:
+            fn, args, kwargs, fut, enqueued_at = task
+            started = time.monotonic()
+            with self._lock:
+                self._running += 1
+                wait_ms = (started - enqueued_at) * 1000
+                self._wait_ms_total += wait_ms
+                self._wait_ms_max = max(self._wait_ms_max, wait_ms)
+            ok = True
+            if fut.set_running_or_notify_cancel():
+                try:
+                    fut.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    ok = False
+                    fut.set_exception(e)
+            run_ms = (time.monotonic() - started) * 1000
+            task = None
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._completed += 1
+                if not ok:
+                    self._failed += 1
+                self._run_ms_total += run_ms
+                self._run_ms_max = max(self._run_ms_max, run_ms)
+                if key is not None:
+                    waiting = self._keyed.get(key)
+                    if waiting:
+                        task = waiting.popleft()
+                    else:
+                        self._keyed.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._completed or 1
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "active_conversations": len(self._keyed),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "wait_ms_avg": round(self._wait_ms_total / done, 1),
+                "wait_ms_max": round(self._wait_ms_max, 1),
+                "run_ms_avg": round(self._run_ms_total / done, 1),
+                "run_ms_max": round(self._run_ms_max, 1),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_executor: Optional[EngineExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> EngineExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = EngineExecutor(
+                    max_workers=_int_env("ENGINE_EXECUTOR_WORKERS", 32),
+                    max_pending=_int_env("ENGINE_EXECUTOR_MAX_PENDING", 256),
+                )
+    return _executor
+
+
+async def run(key: Optional[str], fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Depuis l'event loop : exécute fn dans l'executor (sérialisé par key) sans bloquer la boucle.
+    Comme asyncio.to_thread, fn voit les ContextVar de l'appelant (tenant, trace du tour).
+    """
+    ctx = contextvars.copy_context()
+    fut = asyncio.wrap_future(get_executor().submit(key, ctx.run, fn, *args, **kwargs))
+    if timeout is None:
+        return await fut
+    return await asyncio.wait_for(fut, timeout=timeout)
+
+
+def run_sync(fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Depuis du code synchrone : exécute fn dans l'executor et attend au plus timeout secondes
+    (lève concurrent.futures.TimeoutError ; la tâche continue en arrière-plan).
+    """
+    ctx = contextvars.copy_context()
+    return get_executor().submit(None, ctx.run, fn, *args, **kwargs).result(timeout=timeout)
+
+
+def stats() -> Dict[str, Any]:
+    if _executor is None:
+        return {"workers": 0, "pending": 0, "running": 0, "queued": 0}
+    return _executor.stats()
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        ex, _executor = _executor, None
+    if ex is not None:
+        ex.shutdown(wait=True)
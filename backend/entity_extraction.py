@@ -13,9 +13,12 @@ Entités extraites :
 
 from __future__ import annotations
 import re
-from typing import Dict, Optional, List, Any
+from typing import TYPE_CHECKING, Dict, Optional, List, Any, Union
 from dataclasses import dataclass
 
+if TYPE_CHECKING:
+    from backend.utterance import NormalizedUtterance
+
 
 @dataclass
 class ExtractedEntities:
@@ -289,7 +292,7 @@ def infer_preference_from_context(message: str) -> Optional[str]:
     return None
 
 
-def extract_entities(message: str) -> ExtractedEntities:
+def extract_entities(message: Union[str, "NormalizedUtterance"]) -> ExtractedEntities:
     """
     Extraction principale - conservatrice.
     
@@ -297,13 +300,15 @@ def extract_entities(message: str) -> ExtractedEntities:
     En cas de doute, les champs restent None.
     
     Args:
-        message: Le message de l'utilisateur (transcription vocale)
+        message: Le message de l'utilisateur (transcription vocale), ou l'énoncé normalisé du tour
     
     Returns:
         ExtractedEntities avec les champs remplis si trouvés
     """
     entities = ExtractedEntities()
     confidence_points = 0
+    # Les trois extracteurs travaillent sur la forme lower/strip : calculée une fois
+    message = message.lower().strip() if isinstance(message, str) else message.lower
     
     # Extraction du nom
     name = extract_name(message)
@@ -3,7 +3,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from backend.utterance import NormalizedUtterance
 
 
 class InputKind(str, Enum):
@@ -21,3 +24,4 @@ class InputEvent:
     text: str  # Texte brut (pour les handlers / engine)
     text_normalized: str = ""  # Optionnel : lower, stripped (pour routage)
     strong_intent: Optional[str] = None  # Ex: BOOKING, CANCEL, TRANSFER, YES, NO, FAQ, etc.
+    utterance: Optional["NormalizedUtterance"] = None  # Énoncé normalisé du tour (partagé avec l'engine)
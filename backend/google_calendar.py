@@ -3,8 +3,10 @@
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from datetime import datetime, timedelta, timezone
+import threading
 import time
-from typing import List, Dict, Optional
+from itertools import islice
+from typing import List, Dict, Optional, Tuple
 import logging
 from googleapiclient.errors import HttpError
 
@@ -19,6 +21,8 @@ logger = logging.getLogger(__name__)
 
 # Configuration
 import backend.config as cfg  # Import du MODULE (pas from import)
+from backend.calendar_busy_index import BUSY_INDEX_ENABLED, CalendarBusyIndex, event_interval
+from backend.slot_engine import BusyTimeline, iter_free_slots
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
@@ -51,6 +55,8 @@ class GoogleCalendarService:
         """
         self.calendar_id = calendar_id
         self.service = self._build_service()
+        self._busy_index: Optional[CalendarBusyIndex] = None
+        self._busy_index_lock = threading.Lock()
 
     def _build_service(self):
         """Crée le service Google Calendar."""
@@ -69,6 +75,37 @@ class GoogleCalendarService:
             logger.error(f"Failed to initialize Google Calendar: {e}")
             raise
     
+    def busy_index(self) -> CalendarBusyIndex:
+        """Index des plages occupées de ce calendrier (créé au premier appel)."""
+        if self._busy_index is None:
+            with self._busy_index_lock:
+                if self._busy_index is None:
+                    tz = ZoneInfo(CALENDAR_TZ) if ZoneInfo else timezone(timedelta(hours=1))
+                    self._busy_index = CalendarBusyIndex(self.service, self.calendar_id, tz)
+        return self._busy_index
+
+    def _busy_intervals(self, range_start: datetime, range_end: datetime, tz) -> List[Tuple[datetime, datetime]]:
+        """Plages occupées sur [range_start, range_end) : index local si possible, sinon events().list direct."""
+        if BUSY_INDEX_ENABLED:
+            busy = self.busy_index().busy_between(range_start, range_end)
+            if busy is not None:
+                return busy
+        time_min = range_start.isoformat().replace('+00:00', 'Z') if range_start.tzinfo else range_start.isoformat() + 'Z'
+        time_max = range_end.isoformat().replace('+00:00', 'Z') if range_end.tzinfo else range_end.isoformat() + 'Z'
+        events_result = self.service.events().list(
+            calendarId=self.calendar_id,
+            timeMin=time_min,
+            timeMax=time_max,
+            singleEvents=True,
+            orderBy='startTime'
+        ).execute()
+        intervals = []
+        for event in events_result.get('items', []):
+            interval = event_interval(event, tz)
+            if interval is not None:
+                intervals.append(interval)
+        return intervals
+
     def get_free_slots(
         self,
         date: datetime,
@@ -108,72 +145,29 @@ class GoogleCalendarService:
                 day_start = day_start.replace(tzinfo=tz)
                 day_end = day_end.replace(tzinfo=tz)
 
-            # Récupérer events existants (API attend ISO avec timezone)
-            time_min = day_start.isoformat().replace('+00:00', 'Z') if day_start.tzinfo else day_start.isoformat() + 'Z'
-            time_max = day_end.isoformat().replace('+00:00', 'Z') if day_end.tzinfo else day_end.isoformat() + 'Z'
-            events_result = self.service.events().list(
-                calendarId=self.calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            # Plages occupées (index local synchronisé, ou events().list si hors fenêtre)
+            parsed_events = self._busy_intervals(day_start, day_end, tz)
+            events_busy = len(parsed_events)
 
-            events = events_result.get('items', [])
-            events_busy = len(events)
-
-            # Créer liste de tous les créneaux possibles
-            all_slots = []
-            current = day_start
-
-            while current < day_end:
-                slot_end = current + timedelta(minutes=duration_minutes)
-                if slot_end <= day_end:
-                    all_slots.append({
-                        'start': current,
-                        'end': slot_end
-                    })
-                current += timedelta(minutes=duration_minutes)
-
-            # Filtrer créneaux occupés (normaliser TZ event pour comparaison)
-            free_slots = []
-
-            buffer_td = timedelta(minutes=int(buffer_minutes or 0))
-            for slot in all_slots:
-                slot_start = slot['start']
-                slot_end = slot['end']
-                effective_end = slot_end + buffer_td
-                if effective_end > day_end:
-                    continue
-                is_free = True
-
-                for event in events:
-                    raw_start = event['start'].get('dateTime', event['start'].get('date', ''))
-                    raw_end = event['end'].get('dateTime', event['end'].get('date', ''))
-                    event_start = datetime.fromisoformat(raw_start.replace('Z', '+00:00'))
-                    event_end = datetime.fromisoformat(raw_end.replace('Z', '+00:00'))
-                    if event_start.tzinfo is not None:
-                        event_start = event_start.astimezone(tz)
-                        event_end = event_end.astimezone(tz)
-                    else:
-                        event_start = event_start.replace(tzinfo=tz)
-                        event_end = event_end.replace(tzinfo=tz)
-                    # Check overlap: slot + buffer ne doit pas chevaucher un event
-                    if (slot_start < event_end and effective_end > event_start):
-                        is_free = False
-                        break
-
-                if is_free:
-                    # Formater label français
-                    label = self._format_slot_label(slot['start'])
-                    free_slots.append({
-                        'start': slot['start'].isoformat(),
-                        'end': slot['end'].isoformat(),
-                        'label': label
-                    })
-
-                if len(free_slots) >= limit:
-                    break
+            busy = BusyTimeline(parsed_events)
+            free_slots = [
+                {
+                    'start': slot_start.isoformat(),
+                    'end': slot_end.isoformat(),
+                    'label': self._format_slot_label(slot_start),
+                }
+                for slot_start, slot_end in islice(
+                    iter_free_slots(
+                        busy,
+                        [day_start],
+                        start_hour=start_hour,
+                        end_hour=end_hour,
+                        duration_minutes=duration_minutes,
+                        buffer_minutes=buffer_minutes,
+                    ),
+                    limit,
+                )
+            ]
 
             logger.info(
                 "get_free_slots: date=%s start_hour=%s end_hour=%s events_busy=%s free_slots=%s",
@@ -211,7 +205,8 @@ class GoogleCalendarService:
         Récupère en une seule requête Google le premier créneau libre de plusieurs jours.
 
         Cette variante évite de faire 1 appel API par jour dans le parcours vocal,
-        ce qui réduit fortement le risque de timeout Vapi.
+        ce qui réduit fortement le risque de timeout Vapi. Avec l'index local (CALENDAR_BUSY_INDEX),
+        plus aucun appel Google sur le chemin chaud : seulement une sync incrémentale périodique.
         """
         if not dates or limit <= 0:
             return []
@@ -230,61 +225,29 @@ class GoogleCalendarService:
 
             range_start = normalized_dates[0].replace(hour=start_hour, minute=0, second=0, microsecond=0)
             range_end = normalized_dates[-1].replace(hour=end_hour, minute=0, second=0, microsecond=0)
-            time_min = range_start.isoformat().replace('+00:00', 'Z') if range_start.tzinfo else range_start.isoformat() + 'Z'
-            time_max = range_end.isoformat().replace('+00:00', 'Z') if range_end.tzinfo else range_end.isoformat() + 'Z'
-            events_result = self.service.events().list(
-                calendarId=self.calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            events = events_result.get('items', [])
-            events_busy = len(events)
-
-            parsed_events = []
-            for event in events:
-                raw_start = event['start'].get('dateTime', event['start'].get('date', ''))
-                raw_end = event['end'].get('dateTime', event['end'].get('date', ''))
-                event_start = datetime.fromisoformat(raw_start.replace('Z', '+00:00'))
-                event_end = datetime.fromisoformat(raw_end.replace('Z', '+00:00'))
-                if event_start.tzinfo is not None:
-                    event_start = event_start.astimezone(tz)
-                    event_end = event_end.astimezone(tz)
-                else:
-                    event_start = event_start.replace(tzinfo=tz)
-                    event_end = event_end.replace(tzinfo=tz)
-                parsed_events.append((event_start, event_end))
-
-            free_slots: List[Dict] = []
-            buffer_td = timedelta(minutes=int(buffer_minutes or 0))
-            for current_date in normalized_dates:
-                day_start = current_date.replace(hour=start_hour, minute=0, second=0, microsecond=0)
-                day_end = current_date.replace(hour=end_hour, minute=0, second=0, microsecond=0)
-                current = day_start
-                day_count = 0
-                while current < day_end:
-                    slot_end = current + timedelta(minutes=duration_minutes)
-                    effective_end = slot_end + buffer_td
-                    if effective_end > day_end:
-                        break
-                    is_free = True
-                    for event_start, event_end in parsed_events:
-                        if current < event_end and effective_end > event_start:
-                            is_free = False
-                            break
-                    if is_free:
-                        free_slots.append({
-                            'start': current.isoformat(),
-                            'end': slot_end.isoformat(),
-                            'label': self._format_slot_label(current),
-                        })
-                        day_count += 1
-                        if len(free_slots) >= limit or day_count >= per_day_limit:
-                            break
-                    current += timedelta(minutes=duration_minutes)
-                if len(free_slots) >= limit:
-                    break
+            parsed_events = self._busy_intervals(range_start, range_end, tz)
+            events_busy = len(parsed_events)
+
+            busy = BusyTimeline(parsed_events)
+            free_slots: List[Dict] = [
+                {
+                    'start': slot_start.isoformat(),
+                    'end': slot_end.isoformat(),
+                    'label': self._format_slot_label(slot_start),
+                }
+                for slot_start, slot_end in islice(
+                    iter_free_slots(
+                        busy,
+                        normalized_dates,
+                        start_hour=start_hour,
+                        end_hour=end_hour,
+                        duration_minutes=duration_minutes,
+                        buffer_minutes=buffer_minutes,
+                        per_day_limit=per_day_limit,
+                    ),
+                    limit,
+                )
+            ]
 
             logger.info(
                 "get_free_slots_range: days=%s start_hour=%s end_hour=%s events_busy=%s free_slots=%s",
@@ -380,6 +343,8 @@ class GoogleCalendarService:
             ).execute()
             t_insert_ms = round((time.perf_counter() - t_insert_0) * 1000, 0)
             event_id = created_event.get('id')
+            if self._busy_index is not None:
+                self._busy_index.upsert(event_id, start_time, end_time)
             logger.info(
                 "GOOGLE_BOOK_OK calendar_id=%s event_id=%s t_insert_ms=%s t_total_ms=%s",
                 cal_mask,
@@ -462,6 +427,8 @@ class GoogleCalendarService:
                 eventId=event_id
             ).execute()
             
+            if self._busy_index is not None:
+                self._busy_index.remove(event_id)
             logger.info(f"Appointment cancelled: {event_id}")
             return True
         
@@ -499,6 +466,8 @@ class GoogleCalendarService:
                 eventId=event_id,
                 body=event,
             ).execute()
+            if self._busy_index is not None:
+                self._busy_index.upsert(event_id, start_time, end_time)
             logger.info("Appointment rescheduled: %s", event_id)
             return True
         except Exception as e:
@@ -9,6 +9,7 @@ import re
 from typing import Optional, Tuple
 
 from backend import config, prompts
+from backend.pattern_detector import MultiPatternDetector
 
 
 # ----------------------------
@@ -415,6 +416,13 @@ ANY_WORDS = frozenset({
     "quand vous voulez", "indifferent", "indifférent",
 })
 
+# Une recherche pour les trois lexiques ; ordre = priorité (matin > après-midi > neutre)
+_TIME_PREF_DETECTOR = MultiPatternDetector(literals={
+    "morning": MORNING_KEYWORDS,
+    "afternoon": AFTERNOON_KEYWORDS,
+    "neutral": NEUTRAL_KEYWORDS,
+})
+
 
 def infer_time_preference(text: str) -> Optional[str]:
     """
@@ -427,12 +435,9 @@ def infer_time_preference(text: str) -> Optional[str]:
     t = normalize_pref(text)
     if not t:
         return None
-    if any(k in t for k in MORNING_KEYWORDS):
-        return "morning"
-    if any(k in t for k in AFTERNOON_KEYWORDS):
-        return "afternoon"
-    if any(k in t for k in NEUTRAL_KEYWORDS):
-        return "neutral"
+    pref = _TIME_PREF_DETECTOR.first(t)
+    if pref is not None:
+        return pref
     hour = extract_hour(text)
     if hour is not None:
         if hour < 12:
@@ -6,6 +6,8 @@ Déterministe, sans LLM, TTS-friendly.
 import re
 from typing import Optional
 
+from backend.pattern_detector import MultiPatternDetector
+
 # =========================
 # RED FLAGS MÉDICAUX — URGENCES
 # =========================
@@ -92,6 +94,10 @@ CAUTION_KEYWORDS = [
     "c'est grave", "je ne sais pas",
 ]
 
+# Compilés une fois : une recherche combinée par énoncé (ordre des catégories = priorité d'audit)
+_RED_FLAG_DETECTOR = MultiPatternDetector(regexes=RED_FLAG_CATEGORIES)
+_SYMPTOM_DETECTOR = MultiPatternDetector(literals={"CAUTION": CAUTION_KEYWORDS, "NON_URGENT": NON_URGENT_KEYWORDS})
+
 
 def detect_medical_red_flag(text: str) -> Optional[str]:
     """
@@ -100,12 +106,7 @@ def detect_medical_red_flag(text: str) -> Optional[str]:
     """
     if not text:
         return None
-    normalized = text.lower()
-    for category, patterns in RED_FLAG_CATEGORIES.items():
-        for pattern in patterns:
-            if re.search(pattern, normalized):
-                return category
-    return None
+    return _RED_FLAG_DETECTOR.first(text.lower())
 
 
 def detect_medical_red_flags(text: str) -> bool:
@@ -125,9 +126,9 @@ def classify_medical_symptoms(text: str) -> Optional[str]:
     """
     if not text:
         return None
-    t = text.lower()
-    has_caution = any(k in t for k in CAUTION_KEYWORDS)
-    has_symptom = any(k in t for k in NON_URGENT_KEYWORDS)
+    found = _SYMPTOM_DETECTOR.categories(text.lower())
+    has_caution = "CAUTION" in found
+    has_symptom = "NON_URGENT" in found
     if has_caution and has_symptom:
         return "CAUTION"
     if has_symptom:
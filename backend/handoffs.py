@@ -5,6 +5,7 @@ from typing import Any, Dict, List, Optional
 
 import backend.db as db
 from backend.handoff_router import resolve_handoff_decision
+from backend.pg_pool import pg_connection
 
 
 ALLOWED_STATUSES = {
@@ -139,10 +140,7 @@ def get_handoff_by_call_id(tenant_id: int, call_id: str) -> Optional[Dict[str, A
     url = db._pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 db._ensure_human_handoffs_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -183,10 +181,7 @@ def get_handoff_by_id(tenant_id: int, handoff_id: int) -> Optional[Dict[str, Any
     url = db._pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 db._ensure_human_handoffs_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -263,9 +258,9 @@ def create_handoff(
     url = db._pg_events_url()
     if url:
         try:
-            import psycopg
+            from psycopg.rows import tuple_row
 
-            with psycopg.connect(url) as conn:
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 db._ensure_human_handoffs_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -370,9 +365,6 @@ def list_handoffs(
     url = db._pg_events_url()
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
             sql = "SELECT * FROM human_handoffs WHERE tenant_id = %s"
             params: List[Any] = [tenant_id]
             if clean_status == "open":
@@ -386,7 +378,7 @@ def list_handoffs(
                 params.append(clean_target)
             sql += " ORDER BY created_at DESC LIMIT %s"
             params.append(limit)
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 db._ensure_human_handoffs_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(sql, tuple(params))
@@ -439,9 +431,9 @@ def update_handoff_status(
     url = db._pg_events_url()
     if url:
         try:
-            import psycopg
+            from psycopg.rows import tuple_row
 
-            with psycopg.connect(url) as conn:
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 db._ensure_human_handoffs_table_pg(conn)
                 with conn.cursor() as cur:
                     cur.execute(
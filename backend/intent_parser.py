@@ -10,7 +10,10 @@ from __future__ import annotations
 
 import re
 from enum import Enum
-from typing import Optional, List
+from functools import lru_cache
+from typing import FrozenSet, Optional, List
+
+from backend.pattern_detector import MultiPatternDetector
 
 # ---------------------------------------------------------------------------
 # 0) Types / Enums
@@ -166,6 +169,9 @@ _ACCENT_MAP = str.maketrans(
 )
 
 
+_STT_PUNCT_RE = re.compile(r"[.,;:!?\[\]()\"…]")
+
+
 def normalize_stt_text(raw: str) -> str:
     """
     Normalise le texte STT pour parsing déterministe.
@@ -174,13 +180,19 @@ def normalize_stt_text(raw: str) -> str:
     """
     if not raw or not isinstance(raw, str):
         return ""
+    return _normalize_stt_cached(raw)
+
+
+@lru_cache(maxsize=2048)
+def _normalize_stt_cached(raw: str) -> str:
+    """Mémoïsé : un tour normalise le même énoncé dans chaque détecteur (yes/no/repeat/strong/booking…)."""
     t = raw.strip().lower()
     if not t:
         return ""
     # Uniformiser apostrophes
     t = t.replace("'", " ").replace("'", " ").replace("'", " ")
     # Ponctuation → espace
-    t = re.sub(r"[.,;:!?\[\]()\"…]", " ", t)
+    t = _STT_PUNCT_RE.sub(" ", t)
     # Tirets internes (après-midi → apres midi)
     t = t.replace("-", " ")
     # Accents → ascii pour matching STT
@@ -200,14 +212,6 @@ def tokenize(text: str) -> List[str]:
 # 2) Détection intents forts (override global) — pure
 # ---------------------------------------------------------------------------
 
-def _pattern_in_text(text_normalized: str, patterns: List[str]) -> bool:
-    """Match lexique sur texte déjà normalisé (patterns en forme normalisée)."""
-    for p in patterns:
-        if p and (p in text_normalized or text_normalized == p):
-            return True
-    return False
-
-
 def detect_strong_intent(text: str, state: str = "") -> Optional[Intent]:
     """
     Priorité: TRANSFER > CANCEL > MODIFY > ABANDON > ORDONNANCE > FAQ
@@ -218,22 +222,15 @@ def detect_strong_intent(text: str, state: str = "") -> Optional[Intent]:
     t = normalize_stt_text(text)
     if not t:
         return None
-    if _pattern_in_text(t, _TRANSFER_LEXICON):
-        return Intent.TRANSFER
-    if _pattern_in_text(t, _CANCEL_LEXICON):
-        return Intent.CANCEL
-    if _pattern_in_text(t, _MODIFY_LEXICON):
-        return Intent.MODIFY
-    if _pattern_in_text(t, _ABANDON_LEXICON):
-        if len(t) < _ABANDON_MIN_LEN:
-            return None
-        if t in _ABANDON_EXCLUDED:
+    found = _lexicon_categories(t)
+    if not found:
+        return None
+    for intent in _STRONG_INTENT_ORDER:
+        if intent.value not in found:
+            continue
+        if intent is Intent.ABANDON and (len(t) < _ABANDON_MIN_LEN or t in _ABANDON_EXCLUDED):
             return None
-        return Intent.ABANDON
-    if _pattern_in_text(t, _ORDONNANCE_LEXICON):
-        return Intent.ORDONNANCE
-    if _pattern_in_text(t, _FAQ_STRONG_LEXICON):
-        return Intent.FAQ
+        return intent
     return None
 
 
@@ -245,9 +242,8 @@ def _is_yes(text: str) -> bool:
     t = normalize_stt_text(text)
     if not t:
         return False
-    for p in _YES_LEXICON:
-        if p in t or t == p or t.startswith(p + " ") or t.startswith(p + ","):
-            return True
+    if "YES" in _lexicon_categories(t):
+        return True
     if t in ("oui", "ui", "wi", "ouais", "ouai", "ok", "okay", "d accord", "daccord"):
         return True
     return False
@@ -304,12 +300,7 @@ def _is_repeat(text: str) -> bool:
     tokens = t.split()
     if any(w in _REPEAT_SINGLE_WORDS for w in tokens):
         return True
-    for p in _REPEAT_LEXICON:
-        if " " in p and (p in t or t == p):
-            return True
-        if t == p:
-            return True
-    return False
+    return t in _REPEAT_LEXICON_SET or "REPEAT" in _lexicon_categories(t)
 
 
 # Liste noire start intent : annulation / déplacement / négation / RDV existant → pas BOOKING
@@ -323,6 +314,44 @@ _BOOKING_START_BLACKLIST = [
 ]
 
 
+_BOOKING_MARKERS = [
+    "rendez-vous", "rendez vous", "rdv",
+    "prendre rendez-vous", "prendre rendez vous", "prendre rdv",
+    "prise de rendez vous", "rendez vous svp", "un rendez vous", "un rdv",
+    "réserver", "reserver", "booker", "je veux venir", "je veux un rendez", "je voudrais un rendez",
+    "je voudrais un créneau", "je voudrais un creneau",
+    "je voudrais rdv", "je voudrais une rendez", "je voudrais un rendez vous", "voudrais un rdv",
+]
+_FAQ_KEYWORDS = ["horaire", "horaires", "adresse", "tarif", "prix", "parking", "accès", "ouvert", "fermé", "où", "ou "]
+# Phrases multi-mots de _REPEAT_LEXICON : sous-chaîne ; mots seuls : énoncé entier uniquement
+_REPEAT_LEXICON_SET = frozenset(_REPEAT_LEXICON)
+
+_STRONG_INTENT_ORDER = (
+    Intent.TRANSFER, Intent.CANCEL, Intent.MODIFY, Intent.ABANDON, Intent.ORDONNANCE, Intent.FAQ,
+)
+# Tous les lexiques « sous-chaîne » compilés en un seul automate : un passage par énoncé normalisé
+_LEXICON_DETECTOR = MultiPatternDetector(literals={
+    "TRANSFER": _TRANSFER_LEXICON,
+    "CANCEL": _CANCEL_LEXICON,
+    "MODIFY": _MODIFY_LEXICON,
+    "ABANDON": _ABANDON_LEXICON,
+    "ORDONNANCE": _ORDONNANCE_LEXICON,
+    "FAQ": _FAQ_STRONG_LEXICON,
+    "YES": _YES_LEXICON,
+    "REPEAT": [p for p in _REPEAT_LEXICON if " " in p],
+    "BOOKING_BLACKLIST": _BOOKING_START_BLACKLIST,
+    "BOOKING": _BOOKING_MARKERS,
+    "FAQ_KEYWORDS": _FAQ_KEYWORDS,
+})
+
+
+@lru_cache(maxsize=1024)
+def _lexicon_categories(text_normalized: str) -> FrozenSet[str]:
+    """Catégories de lexique présentes dans un texte déjà normalisé (mémoïsé : detect_intent interroge
+    plusieurs lexiques sur le même énoncé)."""
+    return _LEXICON_DETECTOR.categories(text_normalized)
+
+
 def _is_booking_blacklist(text: str) -> bool:
     """True si on ne doit pas traiter comme INTENT_BOOKING (annulation, négation, déplacement, RDV existant)."""
     t = normalize_stt_text(text)
@@ -330,7 +359,7 @@ def _is_booking_blacklist(text: str) -> bool:
         return False
     if t == "non" or t.startswith("non "):
         return True
-    return any(bl in t for bl in _BOOKING_START_BLACKLIST)
+    return "BOOKING_BLACKLIST" in _lexicon_categories(t)
 
 
 def _is_booking(text: str) -> bool:
@@ -342,21 +371,12 @@ def _is_booking(text: str) -> bool:
     # Mots-clés courts (start intent "rendez-vous" — liste blanche produit)
     if t in ("rdv", "rendez vous", "rendezvous") or t.strip() in ("rdv", "rendez vous", "rendezvous"):
         return True
-    booking_markers = [
-        "rendez-vous", "rendez vous", "rdv",
-        "prendre rendez-vous", "prendre rendez vous", "prendre rdv",
-        "prise de rendez vous", "rendez vous svp", "un rendez vous", "un rdv",
-        "réserver", "reserver", "booker", "je veux venir", "je veux un rendez", "je voudrais un rendez",
-        "je voudrais un créneau", "je voudrais un creneau",
-        "je voudrais rdv", "je voudrais une rendez", "je voudrais un rendez vous", "voudrais un rdv",
-    ]
-    return any(m in t for m in booking_markers)
+    return "BOOKING" in _lexicon_categories(t)
 
 
 def _is_faq_keywords(text: str) -> bool:
     t = normalize_stt_text(text)
-    kw = ["horaire", "horaires", "adresse", "tarif", "prix", "parking", "accès", "ouvert", "fermé", "où", "ou "]
-    return any(k in t for k in kw)
+    return "FAQ_KEYWORDS" in _lexicon_categories(t)
 
 
 def detect_intent(text: str, state: str = "") -> Intent:
@@ -490,6 +510,18 @@ def parse_contact_choice(text: str) -> Optional[ContactChoice]:
 # 7) Normalisation téléphone (pure)
 # ---------------------------------------------------------------------------
 
+_DIGIT_WORDS: Optional[tuple] = None
+
+
+def _digit_words(word_to_digit: dict) -> tuple:
+    """(mot normalisé, chiffres) triés du plus long au plus court ; calculé une fois (table de guards)."""
+    global _DIGIT_WORDS
+    if _DIGIT_WORDS is None:
+        pairs = [(normalize_stt_text(k), v) for k, v in word_to_digit.items()]
+        _DIGIT_WORDS = tuple(sorted(((p, v) for p, v in pairs if p), key=lambda kv: len(kv[0]), reverse=True))
+    return _DIGIT_WORDS
+
+
 def words_to_digits(text: str) -> str:
     """
     Convertit mots (zéro..neuf, dix, etc.) en chiffres. Pure, sans effet de bord.
@@ -506,18 +538,14 @@ def words_to_digits(text: str) -> str:
     if not remaining:
         return "".join(c for c in text if c.isdigit())
     result = []
-    sorted_keys = sorted(_WORD_TO_DIGIT.keys(), key=lambda k: len(normalize_stt_text(k)), reverse=True)
     while remaining:
         remaining = remaining.strip()
         if not remaining:
             break
         found = False
-        for pattern in sorted_keys:
-            pnorm = normalize_stt_text(pattern)
-            if not pnorm:
-                continue
-            if remaining == pnorm or remaining.startswith(pnorm + " ") or remaining.startswith(pnorm):
-                result.append(_WORD_TO_DIGIT[pattern])
+        for pnorm, digit in _digit_words(_WORD_TO_DIGIT):
+            if remaining.startswith(pnorm):
+                result.append(digit)
                 remaining = remaining[len(pnorm):].strip()
                 found = True
                 break
@@ -1,7 +1,8 @@
 # backend/ivr_events_pg.py
 """
 Postgres ivr_events (dual-write quand USE_PG_EVENTS=true).
-Écriture seulement ; lecture = export_weekly_kpis.py.
+Écriture seulement ; lecture = export_weekly_kpis.py / stats_rollup.
+- Rollup du jour incrémenté dans la même transaction (savepoint, un échec n'annule pas l'event)
 - Idempotent : ON CONFLICT DO NOTHING (retry, backfill rejoué)
 - Retry léger (1x) sur erreurs transitoires
 - Création automatique de la table au premier écriture si elle n'existe pas.
@@ -12,7 +13,7 @@ import logging
 import os
 from typing import Optional
 
-from backend.pg_tenant_context import set_tenant_id_on_connection
+from backend.pg_pool import pg_connection
 
 logger = logging.getLogger(__name__)
 
@@ -73,8 +74,8 @@ def ensure_ivr_events_table() -> bool:
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 for stmt in _CREATE_IVR_EVENTS_SQL.strip().split(";"):
                     stmt = stmt.strip()
@@ -89,6 +90,15 @@ def ensure_ivr_events_table() -> bool:
         return False
 
 
+def _record_rollup(conn, client_id: int, call_id: str, event: str, created_at: Optional[str]) -> None:
+    try:
+        from backend import stats_rollup
+        with conn.transaction():
+            stats_rollup.record_event(conn, True, client_id, call_id, event, created_at)
+    except Exception as e:
+        logger.debug("ivr_events_pg: rollup increment failed: %s", e)
+
+
 def create_ivr_event_pg(
     client_id: int,
     call_id: str,
@@ -110,9 +120,8 @@ def create_ivr_event_pg(
 
     def _do_insert() -> bool:
         ensure_ivr_events_table()
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, client_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=client_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -122,6 +131,8 @@ def create_ivr_event_pg(
                     """,
                     (client_id, call_id_val, event, context, reason, created_at),
                 )
+                if cur.rowcount == 1:
+                    _record_rollup(conn, client_id, call_id_val, event, created_at)
                 conn.commit()
         return True
 
@@ -148,9 +159,8 @@ def consent_obtained_exists_pg(client_id: int, call_id: str) -> bool:
         return False
     ensure_ivr_events_table()
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, client_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=client_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT 1 FROM ivr_events WHERE client_id = %s AND call_id = %s AND event = 'consent_obtained' LIMIT 1",
@@ -167,8 +177,8 @@ def is_pg_available() -> bool:
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT 1")
         return True
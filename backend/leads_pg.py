@@ -7,16 +7,16 @@ import uuid
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from backend.pg_pool import pg_connection
+
 logger = logging.getLogger(__name__)
 
 
 def _get_conn():
-    import psycopg
-    from psycopg.rows import dict_row
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL")
     if not url:
         raise RuntimeError("DATABASE_URL or PG_TENANTS_URL required for leads")
-    return psycopg.connect(url, row_factory=dict_row)
+    return pg_connection(url)
 
 
 def get_lead_by_email_for_upsert(email: str) -> Optional[Dict[str, Any]]:
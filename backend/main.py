@@ -20,13 +20,17 @@ import sqlite3
 
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
 from backend.engine import ENGINE, Event
 from backend.routes.voice import _get_engine
 import backend.config as config  # Import du MODULE (pas from import)
 from backend.db import init_db, list_free_slots, count_free_slots
+from backend import (
+    cache_warmup, composite_snapshot, email_outbox, engine_executor, single_flight, stats_rollup, turn_trace,
+)
+from backend.pg_pool import close_pools, pg_connection, pool_stats
 from backend.tenant_routing import current_tenant_id
 from backend.deps import require_tenant_web, TenantIdWeb
 # Nouvelle architecture multi-canal
@@ -175,13 +179,30 @@ async def startup():
 
     if not _lean:
         asyncio.create_task(keep_alive())
+        if cache_warmup.enabled():
+            asyncio.create_task(cache_warmup.run_forever())
     else:
         print("⏸️  keep_alive disabled (DISABLE_WARMUP=true) — no keep-alive ping, no slot warmup")
 
+    if stats_rollup.ENABLED:
+        asyncio.create_task(stats_rollup.run_forever())
+    if email_outbox.active():
+        asyncio.create_task(email_outbox.run_forever())
+
     asyncio.create_task(_init_heavy())
     print("🚀 Server ready (heavy init in background)")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Arrêt : executor engine, flush du journal d'appel write-behind, puis fermeture des pools PG partagés."""
+    from backend import call_journal
+
+    await asyncio.to_thread(engine_executor.shutdown)
+    await asyncio.to_thread(call_journal.shutdown)
+    await asyncio.to_thread(close_pools)
+
+
 async def _init_heavy():
     """Init lourde en arrière-plan (credentials, PG) — ne bloque pas le healthcheck."""
     await asyncio.to_thread(_init_heavy_sync)
@@ -231,8 +252,8 @@ def _init_heavy_sync():
     try:
         _pg_url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
         if _pg_url:
-            import psycopg
-            with psycopg.connect(_pg_url) as conn:
+            from psycopg.rows import tuple_row
+            with pg_connection(_pg_url, row_factory=tuple_row) as conn:
                 with conn.cursor() as cur:
                     cur.execute("UPDATE vapi_calls SET started_at = created_at WHERE started_at IS NULL AND created_at IS NOT NULL")
                     fixed_started = cur.rowcount
@@ -286,7 +307,7 @@ def _init_heavy_sync():
 async def keep_alive():
     """
     Keep-alive: ping toutes les 30 secondes pour empêcher Railway de stopper le container.
-    Pré-charge les slots Google Calendar toutes les 2 minutes pour que get_slots soit instantané.
+    Le warmup des caches (tous les tenants) est fait par backend/cache_warmup.py.
     """
     import httpx
     import os
@@ -299,31 +320,6 @@ async def keep_alive():
 
     print(f"🔄 Keep-alive started, pinging: {health_url}")
 
-    def _warmup_slots():
-        try:
-            from backend.calendar_adapter import warmup_calendar_adapter
-            from backend.tools_booking import get_slots_for_display
-            from backend.session import Session
-            warmup_tenant_ids = {
-                int(getattr(config, "DEFAULT_TENANT_ID", 1) or 1),
-                int(getattr(config, "TEST_TENANT_ID", config.DEFAULT_TENANT_ID) or config.DEFAULT_TENANT_ID),
-            }
-            for tenant_id in sorted(warmup_tenant_ids):
-                adapter_ready = warmup_calendar_adapter(tenant_id)
-                print(f"🔥 Calendar adapter warmup tenant={tenant_id}: ready={adapter_ready}")
-            warmup_tenant_id = int(getattr(config, "TEST_TENANT_ID", config.DEFAULT_TENANT_ID) or config.DEFAULT_TENANT_ID)
-            for pref_label, pref_val in [("none", None), ("matin", "matin"), ("aprem", "après-midi")]:
-                s = Session(conv_id=f"__warmup_{pref_label}__")
-                s.tenant_id = warmup_tenant_id
-                slots = get_slots_for_display(limit=3, pref=pref_val, session=s)
-                print(f"🔥 Slots warmup tenant={warmup_tenant_id} pref={pref_label}: {len(slots)} cached")
-        except Exception as e:
-            print(f"⚠️ Slots warmup failed: {e}")
-
-    await asyncio.sleep(10)
-    await asyncio.to_thread(_warmup_slots)
-
-    _slots_warmup_counter = 0
     while True:
         await asyncio.sleep(30)
         try:
@@ -333,10 +329,6 @@ async def keep_alive():
         except Exception as e:
             print(f"⚠️ Keep-alive ping failed: {e}")
 
-        _slots_warmup_counter += 1
-        if _slots_warmup_counter % 3 == 0:
-            await asyncio.to_thread(_warmup_slots)
-
 
 async def cleanup_old_conversations():
     """
@@ -485,8 +477,6 @@ async def debug_tenant_route(
 
     # PG routing + assistant + recent calls
     try:
-        from backend.pg_pool import pg_connection
-
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 if keys:
@@ -646,7 +636,6 @@ def _health_checks_sync() -> dict:
     postgres_error = None
     if db_url:
         try:
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT 1")
@@ -668,6 +657,18 @@ async def health() -> dict:
     try:
         deep_checks_enabled = os.getenv("HEALTH_DEEP_CHECKS", "true").lower() in ("1", "true", "yes")
         out["streams"] = len(STREAMS)
+        out["engine_sessions"] = len(getattr(ENGINE.session_store, "_memory_cache", None) or {})
+        out["pg_pool"] = pool_stats()
+        out["single_flight"] = single_flight.stats()
+        out["cache_warmup"] = cache_warmup.stats()
+        out["stats_rollup"] = stats_rollup.stats()
+        out["admin_snapshot"] = composite_snapshot.stats()
+        out["email_outbox"] = email_outbox.stats()
+        from backend import call_journal
+        out["call_journal"] = call_journal.stats()
+        from backend import shared_cache
+        out["shared_cache"] = shared_cache.stats()
+        out["engine_executor"] = engine_executor.stats()
         # Infos instantanées (pas d'I/O)
         service_account_file = getattr(config, "SERVICE_ACCOUNT_FILE", None)
         file_exists = False
@@ -718,6 +719,19 @@ async def health() -> dict:
     return out
 
 
+@app.get("/metrics")
+async def metrics(request: Request) -> PlainTextResponse:
+    """
+    Histogrammes de latence par étape de tour + compteurs single-flight (format texte Prometheus).
+    Si METRICS_TOKEN est défini : Authorization: Bearer <METRICS_TOKEN> requis.
+    """
+    token = (os.getenv("METRICS_TOKEN") or "").strip()
+    if token and request.headers.get("authorization", "") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="unauthorized")
+    body = turn_trace.render_prometheus() + single_flight.render_prometheus()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root():
     """Redirige vers le frontend"""
@@ -738,7 +752,6 @@ async def debug_call_durations():
     if not url:
         return {"error": "no PG URL"}
     try:
-        from backend.pg_pool import pg_connection
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -785,7 +798,6 @@ async def debug_longest_calls(limit: int = 10, tenant_id: int | None = None):
         return {"error": "no PG URL"}
     limit = max(1, min(int(limit or 10), 50))
     try:
-        from backend.pg_pool import pg_connection
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 if tenant_id:
@@ -882,7 +894,6 @@ async def debug_calls_diag():
     start = (now - timedelta(days=30)).strftime("%Y-%m-%d 00:00:00")
     end = now.strftime("%Y-%m-%d %H:%M:%S")
     try:
-        from backend.pg_pool import pg_connection
         from backend.routes.admin import _get_calls_list
         with pg_connection() as conn:
             with conn.cursor() as cur:
@@ -932,7 +943,6 @@ async def debug_vapi_assistant():
         if not api_key:
             return {"error": "VAPI_API_KEY non configuré"}
 
-        from backend.pg_pool import pg_connection
         assistants_db = []
         try:
             with pg_connection() as conn:
@@ -1168,7 +1178,6 @@ async def debug_vapi_patch_tools():
             vapi_ids.add(env_id)
 
         try:
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT DISTINCT vapi_assistant_id FROM tenant_assistants WHERE vapi_assistant_id IS NOT NULL")
@@ -1218,7 +1227,6 @@ async def debug_vapi_cleanup_inline_tools(tool_id: str = None):
         if env_id:
             vapi_ids.add(env_id)
         try:
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT DISTINCT vapi_assistant_id FROM tenant_assistants WHERE vapi_assistant_id IS NOT NULL")
@@ -1459,7 +1467,6 @@ async def debug_vapi_patch_prompt_faq_rule():
         if env_id:
             vapi_ids.add(env_id)
         try:
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     cur.execute("SELECT DISTINCT vapi_assistant_id FROM tenant_assistants WHERE vapi_assistant_id IS NOT NULL")
@@ -1562,7 +1569,7 @@ async def run_engine(conv_id: str, message: str, channel: str = "web") -> None:
         session.channel = channel
         tenant_id = getattr(session, "tenant_id", None)
         if tenant_id is not None:
-            from backend.billing_pg import get_tenant_suspension
+            from backend.billing_cache import get_tenant_suspension
             from backend import prompts
             is_suspended, _, suspension_mode = get_tenant_suspension(int(tenant_id))
             if is_suspended:
@@ -1581,7 +1588,16 @@ async def run_engine(conv_id: str, message: str, channel: str = "web") -> None:
         })
 
         engine = _get_engine(conv_id)
-        events = engine.handle_message(conv_id, message)
+        try:
+            events = await engine_executor.run(conv_id, engine.handle_message, conv_id, message)
+        except engine_executor.EngineBusy:
+            _logger.warning("[ENGINE_BUSY] conv_id=%s stats=%s", conv_id[:20], engine_executor.stats())
+            await push_event(conv_id, {
+                "type": "error",
+                "message": "Serveur occupé, veuillez réessayer",
+                "timestamp": now_iso(),
+            })
+            return
 
         for ev in events:
             await emit_event(conv_id, ev)
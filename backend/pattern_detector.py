@@ -0,0 +1,126 @@
+# backend/pattern_detector.py
+"""
+Détection multi-motifs : plusieurs catégories de mots-clés / regex compilées une fois (à l'import
+du module appelant), toutes les catégories présentes obtenues en un seul passage sur l'énoncé.
+
+Littéraux (sémantique `mot in texte`) : les mots-clés de toutes les catégories sont rangés dans un trie
+puis compilés en une seule regex (équivalent d'un automate Aho-Corasick, exécuté par le moteur re
+en C), recherchée à partir de chaque position de match + 1 pour ne rater aucun chevauchement. À une
+position donnée, le trie suit un seul chemin et capture le mot-clé le plus long ; tous les autres
+mots-clés qui commencent à cette position en sont des préfixes, d'où la table mot-clé → catégories
+(les siennes + celles de ses préfixes).
+
+Regex (patterns avec `.*`, `\\b`, groupes) : une regex combinée (préfiltre : pas de match → aucune
+catégorie en une recherche) puis une alternation compilée par catégorie, évaluée seulement si le
+préfiltre a trouvé quelque chose.
+
+L'ordre de déclaration des catégories sert de priorité pour first().
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+def _trie_regex(node: dict) -> str:
+    """Nœud de trie → regex ; '' marque la fin d'un mot-clé (option vide en dernier = plus long d'abord)."""
+    terminal = "" in node
+    branches = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(node.items()) if ch != ""]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if terminal:
+        return ("(?:" + body + ")?") if len(branches) > 1 or len(body) > 1 else body + "?"
+    return body
+
+
+class MultiPatternDetector:
+    """Catégories → mots-clés littéraux et/ou regex, compilés une fois."""
+
+    def __init__(
+        self,
+        literals: Optional[Mapping[str, Iterable[str]]] = None,
+        regexes: Optional[Mapping[str, Iterable[str]]] = None,
+        regex_flags: int = 0,
+    ):
+        self.order: Tuple[str, ...] = tuple(dict.fromkeys([*(literals or {}), *(regexes or {})]))
+        self._rank = {cat: i for i, cat in enumerate(self.order)}
+
+        # ---- Littéraux : trie → regex + table mot-clé → catégories ----
+        keyword_cats: Dict[str, set] = {}
+        for cat, words in (literals or {}).items():
+            for w in words:
+                if w:
+                    keyword_cats.setdefault(w, set()).add(cat)
+        self._literal_re: Optional[re.Pattern] = None
+        self._literal_cats: Dict[str, FrozenSet[str]] = {}
+        if keyword_cats:
+            trie: dict = {}
+            for w in keyword_cats:
+                node = trie
+                for ch in w:
+                    node = node.setdefault(ch, {})
+                node[""] = True
+            self._literal_re = re.compile(_trie_regex(trie))
+            for w in keyword_cats:
+                cats = set()
+                for i in range(1, len(w) + 1):
+                    cats |= keyword_cats.get(w[:i], set())
+                self._literal_cats[w] = frozenset(cats)
+
+        # ---- Regex : préfiltre combiné + une alternation par catégorie ----
+        self._regex_by_cat: List[Tuple[str, re.Pattern]] = []
+        all_patterns: List[str] = []
+        for cat, patterns in (regexes or {}).items():
+            patterns = [p for p in patterns if p]
+            if patterns:
+                self._regex_by_cat.append((cat, re.compile("|".join(f"(?:{p})" for p in patterns), regex_flags)))
+                all_patterns.extend(patterns)
+        self._regex_any: Optional[re.Pattern] = (
+            re.compile("|".join(f"(?:{p})" for p in all_patterns), regex_flags) if all_patterns else None
+        )
+
+    def _literal_categories(self, text: str) -> set:
+        found: set = set()
+        if self._literal_re is None:
+            return found
+        cats_of = self._literal_cats
+        search = self._literal_re.search
+        m = search(text)
+        while m is not None:
+            found |= cats_of[m.group()]
+            m = search(text, m.start() + 1)
+        return found
+
+    def categories(self, text: str) -> FrozenSet[str]:
+        """Toutes les catégories présentes dans text (déjà normalisé par l'appelant)."""
+        if not text:
+            return _EMPTY
+        found = self._literal_categories(text)
+        if self._regex_any is not None and self._regex_any.search(text):
+            for cat, rx in self._regex_by_cat:
+                if cat not in found and rx.search(text):
+                    found.add(cat)
+        return frozenset(found) if found else _EMPTY
+
+    def first(self, text: str) -> Optional[str]:
+        """Catégorie présente la plus prioritaire (ordre de déclaration), ou None."""
+        if not text:
+            return None
+        found = self._literal_categories(text)
+        best = min(found, key=self._rank.__getitem__) if found else None
+        if self._regex_any is None or not self._regex_any.search(text):
+            return best
+        # Regex : arrêt à la première catégorie qui matche, inutile d'évaluer les moins prioritaires
+        limit = self._rank[best] if best is not None else len(self.order)
+        for cat, rx in self._regex_by_cat:
+            if self._rank[cat] >= limit:
+                break
+            if rx.search(text):
+                return cat
+        return best
+
+    def has(self, text: str, category: str) -> bool:
+        return category in self.categories(text)
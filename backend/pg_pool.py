@@ -1,48 +1,65 @@
 """
-Singleton connection pool for PostgreSQL (psycopg_pool).
-Eliminates per-request TCP+SSL connection overhead on Railway.
+Service de pool de connexions PostgreSQL partagé (psycopg_pool).
+Élimine l'overhead TCP+SSL par requête sur Railway : tous les modules PG
+(billing, sessions, slots, ivr_events, vapi_calls, handoffs, admin...) passent par pg_connection().
+
+Un pool par URL (DATABASE_URL, PG_EVENTS_URL, PG_TENANTS_URL pointent en général sur la même base
+→ un seul pool). Dimensionnement via env (lu à la création du pool) :
+  PG_POOL_MIN_SIZE (1), PG_POOL_MAX_SIZE (10), PG_POOL_TIMEOUT_SEC (3),
+  PG_POOL_MAX_IDLE_SEC (300), PG_POOL_MAX_LIFETIME_SEC (1800), PG_POOL_CHECK (false).
 """
 from __future__ import annotations
 
 import logging
 import os
+import threading
+import time
 from contextlib import contextmanager
-from typing import Optional
+from typing import Any, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
-_pool = None
-_pool_url: Optional[str] = None
+_pools: Dict[str, Any] = {}
+_pools_lock = threading.Lock()
+# Compteur des fallbacks en connexion directe (pool indisponible / saturé)
+_direct_fallbacks = 0
+_fallbacks_lock = threading.Lock()
+# Pool sans aucune connexion après un timeout → connexion directe pendant _POOL_DOWN_COOLDOWN_SEC
+# (évite d'attendre le timeout du pool à chaque requête quand PG est injoignable)
+_pool_down_until: Dict[str, float] = {}
+_POOL_DOWN_COOLDOWN_SEC = 30.0
 
 
 def _get_pg_url() -> Optional[str]:
     return (os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL") or "").strip() or None
 
 
-def get_pool():
-    """Return the singleton ConnectionPool, creating it on first call."""
-    global _pool, _pool_url
-    url = _get_pg_url()
-    if not url:
-        return None
-    if _pool is not None and _pool_url == url:
-        return _pool
+def _env_int(name: str, default: int) -> int:
     try:
-        from psycopg_pool import ConnectionPool
-        _pool = ConnectionPool(
-            conninfo=url,
-            min_size=1,
-            max_size=5,
-            timeout=3.0,
-            max_idle=300.0,
-            kwargs={"row_factory": _dict_row_factory()},
-        )
-        _pool_url = url
-        logger.info("PG connection pool created (min=1, max=5)")
-        return _pool
-    except Exception as e:
-        logger.warning("Failed to create PG pool, falling back to direct connect: %s", e)
-        return None
+        return int((os.environ.get(name) or "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float((os.environ.get(name) or "").strip() or default)
+    except ValueError:
+        return default
+
+
+def _pool_settings() -> Dict[str, Any]:
+    """Dimensionnement du pool depuis l'env (lu au runtime pour permettre le mock en tests)."""
+    min_size = max(0, _env_int("PG_POOL_MIN_SIZE", 1))
+    max_size = max(1, min_size, _env_int("PG_POOL_MAX_SIZE", 10))
+    return {
+        "min_size": min_size,
+        "max_size": max_size,
+        "timeout": _env_float("PG_POOL_TIMEOUT_SEC", 3.0),
+        "max_idle": _env_float("PG_POOL_MAX_IDLE_SEC", 300.0),
+        "max_lifetime": _env_float("PG_POOL_MAX_LIFETIME_SEC", 1800.0),
+        "check": (os.environ.get("PG_POOL_CHECK") or "false").lower() in ("true", "1", "yes"),
+    }
 
 
 def _dict_row_factory():
@@ -50,25 +67,145 @@ def _dict_row_factory():
     return dict_row
 
 
-@contextmanager
-def pg_connection():
+def get_pool(url: Optional[str] = None):
     """
-    Context manager that yields a psycopg connection.
-    Uses the pool if available, falls back to direct connect.
+    Retourne le ConnectionPool partagé pour url (défaut DATABASE_URL / PG_EVENTS_URL),
+    créé au premier appel. None si pas d'URL ou si psycopg_pool indisponible.
     """
-    pool = get_pool()
+    url = (url or "").strip() or _get_pg_url()
+    if not url:
+        return None
+    pool = _pools.get(url)
     if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(url)
+        if pool is not None:
+            return pool
         try:
-            with pool.connection() as conn:
-                yield conn
-                return
+            from psycopg_pool import ConnectionPool
+
+            settings = _pool_settings()
+            extra: Dict[str, Any] = {}
+            if settings["check"]:
+                # check= : psycopg_pool >= 3.2 uniquement, n'est passé que si PG_POOL_CHECK
+                extra["check"] = ConnectionPool.check_connection
+            pool = ConnectionPool(
+                conninfo=url,
+                min_size=settings["min_size"],
+                max_size=settings["max_size"],
+                timeout=settings["timeout"],
+                max_idle=settings["max_idle"],
+                max_lifetime=settings["max_lifetime"],
+                kwargs={"row_factory": _dict_row_factory(), "connect_timeout": 3},
+                name=f"pg{len(_pools) + 1}",
+                open=True,
+                **extra,
+            )
+            _pools[url] = pool
+            logger.info(
+                "PG connection pool created (min=%s, max=%s)", settings["min_size"], settings["max_size"]
+            )
+            return pool
         except Exception as e:
-            logger.debug("Pool connection failed, falling back to direct: %s", e)
+            logger.warning("Failed to create PG pool, falling back to direct connect: %s", e)
+            return None
+
+
+@contextmanager
+def _checked_out(conn, tenant_id: Optional[int], row_factory):
+    """Prépare la connexion (row_factory, contexte RLS) et commit/rollback en sortie."""
+    from backend.pg_tenant_context import set_tenant_id_on_connection
+
+    if row_factory is not None:
+        conn.row_factory = row_factory
+    try:
+        with conn:
+            set_tenant_id_on_connection(conn, tenant_id)
+            yield conn
+    finally:
+        if row_factory is not None and not conn.closed:
+            # Les connexions du pool sont partagées : restaurer le row_factory par défaut
+            conn.row_factory = _dict_row_factory()
 
-    url = _get_pg_url()
+
+@contextmanager
+def pg_connection(url: Optional[str] = None, *, tenant_id: Optional[int] = None, row_factory=None):
+    """
+    Context manager qui fournit une connexion psycopg issue du pool partagé.
+    - url : base cible (défaut DATABASE_URL / PG_EVENTS_URL).
+    - tenant_id : si >= 1, pose app.current_tenant_id (RLS) dès le checkout.
+    - row_factory : dict_row par défaut ; passer psycopg.rows.tuple_row pour des tuples.
+    Commit en sortie normale, rollback sur exception (comme psycopg.connect()).
+    Fallback connexion directe si le pool est indisponible ou saturé.
+    """
+    global _direct_fallbacks
+    url = (url or "").strip() or _get_pg_url()
     if not url:
         raise RuntimeError("No PostgreSQL URL configured")
+    pool = get_pool(url)
+    conn = None
+    if pool is not None and _pool_down_until.get(url, 0.0) <= time.monotonic():
+        try:
+            conn = pool.getconn()
+        except Exception as e:
+            logger.debug("Pool connection failed, falling back to direct: %s", e)
+            try:
+                if not pool.get_stats().get("pool_size"):
+                    _pool_down_until[url] = time.monotonic() + _POOL_DOWN_COOLDOWN_SEC
+            except Exception:
+                pass
+    if conn is not None:
+        try:
+            with _checked_out(conn, tenant_id, row_factory) as c:
+                yield c
+        finally:
+            pool.putconn(conn)
+        return
+
+    with _fallbacks_lock:
+        _direct_fallbacks += 1
     import psycopg
-    from psycopg.rows import dict_row
-    with psycopg.connect(url, row_factory=dict_row, connect_timeout=3) as conn:
+
+    with psycopg.connect(url, row_factory=row_factory or _dict_row_factory(), connect_timeout=3) as conn:
+        from backend.pg_tenant_context import set_tenant_id_on_connection
+
+        set_tenant_id_on_connection(conn, tenant_id)
         yield conn
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Stats des pools (taille, dispo, attentes, erreurs) pour /health. Aucune I/O."""
+    pools = []
+    for pool in list(_pools.values()):
+        try:
+            s = pool.get_stats()
+            pools.append({
+                "name": pool.name,
+                "min_size": s.get("pool_min"),
+                "max_size": s.get("pool_max"),
+                "size": s.get("pool_size"),
+                "available": s.get("pool_available"),
+                "waiting": s.get("requests_waiting", 0),
+                "requests": s.get("requests_num", 0),
+                "requests_queued": s.get("requests_queued", 0),
+                "requests_wait_ms": s.get("requests_wait_ms", 0),
+                "requests_errors": s.get("requests_errors", 0),
+                "connections_errors": s.get("connections_errors", 0),
+                "connections_lost": s.get("connections_lost", 0),
+            })
+        except Exception as e:
+            logger.debug("pool_stats failed: %s", e)
+    return {"pools": pools, "direct_fallbacks": _direct_fallbacks}
+
+
+def close_pools() -> None:
+    """Ferme tous les pools (shutdown)."""
+    with _pools_lock:
+        for pool in list(_pools.values()):
+            try:
+                pool.close()
+            except Exception as e:
+                logger.debug("pool close failed: %s", e)
+        _pools.clear()
+        _pool_down_until.clear()
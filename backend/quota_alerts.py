@@ -7,7 +7,8 @@ from __future__ import annotations
 import logging
 import os
 from datetime import datetime
-from typing import List, Tuple
+
+from backend.pg_pool import pg_connection
 
 logger = logging.getLogger(__name__)
 
@@ -16,53 +17,14 @@ def _pg_url() -> str | None:
     return os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL") or os.environ.get("PG_EVENTS_URL")
 
 
-def _active_tenant_ids() -> List[int]:
-    """Liste des tenant_id actifs (status=active)."""
-    url = _pg_url()
-    if not url:
-        return []
-    try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT tenant_id FROM tenants WHERE COALESCE(status, 'active') = 'active' ORDER BY tenant_id"
-                )
-                return [int(r[0]) for r in cur.fetchall()]
-    except Exception as e:
-        if "does not exist" not in str(e).lower():
-            logger.warning("_active_tenant_ids failed: %s", e)
-        return []
-
-
-def _quota_alert_80_already_sent(tenant_id: int, month_utc: str) -> bool:
-    """True si une alerte 80 % a déjà été envoyée pour ce tenant ce mois."""
-    url = _pg_url()
-    if not url or not month_utc or len(month_utc) != 7:
-        return True
-    try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM quota_alert_log WHERE tenant_id = %s AND month_utc = %s AND alert_type = %s",
-                    (tenant_id, month_utc, "80pct"),
-                )
-                return cur.fetchone() is not None
-    except Exception as e:
-        if "does not exist" not in str(e).lower():
-            logger.warning("_quota_alert_80_already_sent failed: %s", e)
-        return True
-
-
 def _quota_alert_80_mark_sent(tenant_id: int, month_utc: str) -> None:
     """Enregistre l'envoi d'une alerte 80 % (anti-spam)."""
     url = _pg_url()
     if not url or not month_utc:
         return
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -77,32 +39,15 @@ def _quota_alert_80_mark_sent(tenant_id: int, month_utc: str) -> None:
         logger.warning("_quota_alert_80_mark_sent failed: %s", e)
 
 
-def _tenant_email_and_name(tenant_id: int) -> Tuple[str, str]:
-    """(email, name) pour envoi alerte. email = contact_email ou billing_email."""
-    from backend.billing_pg import _get_tenant_params_for_quota, get_tenant_billing
-
-    params = _get_tenant_params_for_quota(tenant_id)
-    billing = get_tenant_billing(tenant_id)
-    email = (params.get("contact_email") or "").strip() or (params.get("billing_email") or "").strip()
-    if not email and billing:
-        email = (billing.get("billing_email") or "").strip() or ""
-    name = (params.get("business_name") or "").strip()
-    if not name:
-        try:
-            from backend.auth_pg import pg_get_tenant_name
-            name = (pg_get_tenant_name(tenant_id) or "").strip() or f"Client #{tenant_id}"
-        except Exception:
-            name = f"Client #{tenant_id}"
-    return (email.strip().lower() or "", name or f"Client #{tenant_id}")
-
-
 def run_quota_alerts_80(month_utc: str | None = None) -> dict:
     """
     Envoie les alertes 80 % pour le mois UTC : tenants avec 80 <= usage_pct < 100.
     Anti-spam : 1 email par tenant par mois (quota_alert_log).
+    Quota, email et anti-spam de tous les tenants actifs en une requête (quota_engine) ;
+    écritures seulement pour les alertes envoyées.
     Retourne {"sent": n, "skipped": m, "errors": [...]}.
     """
-    from backend.billing_pg import get_quota_snapshot_month
+    from backend import quota_engine
     from backend.services.email_service import send_quota_alert_80_email
 
     now = datetime.utcnow()
@@ -111,28 +56,30 @@ def run_quota_alerts_80(month_utc: str | None = None) -> dict:
     skipped = 0
     errors = []
 
-    for tenant_id in _active_tenant_ids():
-        included, used = get_quota_snapshot_month(tenant_id, month_utc)
-        if included <= 0:
+    quotas = quota_engine.snapshot_month(month_utc)
+    if any(q.alert_80_sent is None for q in quotas.values()):
+        # Anti-spam illisible : ne rien envoyer plutôt que réalerter tous les tenants à chaque run
+        logger.warning("quota_alerts_80 skipped month=%s: quota_alert_log unreadable", month_utc)
+        return {"sent": 0, "skipped": len(quotas), "errors": ["quota_alert_log unreadable"]}
+
+    for tenant_id, q in quotas.items():
+        if q.included_minutes <= 0:
             continue
-        usage_pct = (used / included) * 100
-        if usage_pct < 80 or usage_pct >= 100:
+        if q.usage_pct < 80 or q.usage_pct >= 100:
             continue
-        if _quota_alert_80_already_sent(tenant_id, month_utc):
+        if q.alert_80_sent:
             skipped += 1
             continue
-
-        email, name = _tenant_email_and_name(tenant_id)
-        if not email:
+        if not q.email:
             logger.info("quota_alert_80_skip_no_email tenant_id=%s", tenant_id)
             skipped += 1
             continue
 
         ok, err = send_quota_alert_80_email(
-            to_email=email,
-            tenant_name=name,
-            used_minutes=used,
-            included_minutes=included,
+            to_email=q.email,
+            tenant_name=q.business_name or q.name or f"Client #{tenant_id}",
+            used_minutes=q.used_minutes,
+            included_minutes=q.included_minutes,
             month_utc=month_utc,
         )
         if ok:
@@ -143,7 +90,7 @@ def run_quota_alerts_80(month_utc: str | None = None) -> dict:
             except Exception:
                 pass
             sent += 1
-            logger.info("quota_alert_80_sent tenant_id=%s month=%s to=%s", tenant_id, month_utc, email[:50])
+            logger.info("quota_alert_80_sent tenant_id=%s month=%s to=%s", tenant_id, month_utc, q.email[:50])
         else:
             errors.append(f"tenant_id={tenant_id}: {err or 'unknown'}")
 
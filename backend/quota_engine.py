@@ -0,0 +1,261 @@
+# backend/quota_engine.py
+"""
+Quota minutes ensembliste : included / used / % de tous les tenants pour un mois UTC en une requête
+(tenants ⋈ tenant_billing ⋈ tenant_config ⋈ SUM(vapi_call_usage) GROUP BY), + billing_plans et
+quota_alert_log lus une fois chacun. Coût constant quel que soit le nombre de tenants.
+
+Utilisé par le job alertes 80 % (quota_alerts), l'overview billing admin et le gate quota vocal
+(billing_pg.get_quota_snapshot_month → snapshot_month(tenant_ids=[tid])).
+
+Résolution du plan (même règle que le gate vocal) : tenant_billing.plan_key, sinon params_json.plan_key,
+sinon "free" ; plan "custom" → params_json.custom_included_minutes_month si > 0.
+Si la base events (vapi_call_usage) n'est pas celle des tenants : la requête tenants ne référence pas
+vapi_call_usage, 2e requête GROUP BY sur la base events.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from backend.pg_pool import pg_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _tenants_url() -> Optional[str]:
+    return os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL") or os.environ.get("PG_EVENTS_URL")
+
+
+def _events_url() -> Optional[str]:
+    return os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL") or _tenants_url()
+
+
+@dataclass
+class TenantQuota:
+    tenant_id: int
+    name: str = ""  # tenants.name
+    business_name: str = ""  # params_json.business_name (emails)
+    status: str = "active"
+    plan_key: str = "free"
+    included_minutes: int = 0
+    quota_source: str = "plan"  # plan | custom
+    used_minutes: float = 0.0
+    cost_usd: float = 0.0
+    billing_status: Optional[str] = None
+    stripe_customer_id: Optional[str] = None
+    stripe_subscription_id: Optional[str] = None
+    current_period_end: Any = None
+    email: str = ""
+    alert_80_sent: Optional[bool] = False  # None : quota_alert_log illisible (anti-spam inconnu)
+
+    @property
+    def usage_pct(self) -> float:
+        if not self.included_minutes:
+            return 100.0 if self.used_minutes else 0.0
+        return self.used_minutes / self.included_minutes * 100
+
+
+def month_bounds(month_utc: str) -> Optional[Tuple[str, str]]:
+    """[début, fin[ du mois UTC (YYYY-MM) au format SQL ; None si invalide."""
+    if not month_utc or len(month_utc) != 7 or month_utc[4] != "-":
+        return None
+    try:
+        y, m = int(month_utc[:4]), int(month_utc[5:7])
+    except ValueError:
+        return None
+    if not 1 <= m <= 12:
+        return None
+    end = f"{y}-{m + 1:02d}-01 00:00:00" if m < 12 else f"{y + 1}-01-01 00:00:00"
+    return (f"{month_utc}-01 00:00:00", end)
+
+
+def resolve_included(
+    billing_plan_key: Optional[str], params: Mapping[str, Any], plans: Mapping[str, int],
+) -> Tuple[str, int, str]:
+    """(plan_key, included_minutes, quota_source) pour un tenant, plans = {plan_key: minutes incluses}."""
+    plan_key = ((billing_plan_key or "").strip() or (params.get("plan_key") or "").strip() or "free").lower()
+    if plan_key == "custom":
+        try:
+            custom_val = int(params.get("custom_included_minutes_month") or 0)
+        except (TypeError, ValueError):
+            custom_val = 0
+        if custom_val > 0:
+            return (plan_key, custom_val, "custom")
+    return (plan_key, int(plans.get(plan_key) or 0), "plan")
+
+
+def _plans(cur) -> Dict[str, int]:
+    from backend.billing_pg import DEFAULT_PLANS
+
+    plans = dict(DEFAULT_PLANS)
+    try:
+        cur.execute("SAVEPOINT quota_plans")
+        cur.execute("SELECT plan_key, included_minutes_month FROM billing_plans")
+        for r in cur.fetchall():
+            plans[(r["plan_key"] or "").strip().lower()] = int(r["included_minutes_month"] or 0)
+        cur.execute("RELEASE SAVEPOINT quota_plans")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT quota_plans")
+        if "does not exist" not in str(e).lower():
+            logger.debug("quota_engine billing_plans: %s", e)
+    return plans
+
+
+def _params(raw: Any) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    if isinstance(raw, str):
+        try:
+            return json.loads(raw) or {}
+        except ValueError:
+            return {}
+    return dict(raw)
+
+
+def _usage_by_tenant(url: str, start: str, end: str, ids: Optional[list]) -> Dict[int, Tuple[float, float]]:
+    """Base events séparée : {tenant_id: (minutes, cost_usd)} en un GROUP BY."""
+    out: Dict[int, Tuple[float, float]] = {}
+    try:
+        with pg_connection(url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT tenant_id, COALESCE(SUM(duration_sec), 0) / 60.0 AS minutes,
+                           COALESCE(SUM(cost_usd), 0) AS cost_usd
+                    FROM vapi_call_usage
+                    WHERE ended_at IS NOT NULL AND ended_at >= %s AND ended_at < %s
+                      AND (%s::bigint[] IS NULL OR tenant_id = ANY(%s::bigint[]))
+                    GROUP BY tenant_id
+                    """,
+                    (start, end, ids, ids),
+                )
+                for r in cur.fetchall():
+                    out[int(r["tenant_id"])] = (float(r["minutes"] or 0), float(r["cost_usd"] or 0))
+    except Exception as e:
+        if "does not exist" not in str(e).lower():
+            logger.warning("quota_engine usage query failed: %s", e)
+    return out
+
+
+def _alerts_sent(cur, month_utc: str) -> Optional[Set[int]]:
+    """
+    Tenants ayant déjà reçu l'alerte 80 % ce mois (requête à part, savepoint).
+    None si illisible (table absente, erreur) : l'appelant ne doit pas alerter (fail closed).
+    """
+    out: Optional[Set[int]] = None
+    try:
+        cur.execute("SAVEPOINT quota_alerts")
+        cur.execute(
+            "SELECT tenant_id FROM quota_alert_log WHERE month_utc = %s AND alert_type = '80pct'", (month_utc,),
+        )
+        out = {int(r["tenant_id"]) for r in cur.fetchall()}
+        cur.execute("RELEASE SAVEPOINT quota_alerts")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT quota_alerts")
+        logger.warning("quota_engine quota_alert_log unreadable: %s", e)
+    return out
+
+
+def _snapshot_sql(targeted: bool, join_usage: bool) -> str:
+    """
+    Requête snapshot. targeted (tenant_ids fournis, gate vocal) : ni tenants ni quota_alert_log, seulement
+    les tables nécessaires au quota. join_usage=False (base events séparée) : vapi_call_usage n'est pas
+    référencée (Postgres résout les tables avant le WHERE).
+    """
+    if targeted:
+        ids = "ids AS (SELECT unnest(%(ids)s::bigint[]) AS tenant_id)"
+        tenant_cols, tenant_join = "NULL AS name, NULL AS status,", ""
+    else:
+        ids = """ids AS (
+        SELECT t.tenant_id FROM tenants t
+        WHERE (NOT %(active_only)s OR COALESCE(t.status, 'active') = 'active')
+    )"""
+        tenant_cols, tenant_join = "t.name, t.status,", "LEFT JOIN tenants t ON t.tenant_id = ids.tenant_id"
+    usage_cte = usage_cols = usage_join = ""
+    if join_usage:
+        usage_cte = """,
+    usage AS (
+        SELECT tenant_id, COALESCE(SUM(duration_sec), 0) / 60.0 AS minutes, COALESCE(SUM(cost_usd), 0) AS cost_usd
+        FROM vapi_call_usage
+        WHERE ended_at IS NOT NULL AND ended_at >= %(start)s AND ended_at < %(end)s
+          AND tenant_id IN (SELECT tenant_id FROM ids)
+        GROUP BY tenant_id
+    )"""
+        usage_cols = ",\n           COALESCE(u.minutes, 0) AS minutes, COALESCE(u.cost_usd, 0) AS cost_usd"
+        usage_join = "LEFT JOIN usage u ON u.tenant_id = ids.tenant_id"
+    return f"""
+    WITH {ids}{usage_cte}
+    SELECT ids.tenant_id, {tenant_cols}
+           tb.plan_key AS billing_plan_key, tb.billing_status, tb.stripe_customer_id, tb.stripe_subscription_id,
+           tb.current_period_end, tc.params_json{usage_cols}
+    FROM ids
+    {tenant_join}
+    LEFT JOIN tenant_billing tb ON tb.tenant_id = ids.tenant_id
+    LEFT JOIN tenant_config tc ON tc.tenant_id = ids.tenant_id
+    {usage_join}
+    ORDER BY ids.tenant_id
+"""
+
+
+def snapshot_month(
+    month_utc: str, tenant_ids: Optional[Iterable[int]] = None, active_only: bool = True,
+) -> Dict[int, TenantQuota]:
+    """
+    {tenant_id: TenantQuota} pour le mois UTC. tenant_ids=None → tous les tenants (actifs si active_only) ;
+    sinon exactement ces tenants (même sans ligne tenants ; requête réduite au quota : name, status et
+    alert_80_sent non renseignés). alert_80_sent=None si quota_alert_log illisible.
+    {} si mois invalide / pas de PG.
+    """
+    bounds = month_bounds(month_utc)
+    url = _tenants_url()
+    if not bounds or not url:
+        return {}
+    start, end = bounds
+    ids = sorted({int(t) for t in tenant_ids}) if tenant_ids is not None else None
+    if ids is not None and not ids:
+        return {}
+    events_url = _events_url()
+    join_usage = events_url == url
+    try:
+        with pg_connection(url) as conn:
+            with conn.cursor() as cur:
+                plans = _plans(cur)
+                cur.execute(_snapshot_sql(ids is not None, join_usage), {
+                    "ids": ids, "active_only": active_only, "start": start, "end": end,
+                })
+                rows = cur.fetchall()
+                alerted = _alerts_sent(cur, month_utc) if ids is None else set()
+    except Exception as e:
+        if "does not exist" not in str(e).lower():
+            logger.warning("quota_engine snapshot failed: %s", e)
+        return {}
+    usage = {} if join_usage or not events_url else _usage_by_tenant(events_url, start, end, ids)
+
+    out: Dict[int, TenantQuota] = {}
+    for r in rows:
+        tid = int(r["tenant_id"])
+        params = _params(r.get("params_json"))
+        plan_key, included, source = resolve_included(r.get("billing_plan_key"), params, plans)
+        minutes, cost = usage.get(tid, (r.get("minutes"), r.get("cost_usd")))
+        email = (params.get("contact_email") or "").strip() or (params.get("billing_email") or "").strip()
+        out[tid] = TenantQuota(
+            tenant_id=tid,
+            name=(r.get("name") or "").strip(),
+            business_name=(params.get("business_name") or "").strip(),
+            status=r.get("status") or "active",
+            plan_key=plan_key,
+            included_minutes=included,
+            quota_source=source,
+            used_minutes=round(float(minutes or 0), 2),
+            cost_usd=round(float(cost or 0), 4),
+            billing_status=(r.get("billing_status") or "").strip() or None,
+            stripe_customer_id=(r.get("stripe_customer_id") or "").strip() or None,
+            stripe_subscription_id=(r.get("stripe_subscription_id") or "").strip() or None,
+            current_period_end=r.get("current_period_end"),
+            email=email.lower(),
+            alert_80_sent=None if alerted is None else tid in alerted,
+        )
+    return out
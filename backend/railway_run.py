@@ -47,6 +47,9 @@ def main() -> int:
         "python -m backend.run_migration 028 || true; "
         "python -m backend.run_migration 029 || true; "
         "python -m backend.run_migration 030 || true; "
+        "python -m backend.run_migration 032 || true; "
+        "python -m backend.run_migration 033 || true; "
+        "python -m backend.run_migration 034 || true; "
         "echo 'Migrations done'"
     )
     subprocess.Popen(
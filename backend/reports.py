@@ -907,6 +907,25 @@ def setup_scheduler():
         except Exception as e:
             logger.warning("suspension_past_due_job failed: %s", e)
 
+    # Compaction checkpoints delta (appels terminés) : 03:30 UTC quotidien
+    @scheduler.scheduled_job(CronTrigger(hour=3, minute=30))
+    def call_checkpoint_compaction_job():
+        try:
+            from backend.checkpoint_delta import delta_enabled
+            from backend.session_pg import pg_compact_call_checkpoints
+            if not delta_enabled():
+                return
+            total = 0
+            while True:
+                n = pg_compact_call_checkpoints(idle_minutes=30, limit=200)
+                total += n
+                if n < 200:
+                    break
+            if total:
+                logger.info("call_checkpoint_compaction_job: %s call(s) compacted", total)
+        except Exception as e:
+            logger.warning("call_checkpoint_compaction_job failed: %s", e)
+
     scheduler.start()
     channel_type = os.getenv("REPORT_CHANNEL", "telegram")
     logger.info(f"Report scheduler started (daily at 18h, weekly on Sunday 20h) via {channel_type}")
@@ -13,8 +13,8 @@ import json
 import logging
 import os
 import secrets
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 import jwt
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
@@ -22,9 +22,11 @@ from fastapi.responses import JSONResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr, Field
 
-from backend import config
+from backend import composite_snapshot, config, quota_engine, stats_rollup, turn_trace
+from backend.composite_snapshot import Section
 from backend.deps import validate_tenant_id
 from backend.auth_pg import pg_add_tenant_user, pg_create_tenant_user, pg_get_tenant_user_by_email
+from backend.pg_pool import pg_connection
 from backend.billing_pg import (
     get_billing_plans,
     get_plan_included_minutes,
@@ -58,6 +60,7 @@ from backend.tenant_config import (
     reset_faq_params,
     set_params,
 )
+from backend.tools_faq import rebuild_tenant_faq_index
 from backend.vapi_utils import update_vapi_assistant_faq
 
 logger = logging.getLogger(__name__)
@@ -72,6 +75,127 @@ def _ivr_client_id(tenant_id: int) -> int:
 # Minutes : plafond 6h par session pour éviter les outliers (sessions ouvertes / bug updated_at).
 MAX_SESSION_MINUTES = 6 * 60  # 360
 
+# Payloads admin composites (composite_snapshot) : TTL de fraîcheur par famille de section (s),
+# au-delà servies périmées + recalcul en arrière-plan.
+_SNAPSHOT_TTL_S = {
+    "stats": float(os.getenv("ADMIN_SNAPSHOT_STATS_TTL_S", "60")),
+    "ops": float(os.getenv("ADMIN_SNAPSHOT_OPS_TTL_S", "60")),
+    "billing": float(os.getenv("ADMIN_SNAPSHOT_BILLING_TTL_S", "300")),
+    "tenants": float(os.getenv("ADMIN_SNAPSHOT_TENANTS_TTL_S", "60")),
+}
+
+
+def _rollup_counters(start_day: str, end_day: str, tenant_id: Optional[int] = None) -> Optional[dict]:
+    """
+    Compteurs ivr_events de [start_day, end_day] depuis les rollups journaliers (stats_rollup).
+    None si les rollups ne sont pas encore prêts → l'appelant garde les requêtes brutes.
+    """
+    if not stats_rollup.ready():
+        return None
+    cid = _ivr_client_id(tenant_id) if tenant_id is not None else None
+    try:
+        counts = stats_rollup.event_counts(start_day, end_day, tenant_id=cid).get(None, {})
+        last = stats_rollup.last_activity(start_day, end_day, tenant_id=cid)
+    except Exception as e:
+        logger.warning("stats rollup read failed (fallback raw): %s", e)
+        return None
+
+    def n_events(*events: str) -> int:
+        return sum(counts.get(e, (0, 0))[0] for e in events)
+
+    return {
+        "calls_total": counts.get(stats_rollup.ALL, (0, 0))[1],
+        "abandon_events": n_events(*stats_rollup.ABANDON_EVENTS),
+        "calls_abandoned": counts.get(stats_rollup.ABANDON, (0, 0))[1],
+        "appointments_total": n_events("booking_confirmed"),
+        "transfers_total": n_events(*stats_rollup.TRANSFER_EVENTS),
+        "errors_total": n_events("anti_loop_trigger"),
+        "last_activity_at": last,
+    }
+
+
+def _rollup_usage(start_day: str, end_day: str, tenant_id: Optional[int] = None) -> Optional[tuple]:
+    """
+    (minutes_sessions, vapi_minutes, vapi_cost) depuis stats_daily (PG), mêmes règles que les requêtes
+    brutes (vapi_* à None si aucune conso). None si call_sessions / vapi_call_usage pas encore agrégés.
+    """
+    if not (stats_rollup.ready("call_sessions") and stats_rollup.ready("vapi_call_usage")):
+        return None
+    try:
+        sums = stats_rollup.metric_sums(
+            ("session_minutes", "usage_sec", "usage_cost_usd"), start_day, end_day, tenant_id=tenant_id,
+        ).get(None, {})
+    except Exception as e:
+        logger.warning("stats rollup usage read failed (fallback raw): %s", e)
+        return None
+    usage_sec, cost = sums.get("usage_sec", 0.0), sums.get("usage_cost_usd", 0.0)
+    if not (usage_sec or cost):
+        return sums.get("session_minutes", 0.0), None, None
+    return sums.get("session_minutes", 0.0), usage_sec / 60.0, cost
+
+
+def _rollup_series(metric: str, start_day: str, end_day: str, tenant_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    {jour: valeur} depuis les rollups (calls, appointments, minutes, cost_usd). Pour un tenant, minutes
+    retombe sur call_sessions les jours sans conso Vapi (comme la requête brute). None → requêtes brutes.
+    """
+    try:
+        if metric in ("calls", "appointments"):
+            if not stats_rollup.ready():
+                return None
+            event, idx = (stats_rollup.ALL, 1) if metric == "calls" else ("booking_confirmed", 0)
+            cid = _ivr_client_id(tenant_id) if tenant_id is not None else None
+            rows = stats_rollup.event_counts(start_day, end_day, tenant_id=cid, by="day", events=[event])
+            return {d: v.get(event, (0, 0))[idx] for d, v in rows.items()}
+        if metric in ("minutes", "cost_usd"):
+            with_sessions = metric == "minutes" and tenant_id is not None
+            if not stats_rollup.ready("vapi_call_usage") or (with_sessions and not stats_rollup.ready("call_sessions")):
+                return None
+            name = "usage_sec" if metric == "minutes" else "usage_cost_usd"
+            names = (name, "session_minutes") if with_sessions else (name,)
+            rows = stats_rollup.metric_sums(names, start_day, end_day, tenant_id=tenant_id, by="day")
+            out: Dict[str, Any] = {}
+            for d, v in rows.items():
+                if metric == "cost_usd":
+                    out[d] = round(v.get(name, 0.0), 4)
+                    continue
+                mins = int(round(v.get(name, 0.0) / 60.0, 0))
+                if mins == 0 and with_sessions:
+                    mins = int(v.get("session_minutes", 0.0))
+                out[d] = mins
+            return out
+    except Exception as e:
+        logger.warning("stats rollup series %s failed (fallback raw): %s", metric, e)
+    return None
+
+
+def _rollup_top_tenants(metric: str, start_day: str, end_day: str, limit: int) -> Optional[List[tuple]]:
+    """[(tenant_id, valeur)] triés depuis les rollups, mêmes règles que les requêtes brutes ; None → requêtes brutes."""
+    pg = bool(os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL"))
+    try:
+        if pg and metric in ("minutes", "cost_usd"):
+            if not (stats_rollup.ready("vapi_call_usage") and stats_rollup.ready("call_sessions")):
+                return None
+            name = "usage_sec" if metric == "minutes" else "usage_cost_usd"
+            rows = stats_rollup.metric_sums((name,), start_day, end_day, by="tenant")
+            if metric == "cost_usd":
+                values = {tid: round(v.get(name, 0.0), 4) for tid, v in rows.items()}
+            else:
+                values = {tid: int(round(v.get(name, 0.0) / 60.0)) for tid, v in rows.items()}
+                if not values:
+                    rows = stats_rollup.metric_sums(("session_minutes",), start_day, end_day, by="tenant")
+                    values = {tid: int(round(v.get("session_minutes", 0.0))) for tid, v in rows.items()}
+        else:
+            if not stats_rollup.ready():
+                return None
+            event, idx = ("booking_confirmed", 0) if metric == "appointments" else (stats_rollup.ALL, 1)
+            rows = stats_rollup.event_counts(start_day, end_day, by="tenant", events=[event])
+            values = {tid: v.get(event, (0, 0))[idx] for tid, v in rows.items()}
+    except Exception as e:
+        logger.warning("stats rollup top_tenants %s failed (fallback raw): %s", metric, e)
+        return None
+    return sorted(values.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
 
 def _get_vapi_usage_for_window(
     url: Optional[str], start: str, end: str, tenant_id: Optional[int] = None
@@ -83,8 +207,8 @@ def _get_vapi_usage_for_window(
     if not url:
         return (None, None)
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 if tenant_id is not None:
                     cur.execute(
@@ -177,7 +301,6 @@ def _fetch_vapi_call_items_pg(
     cursor: Optional[str] = None,
     result_filter: Optional[str] = None,
 ) -> tuple[list[dict], Optional[str]]:
-    from backend.pg_pool import pg_connection
 
     cursor_ts: Optional[str] = None
     cursor_id: Optional[str] = None
@@ -717,13 +840,19 @@ def _get_activation_queue(limit: int = 8) -> dict:
 
 
 def _get_kpis_weekly(tenant_id: int, start: str, end: str) -> dict:
-    """Aggrège ivr_events pour la période (PG ou SQLite)."""
+    """Aggrège ivr_events pour la période (PG ou SQLite) ; rollups journaliers si période alignée sur des jours."""
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
-    if url:
+    by_event = None
+    days = stats_rollup.aligned_days(start, end)
+    if days and stats_rollup.ready():
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            counts = stats_rollup.event_counts(*days, tenant_id=_ivr_client_id(tenant_id)).get(None, {})
+            by_event = {ev: n for ev, (n, _) in counts.items() if not ev.startswith("__")}
+        except Exception as e:
+            logger.warning("kpis rollup failed (fallback raw): %s", e)
+    if by_event is None and url:
+        try:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -739,7 +868,7 @@ def _get_kpis_weekly(tenant_id: int, start: str, end: str) -> dict:
         except Exception as e:
             logger.warning("pg kpis failed: %s", e)
             by_event = {}
-    else:
+    elif by_event is None:
         import backend.db as db
         conn = db.get_conn()
         try:
@@ -772,13 +901,38 @@ def _get_kpis_weekly(tenant_id: int, start: str, end: str) -> dict:
     }
 
 
+def _rollup_snapshot_counters(tenant_id: int, start_day: str, end_day: str) -> Optional[dict]:
+    """counters_7d du snapshot depuis les rollups (calls = vapi_calls) ; None → requêtes brutes."""
+    if not (stats_rollup.ready() and stats_rollup.ready("vapi_calls")):
+        return None
+    try:
+        counts = stats_rollup.event_counts(
+            start_day, end_day, tenant_id=_ivr_client_id(tenant_id),
+            events=("booking_confirmed", "transferred_human", "transferred", "user_abandon"),
+        ).get(None, {})
+        sums = stats_rollup.metric_sums(("vapi_calls",), start_day, end_day, tenant_id=tenant_id).get(None, {})
+    except Exception as e:
+        logger.warning("snapshot rollup failed (fallback raw): %s", e)
+        return None
+
+    def n(event: str) -> int:
+        return counts.get(event, (0, 0))[0]
+
+    return {
+        "calls_total": int(sums.get("vapi_calls", 0)),
+        "bookings_confirmed": n("booking_confirmed"),
+        "transfers": n("transferred_human") + n("transferred"),
+        "abandons": n("user_abandon"),
+    }
+
+
 def _get_dashboard_snapshot(tenant_id: int, tenant_name: str) -> dict:
     """
     Snapshot dashboard pour un tenant.
     - service_status: online si dernier event < 15 min, sinon offline
     - last_call: dernier call (7j) avec outcome prioritaire
     - last_booking: depuis appointments PG si dispo, sinon ivr_events
-    - counters_7d: agrégats ivr_events
+    - counters_7d: rollups journaliers si prêts, sinon agrégats ivr_events / vapi_calls
     """
     from datetime import datetime, timedelta
     now = datetime.utcnow()
@@ -796,7 +950,6 @@ def _get_dashboard_snapshot(tenant_id: int, tenant_name: str) -> dict:
 
     if url_events:
         try:
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     # Dernière activité: source canonique vapi_calls
@@ -821,30 +974,34 @@ def _get_dashboard_snapshot(tenant_id: int, tenant_name: str) -> dict:
                         if delta.total_seconds() < 900:  # 15 min
                             service_status = {"status": "online", "reason": None, "checked_at": now.strftime("%Y-%m-%dT%H:%M:%SZ")}
 
-                    # Counters 7d
-                    cur.execute(
-                        "SELECT event, COUNT(*) as cnt FROM ivr_events WHERE client_id = %s AND created_at >= %s AND created_at <= %s GROUP BY event",
-                        (tenant_id, start_7d, end_7d),
-                    )
-                    by_event = {r["event"]: r["cnt"] for r in cur.fetchall()}
-                    cur.execute(
-                        """
-                        SELECT COUNT(DISTINCT v.call_id) AS c
-                        FROM vapi_calls v
-                        WHERE v.tenant_id = %s
-                          AND COALESCE(v.ended_at, v.updated_at, v.started_at, v.created_at) >= %s
-                          AND COALESCE(v.ended_at, v.updated_at, v.started_at, v.created_at) <= %s
-                        """,
-                        (tenant_id, start_7d, end_7d),
-                    )
-                    r = cur.fetchone()
-                    calls_total = int(r["c"]) if r and r.get("c") else 0
-                    counters_7d = {
-                        "calls_total": calls_total,
-                        "bookings_confirmed": by_event.get("booking_confirmed", 0),
-                        "transfers": by_event.get("transferred_human", 0) + by_event.get("transferred", 0),
-                        "abandons": by_event.get("user_abandon", 0),
-                    }
+                    # Counters 7d (rollups journaliers si prêts)
+                    rolled = _rollup_snapshot_counters(tenant_id, start_7d[:10], end_7d[:10])
+                    if rolled is not None:
+                        counters_7d = rolled
+                    else:
+                        cur.execute(
+                            "SELECT event, COUNT(*) as cnt FROM ivr_events WHERE client_id = %s AND created_at >= %s AND created_at <= %s GROUP BY event",
+                            (tenant_id, start_7d, end_7d),
+                        )
+                        by_event = {r["event"]: r["cnt"] for r in cur.fetchall()}
+                        cur.execute(
+                            """
+                            SELECT COUNT(DISTINCT v.call_id) AS c
+                            FROM vapi_calls v
+                            WHERE v.tenant_id = %s
+                              AND COALESCE(v.ended_at, v.updated_at, v.started_at, v.created_at) >= %s
+                              AND COALESCE(v.ended_at, v.updated_at, v.started_at, v.created_at) <= %s
+                            """,
+                            (tenant_id, start_7d, end_7d),
+                        )
+                        r = cur.fetchone()
+                        calls_total = int(r["c"]) if r and r.get("c") else 0
+                        counters_7d = {
+                            "calls_total": calls_total,
+                            "bookings_confirmed": by_event.get("booking_confirmed", 0),
+                            "transfers": by_event.get("transferred_human", 0) + by_event.get("transferred", 0),
+                            "abandons": by_event.get("user_abandon", 0),
+                        }
 
                     # last_call: source canonique vapi_calls, enrichissement last_event si disponible
                     cur.execute(
@@ -939,9 +1096,7 @@ def _get_dashboard_snapshot(tenant_id: int, tenant_name: str) -> dict:
     # last_booking: appointments PG préféré (PG a tenant_id)
     if url_slots and config.USE_PG_SLOTS:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_slots, row_factory=dict_row) as conn:
+            with pg_connection(url_slots) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -1055,9 +1210,7 @@ def _get_technical_status(tenant_id: int) -> Optional[dict]:
     url_events = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     if url_events:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_events, row_factory=dict_row) as conn:
+            with pg_connection(url_events) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         "SELECT MAX(created_at) as m FROM ivr_events WHERE client_id = %s",
@@ -1111,9 +1264,7 @@ def _get_technical_status(tenant_id: int) -> Optional[dict]:
         try:
             from datetime import timedelta
             start_7d = (now - timedelta(days=7)).strftime("%Y-%m-%d 00:00:00")
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_events, row_factory=dict_row) as conn:
+            with pg_connection(url_events) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -1147,9 +1298,40 @@ def _get_technical_status(tenant_id: int) -> Optional[dict]:
     }
 
 
+def _rollup_kpis_daily(tenant_id: int, start_day: str, end_day: str, pg: bool) -> Optional[tuple]:
+    """
+    ({jour: calls}, {jour: {bookings, transfers}}) depuis les rollups. calls = vapi_calls (PG, source
+    canonique) ou appels distincts ivr_events (SQLite). None → requêtes brutes.
+    """
+    if not stats_rollup.ready() or (pg and not stats_rollup.ready("vapi_calls")):
+        return None
+    transfer_events = ("transferred_human", "transferred")
+    try:
+        counts = stats_rollup.event_counts(
+            start_day, end_day, tenant_id=_ivr_client_id(tenant_id), by="day",
+            events=("booking_confirmed", stats_rollup.ALL, *transfer_events),
+        )
+        if pg:
+            sums = stats_rollup.metric_sums(("vapi_calls",), start_day, end_day, tenant_id=tenant_id, by="day")
+            calls_by_day = {d: int(v.get("vapi_calls", 0)) for d, v in sums.items()}
+        else:
+            calls_by_day = {d: v.get(stats_rollup.ALL, (0, 0))[1] for d, v in counts.items()}
+    except Exception as e:
+        logger.warning("kpis_daily rollup failed (fallback raw): %s", e)
+        return None
+    metric_by_day = {
+        d: {
+            "bookings": v.get("booking_confirmed", (0, 0))[0],
+            "transfers": sum(v.get(e, (0, 0))[0] for e in transfer_events),
+        }
+        for d, v in counts.items()
+    }
+    return calls_by_day, metric_by_day
+
+
 def _get_kpis_daily(tenant_id: int, days: int = 7) -> dict:
     """
-    KPIs par jour + trend vs semaine précédente.
+    KPIs par jour + trend vs semaine précédente (rollups journaliers si prêts).
     Returns: {days: [{date, calls, bookings, transfers}], current: {}, previous: {}, trend: {calls_pct, bookings_pct, transfers_pct}}
     """
     from datetime import datetime, timedelta
@@ -1162,10 +1344,19 @@ def _get_kpis_daily(tenant_id: int, days: int = 7) -> dict:
     days_data = []
     current = {"calls": 0, "bookings": 0, "transfers": 0}
     previous = {"calls": 0, "bookings": 0, "transfers": 0}
-
-    if url:
+    rolled = _rollup_kpis_daily(tenant_id, start_prev[:10], now.strftime("%Y-%m-%d"), pg=bool(url))
+
+    if rolled is not None:
+        calls_by_day, metric_by_day = rolled
+        for d in sorted(set(calls_by_day) | set(metric_by_day)):
+            row = {"calls": calls_by_day.get(d, 0), **metric_by_day.get(d, {"bookings": 0, "transfers": 0})}
+            if d >= start_curr[:10]:
+                days_data.append({"date": d, **row})
+            bucket = current if d >= start_curr[:10] else previous
+            for k in bucket:
+                bucket[k] += row[k]
+    elif url:
         try:
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     # Calls: source canonique vapi_calls
@@ -1291,9 +1482,7 @@ def _get_rgpd(tenant_id: int, start: str, end: str) -> dict:
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -1364,9 +1553,7 @@ def _get_rgpd_extended(tenant_id: int, start: str, end: str, last_n: int = 20) -
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -2077,7 +2264,6 @@ def _get_calls_list(
                 if canonical_items:
                     return {"items": canonical_items, "next_cursor": next_cursor, "days": days}
 
-            from backend.pg_pool import pg_connection
             with pg_connection() as conn:
                 with conn.cursor() as cur:
                     seen_call_ids: set[str] = set()
@@ -2238,11 +2424,11 @@ def _get_call_detail(tenant_id: int, call_id: str) -> dict:
         "duration_sec": None,
         "result": "other",
         "events": [],
+        "trace": turn_trace.call_trace(call_id_clean, tenant_id),
     }
     if not url:
         return out
     try:
-        from backend.pg_pool import pg_connection
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 vapi_row = None
@@ -2413,9 +2599,7 @@ def _get_transfer_reasons(tenant_id: int, days: int = 7) -> dict:
 
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -3159,8 +3343,8 @@ def admin_get_tenant_usage(
     out = {"tenant_id": tenant_id, "month": month, "minutes_total": 0, "cost_usd": 0, "calls_count": 0}
     if url:
         try:
-            import psycopg
-            with psycopg.connect(url) as conn:
+            from psycopg.rows import tuple_row
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -3189,8 +3373,8 @@ def _get_quota_used_minutes(tenant_id: int, start: str, end: str) -> float:
     if not url:
         return 0.0
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -3215,118 +3399,53 @@ PLAN_MRR_EUR = {"starter": 99, "growth": 149, "pro": 199, "free": 0, "business":
 def _get_billing_overview(month: str) -> dict:
     """
     Overview billing agrégé (DB only, pas d'appel Stripe).
-    1 query tenants+tenant_billing, 1 query usage vapi_call_usage.
+    tenants + tenant_billing + usage + quota en 1 requête ensembliste (quota_engine).
     """
-    if len(month) != 7 or month[4] != "-":
-        return {"month": month, "summary": {"mrr_eur_total": 0, "tenants_past_due_count": 0, "cost_usd_month_total": 0}, "tenants": []}
-    try:
-        y, m = int(month[:4]), int(month[5:7])
-        end = f"{y}-{m + 1:02d}-01 00:00:00" if m < 12 else f"{y + 1}-01-01 00:00:00"
-    except ValueError:
-        return {"month": month, "summary": {"mrr_eur_total": 0, "tenants_past_due_count": 0, "cost_usd_month_total": 0}, "tenants": []}
-    start = f"{month}-01 00:00:00"
-
-    url_billing = os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL")
-    url_events = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
+    empty = {"month": month, "summary": {"mrr_eur_total": 0, "tenants_past_due_count": 0, "cost_usd_month_total": 0}, "tenants": []}
+    if quota_engine.month_bounds(month) is None:
+        return empty
+    if not (os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL")):
+        return empty
 
     tenants_data: List[dict] = []
     past_due_count = 0
     mrr_total = 0
     cost_total = 0.0
 
-    if not url_billing:
-        return {"month": month, "summary": {"mrr_eur_total": 0, "tenants_past_due_count": 0, "cost_usd_month_total": 0}, "tenants": []}
-
-    try:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url_billing, row_factory=dict_row) as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT t.tenant_id, t.name, t.status,
-                           tb.stripe_customer_id, tb.stripe_subscription_id, tb.billing_status,
-                           tb.plan_key, tb.current_period_start, tb.current_period_end
-                    FROM tenants t
-                    LEFT JOIN tenant_billing tb ON tb.tenant_id = t.tenant_id
-                    WHERE COALESCE(t.status, 'active') = 'active' AND COALESCE(t.status, '') != 'deleted'
-                    ORDER BY t.name
-                    """,
-                )
-                rows = cur.fetchall()
-    except Exception as e:
-        if "does not exist" not in str(e).lower() and "tenant" not in str(e).lower():
-            logger.warning("billing overview tenants query: %s", e)
-        return {"month": month, "summary": {"mrr_eur_total": 0, "tenants_past_due_count": 0, "cost_usd_month_total": 0}, "tenants": []}
-
-    usage_by_tenant: dict = {}
-    if url_events:
-        try:
-            import psycopg
-            with psycopg.connect(url_events) as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        SELECT tenant_id,
-                               COALESCE(SUM(duration_sec), 0) / 60.0 AS minutes,
-                               COALESCE(SUM(cost_usd), 0) AS cost_usd
-                        FROM vapi_call_usage
-                        WHERE ended_at IS NOT NULL AND ended_at >= %s AND ended_at < %s
-                        GROUP BY tenant_id
-                        """,
-                        (start, end),
-                    )
-                    for r in cur.fetchall() or []:
-                        tid = r[0]
-                        usage_by_tenant[tid] = {"minutes": round(float(r[1] or 0), 2), "cost_usd": round(float(r[2] or 0), 4)}
-        except Exception as e:
-            if "does not exist" not in str(e).lower() and "vapi_call_usage" not in str(e).lower():
-                logger.warning("billing overview usage query: %s", e)
-
-    for r in rows or []:
-        tid = r.get("tenant_id")
-        if tid is None:
-            continue
-        name = (r.get("name") or f"Tenant #{tid}")[:200]
-        plan_key = (r.get("plan_key") or "").strip().lower() or "free"
-        billing_status = (r.get("billing_status") or "").strip() or None
+    quotas = quota_engine.snapshot_month(month)
+    for q in sorted(quotas.values(), key=lambda q: (q.name or "", q.tenant_id)):
+        tid = q.tenant_id
+        billing_status = q.billing_status
         if billing_status in ("past_due", "unpaid"):
             past_due_count += 1
 
-        mrr_eur = PLAN_MRR_EUR.get(plan_key, 0)
+        mrr_eur = PLAN_MRR_EUR.get(q.plan_key, 0)
         if billing_status in ("active", "trialing"):
             mrr_total += mrr_eur
+        cost_total += q.cost_usd
 
-        usage = usage_by_tenant.get(tid) or {"minutes": 0, "cost_usd": 0}
-        cost_total += float(usage.get("cost_usd") or 0)
-
-        included = get_plan_included_minutes(plan_key)
-        used = round(float(usage.get("minutes") or 0), 2)
-
-        period_end = r.get("current_period_end")
+        period_end = q.current_period_end
         if period_end and hasattr(period_end, "timestamp"):
             period_end_ts = int(period_end.timestamp())
-        elif period_end and hasattr(period_end, "isoformat"):
-            from datetime import datetime
+        elif period_end and isinstance(period_end, str):
             try:
-                dt = datetime.fromisoformat(period_end.replace("Z", "+00:00"))
-                period_end_ts = int(dt.timestamp())
-            except Exception:
+                period_end_ts = int(datetime.fromisoformat(period_end.replace("Z", "+00:00")).timestamp())
+            except ValueError:
                 period_end_ts = None
         else:
             period_end_ts = None
 
         tenants_data.append({
             "tenant_id": tid,
-            "name": name,
-            "plan_key": plan_key,
+            "name": (q.name or f"Tenant #{tid}")[:200],
+            "plan_key": q.plan_key,
             "stripe_status": billing_status,
-            "stripe_customer_id": (r.get("stripe_customer_id") or "").strip() or None,
-            "stripe_subscription_id": (r.get("stripe_subscription_id") or "").strip() or None,
+            "stripe_customer_id": q.stripe_customer_id,
+            "stripe_subscription_id": q.stripe_subscription_id,
             "current_period_end": period_end_ts,
             "mrr_eur": mrr_eur if billing_status in ("active", "trialing") else 0,
-            "usage": {"minutes": used, "cost_usd": round(float(usage.get("cost_usd") or 0), 4)},
-            "quota": {"included": included, "used": int(used)},
+            "usage": {"minutes": q.used_minutes, "cost_usd": q.cost_usd},
+            "quota": {"included": q.included_minutes, "used": int(q.used_minutes)},
         })
 
     return {
@@ -3534,6 +3653,7 @@ async def admin_put_tenant_faq(
             raise HTTPException(status_code=500, detail="Impossible d'enregistrer la FAQ.")
     else:
         set_params(tenant_id, {"faq_json": faq_payload})
+    rebuild_tenant_faq_index(tenant_id)
     await _sync_admin_faq_to_vapi(tenant_id)
     return {"ok": True, "faq": faq_payload}
 
@@ -3549,6 +3669,7 @@ async def admin_reset_tenant_faq(
             raise HTTPException(status_code=500, detail="Impossible de réinitialiser la FAQ.")
     else:
         reset_faq_params(tenant_id)
+    rebuild_tenant_faq_index(tenant_id)
     await _sync_admin_faq_to_vapi(tenant_id)
     return {"ok": True, "faq": get_faq(tenant_id)}
 
@@ -3873,8 +3994,8 @@ def _get_assigned_voice_numbers() -> set:
     if not url:
         return set()
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT key FROM tenant_routing WHERE channel IN ('voice', 'vocal') AND is_active = TRUE"
@@ -3914,7 +4035,7 @@ def admin_list_twilio_numbers(_: None = Depends(_verify_admin)):
 
 
 def _get_global_stats(window_days: int) -> dict:
-    """KPIs globaux sur la fenêtre. Prod = Postgres (Railway) ; fallback SQLite en dev local."""
+    """KPIs globaux sur la fenêtre. Prod = Postgres (Railway) ; fallback SQLite en dev local. Rollups journaliers si prêts."""
     from datetime import datetime, timedelta
     now = datetime.utcnow()
     start = (now - timedelta(days=window_days)).strftime("%Y-%m-%d 00:00:00")
@@ -3931,12 +4052,34 @@ def _get_global_stats(window_days: int) -> dict:
     last_activity_at: Optional[str] = None
     minutes_total = 0.0
     cost_usd_total: Optional[float] = None
-
-    if url:
+    # Rollups journaliers (stats_rollup) dès qu'ils sont prêts ; sinon requêtes brutes ci-dessous
+    start_day, end_day = stats_rollup.window_days(window_days, now)
+    rolled = _rollup_counters(start_day, end_day)
+    usage = _rollup_usage(start_day, end_day) if rolled is not None and url else None
+
+    if rolled is not None and (usage is not None or not url):
+        calls_total = rolled["calls_total"]
+        calls_abandoned = rolled["abandon_events"]
+        transfers_total = rolled["transfers_total"]
+        appointments_total = rolled["appointments_total"]
+        errors_total = rolled["errors_total"]
+        last_activity_at = rolled["last_activity_at"]
+        if url and calls_total == 0 and stats_rollup.ready("vapi_calls"):
+            try:
+                sums = stats_rollup.metric_sums(("vapi_calls",), start_day, end_day).get(None, {})
+                calls_total = int(sums.get("vapi_calls", 0))
+            except Exception as e:
+                logger.debug("stats global rollup vapi_calls: %s", e)
+        if usage is not None:
+            session_mins, vapi_mins, vapi_cost = usage
+            minutes_total = round(session_mins, 1)
+            if vapi_mins is not None and vapi_mins > 0:
+                minutes_total = round(vapi_mins, 1)
+            if vapi_cost is not None and vapi_cost >= 0:
+                cost_usd_total = round(vapi_cost, 4)
+    elif url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -4048,8 +4191,8 @@ def _get_global_stats(window_days: int) -> dict:
         url_slots = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
         if url_slots:
             try:
-                import psycopg
-                with psycopg.connect(url_slots) as conn:
+                from psycopg.rows import tuple_row
+                with pg_connection(url_slots, row_factory=tuple_row) as conn:
                     with conn.cursor() as cur:
                         cur.execute(
                             "SELECT COUNT(*) FROM appointments WHERE created_at >= %s AND created_at <= %s",
@@ -4080,7 +4223,7 @@ def _get_global_stats(window_days: int) -> dict:
 
 
 def _get_stats_timeseries(metric: str, days: int) -> dict:
-    """Série temporelle par jour. Une connexion + une requête agrégée par jour (évite N connexions)."""
+    """Série temporelle par jour. Rollups journaliers si prêts, sinon une connexion + une requête agrégée par jour."""
     from datetime import datetime, timedelta
     now = datetime.utcnow()
     start = (now - timedelta(days=days)).strftime("%Y-%m-%d 00:00:00")
@@ -4090,12 +4233,13 @@ def _get_stats_timeseries(metric: str, days: int) -> dict:
     for i in range(days):
         d = (now - timedelta(days=days - 1 - i)).date()
         by_date[d.strftime("%Y-%m-%d")] = 0
+    rolled = _rollup_series(metric, *stats_rollup.window_days(days, now))
 
-    if url:
+    if rolled is not None:
+        by_date.update(rolled)
+    elif url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     if metric == "calls":
                         cur.execute(
@@ -4193,18 +4337,26 @@ def _get_stats_timeseries(metric: str, days: int) -> dict:
 
 
 def _get_stats_top_tenants(metric: str, window_days: int, limit: int) -> dict:
-    """Top tenants par métrique. Sources = Postgres (Railway) en prod."""
+    """Top tenants par métrique. Sources = rollups journaliers si prêts, sinon Postgres (Railway) en prod."""
     from datetime import datetime, timedelta
     now = datetime.utcnow()
     start = (now - timedelta(days=window_days)).strftime("%Y-%m-%d 00:00:00")
     end = now.strftime("%Y-%m-%d %H:%M:%S")
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     items: List[dict] = []
-    if url:
+    top = _rollup_top_tenants(metric, *stats_rollup.window_days(window_days, now), limit)
+    if top is not None:
+        for tid, val in top:
+            d = (_get_tenant_detail(tid) if tid else None) or {}
+            items.append({
+                "tenant_id": tid,
+                "name": d.get("name") or f"Tenant #{tid}",
+                "value": val,
+                "last_activity_at": None,
+            })
+    elif url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     if metric == "calls":
                         cur.execute(
@@ -4349,7 +4501,10 @@ def _get_stats_top_tenants(metric: str, window_days: int, limit: int) -> dict:
 
 
 def _get_tenant_stats(tenant_id: int, window_days: int) -> dict:
-    """KPIs pour un tenant sur la fenêtre. Prod = Postgres (Railway). calls_answered = calls_total - calls_abandoned."""
+    """
+    KPIs pour un tenant sur la fenêtre. Rollups journaliers si prêts, sinon Postgres (Railway) en prod.
+    calls_answered = calls_total - calls_abandoned.
+    """
     from datetime import datetime, timedelta
     now = datetime.utcnow()
     start = (now - timedelta(days=window_days)).strftime("%Y-%m-%d 00:00:00")
@@ -4367,11 +4522,23 @@ def _get_tenant_stats(tenant_id: int, window_days: int) -> dict:
         "errors_total": 0,
         "last_activity_at": None,
     }
-    if url:
+    start_day, end_day = stats_rollup.window_days(window_days, now)
+    rolled = _rollup_counters(start_day, end_day, tenant_id)
+    usage = _rollup_usage(start_day, end_day, tenant_id) if rolled is not None and url else None
+    if rolled is not None and (usage is not None or not url):
+        for key in ("calls_total", "calls_abandoned", "appointments_total", "transfers_total", "errors_total", "last_activity_at"):
+            out[key] = rolled[key]
+        out["calls_answered"] = max(0, out["calls_total"] - out["calls_abandoned"])
+        if usage is not None:
+            session_mins, vapi_mins, vapi_cost = usage
+            out["minutes_total"] = int(round(session_mins, 0))
+            if vapi_mins is not None and vapi_mins > 0:
+                out["minutes_total"] = int(round(vapi_mins, 0))
+            if vapi_cost is not None and vapi_cost >= 0:
+                out["cost_usd"] = round(vapi_cost, 4)
+    elif url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cid = _ivr_client_id(tenant_id)
                     cur.execute(
@@ -4496,11 +4663,18 @@ def _get_tenant_stats(tenant_id: int, window_days: int) -> dict:
 
 
 def _get_tenant_timeseries(tenant_id: int, metric: str, days: int) -> dict:
-    """Série temporelle par jour pour un tenant. Sources = Postgres (Railway) en prod."""
+    """Série temporelle par jour pour un tenant. Rollups journaliers si prêts (une requête), sinon Postgres (Railway) en prod."""
     from datetime import datetime, timedelta
     now = datetime.utcnow()
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     points: List[dict] = []
+    first_day = (now - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    rolled = _rollup_series(metric, first_day, now.strftime("%Y-%m-%d"), tenant_id=tenant_id)
+    if rolled is not None:
+        for i in range(days - 1, -1, -1):
+            date_str = (now - timedelta(days=i)).strftime("%Y-%m-%d")
+            points.append({"date": date_str, "value": rolled.get(date_str, 0)})
+        return {"metric": metric, "days": days, "points": points}
     for i in range(days - 1, -1, -1):
         d = (now - timedelta(days=i)).date()
         date_str = d.strftime("%Y-%m-%d")
@@ -4509,8 +4683,8 @@ def _get_tenant_timeseries(tenant_id: int, metric: str, days: int) -> dict:
         value = 0
         if url:
             try:
-                import psycopg
-                with psycopg.connect(url) as conn:
+                from psycopg.rows import tuple_row
+                with pg_connection(url, row_factory=tuple_row) as conn:
                     with conn.cursor() as cur:
                         cid = _ivr_client_id(tenant_id)
                         if metric == "calls":
@@ -4580,9 +4754,7 @@ def _get_tenant_activity(tenant_id: int, limit: int) -> dict:
     items: List[dict] = []
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -4657,9 +4829,7 @@ def _get_billing_snapshot() -> dict:
     }
     if url_events:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_events, row_factory=dict_row) as conn:
+            with pg_connection(url_events) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -4694,9 +4864,7 @@ def _get_billing_snapshot() -> dict:
                 logger.warning("billing_snapshot vapi: %s", e)
     if url_billing:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_billing, row_factory=dict_row) as conn:
+            with pg_connection(url_billing) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -4740,43 +4908,62 @@ def admin_stats_global(
 @router.get("/admin/stats/dashboard-payload")
 def admin_stats_dashboard_payload(
     window_days: int = Query(30, ge=7, le=90),
+    refresh: bool = Query(False, description="Ignorer le cache (sections recalculées)"),
     _: None = Depends(_verify_admin),
 ):
-    """Payload unique pour la page Dashboard admin : global + timeseries + topTenants (calls + cost) + billing. 1 seul round-trip."""
-    return {
-        "global": _get_global_stats(window_days),
-        "timeseries": _get_stats_timeseries("calls", window_days),
-        "topTenantsCalls": _get_stats_top_tenants("calls", window_days, 10),
-        "topTenantsCost": _get_stats_top_tenants("cost_usd", window_days, 10),
-        "billing": _get_billing_snapshot(),
-        "activationQueue": _get_activation_queue(8),
-    }
-
-
-def _get_operations_snapshot(window_days: int = 7) -> dict:
     """
-    Snapshot unique pour /admin/operations : billing, suspensions, cost today/7d, errors.
-    Tout en 1 appel. Today = UTC.
-    Errors = event anti_loop_trigger (liste stricte).
+    Payload unique pour la page Dashboard admin : global + timeseries + topTenants (calls + cost) + billing
+    + activationQueue. 1 seul round-trip ; sections en parallèle avec cache stale-while-revalidate,
+    meta = fraîcheur par section (fresh / stale / computed / timeout / error).
     """
-    from datetime import datetime, timezone, timedelta
+    w = window_days
+    sections, meta = composite_snapshot.assemble("dashboard", {
+        "global": Section(lambda: _get_global_stats(w), key=(w,), ttl_s=_SNAPSHOT_TTL_S["stats"], default={}),
+        "timeseries": Section(
+            lambda: _get_stats_timeseries("calls", w), key=(w,), ttl_s=_SNAPSHOT_TTL_S["stats"],
+            default={"metric": "calls", "days": w, "points": []},
+        ),
+        "topTenantsCalls": Section(
+            lambda: _get_stats_top_tenants("calls", w, 10), key=(w,), ttl_s=_SNAPSHOT_TTL_S["stats"],
+            default={"metric": "calls", "window_days": w, "items": []},
+        ),
+        "topTenantsCost": Section(
+            lambda: _get_stats_top_tenants("cost_usd", w, 10), key=(w,), ttl_s=_SNAPSHOT_TTL_S["stats"],
+            default={"metric": "cost_usd", "window_days": w, "items": []},
+        ),
+        "billing": Section(_get_billing_snapshot, ttl_s=_SNAPSHOT_TTL_S["billing"], default={}),
+        "activationQueue": Section(
+            lambda: _get_activation_queue(8), ttl_s=_SNAPSHOT_TTL_S["tenants"], default={"items": [], "summary": {}},
+        ),
+    }, refresh=refresh)
+    return {**sections, "meta": meta}
+
 
+def _ops_window(window_days: int) -> Tuple[datetime, str, str, str]:
+    """(now UTC, début du jour UTC, début de la fenêtre, maintenant) au format SQL."""
     now = datetime.now(timezone.utc)
-    generated_at = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return (
+        now,
+        today_start.strftime("%Y-%m-%d %H:%M:%S"),
+        (today_start - timedelta(days=window_days)).strftime("%Y-%m-%d %H:%M:%S"),
+        now.strftime("%Y-%m-%d %H:%M:%S"),
+    )
 
-    # Billing : réutilise _get_billing_snapshot + month_utc
+
+def _ops_billing() -> dict:
+    """Section billing d'operations : _get_billing_snapshot + month_utc + last_activity_at des top tenants."""
+    now = datetime.now(timezone.utc)
     billing = _get_billing_snapshot()
     billing["month_utc"] = now.strftime("%Y-%m")
     # Enrichir top_tenants_by_cost_this_month avec last_activity_at (1 seule requête groupée, pas de N+1)
     url_events = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     if url_events and billing.get("top_tenants_by_cost_this_month"):
         try:
-            import psycopg
-            from psycopg.rows import dict_row
             tids = [t["tenant_id"] for t in billing["top_tenants_by_cost_this_month"] if t.get("tenant_id") is not None]
             month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).strftime("%Y-%m-%d %H:%M:%S")
             if tids:
-                with psycopg.connect(url_events, row_factory=dict_row) as conn:
+                with pg_connection(url_events) as conn:
                     with conn.cursor() as cur:
                         cur.execute(
                             """
@@ -4794,15 +4981,16 @@ def _get_operations_snapshot(window_days: int = 7) -> dict:
         except Exception as e:
             if "does not exist" not in str(e).lower():
                 logger.warning("operations_snapshot last_activity: %s", e)
+    return billing
 
-    # Suspensions : tenant_billing JOIN tenants
+
+def _ops_suspensions() -> dict:
+    """Section suspensions d'operations : tenant_billing JOIN tenants."""
     url_billing = os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL")
     suspensions = {"suspended_total": 0, "items": []}
     if url_billing:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_billing, row_factory=dict_row) as conn:
+            with pg_connection(url_billing) as conn:
                 with conn.cursor() as cur:
                     try:
                         cur.execute(
@@ -4847,23 +5035,20 @@ def _get_operations_snapshot(window_days: int = 7) -> dict:
         except Exception as e:
             if "does not exist" not in str(e).lower() and "tenant_billing" not in str(e).lower():
                 logger.warning("operations_snapshot suspensions: %s", e)
+    return suspensions
 
-    # Cost today UTC + last 7d (vapi_call_usage)
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    today_str = today_start.strftime("%Y-%m-%d %H:%M:%S")
-    end_str = now.strftime("%Y-%m-%d %H:%M:%S")
-    seven_d_start = (today_start - timedelta(days=window_days))
-    seven_d_str = seven_d_start.strftime("%Y-%m-%d %H:%M:%S")
 
+def _ops_cost(window_days: int) -> dict:
+    """Section cost d'operations : coût today UTC + fenêtre (vapi_call_usage)."""
+    _, today_str, seven_d_str, end_str = _ops_window(window_days)
+    url_events = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     cost = {
-        "today_utc": {"date_utc": today_start.strftime("%Y-%m-%d"), "total_usd": 0.0, "top": []},
+        "today_utc": {"date_utc": today_str[:10], "total_usd": 0.0, "top": []},
         "last_7d": {"window_days": window_days, "total_usd": 0.0, "top": []},
     }
     if url_events:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_events, row_factory=dict_row) as conn:
+            with pg_connection(url_events) as conn:
                 with conn.cursor() as cur:
                     for label, start_s, end_s in [("today_utc", today_str, end_str), ("last_7d", seven_d_str, end_str)]:
                         cur.execute(
@@ -4896,14 +5081,17 @@ def _get_operations_snapshot(window_days: int = 7) -> dict:
         except Exception as e:
             if "does not exist" not in str(e).lower():
                 logger.warning("operations_snapshot cost: %s", e)
+    return cost
+
 
-    # Errors : top tenants par anti_loop_trigger (7j) + total
+def _ops_errors(window_days: int) -> dict:
+    """Section errors d'operations : top tenants par anti_loop_trigger + total."""
+    _, _, seven_d_str, end_str = _ops_window(window_days)
+    url_events = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     errors = {"window_days": window_days, "top_tenants": [], "errors_total": 0}
     if url_events:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_events, row_factory=dict_row) as conn:
+            with pg_connection(url_events) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -4940,167 +5128,169 @@ def _get_operations_snapshot(window_days: int = 7) -> dict:
         except Exception as e:
             if "does not exist" not in str(e).lower():
                 logger.warning("operations_snapshot errors: %s", e)
+    return errors
 
-    # Quota risk : tenants >80% et >100% ce mois UTC (même logique que GET .../quota)
-    month_utc = now.strftime("%Y-%m")
-    start_quota = f"{month_utc}-01 00:00:00"
-    try:
-        y, m = int(month_utc[:4]), int(month_utc[5:7])
-        end_quota = f"{y}-{m + 1:02d}-01 00:00:00" if m < 12 else f"{y + 1}-01-01 00:00:00"
-    except ValueError:
-        end_quota = start_quota
-    quota_risk = {"month_utc": month_utc, "over_80": [], "over_100": []}
-    if url_events:
-        try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url_events, row_factory=dict_row) as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        SELECT tenant_id, COALESCE(SUM(duration_sec), 0) / 60.0 AS used_minutes
-                        FROM vapi_call_usage
-                        WHERE ended_at IS NOT NULL AND ended_at >= %s AND ended_at < %s
-                        GROUP BY tenant_id
-                        """,
-                        (start_quota, end_quota),
-                    )
-                    rows = cur.fetchall()
-            for r in rows:
-                tid = r.get("tenant_id")
-                if tid is None:
-                    continue
-                used_minutes = round(float(r.get("used_minutes") or 0), 2)
-                d = _get_tenant_detail(tid)
-                if not d:
-                    continue
-                params = d.get("params") or {}
-                plan_key = (params.get("plan_key") or "").strip()
-                if not plan_key and get_tenant_billing(tid):
-                    plan_key = (get_tenant_billing(tid) or {}).get("plan_key") or ""
-                plan_key = (plan_key or "").strip() or "free"
-                if plan_key == "custom":
-                    try:
-                        custom_val = int(params.get("custom_included_minutes_month") or 0)
-                        included = custom_val if custom_val > 0 else get_plan_included_minutes("custom")
-                    except (TypeError, ValueError):
-                        included = get_plan_included_minutes("custom")
-                else:
-                    included = get_plan_included_minutes(plan_key)
-                if included <= 0:
-                    continue
-                usage_pct = round((used_minutes / included) * 100, 1)
-                name = (d.get("name") or "").strip() or f"Tenant #{tid}"
-                item = {
-                    "tenant_id": int(tid),
-                    "name": name,
-                    "used_minutes": used_minutes,
-                    "included_minutes": included,
-                    "usage_pct": usage_pct,
-                }
-                if usage_pct > 100:
-                    quota_risk["over_100"].append(item)
-                if usage_pct >= 80:
-                    quota_risk["over_80"].append(item)
-            # over_80 peut contenir les mêmes que over_100 ; tri par usage_pct décroissant
-            quota_risk["over_80"].sort(key=lambda x: -x["usage_pct"])
-            quota_risk["over_100"].sort(key=lambda x: -x["usage_pct"])
-        except Exception as e:
-            if "does not exist" not in str(e).lower():
-                logger.warning("operations_snapshot quota: %s", e)
 
-    return {
-        "generated_at": generated_at,
-        "billing": billing,
-        "suspensions": suspensions,
-        "cost": cost,
-        "errors": errors,
-        "quota": quota_risk,
-    }
+def _ops_quota() -> dict:
+    """Section quota d'operations : tenants >80 % et >100 % ce mois UTC (quota_engine, même règle que le gate vocal)."""
+    month_utc = datetime.now(timezone.utc).strftime("%Y-%m")
+    quota_risk = {"month_utc": month_utc, "over_80": [], "over_100": []}
+    for q in quota_engine.snapshot_month(month_utc).values():
+        if q.included_minutes <= 0:
+            continue
+        usage_pct = round(q.usage_pct, 1)
+        item = {
+            "tenant_id": q.tenant_id,
+            "name": q.name or f"Tenant #{q.tenant_id}",
+            "used_minutes": q.used_minutes,
+            "included_minutes": q.included_minutes,
+            "usage_pct": usage_pct,
+        }
+        if usage_pct > 100:
+            quota_risk["over_100"].append(item)
+        if usage_pct >= 80:
+            quota_risk["over_80"].append(item)
+    # over_80 peut contenir les mêmes que over_100 ; tri par usage_pct décroissant
+    quota_risk["over_80"].sort(key=lambda x: -x["usage_pct"])
+    quota_risk["over_100"].sort(key=lambda x: -x["usage_pct"])
+    return quota_risk
 
 
-def _get_quality_snapshot(window_days: int = 7) -> dict:
+def _get_operations_snapshot(window_days: int = 7, refresh: bool = False) -> dict:
     """
-    Snapshot Quality : KPIs + top tenants par anti_loop, abandons, transferts.
-    Source ivr_events (PG prioritaire). UTC.
+    Snapshot unique pour /admin/operations : billing, suspensions, cost today/7d, errors, quota.
+    Tout en 1 appel, sections en parallèle (composite_snapshot) ; meta = fraîcheur par section. Today = UTC.
+    Errors = event anti_loop_trigger (liste stricte).
     """
-    from datetime import datetime, timezone, timedelta
+    now = datetime.now(timezone.utc)
+    sections, meta = composite_snapshot.assemble("operations", {
+        "billing": Section(_ops_billing, ttl_s=_SNAPSHOT_TTL_S["billing"], default={}),
+        "suspensions": Section(_ops_suspensions, ttl_s=_SNAPSHOT_TTL_S["ops"], default={"suspended_total": 0, "items": []}),
+        "cost": Section(lambda: _ops_cost(window_days), key=(window_days,), ttl_s=_SNAPSHOT_TTL_S["ops"], default={}),
+        "errors": Section(
+            lambda: _ops_errors(window_days), key=(window_days,), ttl_s=_SNAPSHOT_TTL_S["ops"],
+            default={"window_days": window_days, "top_tenants": [], "errors_total": 0},
+        ),
+        "quota": Section(_ops_quota, ttl_s=_SNAPSHOT_TTL_S["billing"], default={"over_80": [], "over_100": []}),
+    }, refresh=refresh)
+    return {"generated_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"), **sections, "meta": meta}
+
+
+_QUALITY_ABANDON_EVENTS = ("user_abandon", "abandon", "hangup", "user_hangup")
+_QUALITY_TRANSFER_EVENTS = ("transferred_human", "transferred", "transfer_human", "transfer")
+_QUALITY_TOP_FILTERS = {
+    "anti_loop": "event = 'anti_loop_trigger'",
+    "abandons": "event IN ('user_abandon', 'abandon', 'hangup', 'user_hangup')",
+    "transfers": "event IN ('transferred_human', 'transferred', 'transfer_human', 'transfer')",
+}
+
 
+def _quality_window(window_days: int) -> Tuple[str, str]:
     now = datetime.now(timezone.utc)
-    start = (now - timedelta(days=window_days)).strftime("%Y-%m-%d 00:00:00")
-    end = now.strftime("%Y-%m-%d %H:%M:%S")
-    url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
+    return (now - timedelta(days=window_days)).strftime("%Y-%m-%d 00:00:00"), now.strftime("%Y-%m-%d %H:%M:%S")
+
 
+def _quality_kpis(window_days: int) -> dict:
+    """Section kpis de quality : appels distincts + compteurs par event (ivr_events PG)."""
+    start, end = _quality_window(window_days)
+    url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     kpis = {"calls_total": 0, "abandons": 0, "transfers": 0, "anti_loop": 0, "appointments": 0}
-    top = {"anti_loop": [], "abandons": [], "transfers": []}
+    if not url:
+        return kpis
+    try:
+        with pg_connection(url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT COUNT(DISTINCT call_id) AS c FROM ivr_events
+                    WHERE call_id IS NOT NULL AND TRIM(call_id) != '' AND created_at >= %s AND created_at <= %s
+                    """,
+                    (start, end),
+                )
+                kpis["calls_total"] = cur.fetchone()["c"] or 0
+                cur.execute(
+                    """
+                    SELECT event, COUNT(*) AS cnt FROM ivr_events
+                    WHERE created_at >= %s AND created_at <= %s GROUP BY event
+                    """,
+                    (start, end),
+                )
+                by_event = {r["event"]: r["cnt"] for r in cur.fetchall()}
+        kpis["abandons"] = sum(by_event.get(e, 0) for e in _QUALITY_ABANDON_EVENTS)
+        kpis["transfers"] = sum(by_event.get(e, 0) for e in _QUALITY_TRANSFER_EVENTS)
+        kpis["anti_loop"] = by_event.get("anti_loop_trigger", 0)
+        kpis["appointments"] = by_event.get("booking_confirmed", 0)
+    except Exception as e:
+        if "does not exist" not in str(e).lower():
+            logger.warning("quality_snapshot kpis failed: %s", e)
+    return kpis
 
-    if url:
-        try:
-            import psycopg
-            from psycopg.rows import dict_row
-            with psycopg.connect(url, row_factory=dict_row) as conn:
-                with conn.cursor() as cur:
-                    cur.execute(
-                        """
-                        SELECT COUNT(DISTINCT call_id) AS c FROM ivr_events
-                        WHERE call_id IS NOT NULL AND TRIM(call_id) != '' AND created_at >= %s AND created_at <= %s
-                        """,
-                        (start, end),
-                    )
-                    kpis["calls_total"] = cur.fetchone()["c"] or 0
-                    cur.execute(
-                        """
-                        SELECT event, COUNT(*) AS cnt FROM ivr_events
-                        WHERE created_at >= %s AND created_at <= %s GROUP BY event
-                        """,
-                        (start, end),
-                    )
-                    by_event = {r["event"]: r["cnt"] for r in cur.fetchall()}
-                    abandon_events = ("user_abandon", "abandon", "hangup", "user_hangup")
-                    transfer_events = ("transferred_human", "transferred", "transfer_human", "transfer")
-                    kpis["abandons"] = sum(by_event.get(e, 0) for e in abandon_events)
-                    kpis["transfers"] = sum(by_event.get(e, 0) for e in transfer_events)
-                    kpis["anti_loop"] = by_event.get("anti_loop_trigger", 0)
-                    kpis["appointments"] = by_event.get("booking_confirmed", 0)
-
-                    for metric, event_filter, event_list in [
-                        ("anti_loop", "event = 'anti_loop_trigger'", ["anti_loop_trigger"]),
-                        ("abandons", "event IN ('user_abandon', 'abandon', 'hangup', 'user_hangup')", list(abandon_events)),
-                        ("transfers", "event IN ('transferred_human', 'transferred', 'transfer_human', 'transfer')", list(transfer_events)),
-                    ]:
-                        cur.execute(
-                            f"""
-                            SELECT client_id AS tenant_id, COUNT(*) AS count, MAX(created_at) AS last_at
-                            FROM ivr_events
-                            WHERE {event_filter} AND created_at >= %s AND created_at <= %s
-                            GROUP BY client_id ORDER BY count DESC LIMIT 10
-                            """,
-                            (start, end),
-                        )
-                        for r in cur.fetchall():
-                            tid = r.get("tenant_id")
-                            if tid is None:
-                                continue
-                            d = _get_tenant_detail(tid) or {}
-                            last_at = r.get("last_at")
-                            if last_at and hasattr(last_at, "isoformat"):
-                                last_at = last_at.isoformat() + "Z"
-                            top[metric].append({
-                                "tenant_id": tid,
-                                "name": d.get("name") or f"Tenant #{tid}",
-                                "count": int(r.get("count") or 0),
-                                "last_at": last_at,
-                            })
-        except Exception as e:
-            if "does not exist" not in str(e).lower():
-                logger.warning("quality_snapshot failed: %s", e)
 
+def _quality_top(window_days: int, metric: str) -> List[dict]:
+    """Section top_<metric> de quality : 10 tenants avec le plus d'events du problème."""
+    start, end = _quality_window(window_days)
+    url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
+    items: List[dict] = []
+    if not url:
+        return items
+    try:
+        with pg_connection(url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT client_id AS tenant_id, COUNT(*) AS count, MAX(created_at) AS last_at
+                    FROM ivr_events
+                    WHERE {_QUALITY_TOP_FILTERS[metric]} AND created_at >= %s AND created_at <= %s
+                    GROUP BY client_id ORDER BY count DESC LIMIT 10
+                    """,
+                    (start, end),
+                )
+                rows = cur.fetchall()
+        for r in rows:
+            tid = r.get("tenant_id")
+            if tid is None:
+                continue
+            d = _get_tenant_detail(tid) or {}
+            last_at = r.get("last_at")
+            if last_at and hasattr(last_at, "isoformat"):
+                last_at = last_at.isoformat() + "Z"
+            items.append({
+                "tenant_id": tid,
+                "name": d.get("name") or f"Tenant #{tid}",
+                "count": int(r.get("count") or 0),
+                "last_at": last_at,
+            })
+    except Exception as e:
+        if "does not exist" not in str(e).lower():
+            logger.warning("quality_snapshot top %s failed: %s", metric, e)
+    return items
+
+
+def _get_quality_snapshot(window_days: int = 7, refresh: bool = False) -> dict:
+    """
+    Snapshot Quality : KPIs + top tenants par anti_loop, abandons, transferts.
+    Source ivr_events (PG prioritaire), sections en parallèle (composite_snapshot). UTC.
+    """
+    now = datetime.now(timezone.utc)
+    specs = {
+        "kpis": Section(
+            lambda: _quality_kpis(window_days), key=(window_days,), ttl_s=_SNAPSHOT_TTL_S["stats"],
+            default={"calls_total": 0, "abandons": 0, "transfers": 0, "anti_loop": 0, "appointments": 0},
+        ),
+    }
+    for metric in _QUALITY_TOP_FILTERS:
+        specs[f"top_{metric}"] = Section(
+            lambda m=metric: _quality_top(window_days, m), key=(window_days,), ttl_s=_SNAPSHOT_TTL_S["stats"], default=[],
+        )
+    sections, meta = composite_snapshot.assemble("quality", specs, refresh=refresh)
+    kpis = sections["kpis"]
     abandon_rate = (kpis["abandons"] / kpis["calls_total"] * 100) if kpis["calls_total"] else 0
     return {
         "window_days": window_days,
         "generated_at": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
         "kpis": {**kpis, "abandon_rate_pct": round(abandon_rate, 1)},
-        "top": top,
+        "top": {metric: sections[f"top_{metric}"] for metric in _QUALITY_TOP_FILTERS},
+        "meta": meta,
     }
 
 
@@ -5143,8 +5333,8 @@ def admin_job_insert_test_usage(
         (tenant_id, f"test-usage-{uuid.uuid4()}", start + timedelta(hours=6), start + timedelta(hours=6, minutes=20), 1200, 0.07),
     ]
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 for tid, vid, s, e, dur, cost in rows:
                     cur.execute(
@@ -5173,9 +5363,7 @@ def admin_get_stripe_usage_push_log(
     if not url:
         raise HTTPException(503, "DATABASE_URL not configured")
     try:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
+        with pg_connection(url) as conn:
             with conn.cursor() as cur:
                 if date_from:
                     cur.execute(
@@ -5219,19 +5407,21 @@ def admin_job_push_daily_usage(
 @router.get("/admin/stats/operations-snapshot")
 def admin_stats_operations_snapshot(
     window_days: int = Query(7, ge=1, le=30),
+    refresh: bool = Query(False, description="Ignorer le cache (sections recalculées)"),
     _: None = Depends(_verify_admin),
 ):
     """Snapshot unique pour /admin/operations : billing, suspensions, cost today/7d, errors. 1 seul fetch côté front."""
-    return _get_operations_snapshot(window_days)
+    return _get_operations_snapshot(window_days, refresh=refresh)
 
 
 @router.get("/admin/stats/quality-snapshot")
 def admin_stats_quality_snapshot(
     window_days: int = Query(7, ge=1, le=90),
+    refresh: bool = Query(False, description="Ignorer le cache (sections recalculées)"),
     _: None = Depends(_verify_admin),
 ):
     """Snapshot Quality : KPIs (appels, abandons, transferts, anti_loop, RDV, taux abandon) + top 10 par problème. Drill-down vers /admin/calls?result=."""
-    return _get_quality_snapshot(window_days)
+    return _get_quality_snapshot(window_days, refresh=refresh)
 
 
 @router.get("/admin/stats/timeseries")
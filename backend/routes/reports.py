@@ -50,7 +50,9 @@ def _run_daily_report_one_tenant(tenant_id: Optional[int], today: str, admin_ema
             tid = tenant_id if tenant_id is not None and tenant_id > 0 else 1
             data = get_daily_report_data(tid, today)
             business_name = get_tenant_display_config(tid)["business_name"]
-            ok, err = send_daily_report_email(admin_email, business_name, today, data)
+            ok, err = send_daily_report_email(
+                admin_email, business_name, today, data, idempotency_key=f"daily_report:{tid}:admin:{today}",
+            )
             if ok:
                 notified = 1
                 logger.info("report_sent admin only (no clients)", extra={"date": today})
@@ -76,7 +78,10 @@ def _run_daily_report_one_tenant(tenant_id: Optional[int], today: str, admin_ema
     for client_id, client_name, _ in clients:
         try:
             data = get_daily_report_data(client_id, today)
-            ok, err = send_daily_report_email(admin_email, client_name or f"Client {client_id}", today, data)
+            ok, err = send_daily_report_email(
+                admin_email, client_name or f"Client {client_id}", today, data,
+                idempotency_key=f"daily_report:{tenant_id}:{client_id}:{today}",
+            )
             if ok:
                 notified += 1
             else:
@@ -38,6 +38,7 @@ from backend.db import (
 )
 from backend.google_calendar import GoogleCalendarNotFoundError, GoogleCalendarPermissionError, GoogleCalendarService
 from backend.handoffs import get_handoff_by_id, list_handoffs, update_handoff_status
+from backend.pg_pool import pg_connection
 from backend.routes.admin import (
     _get_call_detail,
     _get_calls_list,
@@ -60,6 +61,7 @@ from backend.tenant_config import (
     set_params,
 )
 from backend.tenants_pg import pg_delete_tenant_param_keys, pg_update_tenant_name, pg_update_tenant_params
+from backend.tools_faq import rebuild_tenant_faq_index
 from backend.vapi_utils import update_vapi_assistant_faq
 
 try:
@@ -319,12 +321,11 @@ def _get_tenant_me_detail(tenant_id: int) -> Optional[dict]:
     """Charge seulement les données nécessaires à /api/tenant/me."""
     if config.USE_PG_TENANTS:
         try:
-            from backend.tenants_pg import _pg_url, pg_tenants_connection, set_tenant_id_on_connection
+            from backend.tenants_pg import _pg_url, pg_tenants_connection
 
             url = _pg_url()
             if url:
-                with pg_tenants_connection() as conn:
-                    set_tenant_id_on_connection(conn, tenant_id)
+                with pg_tenants_connection(tenant_id) as conn:
                     with conn.cursor() as cur:
                         cur.execute(
                             """
@@ -678,10 +679,7 @@ def _get_local_appointment_by_id(tenant_id: int, appointment_id: int) -> Optiona
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -793,10 +791,7 @@ def _load_local_appointments_for_window(
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -884,13 +879,10 @@ def _find_local_appointment_for_google_event(
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
     if url:
         try:
-            import psycopg
-            from psycopg.rows import dict_row
-
             start_utc = start_local.astimezone(timezone.utc)
             window_start = start_utc - timedelta(minutes=1)
             window_end = start_utc + timedelta(minutes=1)
-            with psycopg.connect(url, row_factory=dict_row) as conn:
+            with pg_connection(url) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -976,9 +968,9 @@ def _get_slot_window(
     url = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
     if url:
         try:
-            import psycopg
+            from psycopg.rows import tuple_row
 
-            with psycopg.connect(url) as conn:
+            with pg_connection(url, row_factory=tuple_row) as conn:
                 with conn.cursor() as cur:
                     cur.execute(
                         """
@@ -1380,7 +1372,6 @@ def tenant_calls(
     _pg_url = os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
     if _pg_url:
         try:
-            from backend.pg_pool import pg_connection
             _cids = list(dict.fromkeys(c for c in call_ids_for_followup if c))
             _phones = list(dict.fromkeys(normalize_phone_number(p) for p in phones_for_patients if p))
             _phones = [p for p in _phones if p]
@@ -1811,9 +1802,7 @@ def tenant_agenda(
         url = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
         if url:
             try:
-                import psycopg
-                from psycopg.rows import dict_row
-                with psycopg.connect(url, row_factory=dict_row) as conn:
+                with pg_connection(url) as conn:
                     with conn.cursor() as cur:
                         cur.execute(
                             """
@@ -2025,10 +2014,7 @@ def tenant_agenda_bulk(
         url = os.environ.get("DATABASE_URL") or os.environ.get("PG_SLOTS_URL")
         if url:
             try:
-                import psycopg
-                from psycopg.rows import dict_row
-
-                with psycopg.connect(url, row_factory=dict_row) as conn:
+                with pg_connection(url) as conn:
                     with conn.cursor() as cur:
                         cur.execute(
                             """
@@ -2527,6 +2513,7 @@ async def tenant_put_faq(
         raise HTTPException(status_code=400, detail="FAQ invalide.")
     if not _save_tenant_faq_payload(tenant_id, faq_payload):
         raise HTTPException(status_code=500, detail="Impossible d'enregistrer la FAQ.")
+    rebuild_tenant_faq_index(tenant_id)
     await _sync_tenant_faq_to_vapi(tenant_id)
     return {"ok": True, "faq": faq_payload}
 
@@ -2536,6 +2523,7 @@ async def tenant_reset_faq(auth: dict = Depends(require_tenant_auth)):
     tenant_id = auth["tenant_id"]
     if not _reset_tenant_faq_payload(tenant_id):
         raise HTTPException(status_code=500, detail="Impossible de réinitialiser la FAQ.")
+    rebuild_tenant_faq_index(tenant_id)
     await _sync_tenant_faq_to_vapi(tenant_id)
     return {"ok": True, "faq": get_faq(tenant_id)}
 
@@ -12,9 +12,10 @@ import json
 import re
 import time
 import uuid
-import threading
 from typing import Optional, TYPE_CHECKING
 
+from backend import engine_executor, slot_prefetch, turn_trace
+import contextvars
 from backend.engine import ENGINE
 from backend import prompts, config
 from backend.tenant_config import get_tenant_display_config
@@ -25,6 +26,7 @@ from backend.reports import get_report_generator
 from backend.validation import validate_response as validate_response_tts
 from backend.vapi_live_transfer import maybe_start_live_transfer, maybe_start_terminal_booking_end, extract_control_url
 from backend.vapi_control_cache import set_control_url, get_control_url
+from backend.shared_cache import get_cache
 from backend.stt_utils import normalize_transcript, is_filler_only
 from backend.stt_common import (
     classify_text_only,
@@ -37,31 +39,20 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Déduplication des tool-call results (évite répétitions audio si Vapi renvoie le même toolCallId).
-_TOOL_RESULT_CACHE = {}
-_TOOL_RESULT_CACHE_LOCK = threading.Lock()
 _TOOL_RESULT_CACHE_TTL_S = 120
+_TOOL_RESULT_CACHE = get_cache("tool_result", ttl_seconds=_TOOL_RESULT_CACHE_TTL_S, max_entries=5000)
 
 
 def _tool_result_cache_get(tool_call_id: str):
     if not tool_call_id:
         return None
-    now = time.time()
-    with _TOOL_RESULT_CACHE_LOCK:
-        # purge opportuniste
-        expired = [k for k, v in _TOOL_RESULT_CACHE.items() if now - v.get("ts", 0) > _TOOL_RESULT_CACHE_TTL_S]
-        for k in expired:
-            _TOOL_RESULT_CACHE.pop(k, None)
-        entry = _TOOL_RESULT_CACHE.get(tool_call_id)
-        if not entry:
-            return None
-        return entry.get("value")
+    return _TOOL_RESULT_CACHE.get(tool_call_id)
 
 
 def _tool_result_cache_set(tool_call_id: str, value: str):
     if not tool_call_id:
         return
-    with _TOOL_RESULT_CACHE_LOCK:
-        _TOOL_RESULT_CACHE[tool_call_id] = {"value": value, "ts": time.time()}
+    _TOOL_RESULT_CACHE.set(tool_call_id, value)
 
 
 def _schedule_terminal_booking_end(payload: dict, session, *, delay_s: float = 0.0) -> dict:
@@ -180,6 +171,7 @@ def _record_terminal_side_effects(session, call_id: str, customer_phone: Optiona
             tenant_id=getattr(session, "tenant_id", None),
         )
 
+@turn_trace.traced("session_load")
 def _get_or_resume_voice_session(tenant_id: int, call_id: str):
     """
     Phase 2: PG-first read pour reprise après restart/multi-instance.
@@ -188,7 +180,9 @@ def _get_or_resume_voice_session(tenant_id: int, call_id: str):
     session = ENGINE.session_store.get(call_id)
     if session is None and config.USE_PG_CALL_JOURNAL:
         try:
+            from backend import call_journal
             from backend.session_pg import load_session_pg_first
+            call_journal.flush()  # checkpoints encore en file (même process) → visibles en PG
             result = load_session_pg_first(tenant_id, call_id)
             if result:
                 s_pg, ck_seq, last_seq = result
@@ -444,31 +438,32 @@ def _pg_lock_ok() -> bool:
         return False
 
 
+@turn_trace.traced("journal_write")
 def _call_journal_ensure(tenant_id: int, call_id: str, initial_state: str = "START") -> None:
-    """Phase 1 dual-write: assure call_sessions existe. Si PG down: log WARN, continue."""
+    """Journal write-behind: assure call_sessions existe (écrit par le worker call_journal)."""
     if not getattr(config, "USE_PG_CALL_JOURNAL", True):
         return
     try:
-        from backend.session_pg import pg_ensure_call_session
-        ok = pg_ensure_call_session(tenant_id, call_id, initial_state)
-        if not ok:
-            logger.debug("[CALL_JOURNAL] pg_ensure_call_session skipped (no PG)")
+        from backend import call_journal
+        call_journal.ensure_call_session(tenant_id, call_id, initial_state)
     except Exception as e:
         logger.warning("[CALL_JOURNAL_WARN] pg_down reason=ensure %s", e)
 
 
+@turn_trace.traced("journal_write")
 def _call_journal_user_message(tenant_id: int, call_id: str, text: str) -> None:
-    """Phase 1 dual-write: log message user. Si PG down: log WARN, continue."""
+    """Journal write-behind: message user mis en file (aucun aller-retour PG dans le tour)."""
     if not getattr(config, "USE_PG_CALL_JOURNAL", True):
         return
     try:
-        from backend.session_pg import pg_ensure_call_session, pg_add_message
-        pg_ensure_call_session(tenant_id, call_id)
-        pg_add_message(tenant_id, call_id, "user", text or "")
+        from backend import call_journal
+        call_journal.ensure_call_session(tenant_id, call_id)
+        call_journal.add_message(tenant_id, call_id, "user", text or "")
     except Exception as e:
         logger.warning("[CALL_JOURNAL_WARN] pg_down reason=user_msg %s", e)
 
 
+@turn_trace.traced("journal_write")
 def _call_journal_agent_response(
     tenant_id: int,
     call_id: str,
@@ -478,25 +473,23 @@ def _call_journal_agent_response(
     should_checkpoint: bool,
 ) -> None:
     """
-    Phase 1 dual-write: log message agent, update state, optionnel checkpoint.
+    Journal write-behind: message agent, last_state, optionnel checkpoint.
     should_checkpoint: True si state changé OU pending_slots critique OU toutes les N écritures.
+    Changement d'état → flush synchrone avant la réponse HTTP (reprise load_session_pg_first garantie).
     """
     if not getattr(config, "USE_PG_CALL_JOURNAL", True):
         return
     try:
-        from backend.session_pg import (
-            pg_ensure_call_session,
-            pg_add_message,
-            pg_update_last_state,
-            pg_write_checkpoint,
-        )
-        from backend.session_codec import session_to_dict
-        pg_ensure_call_session(tenant_id, call_id)
-        seq = pg_add_message(tenant_id, call_id, "agent", response_text or "")
-        pg_update_last_state(tenant_id, call_id, getattr(session, "state", "START"))
-        if should_checkpoint and seq is not None:
-            state_json = session_to_dict(session)
-            pg_write_checkpoint(tenant_id, call_id, seq, state_json)
+        from backend import call_journal
+        from backend.session_codec import pack_session
+        state_after = getattr(session, "state", "START")
+        call_journal.ensure_call_session(tenant_id, call_id)
+        call_journal.add_message(tenant_id, call_id, "agent", response_text or "")
+        call_journal.update_last_state(tenant_id, call_id, state_after)
+        if should_checkpoint:
+            call_journal.write_checkpoint(tenant_id, call_id, pack_session(session))
+            if state_after != state_before:
+                call_journal.flush()
     except Exception as e:
         logger.warning("[CALL_JOURNAL_WARN] pg_down reason=agent_response %s", e)
 
@@ -606,6 +599,7 @@ def _parse_stream_flag(payload: dict) -> bool:
     return False
 
 
+@turn_trace.traced("response_build")
 def _make_chat_response(call_id: str, text: str, is_streaming: bool):
     """
     Point de sortie unique pour /chat/completions : SSE si stream demandé, sinon JSON.
@@ -730,9 +724,11 @@ def _compute_voice_response_sync(
     Garantie : AUCUN appel LLM, AUCUN tool, AUCUN journal/DB coûteux — coût zéro.
     """
     from backend import tools_booking
-    from backend.billing_pg import get_tenant_suspension, get_quota_snapshot_month, set_tenant_suspended
+    from backend.billing_cache import get_tenant_suspension, get_quota_snapshot_month
+    from backend.billing_pg import set_tenant_suspended
     from backend import prompts
     # Check suspension en tout premier : avant session, intent, engine, tools.
+    # billing_cache : lecture dict (TTL + compteur minutes incrémental), pas d'aller-retour PG par tour.
     is_suspended, _, suspension_mode = get_tenant_suspension(resolved_tenant_id)
     if is_suspended:
         msg = (
@@ -1167,6 +1163,14 @@ def _schedule_transcript_persist(payload: dict, message: dict) -> None:
     asyncio.create_task(_persist_transcript_bg())
 
 
+def _start_slot_prefetch(payload: dict) -> None:
+    """Début d'appel : précharge les créneaux probables du tenant en arrière-plan (jamais bloquant)."""
+    try:
+        slot_prefetch.prefetch_for_vapi_payload(payload)
+    except Exception as e:
+        logger.debug("SLOT_PREFETCH_START_FAILED %s", str(e)[:120])
+
+
 async def _vapi_webhook_inner(request: Request, payload: dict):
     """Corps du webhook Vapi — séparé pour garantir un try/except global."""
     message = payload.get("message") or {}
@@ -1178,6 +1182,7 @@ async def _vapi_webhook_inner(request: Request, payload: dict):
 
     # assistant-request : répondre immédiatement avec assistantId ou assistant (évite 5.8s + PG puis {} → Vapi fallback anglais)
     if msg_type == "assistant-request":
+        _start_slot_prefetch(payload)
         return _vapi_assistant_request_response()
 
     # end-of-call-report : ingérer conso Vapi (durée, coût) dans vapi_call_usage (source de vérité billing)
@@ -1240,6 +1245,7 @@ async def _vapi_webhook_inner(request: Request, payload: dict):
         # Fast-path prod: ne pas saturer le threadpool/DB sur les statuts intermédiaires.
         # On garde la persistance pour les statuts finaux/structurants uniquement.
         if _status in {"ringing", "in-progress"}:
+            _start_slot_prefetch(payload)
             logger.info("[VAPI_STATUS_UPDATE_FAST_ACK] status=%s (skip persist)", _status)
             return JSONResponse({"ok": True}, status_code=200)
 
@@ -1658,6 +1664,32 @@ def _tool_extract_tool_call_id(payload: dict) -> Optional[str]:
     return payload.get("toolCallId")
 
 
+def _faq_hypotheses(payload: dict, user_message: str, max_hypotheses: int = 3) -> list:
+    """
+    Formulations candidates pour le matching FAQ : user_message du tool (reformulé par le LLM),
+    sa version sans fillers, et la dernière transcription utilisateur brute (message.artifact.messages).
+    Dédupliquées (casse / espaces), user_message en premier.
+    """
+    candidates = [user_message, normalize_transcript(user_message)]
+    message = (payload or {}).get("message") or {}
+    artifact = message.get("artifact") if isinstance(message, dict) else None
+    history = (artifact or {}).get("messages") if isinstance(artifact, dict) else None
+    if isinstance(history, list):
+        last_user = next(
+            (m for m in reversed(history) if isinstance(m, dict) and m.get("role") == "user"),
+            None,
+        )
+        if last_user:
+            candidates.append(str(last_user.get("message") or last_user.get("content") or ""))
+    out, seen = [], set()
+    for text in candidates:
+        key = " ".join((text or "").lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            out.append(text.strip())
+    return out[:max_hypotheses]
+
+
 def _tool_extract_parameters(payload: dict) -> dict:
     """
     Extrait les paramètres du tool-call depuis le payload Vapi.
@@ -1736,6 +1768,7 @@ async def vapi_tool(request: Request):
     """
     import time as _time
     _t0 = _time.monotonic()
+    _trace_token = turn_trace.begin(kind="tool", channel="vocal")
 
     try:
         payload = await request.json()
@@ -1759,6 +1792,7 @@ async def vapi_tool(request: Request):
 
         call_id = _tool_extract_call_id(payload)
         tool_call_id = _tool_extract_tool_call_id(payload)
+        turn_trace.tag(call_id=call_id)
 
         logger.info(
             "TOOL_CALL",
@@ -1800,28 +1834,27 @@ async def vapi_tool(request: Request):
 
         # ── FAQ FAST-PATH : toute l'opération (résolution tenant + FAQ) en <4s ──
         if action == "faq" and user_message:
+            faq_hypotheses = _faq_hypotheses(payload, user_message)
+
             def _faq_fast_work():
                 """Résolution tenant + FAQ search dans un thread avec timeout global."""
                 from backend.tools_faq import tenant_faq_store
                 from backend.tenant_routing import resolve_tenant_id_from_vapi_payload as _resolve
                 tid, _ = _resolve(payload, "vocal")
                 store = tenant_faq_store(tid)
-                return tid, store.search(user_message)
+                return tid, store.search_best(faq_hypotheses)
 
             resolved_tid_fast = None
             faq_result = None
             try:
-                import concurrent.futures
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                    fut = ex.submit(_faq_fast_work)
-                    resolved_tid_fast, faq_result = fut.result(timeout=4.0)
+                resolved_tid_fast, faq_result = await engine_executor.run(None, _faq_fast_work, timeout=4.0)
             except Exception as e:
                 logger.warning("[VAPI_TOOL_FAQ_FAST_TIMEOUT] %s", type(e).__name__)
 
             if faq_result is None or not faq_result.match:
-                from backend.tools_faq import default_faq_store
-                fallback_store = default_faq_store()
-                fallback_result = fallback_store.search(user_message)
+                from backend.tools_faq import default_faq_index
+                fallback_store = default_faq_index()
+                fallback_result = fallback_store.search_best(faq_hypotheses)
                 if fallback_result.match:
                     faq_result = fallback_result
                     logger.info("[VAPI_TOOL_FAQ_FAST_FALLBACK] tenant FAQ miss, default matched faq_id=%s", fallback_result.faq_id)
@@ -1849,7 +1882,6 @@ async def vapi_tool(request: Request):
             current_tenant_id,
         )
         from backend import vapi_tool_handlers as th
-        import concurrent.futures
 
         _TOOL_HARD_CAP_S = 12.0
         _FALLBACK_MSG = th.AGENDA_UNAVAILABLE_MSG
@@ -1924,7 +1956,7 @@ async def vapi_tool(request: Request):
             try:
                 loop = asyncio.get_event_loop()
                 resolved_tenant_id, session, slots_list, source, err, err_reason = await asyncio.wait_for(
-                    loop.run_in_executor(None, _get_slots_all_in_one),
+                    loop.run_in_executor(None, contextvars.copy_context().run, _get_slots_all_in_one),
                     timeout=_TOOL_HARD_CAP_S,
                 )
             except asyncio.TimeoutError:
@@ -1960,6 +1992,7 @@ async def vapi_tool(request: Request):
 
             request.state.tenant_id = resolved_tenant_id
             current_tenant_id.set(str(resolved_tenant_id))
+            turn_trace.tag(tenant_id=resolved_tenant_id)
 
             slots = slots_list or []
             result_payload = th.build_get_slots_tool_result(
@@ -1986,6 +2019,7 @@ async def vapi_tool(request: Request):
         resolved_tenant_id, _ = resolve_tenant_id_from_vapi_payload(payload, channel="vocal")
         request.state.tenant_id = resolved_tenant_id
         current_tenant_id.set(str(resolved_tenant_id))
+        turn_trace.tag(tenant_id=resolved_tenant_id)
 
         def _get_session():
             return _get_or_resume_voice_session(resolved_tenant_id, call_id)
@@ -2197,6 +2231,8 @@ async def vapi_tool(request: Request):
                 status_code=200,
             )
         return JSONResponse({"result": err_msg}, status_code=200)
+    finally:
+        turn_trace.end(_trace_token)
 
 
 @router.get("/_health")
@@ -2217,6 +2253,7 @@ async def vapi_custom_llm(request: Request):
     - Stats pour rapports quotidiens
     """
     t_start = time.time()
+    _trace_token = turn_trace.begin(channel="vocal")
     try:
         payload = await request.json()
         headers = request.headers
@@ -2232,6 +2269,7 @@ async def vapi_custom_llm(request: Request):
         if not call_id:
             call_id = f"chat-{payload.get('id', 'unknown')}"
 
+        turn_trace.tag(call_id=call_id)
         _req_id = str(uuid.uuid4())[:8]
         _source = "body.call.id" if (payload.get("call") and payload["call"].get("id")) else ("header" if headers.get("x-vapi-call-id") else "conversation_id_or_fallback")
         logger.info("session_key_debug", extra={"call_id": call_id, "source": _source})
@@ -2280,12 +2318,17 @@ async def vapi_custom_llm(request: Request):
         # 🎯 DID → tenant_id (avant tout event, pour scoping correct)
         to_number = extract_to_number_from_vapi_payload(payload)
         resolved_tenant_id, route_source = resolve_tenant_id_from_vocal_call(to_number, channel="vocal")
+        turn_trace.tag(tenant_id=resolved_tenant_id)
         logger.info(
             "[TENANT_ROUTE] to=%s tenant_id=%s source=%s",
             to_number or "(none)",
             resolved_tenant_id,
             route_source,
         )
+        try:
+            slot_prefetch.prefetch_for_call(resolved_tenant_id, call_id, customer_phone)
+        except Exception as prefetch_err:
+            logger.debug("SLOT_PREFETCH_START_FAILED %s", str(prefetch_err)[:120])
         if call_id and customer_phone:
             try:
                 from backend.vapi_calls_pg import upsert_vapi_call
@@ -2373,7 +2416,8 @@ async def vapi_custom_llm(request: Request):
                 )
                 print(f"⏱️ First SSE content token: {latency_first_token_ms:.0f}ms (target <3000ms)")
                 try:
-                    response_text, cancel_lookup_streaming = await asyncio.to_thread(
+                    response_text, cancel_lookup_streaming = await engine_executor.run(
+                        call_id,
                         _compute_voice_response_sync,
                         resolved_tenant_id,
                         call_id,
@@ -2394,7 +2438,7 @@ async def vapi_custom_llm(request: Request):
                     for i, word in enumerate(holding.split()):
                         content = f" {word}" if i > 0 else word
                         yield f"data: {json.dumps({'id': f'chatcmpl-{call_id}', 'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {'content': content}, 'finish_reason': None}]})}\n\n"
-                    events = await asyncio.to_thread(_get_engine(call_id).handle_message, call_id, user_message)
+                    events = await engine_executor.run(call_id, _get_engine(call_id).handle_message, call_id, user_message)
                     session_after = ENGINE.session_store.get(call_id)
                     response_text = events[0].text if events else "Je n'ai pas compris"
                 # Validation avant TTS (pare-feu) : si échec → fallback technical_transfer
@@ -2428,8 +2472,10 @@ async def vapi_custom_llm(request: Request):
 
             total_ms = (time.time() - t_start) * 1000
             print(f"✅ STREAMING START (first token < 3s) latency: {total_ms:.0f}ms")
+            # Le tour se termine avec le flux (engine, journal, TTS), pas au return du handler
+            _stream_trace, _trace_token = turn_trace.detach(_trace_token), None
             return StreamingResponse(
-                _stream_with_early_token(),
+                turn_trace.traced_stream(_stream_trace, _stream_with_early_token()),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
@@ -2438,281 +2484,295 @@ async def vapi_custom_llm(request: Request):
                 },
             )
         else:
-            # Traiter via ENGINE (non-streaming)
-            overlap_handled = False
-            response_text = ""
-            action_taken = ""
-
-            # Suspension : même règle qu'en streaming — avant toute logique agent/tools (zéro LLM).
-            from backend.billing_pg import get_tenant_suspension as _get_suspension
-            _suspend, _, _mode = _get_suspension(resolved_tenant_id)
-            if _suspend:
-                response_text = (
-                    getattr(prompts, "MSG_VOCAL_SUSPENDED_SOFT", None)
-                    if (_mode or "hard").strip().lower() == "soft"
-                    else getattr(prompts, "MSG_VOCAL_SUSPENDED", prompts.MSG_VOCAL_SUSPENDED)
-                ) or prompts.MSG_VOCAL_SUSPENDED
-                overlap_handled = True
-
-            if not overlap_handled:
-                # Phase 2: PG-first read — pas de lock sur /chat/completions.
-                # Vapi envoie les tours de façon séquentielle (attend la réponse avant le tour suivant).
-                # Un lock bloquait le 2e tour (LockTimeout → greeting au lieu de la vraie réponse).
-                _call_journal_ensure(resolved_tenant_id, call_id)
-                session = _get_or_resume_voice_session(resolved_tenant_id, call_id)
-                state_before_turn = getattr(session, "state", "START")
-
-                session.channel = "vocal"
-                session.tenant_id = resolved_tenant_id
-
-                # Garde-fou Phase 2: session déjà terminée (CONFIRMED/TRANSFERRED) → ne pas rouvrir
-                if session.state in ("TRANSFERRED", "CONFIRMED"):
-                    response_text = prompts.VOCAL_RESUME_ALREADY_TERMINATED
-                    action_taken = "resume_terminal_guard"
+            # Traiter via ENGINE (non-streaming) — tour exécuté dans l'engine executor (hors event loop,
+            # un seul tour en vol par call_id).
+            def _non_streaming_turn():
+                cancel_lookup_streaming = False
+                overlap_handled = False
+                response_text = ""
+                action_taken = ""
+
+                # Suspension : même règle qu'en streaming — avant toute logique agent/tools (zéro LLM).
+                from backend.billing_cache import get_tenant_suspension as _get_suspension
+                _suspend, _, _mode = _get_suspension(resolved_tenant_id)
+                if _suspend:
+                    response_text = (
+                        getattr(prompts, "MSG_VOCAL_SUSPENDED_SOFT", None)
+                        if (_mode or "hard").strip().lower() == "soft"
+                        else getattr(prompts, "MSG_VOCAL_SUSPENDED", prompts.MSG_VOCAL_SUSPENDED)
+                    ) or prompts.MSG_VOCAL_SUSPENDED
                     overlap_handled = True
 
-                # P0 Option B: dual-write journal PG (Phase 1)
-                _call_journal_ensure(resolved_tenant_id, call_id, state_before_turn)
-                _call_journal_user_message(resolved_tenant_id, call_id, user_message or "")
+                if not overlap_handled:
+                    # Phase 2: PG-first read — pas de lock sur /chat/completions.
+                    # Vapi envoie les tours de façon séquentielle (attend la réponse avant le tour suivant).
+                    # Un lock bloquait le 2e tour (LockTimeout → greeting au lieu de la vraie réponse).
+                    _call_journal_ensure(resolved_tenant_id, call_id)
+                    session = _get_or_resume_voice_session(resolved_tenant_id, call_id)
+                    state_before_turn = getattr(session, "state", "START")
 
-                # 🧠 Stocker le téléphone dans la session pour plus tard
-                if customer_phone:
-                    session.customer_phone = customer_phone
+                    session.channel = "vocal"
+                    session.tenant_id = resolved_tenant_id
 
-                # 🔄 RECONSTRUCTION DE L'ÉTAT depuis l'historique des messages
-                # NOTE: Avec SQLite, cette reconstruction ne devrait plus être nécessaire
-                # On la garde en fallback si SQLite échoue
-                # Guard: si on VA reconstruire ET qu'on a déjà reconstruit 1 fois → transfert (évite boucle)
-                needs_reconstruct = session.state == "START" and len(messages) > 1 and not session.qualif_data.name
-                reconstruct_count = getattr(session, "reconstruct_count", 0)
-                last_user_content = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
-                if needs_reconstruct and reconstruct_count >= 1:
-                    # Ne pas transférer si le message utilisateur ressemble à une demande de RDV
-                    if _looks_like_booking_request(last_user_content or user_message or ""):
-                        logger.info("[SESSION_RECONSTRUCT] conv_id=%s booking-like message -> skip transfer, pass to engine", call_id)
+                    # Garde-fou Phase 2: session déjà terminée (CONFIRMED/TRANSFERRED) → ne pas rouvrir
+                    if session.state in ("TRANSFERRED", "CONFIRMED"):
+                        response_text = prompts.VOCAL_RESUME_ALREADY_TERMINATED
+                        action_taken = "resume_terminal_guard"
+                        overlap_handled = True
+
+                    # P0 Option B: dual-write journal PG (Phase 1)
+                    _call_journal_ensure(resolved_tenant_id, call_id, state_before_turn)
+                    _call_journal_user_message(resolved_tenant_id, call_id, user_message or "")
+
+                    # 🧠 Stocker le téléphone dans la session pour plus tard
+                    if customer_phone:
+                        session.customer_phone = customer_phone
+
+                    # 🔄 RECONSTRUCTION DE L'ÉTAT depuis l'historique des messages
+                    # NOTE: Avec SQLite, cette reconstruction ne devrait plus être nécessaire
+                    # On la garde en fallback si SQLite échoue
+                    # Guard: si on VA reconstruire ET qu'on a déjà reconstruit 1 fois → transfert (évite boucle)
+                    needs_reconstruct = session.state == "START" and len(messages) > 1 and not session.qualif_data.name
+                    reconstruct_count = getattr(session, "reconstruct_count", 0)
+                    last_user_content = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+                    if needs_reconstruct and reconstruct_count >= 1:
+                        # Ne pas transférer si le message utilisateur ressemble à une demande de RDV
+                        if _looks_like_booking_request(last_user_content or user_message or ""):
+                            logger.info("[SESSION_RECONSTRUCT] conv_id=%s booking-like message -> skip transfer, pass to engine", call_id)
+                        else:
+                            logger.warning("[SESSION_RECONSTRUCT] conv_id=%s reconstruct_count=%s -> transfer", call_id, reconstruct_count)
+                            session.state = "TRANSFERRED"
+                            response_text = prompts.VOCAL_TRANSFER_COMPLEX
+                            session.add_message("agent", response_text)
+                            action_taken = "reconstruct_loop_guard"
+                            overlap_handled = True  # skip engine processing
+                    elif needs_reconstruct:
+                        logger.debug("session in START with history but no data -> reconstruction")
+                        session = _reconstruct_session_from_history(session, messages, call_id=call_id)
+                        session.reconstruct_count = 1
                     else:
-                        logger.warning("[SESSION_RECONSTRUCT] conv_id=%s reconstruct_count=%s -> transfer", call_id, reconstruct_count)
-                        session.state = "TRANSFERRED"
-                        response_text = prompts.VOCAL_TRANSFER_COMPLEX
-                        session.add_message("agent", response_text)
-                        action_taken = "reconstruct_loop_guard"
-                        overlap_handled = True  # skip engine processing
-                elif needs_reconstruct:
-                    logger.debug("session in START with history but no data -> reconstruction")
-                    session = _reconstruct_session_from_history(session, messages, call_id=call_id)
-                    session.reconstruct_count = 1
-                else:
-                    logger.debug("session loaded OK: state=%s name=%s", session.state, session.qualif_data.name)
+                        logger.debug("session loaded OK: state=%s name=%s", session.state, session.qualif_data.name)
 
-                t3 = log_timer("Session loaded", t2)
+                    t3 = log_timer("Session loaded", t2)
 
-                # 🧠 Check si client récurrent (avant le premier message traité)
-                if customer_phone:
-                    try:
-                        existing_client = client_memory.get_by_phone(customer_phone, tenant_id=getattr(session, "tenant_id", None))
-                        if existing_client:
-                            session.client_id = existing_client.id  # pour ivr_events / rapport quotidien
-                            if existing_client.total_bookings > 0:
-                                greeting = client_memory.get_personalized_greeting(existing_client, channel="vocal")
-                                if greeting:
-                                    logger.debug("returning client detected: %s", existing_client.name)
-                    except Exception as e:
-                        logger.debug("client memory error: %s", e)
-
-                # Input firewall (text-only) : SILENCE / UNCLEAR / TEXT — avant tout traitement
-                kind, normalized = classify_text_only(user_message or "")
-                # Ne pas traiter "Je voudrais un rendez-vous" comme UNCLEAR → passer à l'engine (flow RDV)
-                if kind == "UNCLEAR" and _looks_like_booking_request(user_message or ""):
-                    kind, normalized = "TEXT", (normalized or normalize_transcript(user_message or ""))
-                unclear_count = getattr(session, "unclear_text_count", 0)
-                logger.info(
-                    "decision_in",
-                    extra={
-                        "call_id": call_id,
-                        "state_before": session.state,
-                        "kind": kind,
-                        "raw_len": len((user_message or "")),
-                        "normalized_len": len(normalized or ""),
-                        "unclear_count": unclear_count,
-                    },
-                )
-                logger.info(
-                    "decision_in_chat",
-                    extra={
-                        "call_id": call_id,
-                        "state_before": session.state,
-                        "turn_count": getattr(session, "turn_count", 0),
-                    },
-                )
-
-                # Semi-sourd : overlap guard (UNCLEAR/SILENCE pendant TTS = ignoré ; mots critiques passent)
-                # Ne pas réinitialiser si déjà géré (reconstruct_loop_guard, resume_terminal_guard)
-                if action_taken not in ("reconstruct_loop_guard", "resume_terminal_guard"):
-                    overlap_handled = False
-                    response_text = ""
-                    action_taken = ""
-                    if _is_agent_speaking(session):
-                        # Interruption pendant énonciation des créneaux (WAIT_CONFIRM) : "un", "1", "deux" = choix valide
-                        if session.state == "WAIT_CONFIRM" and is_critical_token(normalized):
-                            overlap_handled = False
-                        elif is_critical_overlap(user_message or ""):
-                            logger.info(
-                                "critical_overlap_allowed",
-                                extra={"call_id": call_id, "text_len": len((user_message or "")[:20])},
-                            )
-                        elif kind in ("UNCLEAR", "SILENCE"):
-                            response_text = prompts.MSG_VOCAL_CROSSTALK_ACK
-                            action_taken = "overlap_ignored"
-                            overlap_handled = True
-                            logger.info(
-                                "overlap_ignored",
-                                extra={"call_id": call_id, "classification": kind, "reason": "agent_speaking"},
-                            )
-                        elif kind == "TEXT" and len((user_message or "").strip()) < 10:
-                            response_text = getattr(
-                                prompts, "MSG_OVERLAP_REPEAT_SHORT", "Pardon, pouvez-vous répéter ?"
-                            )
-                            session.add_message("agent", response_text)
-                            action_taken = "overlap_repeat"
-                            overlap_handled = True
-                            logger.info(
-                                "overlap_repeat",
-                                extra={"call_id": call_id, "text_len": len((user_message or "").strip())},
-                            )
-
-                # En annulation : si on va chercher le RDV par nom, envoyer d'abord un message de tenue
-                # en stream pour éviter le "mmm" TTS pendant la latence (recherche Google Calendar).
-                cancel_lookup_streaming = (
-                    is_streaming
-                    and session.state == "CANCEL_NAME"
-                    and _looks_like_name_for_cancel(user_message)
-                )
-                if cancel_lookup_streaming:
-                    response_text = ""
-                else:
-                    if not overlap_handled:
+                    # 🧠 Check si client récurrent (avant le premier message traité)
+                    if customer_phone:
                         try:
-                            if kind == "SILENCE":
-                                events = _get_engine(call_id).handle_message(call_id, "")
-                                response_text = events[0].text if events else prompts.MSG_EMPTY_MESSAGE
-                                action_taken = "silence"
-                                _maybe_reset_noise_on_terminal(session, events or [])
-                            elif kind == "TEXT":
-                                events = _get_engine(call_id).handle_message(call_id, normalized)
-                                response_text = events[0].text if events else "Je n'ai pas compris"
-                                action_taken = "text"
-                                _maybe_reset_noise_on_terminal(session, events or [])
-                            else:  # UNCLEAR — overlap guard puis crosstalk : ne pas compter overlap comme échec
-                                now = time.time()
-                                last_reply_ts = getattr(session, "last_agent_reply_ts", 0) or 0
-                                overlap_window = getattr(config, "OVERLAP_WINDOW_SEC", 1.2)
-                                recent_agent = (now - last_reply_ts) < overlap_window
-                                if recent_agent:
-                                    response_text = getattr(
-                                        prompts, "MSG_OVERLAP_REPEAT", "Je vous ai entendu en même temps. Pouvez-vous répéter maintenant ?"
-                                    )
-                                    session.add_message("agent", response_text)
-                                    action_taken = "overlap_guard"
-                                else:
-                                    raw_len = len((user_message or ""))
-                                    last_ts = getattr(session, "last_assistant_ts", 0) or 0
-                                    within_crosstalk_window = (now - last_ts) < getattr(
-                                        config, "CROSSTALK_WINDOW_SEC", 5.0
-                                    )
-                                    max_crosstalk_len = getattr(config, "CROSSTALK_MAX_RAW_LEN", 40)
-                                    if within_crosstalk_window and raw_len <= max_crosstalk_len:
-                                        response_text = prompts.MSG_VOCAL_CROSSTALK_ACK
-                                        action_taken = "ignore_crosstalk"
-                                    else:
-                                        session.unclear_text_count = getattr(session, "unclear_text_count", 0) + 1
-                                        count = session.unclear_text_count
-                                        if count == 1:
-                                            response_text = prompts.MSG_UNCLEAR_1
-                                            session.add_message("agent", response_text)
-                                            action_taken = "unclear_1"
-                                        elif count == 2:
-                                            events = ENGINE._trigger_intent_router(
-                                                session, "unclear_text_2", user_message or ""
-                                            )
-                                            response_text = events[0].text if events else prompts.MSG_UNCLEAR_1
-                                            action_taken = "unclear_2_intent_router"
-                                        else:
-                                            state_before = getattr(session, "state", "START")
-                                            session.state = "TRANSFERRED"
-                                            response_text = (
-                                                prompts.VOCAL_TRANSFER_COMPLEX
-                                                if getattr(session, "channel", "") == "vocal"
-                                                else prompts.MSG_TRANSFER
-                                            )
-                                            session.add_message("agent", response_text)
-                                            action_taken = "unclear_3_transfer"
-                                            logger.info(
-                                                "DECISION_TRACE state_before=%s intent_detected=n/a guard_triggered=unclear_3_transfer state_after=TRANSFERRED text=%r",
-                                                state_before,
-                                                (user_message or "")[:200],
-                                                extra={
-                                                    "call_id": call_id[:24] if call_id else "",
-                                                    "state_before": state_before,
-                                                    "guard_triggered": "unclear_3_transfer",
-                                                    "state_after": "TRANSFERRED",
-                                                },
-                                            )
+                            existing_client = client_memory.get_by_phone(customer_phone, tenant_id=getattr(session, "tenant_id", None))
+                            if existing_client:
+                                session.client_id = existing_client.id  # pour ivr_events / rapport quotidien
+                                if existing_client.total_bookings > 0:
+                                    greeting = client_memory.get_personalized_greeting(existing_client, channel="vocal")
+                                    if greeting:
+                                        logger.debug("returning client detected: %s", existing_client.name)
                         except Exception as e:
-                            print(f"❌ ENGINE ERROR: {e}")
-                            import traceback
-                            traceback.print_exc()
-                            response_text = "Excusez-moi, j'ai un petit souci technique. Je vous transfère à un collègue."
-                    t4 = log_timer("ENGINE processed", t3)
-                    _log_decision_out(call_id, session, action_taken, response_text)
-                    if hasattr(ENGINE.session_store, "save"):
-                        ENGINE.session_store.save(session)
-                    # P0 Option B: dual-write — message agent + checkpoint
-                    state_after = getattr(session, "state", "START")
-                    # Checkpoint sur: changement état, pending_slots, awaiting_confirmation, états critiques
-                    should_cp = (
-                        state_before_turn != state_after
-                        or bool(getattr(session, "pending_slots", None))
-                        or getattr(session, "awaiting_confirmation", None) is not None
-                        or state_after in ("QUALIF_CONTACT", "WAIT_CONFIRM", "CONTACT_CONFIRM", "CONTACT_CONFIRM_CALLERID")
-                    )
-                    _call_journal_agent_response(
-                        resolved_tenant_id,
-                        call_id,
-                        session,
-                        response_text,
-                        state_before_turn,
-                        should_checkpoint=should_cp,
+                            logger.debug("client memory error: %s", e)
+
+                    # Input firewall (text-only) : SILENCE / UNCLEAR / TEXT — avant tout traitement
+                    kind, normalized = classify_text_only(user_message or "")
+                    # Ne pas traiter "Je voudrais un rendez-vous" comme UNCLEAR → passer à l'engine (flow RDV)
+                    if kind == "UNCLEAR" and _looks_like_booking_request(user_message or ""):
+                        kind, normalized = "TEXT", (normalized or normalize_transcript(user_message or ""))
+                    unclear_count = getattr(session, "unclear_text_count", 0)
+                    logger.info(
+                        "decision_in",
+                        extra={
+                            "call_id": call_id,
+                            "state_before": session.state,
+                            "kind": kind,
+                            "raw_len": len((user_message or "")),
+                            "normalized_len": len(normalized or ""),
+                            "unclear_count": unclear_count,
+                        },
                     )
                     logger.info(
-                        "decision_out_chat",
-                        extra={"call_id": call_id, "state_after": getattr(session, "state", "")},
+                        "decision_in_chat",
+                        extra={
+                            "call_id": call_id,
+                            "state_before": session.state,
+                            "turn_count": getattr(session, "turn_count", 0),
+                        },
+                    )
+
+                    # Semi-sourd : overlap guard (UNCLEAR/SILENCE pendant TTS = ignoré ; mots critiques passent)
+                    # Ne pas réinitialiser si déjà géré (reconstruct_loop_guard, resume_terminal_guard)
+                    if action_taken not in ("reconstruct_loop_guard", "resume_terminal_guard"):
+                        overlap_handled = False
+                        response_text = ""
+                        action_taken = ""
+                        if _is_agent_speaking(session):
+                            # Interruption pendant énonciation des créneaux (WAIT_CONFIRM) : "un", "1", "deux" = choix valide
+                            if session.state == "WAIT_CONFIRM" and is_critical_token(normalized):
+                                overlap_handled = False
+                            elif is_critical_overlap(user_message or ""):
+                                logger.info(
+                                    "critical_overlap_allowed",
+                                    extra={"call_id": call_id, "text_len": len((user_message or "")[:20])},
+                                )
+                            elif kind in ("UNCLEAR", "SILENCE"):
+                                response_text = prompts.MSG_VOCAL_CROSSTALK_ACK
+                                action_taken = "overlap_ignored"
+                                overlap_handled = True
+                                logger.info(
+                                    "overlap_ignored",
+                                    extra={"call_id": call_id, "classification": kind, "reason": "agent_speaking"},
+                                )
+                            elif kind == "TEXT" and len((user_message or "").strip()) < 10:
+                                response_text = getattr(
+                                    prompts, "MSG_OVERLAP_REPEAT_SHORT", "Pardon, pouvez-vous répéter ?"
+                                )
+                                session.add_message("agent", response_text)
+                                action_taken = "overlap_repeat"
+                                overlap_handled = True
+                                logger.info(
+                                    "overlap_repeat",
+                                    extra={"call_id": call_id, "text_len": len((user_message or "").strip())},
+                                )
+
+                    # En annulation : si on va chercher le RDV par nom, envoyer d'abord un message de tenue
+                    # en stream pour éviter le "mmm" TTS pendant la latence (recherche Google Calendar).
+                    cancel_lookup_streaming = (
+                        is_streaming
+                        and session.state == "CANCEL_NAME"
+                        and _looks_like_name_for_cancel(user_message)
                     )
-                if not cancel_lookup_streaming:
-                    print(f"✅ Response: '{response_text[:50]}...' ({len(response_text)} chars)")
-                    session.last_assistant_ts = time.time()
-                    session.last_agent_reply_ts = time.time()
-                    if response_text and response_text.strip():
-                        tts_duration = estimate_tts_duration(response_text)
-                        session.speaking_until_ts = time.time() + tts_duration
+                    if cancel_lookup_streaming:
+                        response_text = ""
+                    else:
+                        if not overlap_handled:
+                            try:
+                                if kind == "SILENCE":
+                                    events = _get_engine(call_id).handle_message(call_id, "")
+                                    response_text = events[0].text if events else prompts.MSG_EMPTY_MESSAGE
+                                    action_taken = "silence"
+                                    _maybe_reset_noise_on_terminal(session, events or [])
+                                elif kind == "TEXT":
+                                    events = _get_engine(call_id).handle_message(call_id, normalized)
+                                    response_text = events[0].text if events else "Je n'ai pas compris"
+                                    action_taken = "text"
+                                    _maybe_reset_noise_on_terminal(session, events or [])
+                                else:  # UNCLEAR — overlap guard puis crosstalk : ne pas compter overlap comme échec
+                                    now = time.time()
+                                    last_reply_ts = getattr(session, "last_agent_reply_ts", 0) or 0
+                                    overlap_window = getattr(config, "OVERLAP_WINDOW_SEC", 1.2)
+                                    recent_agent = (now - last_reply_ts) < overlap_window
+                                    if recent_agent:
+                                        response_text = getattr(
+                                            prompts, "MSG_OVERLAP_REPEAT", "Je vous ai entendu en même temps. Pouvez-vous répéter maintenant ?"
+                                        )
+                                        session.add_message("agent", response_text)
+                                        action_taken = "overlap_guard"
+                                    else:
+                                        raw_len = len((user_message or ""))
+                                        last_ts = getattr(session, "last_assistant_ts", 0) or 0
+                                        within_crosstalk_window = (now - last_ts) < getattr(
+                                            config, "CROSSTALK_WINDOW_SEC", 5.0
+                                        )
+                                        max_crosstalk_len = getattr(config, "CROSSTALK_MAX_RAW_LEN", 40)
+                                        if within_crosstalk_window and raw_len <= max_crosstalk_len:
+                                            response_text = prompts.MSG_VOCAL_CROSSTALK_ACK
+                                            action_taken = "ignore_crosstalk"
+                                        else:
+                                            session.unclear_text_count = getattr(session, "unclear_text_count", 0) + 1
+                                            count = session.unclear_text_count
+                                            if count == 1:
+                                                response_text = prompts.MSG_UNCLEAR_1
+                                                session.add_message("agent", response_text)
+                                                action_taken = "unclear_1"
+                                            elif count == 2:
+                                                events = ENGINE._trigger_intent_router(
+                                                    session, "unclear_text_2", user_message or ""
+                                                )
+                                                response_text = events[0].text if events else prompts.MSG_UNCLEAR_1
+                                                action_taken = "unclear_2_intent_router"
+                                            else:
+                                                state_before = getattr(session, "state", "START")
+                                                session.state = "TRANSFERRED"
+                                                response_text = (
+                                                    prompts.VOCAL_TRANSFER_COMPLEX
+                                                    if getattr(session, "channel", "") == "vocal"
+                                                    else prompts.MSG_TRANSFER
+                                                )
+                                                session.add_message("agent", response_text)
+                                                action_taken = "unclear_3_transfer"
+                                                logger.info(
+                                                    "DECISION_TRACE state_before=%s intent_detected=n/a guard_triggered=unclear_3_transfer state_after=TRANSFERRED text=%r",
+                                                    state_before,
+                                                    (user_message or "")[:200],
+                                                    extra={
+                                                        "call_id": call_id[:24] if call_id else "",
+                                                        "state_before": state_before,
+                                                        "guard_triggered": "unclear_3_transfer",
+                                                        "state_after": "TRANSFERRED",
+                                                    },
+                                                )
+                            except Exception as e:
+                                print(f"❌ ENGINE ERROR: {e}")
+                                import traceback
+                                traceback.print_exc()
+                                response_text = "Excusez-moi, j'ai un petit souci technique. Je vous transfère à un collègue."
+                        t4 = log_timer("ENGINE processed", t3)
+                        _log_decision_out(call_id, session, action_taken, response_text)
+                        if hasattr(ENGINE.session_store, "save"):
+                            ENGINE.session_store.save(session)
+                        # P0 Option B: dual-write — message agent + checkpoint
+                        state_after = getattr(session, "state", "START")
+                        # Checkpoint sur: changement état, pending_slots, awaiting_confirmation, états critiques
+                        should_cp = (
+                            state_before_turn != state_after
+                            or bool(getattr(session, "pending_slots", None))
+                            or getattr(session, "awaiting_confirmation", None) is not None
+                            or state_after in ("QUALIF_CONTACT", "WAIT_CONFIRM", "CONTACT_CONFIRM", "CONTACT_CONFIRM_CALLERID")
+                        )
+                        _call_journal_agent_response(
+                            resolved_tenant_id,
+                            call_id,
+                            session,
+                            response_text,
+                            state_before_turn,
+                            should_checkpoint=should_cp,
+                        )
                         logger.info(
-                            "agent_speaking",
-                            extra={
-                                "call_id": call_id,
-                                "tts_duration": round(tts_duration, 2),
-                                "speaking_until_ts": session.speaking_until_ts,
-                            },
+                            "decision_out_chat",
+                            extra={"call_id": call_id, "state_after": getattr(session, "state", "")},
                         )
+                    if not cancel_lookup_streaming:
+                        print(f"✅ Response: '{response_text[:50]}...' ({len(response_text)} chars)")
+                        session.last_assistant_ts = time.time()
+                        session.last_agent_reply_ts = time.time()
+                        if response_text and response_text.strip():
+                            tts_duration = estimate_tts_duration(response_text)
+                            session.speaking_until_ts = time.time() + tts_duration
+                            logger.info(
+                                "agent_speaking",
+                                extra={
+                                    "call_id": call_id,
+                                    "tts_duration": round(tts_duration, 2),
+                                    "speaking_until_ts": session.speaking_until_ts,
+                                },
+                            )
 
-                # 📊 Enregistrer stats pour rapport (si conversation terminée) — pas en cancel_lookup_streaming (fait dans le stream)
-                if not cancel_lookup_streaming:
-                    try:
-                        if session.state in ["CONFIRMED", "TRANSFERRED"]:
-                            reporting = _resolve_terminal_reporting(session)
-                            _record_terminal_side_effects(session, call_id, customer_phone, t_start)
-                            if reporting:
-                                print(f"📊 Stats recorded: {reporting['intent']} → {reporting['outcome']}")
-                    except Exception as e:
-                        print(f"⚠️ Stats recording error: {e}")
+                    # 📊 Enregistrer stats pour rapport (si conversation terminée) — pas en cancel_lookup_streaming (fait dans le stream)
+                    if not cancel_lookup_streaming:
+                        try:
+                            if session.state in ["CONFIRMED", "TRANSFERRED"]:
+                                reporting = _resolve_terminal_reporting(session)
+                                _record_terminal_side_effects(session, call_id, customer_phone, t_start)
+                                if reporting:
+                                    print(f"📊 Stats recorded: {reporting['intent']} → {reporting['outcome']}")
+                        except Exception as e:
+                            print(f"⚠️ Stats recording error: {e}")
+                return response_text, cancel_lookup_streaming
+
+            try:
+                response_text, cancel_lookup_streaming = await engine_executor.run(call_id, _non_streaming_turn)
+            except engine_executor.EngineBusy:
+                logger.warning("[ENGINE_BUSY] call_id=%s stats=%s", call_id[:24] if call_id else "", engine_executor.stats())
+                response_text = getattr(
+                    prompts, "MSG_VOCAL_TECHNICAL_FALLBACK",
+                    "Excusez-moi, un problème est survenu. Je vous transfère à un collègue.",
+                ) or "Excusez-moi, un problème est survenu."
+                cancel_lookup_streaming = False
         
         # ⏱️ TIMING TOTAL
         total_ms = (time.time() - t_start) * 1000
@@ -2742,7 +2802,7 @@ async def vapi_custom_llm(request: Request):
                         }
                         yield f"data: {json.dumps(chunk)}\n\n"
                     # Recherche du RDV (bloquant → en thread)
-                    events = await asyncio.to_thread(_get_engine(call_id).handle_message, call_id, user_message)
+                    events = await engine_executor.run(call_id, _get_engine(call_id).handle_message, call_id, user_message)
                     session_after = ENGINE.session_store.get(call_id)
                     stream_response_text = events[0].text if events else "Je n'ai pas compris"
                     # Stats (même logique qu'en non-streaming)
@@ -2771,8 +2831,9 @@ async def vapi_custom_llm(request: Request):
                 yield f"data: {json.dumps(chunk_final)}\n\n"
                 yield "data: [DONE]\n\n"
             
+            _stream_trace, _trace_token = turn_trace.detach(_trace_token), None
             return StreamingResponse(
-                generate_stream(),
+                turn_trace.traced_stream(_stream_trace, generate_stream()),
                 media_type="text/event-stream",
                 headers={
                     "Cache-Control": "no-cache",
@@ -2801,6 +2862,8 @@ async def vapi_custom_llm(request: Request):
         )
         _err_msg = "Désolé, une erreur est survenue."
         return _make_chat_response(_err_cid, _err_msg, _err_stream)
+    finally:
+        turn_trace.end(_trace_token)
 
 
 @router.get("/health")
@@ -1,6 +1,10 @@
 """
 Envoi du rapport quotidien IVR par email (HTML).
 Supporte Postmark (API HTTPS) ou SMTP. Ne jamais logger tokens / mots de passe.
+Postmark : un client httpx keep-alive partagé par le process (pas de handshake TLS par email).
+Rapports, liens onboarding / paiement et reset mot de passe passent par l'outbox durable
+(backend/email_outbox.py) quand elle est active : la requête ne fait qu'un INSERT, le worker envoie
+(endpoint batch Postmark, retry/backoff). Sinon envoi direct comme avant.
 """
 
 from __future__ import annotations
@@ -8,14 +12,22 @@ from __future__ import annotations
 import logging
 import os
 import smtplib
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
 from urllib.parse import quote
 
 logger = logging.getLogger(__name__)
 
 POSTMARK_API_URL = "https://api.postmarkapp.com/email"
+POSTMARK_BATCH_URL = "https://api.postmarkapp.com/email/batch"
+POSTMARK_BATCH_MAX = 500  # limite Postmark par appel batch
+# ErrorCode Postmark définitifs (adresse invalide, destinataire inactif / bounce) : pas de retry
+POSTMARK_PERMANENT_ERRORS = {300, 406}
+
+_http: Any = None
+_http_lock = threading.Lock()
 
 CONTEXT_LABELS_FR = {
     "name": "Nom non compris",
@@ -135,14 +147,29 @@ def _build_html(client_name: str, date_str: str, data: Dict[str, Any]) -> str:
 """
 
 
-def _send_via_postmark(from_addr: str, to: str, subject: str, html: str, token: str) -> Tuple[bool, Optional[str]]:
-    """Envoi via API Postmark (HTTPS). Returns (success, error_message)."""
-    import httpx
-    headers = {
+def _http_client():
+    """Client httpx partagé (keep-alive, pool de connexions) ; thread-safe."""
+    global _http
+    with _http_lock:
+        if _http is None:
+            import httpx
+            _http = httpx.Client(
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0),
+            )
+        return _http
+
+
+def _postmark_headers(token: str) -> Dict[str, str]:
+    return {
         "Accept": "application/json",
         "Content-Type": "application/json",
         "X-Postmark-Server-Token": token,
     }
+
+
+def _send_via_postmark(from_addr: str, to: str, subject: str, html: str, token: str) -> Tuple[bool, Optional[str]]:
+    """Envoi via API Postmark (HTTPS). Returns (success, error_message)."""
     payload = {
         "From": from_addr,
         "To": to,
@@ -151,8 +178,7 @@ def _send_via_postmark(from_addr: str, to: str, subject: str, html: str, token:
         "MessageStream": "outbound",
     }
     try:
-        with httpx.Client(timeout=30.0) as client:
-            r = client.post(POSTMARK_API_URL, json=payload, headers=headers)
+        r = _http_client().post(POSTMARK_API_URL, json=payload, headers=_postmark_headers(token))
         if r.status_code == 200:
             return True, None
         try:
@@ -167,11 +193,123 @@ def _send_via_postmark(from_addr: str, to: str, subject: str, html: str, token:
         return False, str(e)
 
 
-def send_daily_report_email(to: str, client_name: str, date_str: str, data: Dict[str, Any]) -> Tuple[bool, Optional[str]]:
+# (ok, erreur, message_id fournisseur, échec définitif)
+DeliveryResult = Tuple[bool, Optional[str], Optional[str], bool]
+
+
+def _send_batch_via_postmark(messages: Sequence[Mapping[str, Any]], token: str) -> List[DeliveryResult]:
+    """Endpoint batch Postmark (≤ POSTMARK_BATCH_MAX par appel) : un résultat par message, dans l'ordre."""
+    results: List[DeliveryResult] = []
+    for i in range(0, len(messages), POSTMARK_BATCH_MAX):
+        chunk = messages[i:i + POSTMARK_BATCH_MAX]
+        payload = [
+            {
+                "From": m["from_addr"],
+                "To": m["to"],
+                "Subject": m["subject"],
+                "HtmlBody": m["html"],
+                "MessageStream": "outbound",
+                "Tag": m.get("kind") or None,
+                "Metadata": {"outbox_key": m["key"]} if m.get("key") else None,
+            }
+            for m in chunk
+        ]
+        try:
+            r = _http_client().post(POSTMARK_BATCH_URL, json=payload, headers=_postmark_headers(token))
+            if r.status_code != 200:
+                msg = (r.text or str(r.status_code))[:200]
+                logger.warning("postmark_batch_failed status=%s size=%s message=%s", r.status_code, len(chunk), msg)
+                results.extend((False, f"Postmark {r.status_code}: {msg}", None, False) for _ in chunk)
+                continue
+            body = r.json() or []
+            for j in range(len(chunk)):
+                item = body[j] if j < len(body) else {}
+                code = int(item.get("ErrorCode") or 0) if item else -1
+                if code == 0:
+                    results.append((True, None, item.get("MessageID"), False))
+                else:
+                    err = f"Postmark {code}: {(item.get('Message') or 'réponse batch incomplète')[:200]}"
+                    results.append((False, err, None, code in POSTMARK_PERMANENT_ERRORS))
+        except Exception as e:
+            logger.warning("postmark_batch_failed size=%s: %s", len(chunk), e)
+            results.extend((False, str(e)[:200], None, False) for _ in chunk)
+    return results
+
+
+def _send_batch_via_smtp(messages: Sequence[Mapping[str, Any]], smtp_user: str, smtp_pass: str) -> List[DeliveryResult]:
+    """SMTP : une connexion pour tout le lot, un sendmail par message."""
+    host = os.getenv("SMTP_HOST", "smtp.gmail.com")
+    port = int(os.getenv("SMTP_PORT", "587"))
+    results: List[DeliveryResult] = []
+    try:
+        with smtplib.SMTP(host, port) as server:
+            server.starttls()
+            server.login(smtp_user, smtp_pass)
+            for m in messages:
+                try:
+                    msg = MIMEMultipart("alternative")
+                    msg["From"] = smtp_user
+                    msg["To"] = m["to"]
+                    msg["Subject"] = m["subject"]
+                    msg.attach(MIMEText(m["html"], "html", "utf-8"))
+                    server.sendmail(smtp_user, [m["to"]], msg.as_string())
+                    results.append((True, None, None, False))
+                except smtplib.SMTPRecipientsRefused as e:
+                    results.append((False, str(e)[:200], None, True))
+                except Exception as e:
+                    results.append((False, str(e)[:200], None, False))
+    except Exception as e:
+        logger.warning("smtp_batch_failed size=%s: %s", len(messages), e)
+        results.extend((False, str(e)[:200], None, False) for _ in messages[len(results):])
+    return results
+
+
+def deliver_batch(messages: Sequence[Mapping[str, Any]]) -> List[DeliveryResult]:
+    """
+    Envoie un lot de messages {to, from_addr, subject, html, kind, key} (worker outbox).
+    Postmark batch si POSTMARK_SERVER_TOKEN, sinon SMTP (une connexion) ; un résultat par message.
+    """
+    token = (os.getenv("POSTMARK_SERVER_TOKEN") or "").strip()
+    if token:
+        fallback_from = (os.getenv("POSTMARK_FROM_EMAIL") or os.getenv("EMAIL_FROM") or os.getenv("SMTP_EMAIL") or "").strip()
+        return _send_batch_via_postmark(
+            [dict(m, from_addr=m.get("from_addr") or fallback_from) for m in messages], token,
+        )
+    smtp_user = (os.getenv("SMTP_EMAIL") or "").strip()
+    smtp_pass = (os.getenv("SMTP_PASSWORD") or "").strip()
+    if smtp_user and smtp_pass:
+        return _send_batch_via_smtp(messages, smtp_user, smtp_pass)
+    return [(False, "Email non configuré (Postmark ou SMTP)", None, False) for _ in messages]
+
+
+def _queue(kind: str, to: str, subject: str, html: str, from_addr: str, idempotency_key: Optional[str] = None) -> bool:
+    """
+    True si l'email est confié à l'outbox (le worker l'enverra) ; False → l'appelant envoie en direct
+    (outbox inactive, aucun transport configuré, ou base indisponible).
+    """
+    from backend import email_outbox
+
+    if not email_outbox.active():
+        return False
+    token = (os.getenv("POSTMARK_SERVER_TOKEN") or "").strip()
+    smtp_ok = bool((os.getenv("SMTP_EMAIL") or "").strip() and (os.getenv("SMTP_PASSWORD") or "").strip())
+    if not ((token and from_addr) or smtp_ok):
+        return False
+    return email_outbox.enqueue(to, subject, html, kind=kind, from_addr=from_addr, idempotency_key=idempotency_key)
+
+
+def send_daily_report_email(
+    to: str,
+    client_name: str,
+    date_str: str,
+    data: Dict[str, Any],
+    idempotency_key: Optional[str] = None,
+) -> Tuple[bool, Optional[str]]:
     """
     Envoie l'email du rapport quotidien IVR (HTML).
     Si EMAIL_PROVIDER=postmark (ou POSTMARK_SERVER_TOKEN défini) : envoi via Postmark (EMAIL_FROM).
     Sinon : SMTP (SMTP_HOST, SMTP_PORT, SMTP_EMAIL, SMTP_PASSWORD).
+    Outbox active : mis en file (idempotency_key → un seul envoi par rapport), succès = accepté.
     Returns (success, error_message). error_message is None on success.
     """
     if not to or not to.strip():
@@ -186,6 +324,8 @@ def send_daily_report_email(to: str, client_name: str, date_str: str, data: Dict
     if use_postmark:
         token = (os.getenv("POSTMARK_SERVER_TOKEN") or "").strip()
         from_addr = (os.getenv("EMAIL_FROM") or os.getenv("SMTP_EMAIL") or os.getenv("REPORT_EMAIL") or "").strip()
+        if token and from_addr and _queue("daily_report", to, subject, html, from_addr, idempotency_key):
+            return True, None
         if not token:
             logger.warning("Postmark demandé mais POSTMARK_SERVER_TOKEN manquant")
             return False, "POSTMARK_SERVER_TOKEN non défini"
@@ -205,6 +345,8 @@ def send_daily_report_email(to: str, client_name: str, date_str: str, data: Dict
     if not from_addr or not password:
         logger.warning("Email not configured (SMTP_EMAIL/SMTP_PASSWORD)")
         return False, "SMTP non configuré (SMTP_EMAIL / SMTP_PASSWORD sur Railway)"
+    if _queue("daily_report", to, subject, html, from_addr, idempotency_key):
+        return True, None
     try:
         logger.info("report_daily: connecting SMTP %s:%s", host, port)
         msg = MIMEMultipart("alternative")
@@ -314,6 +456,9 @@ def send_password_reset_email(to: str, reset_url: str, ttl_minutes: int = 60) ->
         os.getenv("POSTMARK_FROM_EMAIL") or os.getenv("EMAIL_FROM") or os.getenv("SMTP_EMAIL") or ""
     ).strip()
     token = (os.getenv("POSTMARK_SERVER_TOKEN") or "").strip()
+    if _queue("password_reset", to.strip(), subject, html, from_addr):
+        logger.info("password_reset_email_queued", extra={"to": to.strip()[:50]})
+        return True, None
     if token and from_addr:
         try:
             ok, err = _send_via_postmark(from_addr, to.strip(), subject, html, token)
@@ -952,6 +1097,9 @@ def send_payment_link_email(
         os.getenv("POSTMARK_FROM_EMAIL") or os.getenv("EMAIL_FROM") or os.getenv("SMTP_EMAIL") or ""
     ).strip()
     token = (os.getenv("POSTMARK_SERVER_TOKEN") or "").strip()
+    if _queue("payment_link", to_addr, subject, html, from_addr):
+        logger.info("payment_link_email_queued", extra={"to": to_addr[:50]})
+        return True, None
     if token and from_addr:
         try:
             ok, err = _send_via_postmark(from_addr, to_addr, subject, html, token)
@@ -1036,6 +1184,9 @@ def send_onboarding_link_email(
         os.getenv("POSTMARK_FROM_EMAIL") or os.getenv("EMAIL_FROM") or os.getenv("SMTP_EMAIL") or ""
     ).strip()
     token = (os.getenv("POSTMARK_SERVER_TOKEN") or "").strip()
+    if _queue("onboarding_link", to_addr, subject, html, from_addr):
+        logger.info("onboarding_link_email_queued", extra={"to": to_addr[:50]})
+        return True, None
     if token and from_addr:
         try:
             ok, err = _send_via_postmark(from_addr, to_addr, subject, html, token)
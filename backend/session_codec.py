@@ -3,18 +3,73 @@
 P0 Option B: Sérialisation Session <-> dict pour checkpoints.
 Aucun secret dans state_json (token, credentials).
 Fix #9: recovery sérialisé pour cohérence Postgres (partial_phone_digits, contact_mode).
+
+Codec versionné (SCHEMA_VERSION) — format unique pour checkpoints PG, web_sessions et SQLite :
+- v1 : dict lisible de session_to_dict (une clé par champ) — encore lu (migration v1 → v2).
+- v2 : forme compacte {"v": 2, "s": state, "f": [idx, valeur, ...], "x": {...}, "m": [...]}
+  * "f" : uniquement les champs différents de leur valeur par défaut, indexés dans _FIELDS_V2 ;
+  * "x" : attributs dynamiques posés hors dataclass (JSON-sérialisables uniquement) ;
+  * "m" : historique messages (SQLite uniquement ; les checkpoints ont call_messages).
+  Ajout de champ = ajout EN FIN de _FIELDS_V2 (pas de bump) : un lecteur plus ancien ignore les
+  index inconnus. Changement de sémantique = bump SCHEMA_VERSION + entrée dans _MIGRATIONS.
+- encode_session / decode_session : octets (_MAGIC + JSON compact), remplacent pickle en SQLite.
 """
 from __future__ import annotations
 
-from typing import Any, Dict
+import json
+import logging
+from collections import deque
+from dataclasses import fields as dc_fields
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
-from backend.session import Session, QualifData
+from backend import config
+from backend.session import Message, Session, QualifData
 from backend.recovery import migrate_recovery_from_legacy
 
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+_MAGIC = b"\x00SC"
+
+# Ordre figé : l'index d'un champ ne doit JAMAIS changer (ajouts en fin de tuple uniquement).
+_FIELDS_V2 = (
+    "channel", "customer_phone", "client_id", "tenant_id", "flags_effective", "transfer_logged",
+    "last_seen_at", "no_match_turns", "confirm_retry_count", "contact_retry_count",
+    "partial_phone_digits", "contact_mode", "contact_fails", "qualif_step", "qualif_data",
+    "motif_help_used", "extracted_name", "extracted_motif", "extracted_pref", "pending_slot_ids",
+    "pending_slot_labels", "pending_slots", "pending_slot_choice", "pending_slots_display",
+    "rejected_slot_starts", "rejected_day_periods", "slot_sequential_refuse_count", "booking_failures",
+    "pending_cancel_slot", "last_intent", "consecutive_questions", "last_agent_message",
+    "last_question_asked", "last_say_key", "last_say_kwargs", "global_recovery_fails",
+    "correction_count", "pending_preference", "last_preference_user_text", "empty_message_count",
+    "turn_count", "router_epoch_turns", "start_unclear_count", "start_no_faq_count",
+    "start_out_of_scope_count", "ack_idx", "noise_detected_count", "last_noise_ts",
+    "unclear_text_count", "last_assistant_ts", "last_agent_reply_ts", "speaking_until_ts",
+    "slot_choice_fails", "name_fails", "qualif_name_intent_repeat_count", "phone_fails",
+    "preference_fails", "qualif_pref_intent_repeat_count", "contact_confirm_fails",
+    "contact_confirm_intent_repeat_count", "cancel_name_fails", "cancel_rdv_not_found_count",
+    "modify_name_fails", "modify_rdv_not_found_count", "faq_fails", "time_constraint_type",
+    "time_constraint_minute", "ordonnance_choice_fails", "ordonnance_choice_asked",
+    "is_reading_slots", "slots_preface_sent", "slots_list_sent", "slot_offer_index",
+    "slot_proposal_sequential", "intent_router_visits", "intent_router_unclear_count", "recovery",
+    "transfer_budget_remaining", "awaiting_confirmation", "yes_ambiguous_count",
+    "consent_prompted", "consent_obtained", "consent_fails",
+)
+_QUALIF_FIELDS = ("name", "motif", "pref", "contact", "contact_type", "contact_channel")
+# Champs de la dataclass gérés hors table ("s", "m") ou clé d'identité
+_OUT_OF_TABLE = {"conv_id", "state", "messages"}
+_DECLARED = {f.name for f in dc_fields(Session)}
+_ALWAYS = object()  # last_seen_at : toujours écrit (défaut = datetime.utcnow au moment de la création)
+_DEFAULTS = {name: getattr(Session(conv_id=""), name) for name in _FIELDS_V2}
+_DEFAULTS["last_seen_at"] = _ALWAYS
+_TABLE = tuple((idx, name, _DEFAULTS[name]) for idx, name in enumerate(_FIELDS_V2))
+_ENCODED_FIELDS = {"qualif_data", "pending_slots", "last_seen_at"}
+
 
 def session_to_dict(session: Session) -> Dict[str, Any]:
     """
-    Convertit une Session en dict pour stockage checkpoint.
+    Forme v1 lisible (une clé par champ) — debug / outils. Le stockage utilise pack_session (v2).
     Inclut uniquement ce qui est nécessaire pour reprendre le flow.
     Exclut: messages (déjà dans call_messages), secrets.
     """
@@ -81,50 +136,171 @@ def _serialize_pending_slots(slots: Any) -> list:
 
 def session_from_dict(conv_id: str, d: Dict[str, Any]) -> Session:
     """
-    Reconstruit une Session minimale depuis un checkpoint.
+    Reconstruit une Session depuis un checkpoint (v1 lisible ou v2 compact, cf. unpack_session).
     Phase 2: utilisé par load_session_pg_first.
     """
+    return unpack_session(conv_id, d)
+
+
+# ---------- Codec versionné (v2) ----------
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (set, tuple, deque)):
+        return list(value)
+    raise TypeError(f"not JSON serializable: {type(value).__name__}")
+
+
+def _encode_field(name: str, value: Any) -> Any:
+    if name == "qualif_data":
+        return [getattr(value, k, None) for k in _QUALIF_FIELDS]
+    if name == "pending_slots":
+        return _serialize_pending_slots(value)
+    if name == "last_seen_at":
+        return value.isoformat() if isinstance(value, datetime) else value
+    return value
+
+
+def _decode_field(name: str, value: Any) -> Any:
+    if name == "qualif_data":
+        if isinstance(value, dict):
+            return QualifData(**{k: value.get(k) for k in _QUALIF_FIELDS})
+        return QualifData(*(list(value or []) + [None] * len(_QUALIF_FIELDS))[: len(_QUALIF_FIELDS)])
+    if name == "pending_slots":
+        return _deserialize_pending_slots(value)
+    if name == "last_seen_at" and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def pack_session(session: Session, *, include_messages: bool = False) -> Dict[str, Any]:
+    """Session → forme compacte v2 (JSON-compatible : jsonb PG ou octets via encode_session)."""
+    attrs = vars(session)
+    packed: List[Any] = []
+    for idx, name, default in _TABLE:
+        value = attrs.get(name)
+        if value == default:
+            continue
+        packed.append(idx)
+        packed.append(_encode_field(name, value) if name in _ENCODED_FIELDS else value)
+    out: Dict[str, Any] = {"v": SCHEMA_VERSION, "s": session.state, "f": packed}
+    extras = {}
+    for name, value in attrs.items():
+        if name in _DECLARED or name.startswith("_"):
+            continue
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            logger.debug("session_codec: attribut %s non sérialisable ignoré", name)
+            continue
+        extras[name] = value
+    if extras:
+        out["x"] = extras
+    if include_messages:
+        messages = getattr(session, "messages", None) or []
+        out["m"] = [[m.role, m.text, m.ts.isoformat() if isinstance(m.ts, datetime) else m.ts] for m in messages]
+    return out
+
+
+def _named_from_v2(d: Dict[str, Any]) -> Dict[str, Any]:
+    """Forme compacte → dict {champ: valeur encodée}. Index inconnus (écrits par une version plus récente) ignorés."""
+    named: Dict[str, Any] = {}
+    flat = d.get("f") or []
+    for i in range(0, len(flat) - 1, 2):
+        idx = flat[i]
+        if isinstance(idx, int) and 0 <= idx < len(_FIELDS_V2):
+            named[_FIELDS_V2[idx]] = flat[i + 1]
+    named["state"] = d.get("s", "START")
+    if d.get("x"):
+        named["_extras"] = d["x"]
+    if "m" in d:
+        named["_messages"] = d["m"]
+    return named
+
+
+def _migrate_v1_to_v2(d: Dict[str, Any]) -> Dict[str, Any]:
+    """v1 (session_to_dict historique) → dict nommé v2."""
+    named = {k: v for k, v in d.items() if k in _FIELDS_V2 and k not in ("pending_slots", "pending_slots_display")}
+    named["state"] = d.get("state", "START")
+    named["channel"] = d.get("channel", "web")
+    named["qualif_data"] = d.get("qualif_data") or {}
+    named["pending_slots"] = d.get("pending_slots") or d.get("pending_slots_display") or []
+    named["time_constraint_type"] = d.get("time_constraint_type", "") or ""
+    named["rejected_slot_starts"] = d.get("rejected_slot_starts") or []
+    named["rejected_day_periods"] = d.get("rejected_day_periods") or []
+    named["recovery"] = d.get("recovery") or {}
+    return named
+
+
+# version source → fonction qui produit le dict nommé de la version suivante
+_MIGRATIONS: Dict[int, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    1: _migrate_v1_to_v2,
+}
+
+
+def _session_from_named(conv_id: str, named: Dict[str, Any], *, legacy: bool = False) -> Session:
     session = Session(conv_id=conv_id)
-    if not d:
-        return session
-    session.state = d.get("state", "START")
-    session.channel = d.get("channel", "web")
-    session.qualif_step = d.get("qualif_step", "name")
-    qd = d.get("qualif_data") or {}
-    session.qualif_data = QualifData(
-        name=qd.get("name"),
-        motif=qd.get("motif"),
-        pref=qd.get("pref"),
-        contact=qd.get("contact"),
-        contact_type=qd.get("contact_type"),
-    )
-    session.pending_slot_choice = d.get("pending_slot_choice")
-    session.pending_slots = _deserialize_pending_slots(d.get("pending_slots") or d.get("pending_slots_display"))
-    session.awaiting_confirmation = d.get("awaiting_confirmation")
-    session.rejected_slot_starts = d.get("rejected_slot_starts") or []
-    session.rejected_day_periods = d.get("rejected_day_periods") or []
-    session.slot_offer_index = d.get("slot_offer_index", 0)
-    session.slot_proposal_sequential = d.get("slot_proposal_sequential", False)
-    session.transfer_budget_remaining = d.get("transfer_budget_remaining", 2)
-    session.time_constraint_type = d.get("time_constraint_type", "") or ""
-    session.time_constraint_minute = d.get("time_constraint_minute", -1)
-    session.no_match_turns = d.get("no_match_turns", 0)
-    session.confirm_retry_count = d.get("confirm_retry_count", 0)
-    session.contact_retry_count = d.get("contact_retry_count", 0)
-    session.contact_fails = d.get("contact_fails", 0)
-    session.slot_choice_fails = d.get("slot_choice_fails", 0)
-    session.name_fails = d.get("name_fails", 0)
-    session.phone_fails = d.get("phone_fails", 0)
-    session.preference_fails = d.get("preference_fails", 0)
-    session.contact_confirm_fails = d.get("contact_confirm_fails", 0)
-    session.turn_count = d.get("turn_count", 0)
-    session.intent_router_visits = d.get("intent_router_visits", 0)
-    session.booking_failures = d.get("booking_failures", 0)
-    session.extracted_name = d.get("extracted_name", False)
-    session.extracted_motif = d.get("extracted_motif", False)
-    session.extracted_pref = d.get("extracted_pref", False)
-    session.pending_cancel_slot = d.get("pending_cancel_slot")
-    # Fix #9: recovery (nouveaux checkpoints) ; sinon migration legacy ci-dessous
-    session.recovery = d.get("recovery") or {}
-    migrate_recovery_from_legacy(session)
+    session.state = named.get("state") or "START"
+    for name, value in named.items():
+        if name in _OUT_OF_TABLE or name.startswith("_"):
+            continue
+        setattr(session, name, _decode_field(name, value))
+    for name, value in (named.get("_extras") or {}).items():
+        if name not in _DECLARED:
+            setattr(session, name, value)
+    if named.get("_messages"):
+        history = deque(maxlen=config.MAX_MESSAGES_HISTORY)
+        for role, text, ts in named["_messages"]:
+            history.append(Message(role=role, text=text, ts=datetime.fromisoformat(ts) if isinstance(ts, str) else ts))
+        session.messages = history
+    if legacy:
+        # Fix #9: recovery absent des anciens checkpoints → rempli depuis les compteurs legacy
+        migrate_recovery_from_legacy(session)
     return session
+
+
+def unpack_session(conv_id: str, d: Optional[Dict[str, Any]]) -> Session:
+    """Dict versionné (v1 lisible ou v2 compact) → Session, migrations appliquées."""
+    if not d:
+        return Session(conv_id=conv_id)
+    version = d.get("v", 1) if isinstance(d.get("v", 1), int) else 1
+    if version >= 2:
+        if version > SCHEMA_VERSION:
+            logger.warning("session_codec: v%s plus récent que v%s, lecture des champs connus", version, SCHEMA_VERSION)
+        named = _named_from_v2(d)
+        version = SCHEMA_VERSION
+    else:
+        named = d
+    legacy = version < SCHEMA_VERSION
+    while version < SCHEMA_VERSION:
+        named = _MIGRATIONS[version](named)
+        version += 1
+    return _session_from_named(conv_id, named, legacy=legacy)
+
+
+def packed_to_json(d: Dict[str, Any]) -> str:
+    """JSON compact d'un dict de session (colonnes jsonb : checkpoints, web_sessions)."""
+    return json.dumps(d, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+
+def encode_session(session: Session) -> bytes:
+    """Snapshot complet (messages inclus) en octets : remplace base64(pickle) côté SQLite."""
+    return _MAGIC + packed_to_json(pack_session(session, include_messages=True)).encode("utf-8")
+
+
+def is_encoded_session(data: Any) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[: len(_MAGIC)]) == _MAGIC
+
+
+def decode_session(conv_id: str, data: bytes) -> Session:
+    if not is_encoded_session(data):
+        raise ValueError("session_codec: format inconnu")
+    return unpack_session(conv_id, json.loads(bytes(data[len(_MAGIC):]).decode("utf-8")))
+
+
+def checkpoint_state(state_json: Optional[Dict[str, Any]]) -> str:
+    """État FSM d'un checkpoint, quel que soit son format (logs)."""
+    if not state_json:
+        return ""
+    return state_json.get("s") or state_json.get("state") or ""
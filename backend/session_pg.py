@@ -14,7 +14,8 @@ from contextvars import ContextVar
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
-from backend.pg_tenant_context import set_tenant_id_on_connection
+from backend.pg_pool import pg_connection
+from backend.shared_cache import get_cache
 
 logger = logging.getLogger(__name__)
 
@@ -71,9 +72,8 @@ def pg_ensure_call_session(
         return False
 
     def _do():
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -115,9 +115,8 @@ def pg_next_seq(tenant_id: int, call_id: str) -> Optional[int]:
         return None
 
     def _do():
-        import psycopg
-        with psycopg.connect(url) as c:
-            set_tenant_id_on_connection(c, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as c:
             with c.cursor() as cur:
                 cur.execute(
                     """
@@ -152,9 +151,8 @@ def pg_add_message(
         return None
 
     def _do():
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -179,9 +177,8 @@ def pg_update_last_state(tenant_id: int, call_id: str, state: str) -> bool:
         return False
 
     def _do():
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -203,32 +200,48 @@ def pg_write_checkpoint(
     seq: int,
     state_json: Dict[str, Any],
 ) -> bool:
-    """INSERT checkpoint. ON CONFLICT DO NOTHING (idempotent)."""
+    """
+    INSERT checkpoint. ON CONFLICT DO NOTHING (idempotent).
+    CALL_CHECKPOINT_DELTA=true : full ou delta selon backend/checkpoint_delta.py (même seq → remplacé).
+    """
     url = _pg_url()
     if not url:
         return False
 
-    import json
+    from backend import checkpoint_delta
+    from backend.session_codec import checkpoint_state, packed_to_json
+
+    planned = checkpoint_delta.plan(tenant_id, call_id, seq, state_json) if checkpoint_delta.delta_enabled() else None
 
     def _do():
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO call_state_checkpoints (tenant_id, call_id, seq, state_json)
-                    VALUES (%s, %s, %s, %s::jsonb)
-                    ON CONFLICT (tenant_id, call_id, seq) DO NOTHING
-                    """,
-                    (tenant_id, call_id, seq, json.dumps(state_json)),
-                )
+                if planned is not None:
+                    checkpoint_delta.execute_write(cur, planned)
+                else:
+                    cur.execute(
+                        """
+                        INSERT INTO call_state_checkpoints (tenant_id, call_id, seq, state_json)
+                        VALUES (%s, %s, %s, %s::jsonb)
+                        ON CONFLICT (tenant_id, call_id, seq) DO NOTHING
+                        """,
+                        (tenant_id, call_id, seq, packed_to_json(state_json)),
+                    )
                 conn.commit()
         return True
 
     result = _execute_with_retry("pg_write_checkpoint", _do)
+    if planned is not None:
+        if result:
+            checkpoint_delta.commit(planned)
+        else:
+            checkpoint_delta.forget(tenant_id, call_id)
     if result:
-        logger.info("[CHECKPOINT] tenant_id=%s call_id=%s seq=%s state=%s", tenant_id, call_id[:16], seq, state_json.get("state", ""))
+        logger.info(
+            "[CHECKPOINT] tenant_id=%s call_id=%s seq=%s state=%s kind=%s",
+            tenant_id, call_id[:16], seq, checkpoint_state(state_json), planned.kind if planned else "full",
+        )
     return result is True
 
 
@@ -236,17 +249,30 @@ def pg_get_latest_checkpoint(
     tenant_id: int,
     call_id: str,
 ) -> Optional[Tuple[int, Dict[str, Any]]]:
-    """SELECT checkpoint le plus récent. Returns (seq, state_json) ou None."""
+    """
+    SELECT checkpoint le plus récent. Returns (seq, state_json) ou None.
+    Toujours dernier full + deltas suivants repliés (checkpoint_delta.read_latest), même flag delta
+    coupé : des lignes delta peuvent rester (rollback du flag, compaction pas encore passée).
+    Schéma antérieur à la migration 032 (pas de colonne kind) : dernière ligne, forcément full.
+    """
     url = _pg_url()
     if not url:
         return None
 
+    from backend import checkpoint_delta
+
     def _do():
         import json
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
+                cur.execute("SAVEPOINT latest_checkpoint")
+                try:
+                    return checkpoint_delta.read_latest(cur, tenant_id, call_id)
+                except Exception as e:
+                    if "does not exist" not in str(e).lower():
+                        raise
+                    cur.execute("ROLLBACK TO SAVEPOINT latest_checkpoint")
                 cur.execute(
                     """
                     SELECT seq, state_json
@@ -265,6 +291,62 @@ def pg_get_latest_checkpoint(
     return _execute_with_retry("pg_get_latest_checkpoint", _do)
 
 
+def pg_compact_call_checkpoints(idle_minutes: int = 30, limit: int = 200) -> int:
+    """
+    Compaction des checkpoints delta des appels inactifs depuis idle_minutes :
+    l'état reconstruit devient une ligne full à sa seq, les deltas de l'appel sont supprimés
+    (les full intermédiaires sont conservés). Returns le nombre d'appels compactés.
+    """
+    url = _pg_url()
+    if not url:
+        return 0
+
+    from backend import checkpoint_delta
+    from backend.session_codec import packed_to_json
+
+    def _do():
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT c.tenant_id, c.call_id
+                    FROM call_state_checkpoints c
+                    JOIN call_sessions s ON s.tenant_id = c.tenant_id AND s.call_id = c.call_id
+                    WHERE c.kind = 'delta'
+                      AND s.updated_at < now() - (%s || ' minutes')::interval
+                    GROUP BY c.tenant_id, c.call_id
+                    LIMIT %s
+                    """,
+                    (str(int(idle_minutes)), limit),
+                )
+                calls = cur.fetchall()
+        compacted = 0
+        for tenant_id, call_id in calls:
+            with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
+                with conn.cursor() as cur:
+                    latest = checkpoint_delta.read_latest(cur, tenant_id, call_id)
+                    if latest is not None:  # sinon deltas sans full de départ : inutilisables, supprimés
+                        seq, packed = latest
+                        cur.execute(
+                            """
+                            UPDATE call_state_checkpoints
+                            SET kind = 'full', prev_seq = NULL, state_json = %s::jsonb
+                            WHERE tenant_id = %s AND call_id = %s AND seq = %s
+                            """,
+                            (packed_to_json(packed), tenant_id, call_id, seq),
+                        )
+                    cur.execute(
+                        "DELETE FROM call_state_checkpoints WHERE tenant_id = %s AND call_id = %s AND kind = 'delta'",
+                        (tenant_id, call_id),
+                    )
+            checkpoint_delta.forget(tenant_id, call_id)
+            compacted += 1
+        return compacted
+
+    return _execute_with_retry("pg_compact_call_checkpoints", _do) or 0
+
+
 def pg_list_messages_since(
     tenant_id: int,
     call_id: str,
@@ -276,10 +358,7 @@ def pg_list_messages_since(
         return []
 
     def _do():
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -315,9 +394,8 @@ def pg_lock_call_session(tenant_id: int, call_id: str, timeout_seconds: int = 2)
         return
     pg_ensure_call_session(tenant_id, call_id)
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("SET LOCAL lock_timeout = %s", (f"{timeout_seconds * 1000}ms",))
                 cur.execute(
@@ -350,9 +428,8 @@ def pg_get_call_session_info(tenant_id: int, call_id: str) -> Optional[Tuple[str
         return None
 
     def _do():
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT last_state, last_seq FROM call_sessions WHERE tenant_id = %s AND call_id = %s",
@@ -368,6 +445,7 @@ def load_session_pg_first(tenant_id: int, call_id: str) -> Optional[Tuple["Sessi
     """
     Phase 2: charge session depuis PG (Option A snapshot-only).
     Returns (session, ck_seq, last_seq) ou None si pas de checkpoint.
+    Mode delta : le checkpoint est reconstruit (dernier full + deltas) par pg_get_latest_checkpoint.
     Pas de replay messages — snapshot suffit pour reprendre le flow.
     """
     from backend.session_codec import session_from_dict
@@ -386,8 +464,8 @@ def load_session_pg_first(tenant_id: int, call_id: str) -> Optional[Tuple["Sessi
 
 # ---------- Web sessions (tenant_id, conv_id) ----------
 # Cache conv_id -> tenant_id pour GET /stream qui n'a pas le header X-Tenant-Key.
-_WEB_CONV_TENANT_CACHE: Dict[str, int] = {}
 _WEB_CACHE_MAX = 10000
+_WEB_CONV_TENANT_CACHE = get_cache("web_conv_tenant", ttl_seconds=24 * 3600, max_entries=_WEB_CACHE_MAX)
 
 
 def _pg_ensure_web_sessions_table(conn) -> None:
@@ -422,10 +500,9 @@ def pg_get_web_session(tenant_id: int, conv_id: str) -> Optional["Session"]:
         return None
 
     def _do() -> Optional["Session"]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             try:
-                set_tenant_id_on_connection(conn, tenant_id)
                 _pg_ensure_web_sessions_table(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -453,20 +530,18 @@ def pg_get_web_session(tenant_id: int, conv_id: str) -> Optional["Session"]:
 
 def pg_save_web_session(tenant_id: int, conv_id: str, session: "Session") -> bool:
     """Enregistre une session web en PG (UPSERT)."""
-    from backend.session_codec import session_to_dict
-    import json
+    from backend.session_codec import pack_session, packed_to_json
 
     url = _pg_url()
     if not url:
         return False
 
-    state = session_to_dict(session)
+    state = pack_session(session)
 
     def _do() -> bool:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             try:
-                set_tenant_id_on_connection(conn, tenant_id)
                 _pg_ensure_web_sessions_table(conn)
                 with conn.cursor() as cur:
                     cur.execute(
@@ -475,7 +550,7 @@ def pg_save_web_session(tenant_id: int, conv_id: str, session: "Session") -> boo
                         VALUES (%s, %s, %s::jsonb, now())
                         ON CONFLICT (tenant_id, conv_id) DO UPDATE SET state_json = EXCLUDED.state_json, updated_at = now()
                         """,
-                        (tenant_id, conv_id, json.dumps(state)),
+                        (tenant_id, conv_id, packed_to_json(state)),
                     )
                     conn.commit()
                 return True
@@ -505,11 +580,7 @@ def pg_get_or_create_web_session(tenant_id: int, conv_id: str) -> "Session":
 
 def pg_web_register_conv_tenant(conv_id: str, tenant_id: int) -> None:
     """Enregistre conv_id -> tenant_id pour résolution ultérieure (ex: GET /stream)."""
-    if len(_WEB_CONV_TENANT_CACHE) >= _WEB_CACHE_MAX:
-        to_remove = list(_WEB_CONV_TENANT_CACHE.keys())[: _WEB_CACHE_MAX // 10]
-        for k in to_remove:
-            del _WEB_CONV_TENANT_CACHE[k]
-    _WEB_CONV_TENANT_CACHE[conv_id] = tenant_id
+    _WEB_CONV_TENANT_CACHE.set(conv_id, tenant_id)
 
 
 def pg_web_resolve_tenant_for_conv(conv_id: str) -> Optional[int]:
@@ -524,10 +595,9 @@ def pg_delete_web_session(tenant_id: int, conv_id: str) -> bool:
         return False
 
     def _do() -> bool:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             try:
-                set_tenant_id_on_connection(conn, tenant_id)
                 with conn.cursor() as cur:
                     cur.execute(
                         "DELETE FROM web_sessions WHERE tenant_id = %s AND conv_id = %s",
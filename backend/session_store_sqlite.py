@@ -6,8 +6,8 @@ Résout le problème de perte de sessions quand Railway redémarre.
 
 import sqlite3
 import json
-import pickle
-import base64
+import logging
+import threading
 from datetime import datetime
 from typing import Optional, Dict, Any
 from pathlib import Path
@@ -15,6 +15,33 @@ from pathlib import Path
 from backend.session import Session, QualifData
 from backend import config
 from backend.recovery import migrate_recovery_from_legacy
+from backend.session_codec import decode_session, encode_session, is_encoded_session
+
+logger = logging.getLogger(__name__)
+
+# Requêtes constantes : réutilisées par le cache de statements préparés de chaque connexion.
+_UPSERT_SQL = """
+    INSERT OR REPLACE INTO sessions (
+        conv_id, state, channel, customer_phone,
+        name, motif, pref, contact, contact_type,
+        no_match_turns, confirm_retry_count, contact_retry_count,
+        partial_phone_digits,
+        pending_slots_json, pending_slot_choice, pending_cancel_slot_json,
+        extracted_name, extracted_motif, extracted_pref, motif_help_used,
+        last_seen_at, created_at, session_pickle, pending_slots_display_json
+    ) VALUES (
+        ?, ?, ?, ?,
+        ?, ?, ?, ?, ?,
+        ?, ?, ?,
+        ?,
+        ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?
+    )
+"""
+_SELECT_SQL = "SELECT * FROM sessions WHERE conv_id = ?"
+_DELETE_SQL = "DELETE FROM sessions WHERE conv_id = ?"
+_DELETE_OLDER_SQL = "DELETE FROM sessions WHERE last_seen_at < ?"
 
 
 def _pending_slots_to_jsonable(slots) -> list:
@@ -52,6 +79,38 @@ class SQLiteSessionStore:
         self.db_path = db_path
         self._init_db()
         self._memory_cache: Dict[str, Session] = {}  # Cache en mémoire pour performance
+        # Connexion longue durée par thread (WAL + synchronous=NORMAL) au lieu d'un connect par opération
+        self._local = threading.local()
+        self._conns: list = []
+        self._conns_lock = threading.Lock()
+        # Dirty tracking : snapshot encodé de la dernière sauvegarde par conv_id (écriture sautée si inchangé)
+        self._saved_snapshots: Dict[str, bytes] = {}
+
+    def _conn(self) -> sqlite3.Connection:
+        """Connexion SQLite du thread courant (ouverte au premier usage, réutilisée ensuite)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False, cached_statements=32)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            except sqlite3.OperationalError:
+                conn.rollback()
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self) -> None:
+        """Ferme toutes les connexions ouvertes par ce store (tests, arrêt)."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
     
     def _init_db(self):
         """Crée la table sessions si elle n'existe pas. Retry si database is locked (Railway)."""
@@ -104,7 +163,7 @@ class SQLiteSessionStore:
                 last_seen_at TEXT NOT NULL,
                 created_at TEXT NOT NULL,
                 
-                -- Full session pickle (backup)
+                -- Snapshot complet (session_codec ; anciennement pickle)
                 session_pickle TEXT,
                 -- P0: slots affichés (source de vérité booking), en fin pour migration ALTER
                 pending_slots_display_json TEXT
@@ -135,8 +194,8 @@ class SQLiteSessionStore:
                 else:
                     raise last_err
 
-    def _serialize_session(self, session: Session) -> Dict[str, Any]:
-        """Convertit une Session en dict pour SQLite."""
+    def _serialize_session(self, session: Session, snapshot: Optional[bytes] = None) -> Dict[str, Any]:
+        """Convertit une Session en dict pour SQLite (snapshot : encode_session déjà calculé par save)."""
         return {
             "conv_id": session.conv_id,
             "state": session.state,
@@ -176,23 +235,22 @@ class SQLiteSessionStore:
             "last_seen_at": session.last_seen_at.isoformat(),
             "created_at": datetime.utcnow().isoformat(),
             
-            # Backup complet (pickle)
-            "session_pickle": base64.b64encode(pickle.dumps(session)).decode('utf-8'),
+            # Snapshot complet (codec versionné session_codec ; colonne historiquement nommée session_pickle)
+            "session_pickle": snapshot if snapshot is not None else encode_session(session),
         }
     
     def _deserialize_session(self, row: tuple) -> Session:
         """Reconstruit une Session depuis une row SQLite."""
-        # Essayer d'abord de restaurer depuis le pickle (plus fiable)
+        # Essayer d'abord de restaurer depuis le snapshot complet (plus fiable).
+        # Les anciennes lignes (base64 pickle) ne sont plus dépicklées : reconstruction par colonnes.
         try:
-            session_pickle = row[22] if len(row) > 22 else None
-            if session_pickle:
-                session = pickle.loads(base64.b64decode(session_pickle))
-                # P0: Ne jamais préférer le cache au pickle DB — la DB est la source de vérité
+            snapshot = row[22] if len(row) > 22 else None
+            if is_encoded_session(snapshot):
+                # P0: Ne jamais préférer le cache au snapshot DB — la DB est la source de vérité
                 # (évite session stale sans pending_slots_display → "problème technique")
-                migrate_recovery_from_legacy(session)
-                return session
+                return decode_session(row[0], snapshot)
         except Exception as e:
-            print(f"⚠️ Could not unpickle session: {e}")
+            logger.warning("could not decode session snapshot conv_id=%s: %s", row[0], e)
         
         # Sinon reconstruire depuis les colonnes
         session = Session(conv_id=row[0])
@@ -265,7 +323,7 @@ class SQLiteSessionStore:
         return session
     
     def save(self, session: Session) -> None:
-        """Sauvegarde une session dans SQLite."""
+        """Sauvegarde une session dans SQLite (écriture sautée si rien n'a changé depuis la dernière sauvegarde)."""
         from backend import config
         config._sqlite_guard("session_store_sqlite.save")
         import time
@@ -273,47 +331,30 @@ class SQLiteSessionStore:
         
         # Mettre à jour le cache mémoire
         self._memory_cache[session.conv_id] = session
+
+        snapshot = encode_session(session)
+        if self._saved_snapshots.get(session.conv_id) == snapshot:
+            return
         
         # Sauvegarder dans SQLite
-        data = self._serialize_session(session)
-        print(f"💾 Saving session {session.conv_id}: state={session.state}, name={session.qualif_data.name}, pending_slots={len(session.pending_slots or [])}")
-        
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO sessions (
-                conv_id, state, channel, customer_phone,
-                name, motif, pref, contact, contact_type,
-                no_match_turns, confirm_retry_count, contact_retry_count,
-                partial_phone_digits,
-                pending_slots_json, pending_slot_choice, pending_cancel_slot_json,
-                extracted_name, extracted_motif, extracted_pref, motif_help_used,
-                last_seen_at, created_at, session_pickle, pending_slots_display_json
-            ) VALUES (
-                ?, ?, ?, ?,
-                ?, ?, ?, ?, ?,
-                ?, ?, ?,
-                ?,
-                ?, ?, ?,
-                ?, ?, ?, ?,
-                ?, ?, ?, ?
-            )
-        """, (
-            data["conv_id"], data["state"], data["channel"], data["customer_phone"],
-            data["name"], data["motif"], data["pref"], data["contact"], data["contact_type"],
-            data["no_match_turns"], data["confirm_retry_count"], data["contact_retry_count"],
-            data["partial_phone_digits"],
-            data["pending_slots_json"], data["pending_slot_choice"], data["pending_cancel_slot_json"],
-            data["extracted_name"], data["extracted_motif"], data["extracted_pref"], data["motif_help_used"],
-            data["last_seen_at"], data["created_at"], data["session_pickle"], data["pending_slots_display_json"]
-        ))
-        
-        conn.commit()
-        conn.close()
+        data = self._serialize_session(session, snapshot=snapshot)
+        conn = self._conn()
+        with conn:
+            conn.execute(_UPSERT_SQL, (
+                data["conv_id"], data["state"], data["channel"], data["customer_phone"],
+                data["name"], data["motif"], data["pref"], data["contact"], data["contact_type"],
+                data["no_match_turns"], data["confirm_retry_count"], data["contact_retry_count"],
+                data["partial_phone_digits"],
+                data["pending_slots_json"], data["pending_slot_choice"], data["pending_cancel_slot_json"],
+                data["extracted_name"], data["extracted_motif"], data["extracted_pref"], data["motif_help_used"],
+                data["last_seen_at"], data["created_at"], data["session_pickle"], data["pending_slots_display_json"]
+            ))
+        self._saved_snapshots[session.conv_id] = snapshot
         
-        elapsed_ms = (time.time() - t_start) * 1000
-        print(f"💾 Session saved in {elapsed_ms:.0f}ms")
+        logger.debug(
+            "session saved conv_id=%s state=%s pending_slots=%s in %.1fms",
+            session.conv_id, session.state, len(session.pending_slots or []), (time.time() - t_start) * 1000,
+        )
     
     def get(self, conv_id: str) -> Optional[Session]:
         """Récupère une session depuis SQLite."""
@@ -324,28 +365,20 @@ class SQLiteSessionStore:
         
         # Check cache mémoire d'abord (RAPIDE)
         if conv_id in self._memory_cache:
-            elapsed = (time.time() - t_start) * 1000
-            print(f"💾 Session {conv_id} from MEMORY cache ({elapsed:.0f}ms)")
             return self._memory_cache[conv_id]
         
         # Sinon chercher dans SQLite (LENT)
-        t_db_start = time.time()
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM sessions WHERE conv_id = ?", (conv_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        elapsed_db = (time.time() - t_db_start) * 1000
+        row = self._conn().execute(_SELECT_SQL, (conv_id,)).fetchone()
         
         if not row:
-            print(f"💾 Session {conv_id} NOT FOUND in SQLite ({elapsed_db:.0f}ms)")
+            logger.debug("session %s not found in SQLite (%.1fms)", conv_id, (time.time() - t_start) * 1000)
             return None
         
         session = self._deserialize_session(row)
-        elapsed_total = (time.time() - t_start) * 1000
-        print(f"💾 Loaded {conv_id} from SQLite ({elapsed_total:.0f}ms): state={session.state}, name={session.qualif_data.name}, pending_slots={len(session.pending_slots or [])}")
+        logger.debug(
+            "session %s loaded from SQLite (%.1fms): state=%s",
+            conv_id, (time.time() - t_start) * 1000, session.state,
+        )
         self._memory_cache[conv_id] = session
         return session
     
@@ -367,14 +400,13 @@ class SQLiteSessionStore:
         """Supprime une session."""
         from backend import config
         config._sqlite_guard("session_store_sqlite.delete")
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sessions WHERE conv_id = ?", (conv_id,))
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        with conn:
+            conn.execute(_DELETE_SQL, (conv_id,))
         
         if conv_id in self._memory_cache:
             del self._memory_cache[conv_id]
+        self._saved_snapshots.pop(conv_id, None)
 
     def cleanup_expired_sessions(self, ttl_minutes: Optional[int] = None) -> int:
         """
@@ -398,13 +430,12 @@ class SQLiteSessionStore:
         ]
         for conv_id in expired_in_memory:
             self._memory_cache.pop(conv_id, None)
+        # Dirty tracking : oublier tout (les lignes supprimées en DB doivent être réécrites au prochain save)
+        self._saved_snapshots.clear()
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sessions WHERE last_seen_at < ?", (cutoff,))
-        deleted_db = cursor.rowcount
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        with conn:
+            deleted_db = conn.execute(_DELETE_OLDER_SQL, (cutoff,)).rowcount
 
         deleted_total = max(deleted_db, 0) + len(expired_in_memory)
         if deleted_total:
@@ -424,13 +455,11 @@ class SQLiteSessionStore:
         config._sqlite_guard("session_store_sqlite.cleanup_old_sessions")
         from datetime import timedelta
         cutoff = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+        self._saved_snapshots.clear()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM sessions WHERE last_seen_at < ?", (cutoff,))
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        conn = self._conn()
+        with conn:
+            deleted = conn.execute(_DELETE_OLDER_SQL, (cutoff,)).rowcount
         
         print(f"🧹 Cleaned up {deleted} old sessions")
         return deleted
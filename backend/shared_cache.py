@@ -0,0 +1,420 @@
+# backend/shared_cache.py
+"""
+Caches clé → valeur nommés (namespaces) derrière une interface unique : slots, params / flags tenant,
+routage assistant → tenant, control URLs Vapi, résultats de tool calls, conv web → tenant.
+
+Backend (SHARED_CACHE_BACKEND, lu à la création du cache) :
+  - memory (défaut) : LRU en mémoire du process (OrderedDict), TTL + taille max par namespace ;
+  - sqlite : fichier SQLite en WAL partagé par les workers uvicorn d'une même machine
+    (SHARED_CACHE_SQLITE_PATH) ; valeurs picklées, taille max appliquée par paquets.
+Invalidation inter-instances (SHARED_CACHE_PG_NOTIFY=true + DATABASE_URL) :
+  delete / invalidate_prefix / clear publient un NOTIFY sur le canal uwi_shared_cache ; chaque process
+  écoute (thread LISTEN sur une connexion dédiée, hors pool) et applique l'invalidation localement.
+  Après une reconnexion du listener, les tiers mémoire sont vidés (notifications perdues pendant la coupure).
+Stats par namespace (hits, misses, sets, evictions, expirations, invalidations) → /health.
+
+Les clés sont des chaînes ; cache_key(*parts) construit "p1:p2:..." pour les clés composites
+(invalidate_prefix(cache_key(tenant_id, "")) cible toutes les entrées d'un tenant).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CHANNEL = "uwi_shared_cache"
+_MISSING = object()
+# Identifiant du process : ignore ses propres NOTIFY
+_ORIGIN = uuid.uuid4().hex[:12]
+# SQLite : contrôle de la taille tous les N set() (COUNT(*) évité à chaque écriture)
+_SQLITE_TRIM_EVERY = 64
+
+
+def _backend_name() -> str:
+    return (os.environ.get("SHARED_CACHE_BACKEND") or "memory").strip().lower()
+
+
+def _sqlite_path() -> str:
+    return (os.environ.get("SHARED_CACHE_SQLITE_PATH") or "shared_cache.db").strip()
+
+
+def _notify_enabled() -> bool:
+    return (os.environ.get("SHARED_CACHE_PG_NOTIFY") or "false").lower() in ("1", "true", "yes")
+
+
+def _pg_url() -> Optional[str]:
+    return os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
+
+
+def cache_key(*parts: Any) -> str:
+    return ":".join(str(p) for p in parts)
+
+
+# ---------- Backends ----------
+
+
+class _MemoryBackend:
+    """LRU en mémoire : OrderedDict clé → (expiration, valeur)."""
+
+    def __init__(self, max_entries: int):
+        self._max = max(1, max_entries)
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Tuple[str, Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return "miss", None
+            if entry[0] <= now:
+                del self._data[key]
+                return "expired", None
+            self._data.move_to_end(key)
+            return "hit", entry[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> int:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self._max:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+_SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS shared_cache (
+        ns TEXT NOT NULL,
+        k TEXT NOT NULL,
+        v BLOB NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (ns, k)
+    )
+"""
+_SQLITE_GET = "SELECT v, expires_at FROM shared_cache WHERE ns = ? AND k = ?"
+_SQLITE_SET = "INSERT OR REPLACE INTO shared_cache (ns, k, v, expires_at) VALUES (?, ?, ?, ?)"
+_SQLITE_DELETE = "DELETE FROM shared_cache WHERE ns = ? AND k = ?"
+_SQLITE_DELETE_PREFIX = "DELETE FROM shared_cache WHERE ns = ? AND substr(k, 1, ?) = ?"
+_SQLITE_CLEAR = "DELETE FROM shared_cache WHERE ns = ?"
+_SQLITE_COUNT = "SELECT COUNT(*) FROM shared_cache WHERE ns = ?"
+_SQLITE_PURGE_EXPIRED = "DELETE FROM shared_cache WHERE ns = ? AND expires_at <= ?"
+_SQLITE_TRIM = """
+    DELETE FROM shared_cache WHERE ns = ? AND k IN (
+        SELECT k FROM shared_cache WHERE ns = ? ORDER BY expires_at LIMIT ?
+    )
+"""
+
+_sqlite_local = threading.local()
+
+
+def _sqlite_conn(path: str) -> sqlite3.Connection:
+    """Connexion SQLite longue durée par thread et par fichier (WAL : lecteurs non bloqués par l'écrivain)."""
+    conns = getattr(_sqlite_local, "conns", None)
+    if conns is None:
+        conns = _sqlite_local.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, timeout=2.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SQLITE_SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+class _SQLiteBackend:
+    """Table shared_cache(ns, k, v, expires_at) dans un fichier partagé entre process."""
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        self._path = path
+        self._ns = namespace
+        self._max = max(1, max_entries)
+        self._sets = 0
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        return _sqlite_conn(self._path)
+
+    def get(self, key: str, now: float) -> Tuple[str, Any]:
+        row = self._conn().execute(_SQLITE_GET, (self._ns, key)).fetchone()
+        if row is None:
+            return "miss", None
+        if row[1] <= now:
+            self._conn().execute(_SQLITE_DELETE, (self._ns, key))
+            return "expired", None
+        try:
+            return "hit", pickle.loads(row[0])
+        except Exception as e:
+            logger.warning("shared cache: valeur illisible ns=%s key=%s: %s", self._ns, key[:40], e)
+            self._conn().execute(_SQLITE_DELETE, (self._ns, key))
+            return "miss", None
+
+    def set(self, key: str, value: Any, expires_at: float) -> int:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute(_SQLITE_SET, (self._ns, key, blob, expires_at))
+        with self._lock:
+            self._sets += 1
+            if self._sets % _SQLITE_TRIM_EVERY:
+                return 0
+        conn.execute(_SQLITE_PURGE_EXPIRED, (self._ns, time.time()))
+        excess = conn.execute(_SQLITE_COUNT, (self._ns,)).fetchone()[0] - self._max
+        if excess <= 0:
+            return 0
+        # Toutes les entrées d'un namespace ont le même TTL : expiration la plus proche = plus ancienne
+        conn.execute(_SQLITE_TRIM, (self._ns, self._ns, excess))
+        return excess
+
+    def delete(self, key: str) -> bool:
+        return self._conn().execute(_SQLITE_DELETE, (self._ns, key)).rowcount > 0
+
+    def delete_prefix(self, prefix: str) -> int:
+        return self._conn().execute(_SQLITE_DELETE_PREFIX, (self._ns, len(prefix), prefix)).rowcount
+
+    def clear(self) -> None:
+        self._conn().execute(_SQLITE_CLEAR, (self._ns,))
+
+    def size(self) -> int:
+        return self._conn().execute(_SQLITE_COUNT, (self._ns,)).fetchone()[0]
+
+
+# ---------- Cache ----------
+
+
+class SharedCache:
+    """Cache d'un namespace : TTL par défaut, taille max, stats, invalidations diffusées."""
+
+    def __init__(self, namespace: str, ttl_seconds: float, max_entries: int = 10000, backend: Optional[str] = None):
+        self.namespace = namespace
+        self.ttl_seconds = float(ttl_seconds)
+        self.backend_name = (backend or _backend_name())
+        if self.backend_name == "sqlite":
+            self._backend: Any = _SQLiteBackend(_sqlite_path(), namespace, max_entries)
+        else:
+            if self.backend_name != "memory":
+                logger.warning("SHARED_CACHE_BACKEND=%s inconnu → memory", self.backend_name)
+                self.backend_name = "memory"
+            self._backend = _MemoryBackend(max_entries)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0,
+            "invalidations": 0, "remote_invalidations": 0, "errors": 0,
+        }
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            status, value = self._backend.get(key, time.time())
+        except Exception as e:
+            logger.warning("shared cache get failed ns=%s: %s", self.namespace, e)
+            self._count("errors")
+            return default
+        if status == "hit":
+            self._count("hits")
+            return value
+        self._count("misses")
+        if status == "expired":
+            self._count("expirations")
+        return default
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else float(ttl_seconds)
+        try:
+            evicted = self._backend.set(key, value, time.time() + ttl)
+        except Exception as e:
+            logger.warning("shared cache set failed ns=%s: %s", self.namespace, e)
+            self._count("errors")
+            return
+        with self._stats_lock:
+            self._stats["sets"] += 1
+            self._stats["evictions"] += evicted
+
+    def delete(self, key: str, broadcast: bool = True) -> bool:
+        removed = self._apply("delete", key)
+        if broadcast:
+            _publish(self.namespace, "delete", key)
+        return removed
+
+    def invalidate_prefix(self, prefix: str, broadcast: bool = True) -> int:
+        removed = self._apply("prefix", prefix)
+        if broadcast:
+            _publish(self.namespace, "prefix", prefix)
+        return removed
+
+    def clear(self, broadcast: bool = True) -> None:
+        self._apply("clear", "")
+        if broadcast:
+            _publish(self.namespace, "clear", "")
+
+    def _apply(self, op: str, key: str, remote: bool = False) -> int:
+        try:
+            if op == "delete":
+                removed = int(self._backend.delete(key))
+            elif op == "prefix":
+                removed = self._backend.delete_prefix(key)
+            else:
+                self._backend.clear()
+                removed = 0
+        except Exception as e:
+            logger.warning("shared cache %s failed ns=%s: %s", op, self.namespace, e)
+            self._count("errors")
+            return 0
+        self._count("remote_invalidations" if remote else "invalidations")
+        return removed
+
+    def __len__(self) -> int:
+        try:
+            return self._backend.size()
+        except Exception:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else None
+        out["size"] = len(self)
+        out["backend"] = self.backend_name
+        return out
+
+
+_registry: Dict[str, SharedCache] = {}
+_registry_lock = threading.Lock()
+
+
+def get_cache(namespace: str, *, ttl_seconds: float, max_entries: int = 10000) -> SharedCache:
+    """Cache du namespace (créé au premier appel ; les appels suivants renvoient la même instance)."""
+    with _registry_lock:
+        cache = _registry.get(namespace)
+        if cache is None:
+            cache = _registry[namespace] = SharedCache(namespace, ttl_seconds, max_entries)
+    _ensure_listener()
+    return cache
+
+
+def stats() -> Dict[str, Any]:
+    """Stats de tous les namespaces + état du listener NOTIFY (pour /health). Aucune I/O hors SQLite local."""
+    with _registry_lock:
+        caches = list(_registry.values())
+    return {
+        "backend": _backend_name(),
+        "pg_notify": {"enabled": _notify_enabled(), **_listener_state},
+        "namespaces": {c.namespace: c.stats() for c in caches},
+    }
+
+
+# ---------- Invalidation inter-instances (PG LISTEN / NOTIFY) ----------
+
+_listener_lock = threading.Lock()
+_listener_thread: Optional[threading.Thread] = None
+_listener_state: Dict[str, Any] = {"connected": False, "received": 0, "published": 0, "reconnects": 0}
+
+
+def _publish(namespace: str, op: str, key: str) -> None:
+    if not _notify_enabled():
+        return
+    url = _pg_url()
+    if not url:
+        return
+    payload = json.dumps({"o": _ORIGIN, "ns": namespace, "op": op, "k": key}, separators=(",", ":"))
+    try:
+        from backend.pg_pool import pg_connection
+        with pg_connection(url) as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (_CHANNEL, payload))
+        _listener_state["published"] += 1
+    except Exception as e:
+        logger.warning("shared cache NOTIFY failed ns=%s op=%s: %s", namespace, op, e)
+
+
+def apply_remote_invalidation(payload: str) -> bool:
+    """Applique un NOTIFY reçu. Ignore les messages de ce process et les namespaces inconnus ici."""
+    try:
+        msg = json.loads(payload)
+    except (TypeError, ValueError):
+        return False
+    if not isinstance(msg, dict) or msg.get("o") == _ORIGIN:
+        return False
+    with _registry_lock:
+        cache = _registry.get(str(msg.get("ns") or ""))
+    if cache is None or msg.get("op") not in ("delete", "prefix", "clear"):
+        return False
+    cache._apply(msg["op"], str(msg.get("k") or ""), remote=True)
+    return True
+
+
+def _clear_memory_tiers() -> None:
+    with _registry_lock:
+        caches = [c for c in _registry.values() if c.backend_name == "memory"]
+    for cache in caches:
+        cache._apply("clear", "", remote=True)
+
+
+def _listen_loop(url: str) -> None:
+    import psycopg
+    backoff = 1.0
+    first = True
+    while True:
+        try:
+            with psycopg.connect(url, autocommit=True, connect_timeout=5) as conn:
+                conn.execute(f"LISTEN {_CHANNEL}")
+                _listener_state["connected"] = True
+                if not first:
+                    _listener_state["reconnects"] += 1
+                    _clear_memory_tiers()
+                first = False
+                backoff = 1.0
+                while True:
+                    for notify in conn.notifies(timeout=30.0):
+                        _listener_state["received"] += 1
+                        apply_remote_invalidation(notify.payload)
+                    conn.execute("SELECT 1")  # détecte une connexion morte
+        except Exception as e:
+            logger.warning("shared cache LISTEN interrompu: %s (retry %.0fs)", e, backoff)
+        _listener_state["connected"] = False
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60.0)
+
+
+def _ensure_listener() -> None:
+    global _listener_thread
+    if _listener_thread is not None or not _notify_enabled():
+        return
+    url = _pg_url()
+    if not url:
+        return
+    with _listener_lock:
+        if _listener_thread is None:
+            _listener_thread = threading.Thread(target=_listen_loop, args=(url,), name="shared-cache-listen", daemon=True)
+            _listener_thread.start()
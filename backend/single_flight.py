@@ -0,0 +1,110 @@
+# backend/single_flight.py
+"""
+Single-flight : une seule exécution en vol par clé ; les appels concurrents sur la même clé
+reçoivent le même Future (même résultat, même exception). La clé est libérée dès la fin de
+l'exécution — ce n'est pas un cache (le résultat est mis en cache par l'appelant s'il le souhaite).
+
+Compteurs par nom d'instance (exécutions lancées / requêtes fusionnées) : stats() et
+render_prometheus() (exposé par GET /metrics).
+"""
+from __future__ import annotations
+
+import threading
+import weakref
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_METRIC = "uwi_single_flight"
+_registry: "weakref.WeakSet[SingleFlight]" = weakref.WeakSet()
+
+
+class SingleFlight:
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        _registry.add(self)
+
+    def _claim(self, key: Hashable) -> Tuple[Future, bool]:
+        """(future, leader) : leader=True si l'appelant doit exécuter fn."""
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            self.leaders += 1
+            fut = self._calls[key] = Future()
+            fut.set_running_or_notify_cancel()
+            return fut, True
+
+    def _run(self, key: Hashable, fn: Callable[[], Any], fut: Future) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            fut.set_exception(e)
+            return
+        with self._lock:
+            self._calls.pop(key, None)
+        fut.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Exécute fn dans le thread appelant, ou attend l'exécution déjà en vol pour key."""
+        fut, leader = self._claim(key)
+        if leader:
+            self._run(key, fn, fut)
+        return fut.result(timeout=timeout)
+
+    def submit(self, key: Hashable, fn: Callable[[], Any], executor: Executor) -> Future:
+        """Lance fn sur executor (ou rejoint l'exécution en vol) sans bloquer."""
+        fut, leader = self._claim(key)
+        if leader:
+            try:
+                executor.submit(self._run, key, fn, fut)
+            except BaseException as e:
+                with self._lock:
+                    self._calls.pop(key, None)
+                fut.set_exception(e)
+        return fut
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """{nom: {inflight, leaders, coalesced}} ; instances de même nom additionnées."""
+    out: Dict[str, Dict[str, int]] = {}
+    for sf in list(_registry):
+        if not sf.name:
+            continue
+        d = out.setdefault(sf.name, {"inflight": 0, "leaders": 0, "coalesced": 0})
+        with sf._lock:
+            d["inflight"] += len(sf._calls)
+            d["leaders"] += sf.leaders
+            d["coalesced"] += sf.coalesced
+    return out
+
+
+def render_prometheus() -> str:
+    """Compteurs au format texte Prometheus 0.0.4."""
+    items = sorted(stats().items())
+    lines = [
+        f"# HELP {_METRIC}_leaders_total Exécutions réellement lancées",
+        f"# TYPE {_METRIC}_leaders_total counter",
+    ]
+    lines += [f'{_METRIC}_leaders_total{{flight="{name}"}} {d["leaders"]}' for name, d in items]
+    lines += [
+        f"# HELP {_METRIC}_coalesced_total Requêtes ayant rejoint une exécution déjà en vol",
+        f"# TYPE {_METRIC}_coalesced_total counter",
+    ]
+    lines += [f'{_METRIC}_coalesced_total{{flight="{name}"}} {d["coalesced"]}' for name, d in items]
+    lines += [
+        f"# HELP {_METRIC}_inflight Exécutions en cours",
+        f"# TYPE {_METRIC}_inflight gauge",
+    ]
+    lines += [f'{_METRIC}_inflight{{flight="{name}"}} {d["inflight"]}' for name, d in items]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,151 @@
+# backend/slot_engine.py
+"""
+Calcul des créneaux libres à partir de plages occupées.
+
+Les plages occupées sont triées et fusionnées une fois (BusyTimeline) ; la recherche d'un conflit
+est un bisect sur les fins de plages (O(log n)) au lieu d'un parcours de tous les events pour chaque
+créneau candidat. En cas de conflit, le balayage saute directement au premier point de la grille
+(pas = durée du RDV) après la plage occupée.
+
+iter_free_slots() est un générateur paresseux : l'appelant arrête dès qu'il a assez de créneaux.
+Filtres : durée, buffer après RDV, plage horaire (période / contrainte horaire via slot_window),
+limite par jour, prédicat libre (accept).
+Utilisé par GoogleCalendarService.get_free_slots / get_free_slots_range et par
+tools_booking._get_slots_from_google_calendar (fenêtre horaire).
+"""
+from __future__ import annotations
+
+import bisect
+import math
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Interval = Tuple[datetime, datetime]
+
+# Périodes UX (préférence exprimée par l'appelant) : (heure début, heure fin), intersectées avec les règles tenant
+PERIOD_HOURS = {
+    "matin": (9, 12),
+    "après-midi": (14, 18),
+    "soir": (18, 20),
+}
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Trie et fusionne les plages qui se chevauchent ou se touchent."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class BusyTimeline:
+    """Plages occupées fusionnées + index des fins pour bisect."""
+
+    __slots__ = ("intervals", "_ends")
+
+    def __init__(self, intervals: Iterable[Interval], merged: bool = False):
+        self.intervals: List[Interval] = list(intervals) if merged else merge_intervals(intervals)
+        self._ends = [end for _, end in self.intervals]
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    def conflict(self, start: datetime, end: datetime) -> Optional[Interval]:
+        """Première plage occupée qui chevauche [start, end), ou None."""
+        i = bisect.bisect_right(self._ends, start)
+        if i < len(self.intervals) and self.intervals[i][0] < end:
+            return self.intervals[i]
+        return None
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return self.conflict(start, end) is None
+
+    def between(self, start: datetime, end: datetime) -> List[Interval]:
+        """Plages occupées qui chevauchent [start, end)."""
+        out: List[Interval] = []
+        for i in range(bisect.bisect_right(self._ends, start), len(self.intervals)):
+            if self.intervals[i][0] >= end:
+                break
+            out.append(self.intervals[i])
+        return out
+
+
+def slot_window(
+    base_start: int,
+    base_end: int,
+    pref: Optional[str] = None,
+    preferred_minute: Optional[int] = None,
+    preferred_time_type: Optional[str] = None,
+) -> Tuple[int, int]:
+    """
+    Plage horaire (heure début, heure fin) à explorer : contrainte horaire explicite en priorité,
+    sinon période préférée, intersectée avec les heures d'ouverture du tenant.
+    """
+    if preferred_minute is not None and preferred_minute >= 0:
+        preferred_hour = preferred_minute // 60
+        constraint_type = (preferred_time_type or "").strip().lower()
+        if constraint_type == "before":
+            return base_start, min(base_end, max(base_start + 1, preferred_hour + 1))
+        if constraint_type == "exact":
+            start_hour = max(base_start, preferred_hour)
+            return start_hour, min(base_end, max(start_hour + 1, preferred_hour + 1))
+        if constraint_type == "after":
+            return max(base_start, preferred_hour), base_end
+        start_hour = max(base_start, preferred_hour)
+        return start_hour, min(base_end, max(start_hour + 1, preferred_hour + 3))
+    if pref in PERIOD_HOURS:
+        period_start, period_end = PERIOD_HOURS[pref]
+        return max(base_start, period_start), min(period_end, base_end)
+    return base_start, base_end
+
+
+def iter_free_slots(
+    busy: BusyTimeline,
+    days: Sequence[datetime],
+    *,
+    start_hour: int,
+    end_hour: int,
+    duration_minutes: int = 15,
+    buffer_minutes: int = 0,
+    per_day_limit: Optional[int] = None,
+    accept: Optional[Callable[[datetime], bool]] = None,
+) -> Iterator[Interval]:
+    """
+    Créneaux libres (début, fin) jour par jour, dans l'ordre chronologique de days.
+    Grille : day_start + k * durée. Un créneau est libre si [début, fin + buffer) ne chevauche
+    aucune plage occupée et tient avant l'heure de fin.
+    """
+    step = timedelta(minutes=duration_minutes)
+    step_sec = step.total_seconds()
+    if step_sec <= 0:
+        return
+    buffer_td = timedelta(minutes=int(buffer_minutes or 0))
+    for day in days:
+        day_start = day.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+        day_end = day.replace(hour=end_hour, minute=0, second=0, microsecond=0) if end_hour < 24 else (
+            day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        )
+        current = day_start
+        day_count = 0
+        while current < day_end:
+            slot_end = current + step
+            effective_end = slot_end + buffer_td
+            if effective_end > day_end:
+                break
+            hit = busy.conflict(current, effective_end)
+            if hit is not None:
+                # Tous les points de grille avant la fin de la plage occupée sont en conflit
+                k = math.ceil((hit[1] - day_start).total_seconds() / step_sec)
+                nxt = day_start + k * step
+                current = nxt if nxt > current else current + step
+                continue
+            if accept is None or accept(current):
+                yield current, slot_end
+                day_count += 1
+                if per_day_limit is not None and day_count >= per_day_limit:
+                    break
+            current += step
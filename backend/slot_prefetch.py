@@ -0,0 +1,154 @@
+# backend/slot_prefetch.py
+"""
+Préchargement prédictif des créneaux dès qu'un appel est vu (webhook assistant-request /
+status-update, ou premier tour chat/completions), pour que la liste soit en cache
+(tools_booking._slots_cache) quand l'appelant dit « je voudrais un rendez-vous ».
+
+Clé = (tenant résolu, préférence probable) :
+  - préférence historique du client (client_memory, preferred_time matin / aprem) si connue ;
+  - sinon sans préférence puis matin / après-midi (mêmes entrées que le warmup keep-alive).
+Un seul préchargement par call_id ; les calculs concurrents pour une même clé (autres appels,
+prefetch_slots_for_pref_question) partagent une seule exécution (SingleFlight).
+Désactivable : SLOT_PREFETCH_ENABLED=false (ou DISABLE_SLOT_CACHE).
+"""
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from backend.shared_cache import get_cache
+from backend.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_ENABLED = os.getenv("SLOT_PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes")
+_WORKERS = max(1, int(os.getenv("SLOT_PREFETCH_WORKERS", "4") or 4))
+_LIMIT = 3
+
+# preferred_time client_memory → pref get_slots_for_display
+_CLIENT_PREF = {"matin": "matin", "aprem": "après-midi", "après-midi": "après-midi"}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_flights = SingleFlight("slot_prefetch")
+# call_id déjà préchargé (partagé entre workers selon SHARED_CACHE_BACKEND)
+_seen_calls = get_cache("slot_prefetch_calls", ttl_seconds=900, max_entries=20000)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_WORKERS, thread_name_prefix="slot-prefetch")
+    return _executor
+
+
+def enabled() -> bool:
+    from backend import tools_booking
+    return _ENABLED and not tools_booking._DISABLE_SLOT_CACHE
+
+
+def historical_pref(tenant_id: int, customer_phone: Optional[str]) -> Optional[str]:
+    """Préférence horaire habituelle du client (matin / après-midi) ou None."""
+    if not customer_phone:
+        return None
+    try:
+        from backend.client_memory import get_client_memory
+        client = get_client_memory().get_by_phone(customer_phone, tenant_id=tenant_id)
+    except Exception as e:
+        logger.debug("[SLOT_PREFETCH] client lookup failed tenant_id=%s: %s", tenant_id, e)
+        return None
+    return _CLIENT_PREF.get((getattr(client, "preferred_time", None) or "").strip().lower()) if client else None
+
+
+def likely_prefs(tenant_id: int, customer_phone: Optional[str] = None) -> List[Optional[str]]:
+    """Préférences à précharger, la plus probable en premier."""
+    pref = historical_pref(tenant_id, customer_phone)
+    if pref:
+        return [pref, None]
+    return [None, "matin", "après-midi"]
+
+
+def _compute(tenant_id: int, pref: Optional[str], refresh: bool = False) -> List[Any]:
+    from backend import tools_booking
+    from backend.session import Session
+
+    if not refresh:
+        cached = tools_booking._get_cached_slots(_LIMIT, tenant_id, pref=pref)
+        if cached:
+            return cached
+    s = Session(conv_id=f"__prefetch_{tenant_id}__")
+    s.tenant_id = tenant_id
+    return tools_booking.get_slots_for_display(limit=_LIMIT, pref=pref, session=s, refresh=refresh)
+
+
+def fetch(tenant_id: int, pref: Optional[str], timeout: Optional[float] = None) -> List[Any]:
+    """Créneaux (tenant, pref) sans contrainte ; rejoint le calcul déjà en vol pour cette clé."""
+    return _flights.do((int(tenant_id), pref), lambda: _compute(int(tenant_id), pref), timeout=timeout)
+
+
+def refresh(tenant_id: int, pref: Optional[str]) -> List[Any]:
+    """Recalcule (tenant, pref) en ignorant le cache puis le réécrit (warmup) ; même clé single-flight que fetch."""
+    return _flights.do((int(tenant_id), pref), lambda: _compute(int(tenant_id), pref, refresh=True))
+
+
+def prefetch(tenant_id: int, prefs: List[Optional[str]]) -> Dict[Optional[str], Future]:
+    """Lance (ou rejoint) le calcul de chaque pref en arrière-plan ; ne bloque pas."""
+    tid = int(tenant_id)
+    return {
+        pref: _flights.submit((tid, pref), lambda p=pref: _compute(tid, p), _get_executor())
+        for pref in prefs
+    }
+
+
+def prefetch_for_call(tenant_id: int, call_id: str = "", customer_phone: Optional[str] = None) -> bool:
+    """
+    Début d'appel : précharge en arrière-plan les créneaux probables du tenant (une fois par call_id).
+    La recherche de la préférence historique se fait aussi en arrière-plan. True si lancé.
+    """
+    if not enabled() or not tenant_id:
+        return False
+    if call_id:
+        if _seen_calls.get(call_id):
+            return False
+        _seen_calls.set(call_id, 1)
+
+    def _plan() -> None:
+        prefs = likely_prefs(int(tenant_id), customer_phone)
+        logger.info("[SLOT_PREFETCH] call_id=%s tenant_id=%s prefs=%s", (call_id or "")[:24], tenant_id, prefs)
+        prefetch(int(tenant_id), prefs)
+
+    try:
+        _get_executor().submit(_plan)
+    except RuntimeError as e:  # executor arrêté (shutdown)
+        logger.debug("[SLOT_PREFETCH] submit failed: %s", e)
+        return False
+    return True
+
+
+def prefetch_for_vapi_payload(payload: dict) -> bool:
+    """Webhook Vapi (assistant-request / status-update) : tenant + appelant résolus en arrière-plan."""
+    if not enabled() or not isinstance(payload, dict):
+        return False
+    message = payload.get("message") or {}
+    call_id = (message.get("call") or {}).get("id") or (payload.get("call") or {}).get("id") or ""
+    if not call_id or _seen_calls.get(call_id):
+        return False
+
+    def _resolve() -> None:
+        try:
+            from backend.tenant_routing import (
+                extract_customer_phone_from_vapi_payload,
+                resolve_tenant_id_from_vapi_payload,
+            )
+            tenant_id, _ = resolve_tenant_id_from_vapi_payload(payload, channel="vocal")
+            prefetch_for_call(tenant_id, call_id, extract_customer_phone_from_vapi_payload(payload))
+        except Exception as e:
+            logger.debug("[SLOT_PREFETCH] payload resolve failed call_id=%s: %s", call_id[:24], e)
+
+    try:
+        _get_executor().submit(_resolve)
+    except RuntimeError as e:
+        logger.debug("[SLOT_PREFETCH] submit failed: %s", e)
+        return False
+    return True
@@ -11,6 +11,8 @@ import os
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from backend.pg_pool import pg_connection
+
 logger = logging.getLogger(__name__)
 
 SLOT_TIMES = ["10:00", "14:00", "16:00"]
@@ -61,9 +63,7 @@ def pg_list_free_slots(
         time_cond = " AND EXTRACT(HOUR FROM start_ts AT TIME ZONE 'Europe/Paris') >= 18"
 
     def _query() -> Optional[List[Dict[str, Any]]]:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
+        with pg_connection(url) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     f"""
@@ -113,8 +113,8 @@ def pg_find_slot_id_by_datetime(
     if not url:
         return None
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 # start_ts format: timestamp, on compare date+time
                 cur.execute(
@@ -148,8 +148,8 @@ def pg_ensure_slot_id_by_datetime(
         return None
 
     def _do() -> Optional[int]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -192,8 +192,8 @@ def pg_count_free_slots(tenant_id: int) -> Optional[int]:
         return None
 
     def _query() -> Optional[int]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -234,8 +234,8 @@ def pg_book_slot_atomic(
         return None
 
     def _do() -> Optional[bool]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -279,9 +279,7 @@ def pg_find_booking_by_name(tenant_id: int, name: str) -> Optional[Dict[str, Any
         return None
 
     def _query() -> Optional[Dict[str, Any]]:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
+        with pg_connection(url) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -332,8 +330,8 @@ def pg_cancel_booking(tenant_id: int, booking: Dict[str, Any]) -> Optional[bool]
         return None
 
     def _do() -> Optional[bool]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 sid = slot_id
                 if sid is None and appt_id is not None:
@@ -387,8 +385,8 @@ def pg_reschedule_booking_atomic(tenant_id: int, appt_id: int, new_slot_id: int)
         return None
 
     def _do() -> Optional[bool]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -461,9 +459,9 @@ def pg_cleanup_and_ensure_slots(tenant_id: int) -> Optional[bool]:
         return None
 
     def _do() -> Optional[bool]:
-        import psycopg
+        from psycopg.rows import tuple_row
         from datetime import timedelta
-        with psycopg.connect(url) as conn:
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
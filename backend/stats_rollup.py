@@ -0,0 +1,612 @@
+# backend/stats_rollup.py
+"""
+Rollups journaliers pour les dashboards admin / tenant et l'export KPI hebdo : les endpoints
+lisent des agrégats (tenant, jour) au lieu de COUNT(DISTINCT call_id) / GROUP BY event sur
+ivr_events et vapi_call_usage bruts à chaque chargement.
+
+Tables (PG : migrations/033_stats_rollup_daily.sql, aussi créées à la volée ; SQLite : à la volée) :
+  ivr_events_daily(client_id, day, event, events, calls, last_at)
+      events = nb d'events, calls = nb d'appels distincts ayant l'event ce jour-là.
+      Lignes synthétiques : __all__ (tous events ; calls = appels distincts du jour),
+      __abandon__ / __transfer__ (appels ayant un des alias), __refuse_booked__ (appels ayant
+      slot_refuse_pref_asked ET booking_confirmed).
+  stats_daily(tenant_id, day, metric, value) — PG seulement :
+      vapi_calls (jour de started_at), usage_sec / usage_cost_usd / usage_calls (vapi_call_usage,
+      jour de ended_at), session_minutes (call_sessions, plafond MAX_SESSION_MINUTES par session).
+  stats_rollup_watermarks(source, watermark)
+
+Maintenance :
+  - refresh() (run_forever au startup, scripts/rollup_stats.py) : les (tenant, jour) touchés depuis
+    le watermark de chaque source (moins ROLLUP_LAG_S pour les commits tardifs) sont recalculés
+    depuis les tables brutes, puis le watermark avance. Premier passage = backfill ROLLUP_BACKFILL_DAYS.
+  - record_event() à l'écriture d'un ivr_event : incrémente events / last_at du jour dans la même
+    transaction ; les appels distincts (calls) sont corrigés au refresh suivant.
+Lecture : bascule par source dès que ready(source) (premier refresh terminé). Jours = dates UTC,
+bornes incluses.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from backend.pg_pool import pg_connection
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("STATS_ROLLUP_ENABLED", "true").lower() in ("1", "true", "yes")
+INTERVAL_S = float(os.getenv("ROLLUP_INTERVAL_S", "60") or 60)
+LAG_S = float(os.getenv("ROLLUP_LAG_S", "120") or 120)
+BACKFILL_DAYS = int(os.getenv("ROLLUP_BACKFILL_DAYS", "120") or 120)
+
+# Alias d'events (mêmes listes que routes/admin et scripts/export_weekly_kpis)
+ABANDON_EVENTS = ("user_abandon", "abandon", "hangup", "user_hangup")
+TRANSFER_EVENTS = ("transferred_human", "transferred", "transfer_human", "transfer")
+ALL = "__all__"
+ABANDON = "__abandon__"
+TRANSFER = "__transfer__"
+REFUSE_BOOKED = "__refuse_booked__"
+_GROUPS = {ABANDON: ABANDON_EVENTS, TRANSFER: TRANSFER_EVENTS}
+_REFUSE_BOOKED_PAIR = ("slot_refuse_pref_asked", "booking_confirmed")
+
+MAX_SESSION_MINUTES = 6 * 60
+
+IVR_SOURCE = "ivr_events"
+# Sources PG → stats_daily : table, colonne jour, filtre, {metric: agrégat}. Watermark = updated_at.
+METRIC_SOURCES: Dict[str, Dict[str, Any]] = {
+    "vapi_calls": {
+        "day": "COALESCE(started_at, created_at)",
+        "where": "TRUE",
+        "metrics": {"vapi_calls": "COUNT(DISTINCT call_id)"},
+    },
+    "vapi_call_usage": {
+        "day": "ended_at",
+        "where": "ended_at IS NOT NULL",
+        "metrics": {
+            "usage_sec": "COALESCE(SUM(duration_sec), 0)",
+            "usage_cost_usd": "COALESCE(SUM(cost_usd), 0)",
+            "usage_calls": "COUNT(*)",
+        },
+    },
+    "call_sessions": {
+        "day": "started_at",
+        "where": "TRUE",
+        "metrics": {
+            "session_minutes": (
+                "COALESCE(SUM(LEAST(GREATEST(EXTRACT(EPOCH FROM (updated_at - started_at)) / 60.0, 0), "
+                f"{MAX_SESSION_MINUTES})), 0)"
+            ),
+        },
+    },
+}
+
+_PG_DDL = """
+CREATE TABLE IF NOT EXISTS ivr_events_daily (
+    client_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    event TEXT NOT NULL,
+    events BIGINT NOT NULL DEFAULT 0,
+    calls BIGINT NOT NULL DEFAULT 0,
+    last_at TIMESTAMPTZ,
+    PRIMARY KEY (client_id, day, event)
+);
+CREATE INDEX IF NOT EXISTS idx_ivr_events_daily_day ON ivr_events_daily (day, event);
+CREATE TABLE IF NOT EXISTS stats_daily (
+    tenant_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    metric TEXT NOT NULL,
+    value DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant_id, day, metric)
+);
+CREATE INDEX IF NOT EXISTS idx_stats_daily_day ON stats_daily (day, metric);
+CREATE TABLE IF NOT EXISTS stats_rollup_watermarks (
+    source TEXT PRIMARY KEY,
+    watermark TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+_SQLITE_DDL = (
+    """CREATE TABLE IF NOT EXISTS ivr_events_daily (
+        client_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        event TEXT NOT NULL,
+        events INTEGER NOT NULL DEFAULT 0,
+        calls INTEGER NOT NULL DEFAULT 0,
+        last_at TEXT,
+        PRIMARY KEY (client_id, day, event)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_ivr_events_daily_day ON ivr_events_daily (day, event)",
+    """CREATE TABLE IF NOT EXISTS stats_rollup_watermarks (
+        source TEXT PRIMARY KEY,
+        watermark TEXT NOT NULL,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_ivr_events_created ON ivr_events (created_at)",
+)
+
+_pg_tables_ready = False
+_ready_lock = threading.Lock()
+# (backend, source) → True, ou monotonic du dernier contrôle négatif
+_ready: Dict[Tuple[str, str], Any] = {}
+_READY_RECHECK_S = 30.0
+_last_run: Dict[str, Any] = {}
+
+
+# ---------- Connexion / dialecte ----------
+
+def _pg_url() -> Optional[str]:
+    return os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
+
+
+def _backend_key(is_pg: bool) -> str:
+    if is_pg:
+        return "pg"
+    from backend import db
+    return f"sqlite:{db.DB_PATH}"
+
+
+def ensure_pg_tables(conn) -> None:
+    global _pg_tables_ready
+    if _pg_tables_ready:
+        return
+    with conn.cursor() as cur:
+        for stmt in _PG_DDL.strip().split(";"):
+            if stmt.strip():
+                cur.execute(stmt)
+    _pg_tables_ready = True
+
+
+def ensure_sqlite_tables(conn) -> None:
+    for stmt in _SQLITE_DDL:
+        conn.execute(stmt)
+
+
+@contextmanager
+def connect() -> Iterator[Tuple[Any, bool]]:
+    """(conn, is_pg) : PG si DATABASE_URL / PG_EVENTS_URL (comme les dashboards), sinon SQLite."""
+    url = _pg_url()
+    if url:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
+            ensure_pg_tables(conn)
+            yield conn, True
+        return
+    from backend import db
+    conn = db.get_conn()
+    try:
+        db._ensure_ivr_tables(conn)
+        ensure_sqlite_tables(conn)
+        yield conn, False
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _maybe_connect(conn: Any = None, is_pg: Optional[bool] = None) -> Iterator[Tuple[Any, bool]]:
+    if conn is not None:
+        if not is_pg:
+            ensure_sqlite_tables(conn)
+        yield conn, bool(is_pg)
+        return
+    with connect() as pair:
+        yield pair
+
+
+def _exec(conn: Any, is_pg: bool, sql: str, params: Sequence[Any] = ()) -> Any:
+    """Requête écrite avec '?' pour les deux backends."""
+    if is_pg:
+        cur = conn.cursor()
+        cur.execute(sql.replace("?", "%s"), tuple(params))
+        return cur
+    return conn.execute(sql, tuple(params))
+
+
+def _in(values: Sequence[Any]) -> str:
+    return ",".join("?" * len(values))
+
+
+def _day(value: Any) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _day_param(d: date, is_pg: bool) -> Any:
+    return d if is_pg else d.isoformat()
+
+
+def _day_bounds(d: date, is_pg: bool) -> Tuple[str, str]:
+    """[00:00, 00:00 lendemain[ en UTC (PG timestamptz) / texte UTC naïf (SQLite)."""
+    fmt = "%Y-%m-%d 00:00:00+00" if is_pg else "%Y-%m-%d 00:00:00"
+    return d.strftime(fmt), (d + timedelta(days=1)).strftime(fmt)
+
+
+def _day_expr(col: str, is_pg: bool) -> str:
+    return f"DATE({col} AT TIME ZONE 'UTC')" if is_pg else f"date({col})"
+
+
+def _ts_param(ts: datetime, is_pg: bool) -> Any:
+    if is_pg:
+        return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    return ts.replace(tzinfo=None).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _parse_ts(value: Any) -> Optional[datetime]:
+    """datetime UTC aware (les horodatages SQLite naïfs sont en UTC)."""
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# ---------- Watermarks ----------
+
+def _get_watermark(conn: Any, is_pg: bool, source: str) -> Optional[datetime]:
+    row = _exec(conn, is_pg, "SELECT watermark FROM stats_rollup_watermarks WHERE source = ?", (source,)).fetchone()
+    return _parse_ts(row[0]) if row else None
+
+
+def _set_watermark(conn: Any, is_pg: bool, source: str, wm: datetime) -> None:
+    _exec(
+        conn, is_pg,
+        """INSERT INTO stats_rollup_watermarks (source, watermark) VALUES (?, ?)
+           ON CONFLICT (source) DO UPDATE SET watermark = excluded.watermark, updated_at = CURRENT_TIMESTAMP""",
+        (source, wm.isoformat(sep=" ")),
+    )
+
+
+def ready(source: str = IVR_SOURCE, conn: Any = None, is_pg: Optional[bool] = None) -> bool:
+    """True dès que la source a été agrégée au moins une fois (watermark posé) sur ce backend."""
+    if not ENABLED:
+        return False
+    pg = bool(_pg_url()) if is_pg is None else bool(is_pg)
+    key = (_backend_key(pg), source)
+    with _ready_lock:
+        state = _ready.get(key)
+    if state is True:
+        return True
+    if state is not None and time.monotonic() - state < _READY_RECHECK_S:
+        return False
+    try:
+        with _maybe_connect(conn, is_pg) as (c, pg):
+            ok = _get_watermark(c, pg, source) is not None
+    except Exception as e:
+        logger.debug("stats_rollup ready(%s): %s", source, e)
+        ok = False
+    with _ready_lock:
+        _ready[key] = True if ok else time.monotonic()
+    return ok
+
+
+def reset_ready() -> None:
+    with _ready_lock:
+        _ready.clear()
+
+
+# ---------- Recalcul ----------
+
+def _rebuild_ivr_day(conn: Any, is_pg: bool, d: date, tenants: Sequence[int]) -> int:
+    lo, hi = _day_bounds(d, is_pg)
+    tids = sorted({int(t) for t in tenants})
+    base = f"FROM ivr_events WHERE client_id IN ({_in(tids)}) AND created_at >= ? AND created_at < ?"
+    params = [*tids, lo, hi]
+    distinct_calls = "COUNT(DISTINCT NULLIF(TRIM(call_id), ''))"
+    rows: List[Tuple[Any, ...]] = []
+    for r in _exec(
+        conn, is_pg,
+        f"SELECT client_id, event, COUNT(*), {distinct_calls}, MAX(created_at) {base} GROUP BY client_id, event",
+        params,
+    ).fetchall():
+        rows.append((r[0], r[1], r[2], r[3], r[4]))
+    for r in _exec(
+        conn, is_pg, f"SELECT client_id, COUNT(*), {distinct_calls}, MAX(created_at) {base} GROUP BY client_id", params,
+    ).fetchall():
+        rows.append((r[0], ALL, r[1], r[2], r[3]))
+    for name, evs in _GROUPS.items():
+        for r in _exec(
+            conn, is_pg,
+            f"SELECT client_id, COUNT(*), {distinct_calls}, MAX(created_at) {base} AND event IN ({_in(evs)}) GROUP BY client_id",
+            [*params, *evs],
+        ).fetchall():
+            rows.append((r[0], name, r[1], r[2], r[3]))
+    for r in _exec(
+        conn, is_pg,
+        f"""SELECT client_id, COUNT(*) FROM (
+                SELECT client_id, call_id {base} AND event IN (?, ?) AND TRIM(call_id) != ''
+                GROUP BY client_id, call_id HAVING COUNT(DISTINCT event) = 2
+            ) x GROUP BY client_id""",
+        [*params, *_REFUSE_BOOKED_PAIR],
+    ).fetchall():
+        rows.append((r[0], REFUSE_BOOKED, r[1], r[1], None))
+
+    _exec(conn, is_pg, f"DELETE FROM ivr_events_daily WHERE day = ? AND client_id IN ({_in(tids)})", [_day_param(d, is_pg), *tids])
+    if rows:
+        sql = "INSERT INTO ivr_events_daily (client_id, day, event, events, calls, last_at) VALUES (?, ?, ?, ?, ?, ?)"
+        values = [(cid, _day_param(d, is_pg), ev, int(n or 0), int(c or 0), last) for cid, ev, n, c, last in rows]
+        if is_pg:
+            with conn.cursor() as cur:
+                cur.executemany(sql.replace("?", "%s"), values)
+        else:
+            conn.executemany(sql, values)
+    return len(rows)
+
+
+def _rebuild_metric_day(conn: Any, source: str, d: date, tenants: Sequence[int]) -> int:
+    spec = METRIC_SOURCES[source]
+    lo, hi = _day_bounds(d, True)
+    tids = sorted({int(t) for t in tenants})
+    metrics = list(spec["metrics"].items())
+    aggs = ", ".join(expr for _, expr in metrics)
+    found = _exec(
+        conn, True,
+        f"""SELECT tenant_id, {aggs} FROM {source}
+            WHERE tenant_id IN ({_in(tids)}) AND {spec['where']} AND {spec['day']} >= ? AND {spec['day']} < ?
+            GROUP BY tenant_id""",
+        [*tids, lo, hi],
+    ).fetchall()
+    names = [m for m, _ in metrics]
+    _exec(
+        conn, True,
+        f"DELETE FROM stats_daily WHERE day = ? AND tenant_id IN ({_in(tids)}) AND metric IN ({_in(names)})",
+        [d, *tids, *names],
+    )
+    values = [(r[0], d, name, float(r[i + 1] or 0)) for r in found for i, name in enumerate(names)]
+    if values:
+        with conn.cursor() as cur:
+            cur.executemany("INSERT INTO stats_daily (tenant_id, day, metric, value) VALUES (%s, %s, %s, %s)", values)
+    return len(values)
+
+
+def _dirty(conn: Any, is_pg: bool, source: str, since: datetime) -> Tuple[Dict[date, List[int]], Optional[datetime]]:
+    """{jour: [tenants]} touchés depuis since, + max(colonne watermark) vue."""
+    if source == IVR_SOURCE:
+        table, tenant_col, ts_col, day_col, where = "ivr_events", "client_id", "created_at", "created_at", "1=1"
+    else:
+        spec = METRIC_SOURCES[source]
+        table, tenant_col, ts_col, day_col, where = source, "tenant_id", "updated_at", spec["day"], spec["where"]
+    param = _ts_param(since, is_pg)
+    rows = _exec(
+        conn, is_pg,
+        f"SELECT DISTINCT {tenant_col}, {_day_expr(day_col, is_pg)} FROM {table} WHERE {ts_col} > ? AND {where}",
+        (param,),
+    ).fetchall()
+    max_row = _exec(conn, is_pg, f"SELECT MAX({ts_col}) FROM {table} WHERE {ts_col} > ?", (param,)).fetchone()
+    out: Dict[date, List[int]] = {}
+    for tid, d in rows:
+        if tid is not None and d is not None:
+            out.setdefault(_day(d), []).append(int(tid))
+    return out, _parse_ts(max_row[0]) if max_row else None
+
+
+def refresh_source(source: str, backfill_days: int = BACKFILL_DAYS, rebuild: bool = False) -> Dict[str, Any]:
+    """Recalcule les jours touchés d'une source et avance son watermark (une transaction)."""
+    now = datetime.now(timezone.utc)
+    with connect() as (conn, is_pg):
+        if source != IVR_SOURCE and not is_pg:
+            return {"source": source, "skipped": "pg_only"}
+        if is_pg:
+            got = _exec(conn, True, "SELECT pg_try_advisory_xact_lock(hashtext(?))", (f"stats_rollup:{source}",)).fetchone()
+            if not got or not got[0]:
+                return {"source": source, "skipped": "locked"}
+        wm = None if rebuild else _get_watermark(conn, is_pg, source)
+        since = (wm - timedelta(seconds=LAG_S)) if wm else now - timedelta(days=backfill_days)
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        dirty, max_ts = _dirty(conn, is_pg, source, since)
+        rows = 0
+        for d, tenants in sorted(dirty.items()):
+            if source == IVR_SOURCE:
+                rows += _rebuild_ivr_day(conn, is_pg, d, tenants)
+            else:
+                rows += _rebuild_metric_day(conn, source, d, tenants)
+        new_wm = max(x for x in (wm, max_ts, since) if x is not None)
+        _set_watermark(conn, is_pg, source, new_wm)
+    with _ready_lock:
+        _ready[(_backend_key(is_pg), source)] = True
+    return {"source": source, "days": len(dirty), "tenant_days": sum(len(t) for t in dirty.values()), "rows": rows}
+
+
+def refresh(backfill_days: int = BACKFILL_DAYS, rebuild: bool = False) -> Dict[str, Any]:
+    """Un passage sur toutes les sources (chacune dans sa transaction ; une source absente n'arrête pas les autres)."""
+    t0 = time.monotonic()
+    sources = [IVR_SOURCE] + (list(METRIC_SOURCES) if _pg_url() else [])
+    results = []
+    for source in sources:
+        try:
+            results.append(refresh_source(source, backfill_days=backfill_days, rebuild=rebuild))
+        except Exception as e:
+            logger.warning("stats_rollup refresh %s failed: %s", source, e)
+            results.append({"source": source, "error": str(e)[:200]})
+    summary = {"sources": results, "duration_ms": round((time.monotonic() - t0) * 1000, 1), "at": time.time()}
+    _last_run.clear()
+    _last_run.update(summary)
+    return summary
+
+
+def stats() -> Dict[str, Any]:
+    return dict(_last_run)
+
+
+async def run_forever(initial_delay_s: float = 5.0) -> None:
+    """Job de fond (startup) : refresh toutes les ROLLUP_INTERVAL_S secondes."""
+    await asyncio.sleep(initial_delay_s)
+    while True:
+        try:
+            await asyncio.to_thread(refresh)
+        except Exception as e:
+            logger.warning("stats_rollup cycle failed: %s", e)
+        await asyncio.sleep(INTERVAL_S)
+
+
+# ---------- Écriture (incréments du jour) ----------
+
+_RECORD_PG = """
+INSERT INTO ivr_events_daily (client_id, day, event, events, calls, last_at)
+VALUES (?, DATE(?::timestamptz AT TIME ZONE 'UTC'), ?, 1, ?, ?::timestamptz)
+ON CONFLICT (client_id, day, event) DO UPDATE SET
+    events = ivr_events_daily.events + 1,
+    last_at = GREATEST(ivr_events_daily.last_at, EXCLUDED.last_at)
+"""
+_RECORD_SQLITE = """
+INSERT INTO ivr_events_daily (client_id, day, event, events, calls, last_at)
+VALUES (?, date(?), ?, 1, ?, ?)
+ON CONFLICT (client_id, day, event) DO UPDATE SET
+    events = ivr_events_daily.events + 1,
+    last_at = max(COALESCE(ivr_events_daily.last_at, ''), excluded.last_at)
+"""
+
+
+def record_event(conn: Any, is_pg: bool, client_id: int, call_id: str, event: str, created_at: Optional[str] = None) -> None:
+    """
+    Incrément à l'écriture d'un ivr_event (même connexion / transaction que l'INSERT).
+    calls vaut 1 à la création de la ligne du jour, puis n'est corrigé que par refresh().
+    """
+    ts = created_at or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+    if is_pg:
+        ensure_pg_tables(conn)
+        if "+" not in ts[10:] and not ts.endswith("Z"):
+            ts = ts + "+00"
+    else:
+        ensure_sqlite_tables(conn)
+    first_call = 1 if (call_id or "").strip() else 0
+    sql = _RECORD_PG if is_pg else _RECORD_SQLITE
+    keys = [event, ALL] + [name for name, evs in _GROUPS.items() if event in evs]
+    for key in keys:
+        _exec(conn, is_pg, sql, (client_id, ts, key, first_call, ts))
+
+
+# ---------- Lecture ----------
+
+def _window(start_day: Any, end_day: Any, is_pg: bool) -> Tuple[Any, Any]:
+    return _day_param(_day(start_day), is_pg), _day_param(_day(end_day), is_pg)
+
+
+def _key_col(by: Optional[str], tenant_col: str) -> Optional[str]:
+    if by is None:
+        return None
+    if by == "day":
+        return "day"
+    if by == "tenant":
+        return tenant_col
+    raise ValueError(f"by={by!r}")
+
+
+def event_counts(
+    start_day: Any,
+    end_day: Any,
+    tenant_id: Optional[int] = None,
+    by: Optional[str] = None,
+    events: Optional[Iterable[str]] = None,
+    conn: Any = None,
+    is_pg: Optional[bool] = None,
+) -> Dict[Any, Dict[str, Tuple[int, int]]]:
+    """
+    {clé: {event: (events, calls)}} sur [start_day, end_day]. clé = None, jour 'YYYY-MM-DD'
+    (by="day") ou tenant_id (by="tenant"). calls additionnés jour par jour.
+    """
+    with _maybe_connect(conn, is_pg) as (c, pg):
+        lo, hi = _window(start_day, end_day, pg)
+        where, params = "day >= ? AND day <= ?", [lo, hi]
+        if tenant_id is not None:
+            where += " AND client_id = ?"
+            params.append(int(tenant_id))
+        evs = list(events or [])
+        if evs:
+            where += f" AND event IN ({_in(evs)})"
+            params += evs
+        key = _key_col(by, "client_id")
+        select_key = f"{key}, " if key else ""
+        group = f"{key}, event" if key else "event"
+        rows = _exec(
+            c, pg,
+            f"SELECT {select_key}event, SUM(events), SUM(calls) FROM ivr_events_daily WHERE {where} GROUP BY {group}",
+            params,
+        ).fetchall()
+    out: Dict[Any, Dict[str, Tuple[int, int]]] = {}
+    for r in rows:
+        k, rest = (None, r) if not key else ((str(r[0])[:10] if by == "day" else int(r[0])), r[1:])
+        out.setdefault(k, {})[rest[0]] = (int(rest[1] or 0), int(rest[2] or 0))
+    return out
+
+
+def metric_sums(
+    metrics: Iterable[str],
+    start_day: Any,
+    end_day: Any,
+    tenant_id: Optional[int] = None,
+    by: Optional[str] = None,
+) -> Dict[Any, Dict[str, float]]:
+    """{clé: {metric: somme}} depuis stats_daily (PG) ; {} hors PG."""
+    names = list(metrics)
+    if not _pg_url() or not names:
+        return {}
+    with connect() as (c, pg):
+        lo, hi = _window(start_day, end_day, pg)
+        where, params = f"day >= ? AND day <= ? AND metric IN ({_in(names)})", [lo, hi, *names]
+        if tenant_id is not None:
+            where += " AND tenant_id = ?"
+            params.append(int(tenant_id))
+        key = _key_col(by, "tenant_id")
+        select_key = f"{key}, " if key else ""
+        group = f"{key}, metric" if key else "metric"
+        rows = _exec(c, pg, f"SELECT {select_key}metric, SUM(value) FROM stats_daily WHERE {where} GROUP BY {group}", params).fetchall()
+    out: Dict[Any, Dict[str, float]] = {}
+    for r in rows:
+        k, rest = (None, r) if not key else ((str(r[0])[:10] if by == "day" else int(r[0])), r[1:])
+        out.setdefault(k, {})[rest[0]] = float(rest[1] or 0)
+    return out
+
+
+def last_activity(start_day: Any, end_day: Any, tenant_id: Optional[int] = None) -> Optional[str]:
+    """Dernier ivr_event de la fenêtre (ISO 'Z'), depuis les lignes __all__."""
+    with connect() as (c, pg):
+        lo, hi = _window(start_day, end_day, pg)
+        where, params = "day >= ? AND day <= ? AND event = ?", [lo, hi, ALL]
+        if tenant_id is not None:
+            where += " AND client_id = ?"
+            params.append(int(tenant_id))
+        row = _exec(c, pg, f"SELECT MAX(last_at) FROM ivr_events_daily WHERE {where}", params).fetchone()
+    value = row[0] if row else None
+    if not value:
+        return None
+    if hasattr(value, "isoformat"):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.isoformat() + "Z"
+    return str(value)
+
+
+def window_days(window: int, now: Optional[datetime] = None) -> Tuple[str, str]:
+    """Fenêtre dashboard « N derniers jours » (start = J-N 00:00 UTC) → (premier jour, aujourd'hui)."""
+    now = now or datetime.utcnow()
+    return (now - timedelta(days=window)).strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d")
+
+
+def aligned_days(start: Any, end: Any) -> Optional[Tuple[str, str]]:
+    """Fenêtre [start, end[ alignée sur minuit UTC → (premier jour, dernier jour inclus) ; None sinon."""
+    bounds = []
+    for value in (start, end):
+        text = str(value).strip().replace("T", " ").rstrip("Z")
+        if text[10:].strip(" :0.").lstrip("+"):  # heure (ou décalage) non nulle
+            return None
+        try:
+            bounds.append(date.fromisoformat(text[:10]))
+        except ValueError:
+            return None
+    first, last = bounds[0], bounds[1] - timedelta(days=1)
+    if last < first:
+        return None
+    return first.isoformat(), last.isoformat()
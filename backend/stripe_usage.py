@@ -5,17 +5,38 @@ Cron 01:00 UTC recommandé pour push_daily_usage_to_stripe(yesterday).
 Deux chemins possibles (env STRIPE_USE_METER_EVENTS) :
 - false (default) : UsageRecord.create (legacy, subscription item metered).
 - true : billing.MeterEvent.create (event_name=STRIPE_METER_EVENT_NAME, payload value + stripe_customer_id).
+
+Pipeline (push_usage_to_stripe) : agrégat usage par jour, billing de tous les tenants en 1 requête,
+réservation idempotente en 1 INSERT ... SELECT unnest, appels Stripe concurrents
+(STRIPE_USAGE_PUSH_WORKERS, défaut 8) derrière un token bucket (STRIPE_USAGE_RATE_PER_S, défaut 20 ;
+429 → retry backoff, STRIPE_USAGE_MAX_RETRIES), résultats sent/failed écrits en 1 UPDATE par date.
 """
 from __future__ import annotations
 
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
-from decimal import Decimal
-from typing import List, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from backend.pg_pool import pg_connection
+from backend.token_bucket import TokenBucket
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+_WORKERS = max(1, int(os.getenv("STRIPE_USAGE_PUSH_WORKERS", "8") or 8))
+_RATE_PER_S = float(os.getenv("STRIPE_USAGE_RATE_PER_S", "20") or 20)
+_MAX_RETRIES = max(0, int(os.getenv("STRIPE_USAGE_MAX_RETRIES", "3") or 3))
+_RETRY_BASE_S = 0.5
+
+_limiter: Optional[TokenBucket] = None
+_limiter_lock = threading.Lock()
+
 # --- Env optionnelles pour Stripe Meters (nouvelle UI) ---
 def _stripe_meter_event_name() -> str:
     return (os.environ.get("STRIPE_METER_EVENT_NAME") or "uwi.minutes").strip() or "uwi.minutes"
@@ -34,98 +55,128 @@ def _pg_events_url() -> str | None:
     return os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL")
 
 
-def try_acquire_usage_push(tenant_id: int, date_utc: date, quantity_minutes: int) -> bool:
+def _get_limiter() -> TokenBucket:
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = TokenBucket(_RATE_PER_S)
+        return _limiter
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    return getattr(e, "http_status", None) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def _call_stripe(fn: Callable[[], T]) -> T:
+    """Appel Stripe derrière le token bucket ; 429 → retry avec backoff exponentiel (autres erreurs remontées)."""
+    for attempt in range(_MAX_RETRIES + 1):
+        _get_limiter().acquire()
+        try:
+            return fn()
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt >= _MAX_RETRIES:
+                raise
+            delay = _RETRY_BASE_S * (2 ** attempt)
+            logger.info("STRIPE_USAGE_RATE_LIMITED retry_in=%.1fs attempt=%s", delay, attempt + 1)
+            time.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+def _billing_by_tenant(tenant_ids: Iterable[int]) -> Dict[int, dict]:
+    """{tenant_id: {stripe_customer_id, stripe_subscription_id, stripe_metered_item_id}} en 1 requête."""
+    ids = sorted({int(t) for t in tenant_ids})
+    url = _pg_url()
+    if not url or not ids:
+        return {}
+    try:
+        with pg_connection(url) as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT tenant_id, stripe_customer_id, stripe_subscription_id, stripe_metered_item_id
+                    FROM tenant_billing WHERE tenant_id = ANY(%s::bigint[])
+                    """,
+                    (ids,),
+                )
+                return {int(r["tenant_id"]): dict(r) for r in cur.fetchall()}
+    except Exception as e:
+        if "does not exist" not in str(e).lower() and "tenant_billing" not in str(e).lower():
+            logger.warning("_billing_by_tenant failed: %s", e)
+        return {}
+
+
+def try_acquire_usage_pushes(date_utc: date, items: Sequence[Tuple[int, int]]) -> Set[int]:
     """
-    Réserve le droit de pousser l'usage pour (tenant_id, date_utc).
+    Réserve le droit de pousser l'usage pour [(tenant_id, minutes)] à date_utc, en 1 requête.
     INSERT pending, ou UPDATE en pending uniquement si status = 'failed' (retry).
-    Retourne True si acquis (nouvelle ligne ou retry failed), False si déjà sent/pending.
+    Retourne les tenant_id acquis (nouvelle ligne ou retry failed) ; les déjà sent/pending sont exclus.
     """
     url = _pg_url()
-    if not url:
-        return False
+    if not url or not items:
+        return set()
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 # sent = immuable : on ne met à jour que si status = 'failed' (retry). Jamais de downgrade sent → pending.
                 cur.execute(
                     """
                     INSERT INTO stripe_usage_push_log (tenant_id, date_utc, quantity_minutes, status)
-                    VALUES (%s, %s, %s, 'pending')
+                    SELECT u.tenant_id, %s, u.minutes, 'pending'
+                    FROM unnest(%s::bigint[], %s::int[]) AS u(tenant_id, minutes)
                     ON CONFLICT (tenant_id, date_utc) DO UPDATE SET
                         quantity_minutes = EXCLUDED.quantity_minutes,
                         status = 'pending',
                         error_short = NULL
                     WHERE stripe_usage_push_log.status = 'failed'
-                    RETURNING 1
+                    RETURNING tenant_id
                     """,
-                    (tenant_id, date_utc, quantity_minutes),
+                    (date_utc, [int(t) for t, _ in items], [int(m) for _, m in items]),
                 )
-                row = cur.fetchone()
+                acquired = {int(r[0]) for r in cur.fetchall()}
                 conn.commit()
-                return row is not None
+                return acquired
     except Exception as e:
         if "does not exist" not in str(e).lower() and "stripe_usage_push_log" not in str(e).lower():
-            logger.warning("try_acquire_usage_push failed: %s", e)
-        return False
-
-
-def mark_usage_push_sent(tenant_id: int, date_utc: date, stripe_usage_record_id: str | None = None) -> None:
-    """Marque le push comme réussi (status=sent). Stocke stripe_usage_record_id si fourni (debug Stripe)."""
-    url = _pg_url()
-    if not url:
-        return
-    record_id = (stripe_usage_record_id or "").strip() or None
-    try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            with conn.cursor() as cur:
-                if record_id:
-                    cur.execute(
-                        """
-                        UPDATE stripe_usage_push_log
-                        SET status = 'sent', error_short = NULL, stripe_usage_record_id = %s
-                        WHERE tenant_id = %s AND date_utc = %s
-                        """,
-                        (record_id, tenant_id, date_utc),
-                    )
-                else:
-                    cur.execute(
-                        """
-                        UPDATE stripe_usage_push_log
-                        SET status = 'sent', error_short = NULL
-                        WHERE tenant_id = %s AND date_utc = %s
-                        """,
-                        (tenant_id, date_utc),
-                    )
-                conn.commit()
-        logger.debug("STRIPE_USAGE_PUSH_SENT tenant_id=%s date_utc=%s", tenant_id, date_utc)
-    except Exception as e:
-        logger.warning("mark_usage_push_sent failed: %s", e)
+            logger.warning("try_acquire_usage_pushes failed: %s", e)
+        return set()
 
 
-def mark_usage_push_failed(tenant_id: int, date_utc: date, error_short: str) -> None:
-    """Marque le push en échec (status=failed, error_short 255 car) pour diagnostic et retry."""
+def record_usage_push_outcomes(
+    date_utc: date,
+    sent: Sequence[Tuple[int, Optional[str]]] = (),
+    failed: Sequence[Tuple[int, str]] = (),
+) -> None:
+    """
+    Écrit les résultats du push en 1 UPDATE : sent [(tenant_id, stripe_usage_record_id|None)]
+    → status=sent ; failed [(tenant_id, error_short)] → status=failed (retry au run suivant).
+    """
     url = _pg_url()
-    if not url:
+    if not url or not (sent or failed):
         return
-    err = (error_short or "")[:255]
+    rows = [(int(t), "sent", (rid or "").strip() or None, None) for t, rid in sent]
+    rows += [(int(t), "failed", None, (err or "")[:255]) for t, err in failed]
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
-                    UPDATE stripe_usage_push_log
-                    SET status = 'failed', error_short = %s
-                    WHERE tenant_id = %s AND date_utc = %s
+                    UPDATE stripe_usage_push_log l
+                    SET status = v.status,
+                        error_short = v.error_short,
+                        stripe_usage_record_id = COALESCE(v.record_id, l.stripe_usage_record_id)
+                    FROM unnest(%s::bigint[], %s::text[], %s::text[], %s::text[])
+                         AS v(tenant_id, status, record_id, error_short)
+                    WHERE l.tenant_id = v.tenant_id AND l.date_utc = %s
                     """,
-                    (err, tenant_id, date_utc),
+                    ([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows], date_utc),
                 )
                 conn.commit()
-        logger.info("STRIPE_USAGE_PUSH_FAILED tenant_id=%s date_utc=%s error_short=%s", tenant_id, date_utc, err[:80])
+        for t, err in failed:
+            logger.info("STRIPE_USAGE_PUSH_FAILED tenant_id=%s date_utc=%s error_short=%s", t, date_utc, (err or "")[:80])
     except Exception as e:
-        logger.warning("mark_usage_push_failed failed: %s", e)
+        logger.warning("record_usage_push_outcomes failed: %s", e)
 
 
 def push_usage_via_meter_events(
@@ -164,7 +215,7 @@ def push_usage_via_meter_events(
     try:
         import stripe
         stripe.api_key = stripe_key
-        stripe.billing.MeterEvent.create(
+        _call_stripe(lambda: stripe.billing.MeterEvent.create(
             event_name=event_name,
             payload={
                 "stripe_customer_id": stripe_customer_id,
@@ -172,7 +223,7 @@ def push_usage_via_meter_events(
             },
             timestamp=ts_unix,
             identifier=identifier,
-        )
+        ))
         logger.info("STRIPE_METER_EVENT_PUSH_OK tenant_id=%s minutes=%s event_name=%s", tenant_id, minutes, event_name)
         return True
     except Exception as e:
@@ -193,8 +244,8 @@ def _aggregate_usage_by_tenant_for_day(date_utc: date) -> List[Tuple[int, int]]:
     start_str = start.strftime("%Y-%m-%d %H:%M:%S")
     end_str = end.strftime("%Y-%m-%d %H:%M:%S")
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -213,97 +264,115 @@ def _aggregate_usage_by_tenant_for_day(date_utc: date) -> List[Tuple[int, int]]:
         return []
 
 
-def push_daily_usage_to_stripe(date_utc: date) -> dict:
+@dataclass
+class _PushJob:
+    tenant_id: int
+    date_utc: date
+    minutes: int
+    customer_id: Optional[str]
+    metered_item_id: str
+
+
+def _push_usage_record(metered_item_id: str, minutes: int, date_utc: date) -> Optional[str]:
+    """UsageRecord.create (action=set, fin de journée UTC) ; retourne l'id du record Stripe."""
+    import stripe
+
+    end_of_day_ts = int(datetime(date_utc.year, date_utc.month, date_utc.day, 23, 59, 59, tzinfo=timezone.utc).timestamp())
+    record = _call_stripe(lambda: stripe.UsageRecord.create(
+        subscription_item=metered_item_id,
+        quantity=minutes,
+        timestamp=end_of_day_ts,
+        action="set",
+    ))
+    return getattr(record, "id", None) if record else None
+
+
+def _push_job(job: _PushJob, use_meter_events: bool) -> Tuple[_PushJob, Optional[str], Optional[str]]:
+    """(job, stripe_usage_record_id, erreur) ; erreur None = poussé."""
+    if use_meter_events:
+        if push_usage_via_meter_events(job.tenant_id, job.minutes, job.date_utc, stripe_customer_id=job.customer_id):
+            logger.info("STRIPE_USAGE_PUSHED tenant_id=%s date_utc=%s minutes=%s (meter_events)", job.tenant_id, job.date_utc, job.minutes)
+            # Pas de fallback : on ne pousse jamais meter_event + UsageRecord pour le même (tenant_id, date_utc)
+            return (job, None, None)
+        # Fallback legacy UsageRecord uniquement si meter_event a échoué
+    try:
+        record_id = _push_usage_record(job.metered_item_id, job.minutes, job.date_utc)
+        logger.info(
+            "STRIPE_USAGE_PUSHED tenant_id=%s date_utc=%s minutes=%s%s",
+            job.tenant_id, job.date_utc, job.minutes, " (fallback UsageRecord)" if use_meter_events else "",
+        )
+        return (job, record_id, None)
+    except Exception as e:
+        logger.warning("STRIPE_USAGE_PUSH_FAILED tenant_id=%s date_utc=%s: %s", job.tenant_id, job.date_utc, str(e)[:200])
+        return (job, None, str(e)[:255] or type(e).__name__)
+
+
+def push_usage_to_stripe(dates: Sequence[date]) -> Dict[date, dict]:
     """
-    Pousse l'usage du jour (date_utc) vers Stripe pour chaque tenant ayant une subscription metered.
-    Idempotent : si déjà poussé pour (tenant_id, date_utc), skip.
-    Si l'appel Stripe échoue, release la ligne pour permettre retry.
-    Retourne {"pushed": n, "skipped": m, "errors": [...]}.
+    Pousse l'usage de plusieurs jours UTC vers Stripe pour chaque tenant ayant une subscription metered.
+    Idempotent : si déjà poussé pour (tenant_id, date_utc), skip ; échec Stripe → failed (retry au run suivant).
+    Requêtes PG constantes par date (agrégat, réservation, résultats) + 1 lecture billing ; appels Stripe
+    concurrents, bornés par le token bucket.
+    Retourne {date: {"pushed": n, "skipped": m, "errors": [...]}}.
     """
-    from backend.billing_pg import get_tenant_billing
-
-    rows = _aggregate_usage_by_tenant_for_day(date_utc)
-    pushed = 0
-    skipped = 0
-    errors = []
+    usage = {d: _aggregate_usage_by_tenant_for_day(d) for d in dates}
+    results: Dict[date, dict] = {d: {"pushed": 0, "skipped": 0, "errors": []} for d in dates}
     stripe_key = (os.environ.get("STRIPE_SECRET_KEY") or "").strip()
     if not stripe_key:
         logger.warning("STRIPE_USAGE_SKIP STRIPE_SECRET_KEY not set")
-        return {"pushed": 0, "skipped": len(rows), "errors": ["STRIPE_SECRET_KEY not set"]}
-
-    for tenant_id, minutes in rows:
-        if minutes <= 0:
-            continue
-        billing = get_tenant_billing(tenant_id)
-        if not billing or not (billing.get("stripe_subscription_id") or "").strip():
-            logger.debug("STRIPE_USAGE_SKIP_NO_SUB tenant_id=%s", tenant_id)
-            skipped += 1
-            continue
-        metered_item_id = (billing.get("stripe_metered_item_id") or "").strip()
-        if not metered_item_id:
-            logger.info("STRIPE_USAGE_SKIP_NO_METERED_ITEM tenant_id=%s", tenant_id)
-            skipped += 1
-            continue
-
-        # Option A : pousser le TOTAL des minutes (Stripe applique les paliers 0€/X min puis €/min)
-        acquired = try_acquire_usage_push(tenant_id, date_utc, minutes)
-        if not acquired:
-            skipped += 1
-            continue
-
-        use_meter_events = _stripe_use_meter_events()
-        customer_id = (billing.get("stripe_customer_id") or "").strip() or None
-
-        if use_meter_events:
-            ok = push_usage_via_meter_events(tenant_id, minutes, date_utc, stripe_customer_id=customer_id)
-            if ok:
-                mark_usage_push_sent(tenant_id, date_utc, stripe_usage_record_id=None)
-                pushed += 1
-                logger.info("STRIPE_USAGE_PUSHED tenant_id=%s date_utc=%s minutes=%s (meter_events)", tenant_id, date_utc, minutes)
-                # Pas de fallback : on ne pousse jamais meter_event + UsageRecord pour le même (tenant_id, date_utc)
+        for d in dates:
+            results[d].update(skipped=len(usage[d]), errors=["STRIPE_SECRET_KEY not set"])
+        return results
+
+    billing = _billing_by_tenant(tid for rows in usage.values() for tid, _ in rows)
+    jobs: List[_PushJob] = []
+    for d in dates:
+        eligible: Dict[int, _PushJob] = {}
+        for tenant_id, minutes in usage[d]:
+            if minutes <= 0:
                 continue
-            # Fallback legacy UsageRecord uniquement si meter_event a échoué
-            try:
-                import stripe
-                stripe.api_key = stripe_key
-                end_of_day_ts = int(datetime(date_utc.year, date_utc.month, date_utc.day, 23, 59, 59, tzinfo=timezone.utc).timestamp())
-                record = stripe.UsageRecord.create(
-                    subscription_item=metered_item_id,
-                    quantity=minutes,
-                    timestamp=end_of_day_ts,
-                    action="set",
-                )
-                usage_record_id = getattr(record, "id", None) if record else None
-                mark_usage_push_sent(tenant_id, date_utc, stripe_usage_record_id=usage_record_id)
-                pushed += 1
-                logger.info("STRIPE_USAGE_PUSHED tenant_id=%s date_utc=%s minutes=%s (fallback UsageRecord)", tenant_id, date_utc, minutes)
-            except Exception as e:
-                mark_usage_push_failed(tenant_id, date_utc, str(e)[:255])
-                err_msg = str(e)[:200]
-                errors.append(f"tenant_id={tenant_id}: {err_msg}")
-                logger.warning("STRIPE_USAGE_PUSH_FAILED tenant_id=%s date_utc=%s: %s", tenant_id, date_utc, err_msg)
-        else:
-            try:
-                import stripe
-                stripe.api_key = stripe_key
-                end_of_day_ts = int(datetime(date_utc.year, date_utc.month, date_utc.day, 23, 59, 59, tzinfo=timezone.utc).timestamp())
-                record = stripe.UsageRecord.create(
-                    subscription_item=metered_item_id,
-                    quantity=minutes,
-                    timestamp=end_of_day_ts,
-                    action="set",
-                )
-                usage_record_id = getattr(record, "id", None) if record else None
-                mark_usage_push_sent(tenant_id, date_utc, stripe_usage_record_id=usage_record_id)
-                pushed += 1
-                logger.info("STRIPE_USAGE_PUSHED tenant_id=%s date_utc=%s minutes=%s", tenant_id, date_utc, minutes)
-            except Exception as e:
-                mark_usage_push_failed(tenant_id, date_utc, str(e)[:255])
-                err_msg = str(e)[:200]
-                errors.append(f"tenant_id={tenant_id}: {err_msg}")
-                logger.warning("STRIPE_USAGE_PUSH_FAILED tenant_id=%s date_utc=%s: %s", tenant_id, date_utc, err_msg)
+            b = billing.get(tenant_id)
+            if not b or not (b.get("stripe_subscription_id") or "").strip():
+                logger.debug("STRIPE_USAGE_SKIP_NO_SUB tenant_id=%s", tenant_id)
+                results[d]["skipped"] += 1
+                continue
+            metered_item_id = (b.get("stripe_metered_item_id") or "").strip()
+            if not metered_item_id:
+                logger.info("STRIPE_USAGE_SKIP_NO_METERED_ITEM tenant_id=%s", tenant_id)
+                results[d]["skipped"] += 1
+                continue
+            customer_id = (b.get("stripe_customer_id") or "").strip() or None
+            eligible[tenant_id] = _PushJob(tenant_id, d, minutes, customer_id, metered_item_id)
+        # Option A : pousser le TOTAL des minutes (Stripe applique les paliers 0€/X min puis €/min)
+        acquired = try_acquire_usage_pushes(d, [(j.tenant_id, j.minutes) for j in eligible.values()]) if eligible else set()
+        results[d]["skipped"] += len(eligible) - len(acquired)
+        jobs.extend(j for tid, j in eligible.items() if tid in acquired)
+    if not jobs:
+        return results
+
+    import stripe
+    stripe.api_key = stripe_key
+    use_meter_events = _stripe_use_meter_events()
+    with ThreadPoolExecutor(max_workers=min(_WORKERS, len(jobs)), thread_name_prefix="stripe-usage") as pool:
+        outcomes = list(pool.map(lambda j: _push_job(j, use_meter_events), jobs))
+
+    for d in dates:
+        sent = [(job.tenant_id, rid) for job, rid, err in outcomes if job.date_utc == d and err is None]
+        failed = [(job.tenant_id, err) for job, _, err in outcomes if job.date_utc == d and err is not None]
+        record_usage_push_outcomes(d, sent=sent, failed=failed)
+        results[d]["pushed"] += len(sent)
+        results[d]["errors"].extend(f"tenant_id={t}: {err[:200]}" for t, err in failed)
+    return results
 
-    return {"pushed": pushed, "skipped": skipped, "errors": errors}
+
+def push_daily_usage_to_stripe(date_utc: date) -> dict:
+    """
+    Pousse l'usage du jour (date_utc) vers Stripe pour chaque tenant ayant une subscription metered.
+    Idempotent : si déjà poussé pour (tenant_id, date_utc), skip.
+    Si l'appel Stripe échoue, la ligne passe en failed (retry au run suivant).
+    Retourne {"pushed": n, "skipped": m, "errors": [...]}.
+    """
+    return push_usage_to_stripe([date_utc])[date_utc]
 
 
 def run_upgrade_suggestions() -> dict:
@@ -346,11 +415,11 @@ def push_daily_usage_with_retry_48h(reference_date: date | None = None) -> dict:
             today = date.today()
     yesterday = today - timedelta(days=1)
     day_before = today - timedelta(days=2)
-    r1 = push_daily_usage_to_stripe(yesterday)
-    r2 = push_daily_usage_to_stripe(day_before)
-    sent = r1.get("pushed", 0) + r2.get("pushed", 0)
-    skipped = r1.get("skipped", 0) + r2.get("skipped", 0)
-    failed = len(r1.get("errors", [])) + len(r2.get("errors", []))
+    # Un seul pipeline pour les deux jours : billing lu une fois, pushes des deux jours concurrents
+    by_date = push_usage_to_stripe([yesterday, day_before])
+    sent = sum(r.get("pushed", 0) for r in by_date.values())
+    skipped = sum(r.get("skipped", 0) for r in by_date.values())
+    failed = sum(len(r.get("errors", [])) for r in by_date.values())
     upgrade_result = run_upgrade_suggestions()
     return {
         "dates": [yesterday.isoformat(), day_before.isoformat()],
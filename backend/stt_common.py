@@ -9,6 +9,7 @@ from __future__ import annotations
 import re
 from typing import Literal, Tuple
 
+from backend.pattern_detector import MultiPatternDetector
 from backend.stt_utils import normalize_transcript, is_filler_only
 
 # Tokens critiques : jamais UNCLEAR/NOISE (oui/non/ok, 1/2/3, variantes)
@@ -34,6 +35,12 @@ ENGLISH_STOPWORDS = frozenset({
     "very", "also", "back", "after", "before", "between", "through",
 })
 
+# Phrases typiquement anglaises (would have, won't even, etc.) — sous-chaîne des tokens joints
+ENGLISH_PHRASES = ("would have", "won t", "wont", "you would", "believe you")
+_ENGLISH_PHRASE_DETECTOR = MultiPatternDetector(literals={"ENGLISH": ENGLISH_PHRASES})
+_APOSTROPHE_RE = re.compile(r"['']")
+_WORD_RE = re.compile(r"[a-zàâäéèêëïîôùûüç]+")
+
 
 def is_critical_token(text: str) -> bool:
     """
@@ -43,7 +50,7 @@ def is_critical_token(text: str) -> bool:
     if not text:
         return False
     t = text.strip().lower()
-    t = re.sub(r"['']", "", t)
+    t = _APOSTROPHE_RE.sub("", t)
     t = "".join(ch for ch in t if ch.isalnum() or ch.isspace()).strip()
     if not t:
         return False
@@ -64,7 +71,7 @@ def looks_like_garbage_or_wrong_language(text: str) -> bool:
     if not text or not text.strip():
         return False
     t = text.strip().lower()
-    tokens = re.findall(r"[a-zàâäéèêëïîôùûüç]+", t)
+    tokens = _WORD_RE.findall(t)
     if not tokens:
         # Que de la ponctuation / chiffres bizarres
         if len(text.strip()) > 3:
@@ -78,10 +85,7 @@ def looks_like_garbage_or_wrong_language(text: str) -> bool:
     if len(tokens) >= 3 and english_count / len(tokens) > 0.33:
         return True
     # Phrase typiquement anglaise (would have, won't even, etc.)
-    combined = " ".join(tokens)
-    if any(phrase in combined for phrase in ["would have", "won t", "wont", "you would", "believe you"]):
-        return True
-    return False
+    return _ENGLISH_PHRASE_DETECTOR.first(" ".join(tokens)) is not None
 
 
 def estimate_tts_duration(text: str) -> float:
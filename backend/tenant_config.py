@@ -10,17 +10,16 @@ from __future__ import annotations
 import copy
 import json
 import logging
-import threading
-import time
 from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
 from backend import config, db
+from backend.shared_cache import get_cache
 
 logger = logging.getLogger(__name__)
 _PARAMS_CACHE_TTL_S = 300
-_PARAMS_CACHE: Dict[int, tuple[float, Dict[str, str]]] = {}
-_PARAMS_CACHE_LOCK = threading.Lock()
+# tenant_id → params_json ; invalidate_params_cache est diffusé aux autres instances (SHARED_CACHE_PG_NOTIFY)
+_PARAMS_CACHE = get_cache("tenant_params", ttl_seconds=_PARAMS_CACHE_TTL_S, max_entries=5000)
 
 FLAG_KEYS = (
     "ENABLE_LLM_ASSIST_START",
@@ -828,11 +827,9 @@ def get_params(tenant_id: Optional[int] = None) -> Dict[str, str]:
     PG-first read, SQLite fallback.
     """
     tid = tenant_id if tenant_id is not None and tenant_id > 0 else config.DEFAULT_TENANT_ID
-    now = time.time()
-    with _PARAMS_CACHE_LOCK:
-        cached = _PARAMS_CACHE.get(tid)
-        if cached and now < cached[0]:
-            return copy.deepcopy(cached[1])
+    cached = _PARAMS_CACHE.get(str(tid))
+    if cached is not None:
+        return copy.deepcopy(cached)
 
     result_dict: Dict[str, str] = {}
     if config.USE_PG_TENANTS:
@@ -862,19 +859,16 @@ def get_params(tenant_id: Optional[int] = None) -> Dict[str, str]:
         finally:
             conn.close()
 
-    with _PARAMS_CACHE_LOCK:
-        _PARAMS_CACHE[tid] = (now + _PARAMS_CACHE_TTL_S, copy.deepcopy(result_dict))
+    _PARAMS_CACHE.set(str(tid), copy.deepcopy(result_dict))
     return copy.deepcopy(result_dict)
 
 
 def invalidate_params_cache(tenant_id: Optional[int] = None) -> None:
     if tenant_id is None:
-        with _PARAMS_CACHE_LOCK:
-            _PARAMS_CACHE.clear()
+        _PARAMS_CACHE.clear()
         return
     tid = tenant_id if tenant_id > 0 else config.DEFAULT_TENANT_ID
-    with _PARAMS_CACHE_LOCK:
-        _PARAMS_CACHE.pop(tid, None)
+    _PARAMS_CACHE.delete(str(tid))
 
 
 def set_params(tenant_id: int, params: Dict[str, str]) -> None:
@@ -887,7 +881,7 @@ def set_params(tenant_id: int, params: Dict[str, str]) -> None:
         "assistant_name", "phone_number", "sector",
         "specialty_label", "address_line1", "postal_code", "city", "agenda_software",
         "client_onboarding_completed", "dashboard_tour_completed",
-        "faq_json",
+        "faq_json", "faq_threshold",
         "booking_duration_minutes", "booking_start_hour", "booking_end_hour",
         "booking_buffer_minutes", "booking_days",
         "mirror_google_bookings_to_internal",
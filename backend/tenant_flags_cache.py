@@ -4,26 +4,23 @@ Cache TTL pour les flags tenant (évite SQLite à chaque tour).
 """
 from __future__ import annotations
 
-import time
-from typing import Dict, Optional
+from typing import Optional
 
 from backend import db
+from backend.shared_cache import get_cache
 from backend.tenant_config import TenantFlags, load_tenant_flags
 
 _TTL_SECONDS = 60
-_cache: Dict[int, tuple[float, TenantFlags]] = {}
+_cache = get_cache("tenant_flags", ttl_seconds=_TTL_SECONDS, max_entries=5000)
 
 
 def get_tenant_flags(tenant_id: Optional[int] = None) -> TenantFlags:
     """Retourne les flags avec cache TTL 60s."""
     tid = int(tenant_id or 1)
-    now = time.time()
 
-    hit = _cache.get(tid)
-    if hit:
-        ts, flags = hit
-        if now - ts < _TTL_SECONDS:
-            return flags
+    hit = _cache.get(str(tid))
+    if hit is not None:
+        return hit
 
     db.ensure_tenant_config()
     conn = db.get_conn()
@@ -32,5 +29,5 @@ def get_tenant_flags(tenant_id: Optional[int] = None) -> TenantFlags:
     finally:
         conn.close()
 
-    _cache[tid] = (now, tf)
+    _cache.set(str(tid), tf)
     return tf
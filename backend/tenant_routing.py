@@ -11,6 +11,7 @@ from contextvars import ContextVar
 from typing import Optional
 
 from backend import config, db
+from backend.shared_cache import get_cache
 
 logger = logging.getLogger(__name__)
 
@@ -146,7 +147,8 @@ def _get_env_vapi_assistant_id() -> Optional[str]:
     return _ENV_VAPI_ASSISTANT_ID or None
 
 
-_assistant_tenant_cache: dict[str, int] = {}
+# assistantId → tenant_id ; TTL long (un assistant change rarement de tenant)
+_assistant_tenant_cache = get_cache("assistant_tenant", ttl_seconds=3600, max_entries=10000)
 
 
 def _fast_resolve_assistant_id(assistant_id: Optional[str]) -> Optional[int]:
@@ -166,7 +168,7 @@ def _fast_resolve_assistant_id(assistant_id: Optional[str]) -> Optional[int]:
         return None
     env_id = _get_env_vapi_assistant_id()
     if env_id and assistant_id == env_id:
-        _assistant_tenant_cache[assistant_id] = config.DEFAULT_TENANT_ID
+        _assistant_tenant_cache.set(assistant_id, config.DEFAULT_TENANT_ID)
         return config.DEFAULT_TENANT_ID
     return None
 
@@ -201,7 +203,7 @@ def resolve_tenant_id_from_vapi_payload(payload: dict, channel: str = "vocal") -
             assistant_tenant_id = pg_find_tenant_id_by_vapi_assistant_id(assistant_id)
             if assistant_tenant_id:
                 tid = int(assistant_tenant_id)
-                _assistant_tenant_cache[assistant_id] = tid
+                _assistant_tenant_cache.set(assistant_id, tid)
                 logger.info(
                     "TENANT_READ source=assistant assistant_id=%s -> tenant_id=%s (cached)",
                     assistant_id[:24],
@@ -11,7 +11,7 @@ import os
 from contextlib import contextmanager
 from typing import Optional, Tuple
 
-from backend.pg_tenant_context import set_tenant_id_on_connection
+from backend.pg_pool import pg_connection
 
 logger = logging.getLogger(__name__)
 
@@ -19,63 +19,18 @@ logger = logging.getLogger(__name__)
 _PG_OK: Optional[bool] = None
 _PG_LAST_CHECK: float = 0
 _HEALTHCHECK_INTERVAL_SEC = 60
-_TENANT_POOL = None
-_TENANT_POOL_URL: Optional[str] = None
 
 
 def _pg_url() -> Optional[str]:
     return os.environ.get("DATABASE_URL") or os.environ.get("PG_TENANTS_URL")
 
 
-def _dict_row_factory():
-    from psycopg.rows import dict_row
-
-    return dict_row
-
-
-def _get_tenant_pool():
-    global _TENANT_POOL, _TENANT_POOL_URL
-    url = _pg_url()
-    if not url:
-        return None
-    if _TENANT_POOL is not None and _TENANT_POOL_URL == url:
-        return _TENANT_POOL
-    try:
-        from psycopg_pool import ConnectionPool
-
-        _TENANT_POOL = ConnectionPool(
-            conninfo=url,
-            min_size=1,
-            max_size=5,
-            timeout=3.0,
-            max_idle=300.0,
-            kwargs={"row_factory": _dict_row_factory()},
-        )
-        _TENANT_POOL_URL = url
-        logger.info("PG tenant connection pool created (min=1, max=5)")
-        return _TENANT_POOL
-    except Exception as e:
-        logger.debug("Failed to create tenant PG pool, fallback direct connect: %s", e)
-        return None
-
-
 @contextmanager
-def pg_tenants_connection():
-    pool = _get_tenant_pool()
-    if pool is not None:
-        try:
-            with pool.connection() as conn:
-                yield conn
-                return
-        except Exception as e:
-            logger.debug("Tenant PG pool connection failed, fallback direct: %s", e)
-
+def pg_tenants_connection(tenant_id: Optional[int] = None):
     url = _pg_url()
     if not url:
         raise RuntimeError("No tenant PostgreSQL URL configured")
-    import psycopg
-
-    with psycopg.connect(url, row_factory=_dict_row_factory(), connect_timeout=3) as conn:
+    with pg_connection(url, tenant_id=tenant_id) as conn:
         yield conn
 
 
@@ -99,8 +54,8 @@ def check_pg_health(force: bool = False) -> bool:
         logger.debug("PG_HEALTH: no DATABASE_URL, skip")
         return False
     try:
-        import psycopg
-        with psycopg.connect(url, connect_timeout=5) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT 1")
         _PG_OK = True
@@ -125,7 +80,6 @@ def pg_resolve_tenant_id(channel: str, did_key: str) -> Optional[Tuple[int, str]
         return None
 
     def _query() -> Optional[Tuple[int, str]]:
-        from backend.pg_pool import pg_connection
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
@@ -161,7 +115,6 @@ def pg_find_tenant_id_by_vapi_assistant_id(assistant_id: str) -> Optional[int]:
         return None
 
     def _query() -> Optional[int]:
-        from backend.pg_pool import pg_connection
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute(
@@ -198,7 +151,6 @@ def pg_tenant_exists(tenant_id: int) -> bool:
         return False
 
     def _query() -> bool:
-        from backend.pg_pool import pg_connection
         with pg_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT 1 FROM tenants WHERE tenant_id = %s LIMIT 1", (int(tenant_id),))
@@ -226,8 +178,7 @@ def pg_get_tenant_flags(tenant_id: int) -> Optional[Tuple[dict, str]]:
         return None
 
     def _query() -> Optional[Tuple[dict, str]]:
-        with pg_tenants_connection() as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_tenants_connection(tenant_id) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT flags_json FROM tenant_config WHERE tenant_id = %s",
@@ -264,8 +215,7 @@ def pg_get_tenant_params(tenant_id: int) -> Optional[Tuple[dict, str]]:
         return None
 
     def _query() -> Optional[Tuple[dict, str]]:
-        with pg_tenants_connection() as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_tenants_connection(tenant_id) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT params_json FROM tenant_config WHERE tenant_id = %s",
@@ -315,8 +265,8 @@ def pg_create_tenant(
     status_val = (status or "active").strip() or "active"
 
     def _do() -> Optional[int]:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "INSERT INTO tenants (name, timezone, status) VALUES (%s, %s, %s) RETURNING tenant_id",
@@ -372,9 +322,8 @@ def pg_update_tenant_name(tenant_id: int, name: str) -> bool:
     if not clean_name:
         return True
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "UPDATE tenants SET name = %s WHERE tenant_id = %s",
@@ -393,11 +342,10 @@ def pg_update_tenant_flags(tenant_id: int, flags: dict) -> bool:
     if not url:
         return False
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
         current, _ = pg_get_tenant_flags(tenant_id) or ({}, "pg")
         merged = {**current, **{k: v for k, v in flags.items() if isinstance(v, bool)}}
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "UPDATE tenant_config SET flags_json = %s, updated_at = now() WHERE tenant_id = %s",
@@ -487,13 +435,12 @@ def pg_update_tenant_params(tenant_id: int, params: dict) -> bool:
     if not url:
         return False
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
         current, _ = pg_get_tenant_params(tenant_id) or ({}, "pg")
         merged = {**current, **filtered}
         # timezone est dans tenants, pas params_json
         tz_val = merged.pop("timezone", None)
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "UPDATE tenant_config SET params_json = %s, updated_at = now() WHERE tenant_id = %s",
@@ -520,15 +467,14 @@ def pg_delete_tenant_param_keys(tenant_id: int, keys: list[str]) -> bool:
     if not url:
         return False
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
 
         current, _ = pg_get_tenant_params(tenant_id) or ({}, "pg")
         if not isinstance(current, dict):
             current = {}
         for key in keys:
             current.pop(key, None)
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "UPDATE tenant_config SET params_json = %s, updated_at = now() WHERE tenant_id = %s",
@@ -557,9 +503,8 @@ def pg_add_routing(channel: str, key: str, tenant_id: int) -> bool:
         logger.warning("pg_add_routing skipped: tenant_id=%s missing in tenants", tenant_id)
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        from psycopg.rows import tuple_row
+        with pg_connection(url, tenant_id=tenant_id, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     """
@@ -582,10 +527,7 @@ def pg_get_routing_for_tenant(tenant_id: int) -> Optional[list]:
     if not url:
         return None
     try:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_connection(url, tenant_id=tenant_id) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT channel, key, is_active FROM tenant_routing WHERE tenant_id = %s ORDER BY channel, key",
@@ -603,8 +545,7 @@ def pg_get_tenant_full(tenant_id: int) -> Optional[dict]:
     if not url:
         return None
     try:
-        with pg_tenants_connection() as conn:
-            set_tenant_id_on_connection(conn, tenant_id)
+        with pg_tenants_connection(tenant_id) as conn:
             with conn.cursor() as cur:
                 cur.execute("SELECT tenant_id, name, timezone, status, created_at FROM tenants WHERE tenant_id = %s", (tenant_id,))
                 t = cur.fetchone()
@@ -643,9 +584,7 @@ def pg_fetch_tenants(include_inactive: bool = False) -> Optional[Tuple[list, str
         return None
 
     def _query() -> Optional[Tuple[list, str]]:
-        import psycopg
-        from psycopg.rows import dict_row
-        with psycopg.connect(url, row_factory=dict_row) as conn:
+        with pg_connection(url) as conn:
             with conn.cursor() as cur:
                 if include_inactive:
                     cur.execute(
@@ -675,8 +614,8 @@ def pg_deactivate_tenant(tenant_id: int) -> bool:
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute("UPDATE tenants SET status = 'inactive' WHERE tenant_id = %s", (tenant_id,))
                 conn.commit()
@@ -695,8 +634,8 @@ def pg_delete_tenant(tenant_id: int) -> bool:
     if not url:
         return False
     try:
-        import psycopg
-        with psycopg.connect(url) as conn:
+        from psycopg.rows import tuple_row
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 for table in ("tenant_routing", "tenant_users", "tenant_config", "tenant_billing"):
                     try:
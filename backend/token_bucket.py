@@ -0,0 +1,53 @@
+# backend/token_bucket.py
+"""
+Token bucket thread-safe pour les appels sortants limités par le fournisseur (Stripe, Postmark).
+rate_per_s jetons/s, capacité burst ; acquire() bloque jusqu'au jeton suivant (ou timeout).
+Partagé par tous les threads d'un process : la limite vaut pour le process entier.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: Optional[float] = None) -> None:
+        self.rate = max(0.001, float(rate_per_s))
+        self.capacity = max(1.0, float(burst if burst is not None else rate_per_s))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self._waited_s = 0.0
+        self._acquired = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Prend `tokens` jetons ; attend si besoin. False si timeout dépassé avant disponibilité."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        t0 = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self._acquired += 1
+                    self._waited_s += now - t0
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "rate_per_s": self.rate,
+                "burst": self.capacity,
+                "acquired": self._acquired,
+                "waited_s": round(self._waited_s, 3),
+            }
@@ -16,6 +16,9 @@ import logging
 
 from backend import prompts
 from backend import config
+from backend import turn_trace
+from backend.shared_cache import cache_key, get_cache
+from backend.single_flight import SingleFlight
 from backend.google_calendar import (
     GoogleCalendarError,
     GoogleCalendarNotFoundError,
@@ -247,14 +250,14 @@ import os as _os
 
 _DISABLE_SLOT_CACHE = _os.getenv("DISABLE_SLOT_CACHE", "").lower() in ("1", "true", "yes")
 
-_slots_cache: Dict[str, Any] = {
-    "by_key": {},  # (tenant_id, pref) -> {"slots": [...], "timestamp": float}
-    "ttl_seconds": 150,
-}
+# Partagé entre workers selon SHARED_CACHE_BACKEND ; invalidation diffusée (SHARED_CACHE_PG_NOTIFY)
+_slots_cache = get_cache("slots", ttl_seconds=150, max_entries=5000)
+# Lectures Google en vol par (tenant, pref, contrainte) — cf. _get_google_pool_coalesced
+_calendar_flights = SingleFlight("calendar_fetch")
 
 
-def _cache_key(tenant_id: int, pref: Optional[str] = None) -> tuple:
-    return (tenant_id, pref or "__none__")
+def _cache_key(tenant_id: int, pref: Optional[str] = None) -> str:
+    return cache_key(tenant_id, pref or "__none__")
 
 
 def _get_cached_slots(limit: int, tenant_id: int = 1, pref: Optional[str] = None) -> Optional[List[prompts.SlotDisplay]]:
@@ -262,14 +265,10 @@ def _get_cached_slots(limit: int, tenant_id: int = 1, pref: Optional[str] = None
     if _DISABLE_SLOT_CACHE:
         return None
     import time
-    key = _cache_key(tenant_id, pref)
-    entry = _slots_cache["by_key"].get(key)
+    entry = _slots_cache.get(_cache_key(tenant_id, pref))
     if not entry or entry.get("slots") is None:
         return None
     age = time.time() - entry.get("timestamp", 0)
-    if age > _slots_cache["ttl_seconds"]:
-        _slots_cache["by_key"].pop(key, None)
-        return None
     logger.info(f"⚡ Cache slots HIT tenant={tenant_id} pref={pref} ({age:.0f}s)")
     return entry["slots"][:limit]
 
@@ -279,18 +278,24 @@ def _set_cached_slots(slots: List[prompts.SlotDisplay], tenant_id: int = 1, pref
     if _DISABLE_SLOT_CACHE:
         return
     import time
-    key = _cache_key(tenant_id, pref)
-    _slots_cache["by_key"][key] = {"slots": slots, "timestamp": time.time()}
+    _slots_cache.set(_cache_key(tenant_id, pref), {"slots": slots, "timestamp": time.time()})
     logger.info(f"⚡ Cache slots SET tenant={tenant_id} pref={pref} ({len(slots)} slots)")
 
 
+def slots_cache_age(tenant_id: int = 1, pref: Optional[str] = None) -> Optional[float]:
+    """Âge (s) de l'entrée de cache (tenant, pref), None si absente."""
+    import time
+    entry = _slots_cache.get(_cache_key(tenant_id, pref))
+    if not entry or entry.get("slots") is None:
+        return None
+    return max(0.0, time.time() - entry.get("timestamp", 0))
+
+
 def invalidate_slots_cache(tenant_id: int = 1) -> None:
-    """Invalide toutes les entrées du cache de slots pour un tenant (après annulation/modification)."""
-    keys_to_remove = [k for k in _slots_cache["by_key"] if k[0] == tenant_id]
-    for k in keys_to_remove:
-        _slots_cache["by_key"].pop(k, None)
-    if keys_to_remove:
-        logger.info("Cache slots INVALIDATED tenant=%s (%s entries)", tenant_id, len(keys_to_remove))
+    """Invalide toutes les entrées du cache de slots pour un tenant (après annulation/modification), sur toutes les instances."""
+    removed = _slots_cache.invalidate_prefix(cache_key(tenant_id, ""))
+    if removed:
+        logger.info("Cache slots INVALIDATED tenant=%s (%s entries)", tenant_id, removed)
 
 
 def _get_calendar_service():
@@ -610,14 +615,24 @@ def prefetch_slots_for_pref_question(session: Any) -> None:
         return
     session._prefetch_slots_ts = now
 
+    # Sans contrainte ni refus : mêmes entrées de cache que le préchargement de début d'appel
+    # (slot_prefetch) → on rejoint le calcul en vol au lieu de relancer Google.
+    minute = getattr(session, "time_constraint_minute", -1)
+    has_time_constraint = bool(
+        (getattr(session, "time_constraint_type", "") or "") and minute is not None and minute >= 0
+    )
+    shareable = not getattr(session, "rejected_slot_starts", None) and not has_time_constraint
+
+    def _fetch(pref: str):
+        if shareable:
+            from backend import slot_prefetch
+            return slot_prefetch.fetch(getattr(session, "tenant_id", None) or 1, pref)
+        return get_slots_for_display(limit=3, pref=pref, session=session)
+
     def _run() -> None:
         try:
-            session._prefetch_morning = get_slots_for_display(
-                limit=3, pref="matin", session=session
-            )
-            session._prefetch_afternoon = get_slots_for_display(
-                limit=3, pref="après-midi", session=session
-            )
+            session._prefetch_morning = _fetch("matin")
+            session._prefetch_afternoon = _fetch("après-midi")
             logger.info(
                 "prefetch_slots: morning=%s afternoon=%s",
                 len(session._prefetch_morning or []),
@@ -641,12 +656,14 @@ def _normalize_iso(s: Optional[str]) -> str:
     return s
 
 
+@turn_trace.traced("calendar_fetch")
 def get_slots_for_display(
     limit: int = 3,
     pref: Optional[str] = None,
     session: Optional[Any] = None,
     exclude_start_iso: Optional[str] = None,
     exclude_end_iso: Optional[str] = None,
+    refresh: bool = False,
 ) -> List[prompts.SlotDisplay]:
     """
     Récupère les créneaux disponibles, filtrés par préférence si fournie.
@@ -659,6 +676,7 @@ def get_slots_for_display(
     
     Utilise Google Calendar si configuré, sinon SQLite.
     Cache utilisé seulement si pref est None (sinon filtre spécifique).
+    refresh: ignore la lecture du cache mais réécrit l'entrée (warmup avant expiration).
     """
     import time
     t_start = time.time()
@@ -673,7 +691,7 @@ def get_slots_for_display(
 
     # Fast-path absolu : cache avant toute résolution adapter/tenant-config (évite overhead DB).
     rejected = getattr(session, "rejected_slot_starts", None) if session else None
-    if not rejected and not has_time_constraint:
+    if not rejected and not has_time_constraint and not refresh:
         cached = _get_cached_slots(limit, tenant_id, pref=pref)
         if cached:
             logger.info(f"⚡ get_slots_for_display: cache hit pref={pref} ({(time.time() - t_start) * 1000:.0f}ms)")
@@ -705,7 +723,7 @@ def get_slots_for_display(
     # Récupérer le pool brut (pas encore étalé) pour pouvoir filtrer refus puis étaler
     if calendar_or_adapter:
         try:
-            pool = _get_slots_from_google_calendar(
+            pool = _get_google_pool_coalesced(
                 calendar_or_adapter,
                 limit,
                 pref=pref,
@@ -756,7 +774,7 @@ def get_slots_for_display(
         logger.info(f"⚠️ Aucun créneau pour pref={pref}, fallback sans filtre")
         if calendar_or_adapter:
             try:
-                pool = _get_slots_from_google_calendar(
+                pool = _get_google_pool_coalesced(
                     calendar_or_adapter,
                     limit,
                     pref=None,
@@ -847,6 +865,34 @@ def get_slots_for_display(
     return slots
 
 
+def _get_google_pool_coalesced(
+    calendar,
+    limit: int,
+    pref: Optional[str] = None,
+    tenant_id: int = 1,
+    preferred_minute: Optional[int] = None,
+    preferred_time_type: Optional[str] = None,
+) -> List[prompts.SlotDisplay]:
+    """
+    _get_slots_from_google_calendar avec fusion des lectures concurrentes : les requêtes
+    simultanées pour (tenant, pref, contrainte horaire, limit) — tool get_slots, webhook,
+    refresh de fond, prefetch — partagent un seul appel Google et son résultat (ou son exception).
+    """
+    key = (int(tenant_id), pref, preferred_time_type or "", preferred_minute, limit)
+    pool = _calendar_flights.do(
+        key,
+        lambda: _get_slots_from_google_calendar(
+            calendar,
+            limit,
+            pref=pref,
+            tenant_id=tenant_id,
+            preferred_minute=preferred_minute,
+            preferred_time_type=preferred_time_type,
+        ),
+    )
+    return list(pool)  # copie : chaque appelant filtre / étale son pool
+
+
 def _get_slots_from_google_calendar(
     calendar,
     limit: int,
@@ -875,29 +921,8 @@ def _get_slots_from_google_calendar(
         target_pool_size = max(12, limit * 4)
         per_day_limit = max(4, limit)
     # Plage horaire selon préférence (intersection avec règles tenant)
-    if preferred_minute is not None and preferred_minute >= 0:
-        preferred_hour = preferred_minute // 60
-        constraint_type = (preferred_time_type or "").strip().lower()
-        if constraint_type == "before":
-            start_hour = base_start
-            end_hour = min(base_end, max(base_start + 1, preferred_hour + 1))
-        elif constraint_type == "exact":
-            start_hour = max(base_start, preferred_hour)
-            end_hour = min(base_end, max(start_hour + 1, preferred_hour + 1))
-        elif constraint_type == "after":
-            start_hour = max(base_start, preferred_hour)
-            end_hour = base_end
-        else:
-            start_hour = max(base_start, preferred_hour)
-            end_hour = min(base_end, max(start_hour + 1, preferred_hour + 3))
-    elif pref == "matin":
-        start_hour, end_hour = max(base_start, 9), min(12, base_end)
-    elif pref == "après-midi":
-        start_hour, end_hour = max(14, base_start), min(18, base_end)
-    elif pref == "soir":
-        start_hour, end_hour = max(18, base_start), min(20, base_end)
-    else:
-        start_hour, end_hour = base_start, base_end
+    from backend.slot_engine import slot_window
+    start_hour, end_hour = slot_window(base_start, base_end, pref, preferred_minute, preferred_time_type)
 
     candidate_dates = []
     for day_offset in range(1, 8):
@@ -1170,6 +1195,7 @@ def _store_google_calendar_slots(session, slots: List[prompts.SlotDisplay], cale
     session.pending_google_slots = full_slots[:len(slots)]
 
 
+@turn_trace.traced("booking")
 def book_slot_from_session(session, choice_index_1based: int) -> tuple[bool, str | None]:
     """
     Réserve le créneau choisi par l'utilisateur.
@@ -1,14 +1,22 @@
 # backend/tools_faq.py
 from __future__ import annotations
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from rapidfuzz import fuzz, process
 from backend import config
 
 logger = logging.getLogger(__name__)
 
+# Threads rapidfuzz pour process.cdist (-1 = tous les cœurs)
+_CDIST_WORKERS = int(os.getenv("FAQ_CDIST_WORKERS", "-1"))
+
 
 def _norm(s: str) -> str:
     """Normalisation simple V1 (déterministe)."""
@@ -32,12 +40,29 @@ class FaqResult:
 
 
 class FaqStore:
-    """V1: store en mémoire, matching lexical strict + priority."""
+    """
+    V1: store en mémoire, matching lexical strict + priority.
+    Index compilé à la construction : questions normalisées, partition priority="normal",
+    table question normalisée → premier item (match exact sans scoring fuzzy).
+    """
 
-    def __init__(self, items: List[FaqItem]) -> None:
+    def __init__(self, items: List[FaqItem], threshold: Optional[float] = None) -> None:
         self.items = items
+        # Seuil propre au store (params tenant faq_threshold) ; None → config.FAQ_THRESHOLD
+        self.threshold = threshold
         # Pré-index normalisé pour stabilité + perfs
         self._items_norm: List[Tuple[str, FaqItem]] = [(_norm(i.question), i) for i in items]
+        self._normal_norm: List[Tuple[str, FaqItem]] = [(qn, it) for (qn, it) in self._items_norm if it.priority == "normal"]
+        self._questions_all: List[str] = [qn for (qn, _) in self._items_norm]
+        self._questions_normal: List[str] = [qn for (qn, _) in self._normal_norm]
+        # WRatio == 100 uniquement pour des chaînes identiques : le premier item exact est celui
+        # qu'extractOne renverrait (il garde le premier meilleur score)
+        self._exact_all: Dict[str, FaqItem] = {}
+        for qn, it in self._items_norm:
+            self._exact_all.setdefault(qn, it)
+        self._exact_normal: Dict[str, FaqItem] = {}
+        for qn, it in self._normal_norm:
+            self._exact_normal.setdefault(qn, it)
 
     def search(self, query: str, include_low: bool = True) -> FaqResult:
         """
@@ -49,16 +74,17 @@ class FaqStore:
         if not q:
             return FaqResult(match=False, score=0.0)
 
-        candidates: List[Tuple[str, FaqItem]]
-        if include_low:
-            candidates = self._items_norm
-        else:
-            candidates = [(qn, it) for (qn, it) in self._items_norm if it.priority == "normal"]
+        exact = (self._exact_all if include_low else self._exact_normal).get(q)
+        if exact is not None:
+            if 1.0 >= self._threshold():
+                return FaqResult(match=True, score=1.0, faq_id=exact.faq_id, answer=exact.answer)
+            return FaqResult(match=False, score=1.0)
 
+        candidates = self._items_norm if include_low else self._normal_norm
         if not candidates:
             return FaqResult(match=False, score=0.0)
 
-        questions_norm = [qn for (qn, _) in candidates]
+        questions_norm = self._questions_all if include_low else self._questions_normal
 
         result = process.extractOne(q, questions_norm, scorer=fuzz.WRatio)
         if result is None:
@@ -67,12 +93,71 @@ class FaqStore:
         _choice, score, idx = result
         score_norm = float(score) / 100.0
 
-        if score_norm >= config.FAQ_THRESHOLD:
+        if score_norm >= self._threshold():
             item = candidates[idx][1]
             return FaqResult(match=True, score=score_norm, faq_id=item.faq_id, answer=item.answer)
 
         return FaqResult(match=False, score=score_norm)
 
+    def _threshold(self) -> float:
+        return config.FAQ_THRESHOLD if self.threshold is None else self.threshold
+
+    def search_batch(self, queries: Sequence[str], include_low: bool = True, top_k: int = 1) -> List[List[FaqResult]]:
+        """
+        Scoring groupé : N requêtes × M questions en un seul process.cdist (multithreadé).
+        Pour chaque requête : jusqu'à top_k résultats, un par faq_id, score décroissant
+        (match = score >= seuil). Le premier résultat est celui que renverrait search().
+        Requête vide ou store vide → [].
+        """
+        questions = self._questions_all if include_low else self._questions_normal
+        candidates = self._items_norm if include_low else self._normal_norm
+        normalized = [_norm(q) for q in queries]
+        out: List[List[FaqResult]] = [[] for _ in normalized]
+        rows = [i for i, q in enumerate(normalized) if q]
+        if not rows or not questions:
+            return out
+        threshold = self._threshold()
+        for row, ranked in zip(rows, _ranked_scores([normalized[i] for i in rows], questions), strict=True):
+            seen = set()
+            for idx, score in ranked:
+                item = candidates[idx][1]
+                if item.faq_id in seen:
+                    continue
+                seen.add(item.faq_id)
+                score_norm = float(score) / 100.0
+                if score_norm >= threshold:
+                    out[row].append(FaqResult(match=True, score=score_norm, faq_id=item.faq_id, answer=item.answer))
+                else:
+                    out[row].append(FaqResult(match=False, score=score_norm, faq_id=item.faq_id))
+                if len(out[row]) >= top_k:
+                    break
+        return out
+
+    def search_best(self, queries: Sequence[str], include_low: bool = True) -> FaqResult:
+        """
+        Meilleur résultat parmi plusieurs hypothèses d'une même demande (alternatives STT,
+        texte brut / normalisé). À score égal, la première hypothèse l'emporte.
+        Une seule hypothèse → search() (extractOne, sans surcoût matriciel).
+        """
+        hypotheses = [q for q in queries if _norm(q)]
+        if len(hypotheses) <= 1:
+            return self.search(hypotheses[0] if hypotheses else "", include_low=include_low)
+        if not _cdist_parallel():
+            # Un seul cœur : extractOne (élagage par score_cutoff interne) reste plus rapide que la matrice
+            best = None
+            for q in hypotheses:
+                result = self.search(q, include_low=include_low)
+                if best is None or result.score > best.score:
+                    best = result
+            return best
+        best_top: Optional[FaqResult] = None
+        for results in self.search_batch(hypotheses, include_low=include_low, top_k=1):
+            if results and (best_top is None or results[0].score > best_top.score):
+                best_top = results[0]
+        if best_top is None:
+            return FaqResult(match=False, score=0.0)
+        return best_top if best_top.match else FaqResult(match=False, score=best_top.score)
+
     def get_answer_by_faq_id(self, faq_id: str) -> Optional[Tuple[str, str]]:
         """Retourne (answer, faq_id) pour le premier item avec ce faq_id, ou None."""
         for item in self.items:
@@ -81,6 +166,83 @@ class FaqStore:
         return None
 
 
+def _cdist_parallel() -> bool:
+    """process.cdist utile pour search_best : numpy présent et plus d'un thread de scoring."""
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    workers = _CDIST_WORKERS if _CDIST_WORKERS > 0 else (os.cpu_count() or 1)
+    return workers > 1
+
+
+def _ranked_scores(queries: List[str], choices: List[str]) -> List[Iterable[Tuple[int, float]]]:
+    """
+    Pour chaque requête : (index choix, score WRatio 0-100) par score décroissant, index croissant
+    à égalité. process.cdist (matrice N × M, workers=FAQ_CDIST_WORKERS) si numpy est installé,
+    sinon un process.extract par requête.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return [
+            [(idx, score) for _choice, score, idx in process.extract(q, choices, scorer=fuzz.WRatio, limit=None)]
+            for q in queries
+        ]
+    matrix = process.cdist(queries, choices, scorer=fuzz.WRatio, dtype=np.float64, workers=_CDIST_WORKERS)
+    return [_iter_ranked_row(row, np.argsort(-row, kind="stable")) for row in matrix]
+
+
+def _iter_ranked_row(row, order) -> Iterable[Tuple[int, float]]:
+    # Paresseux : top_k avec dédup faq_id ne parcourt en général que les premiers indices
+    for j in order:
+        yield int(j), float(row[j])
+
+
+def evaluate_thresholds(
+    store: FaqStore,
+    labeled: Sequence[Tuple[str, Optional[str]]],
+    thresholds: Sequence[float],
+    include_low: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Évaluation hors ligne : (énoncé, faq_id attendu ou None si hors FAQ) → métriques par seuil.
+    Un seul scoring groupé (top-1) ; seul le seuil varie ensuite.
+    precision = bons matchs / matchs, recall = bons matchs / énoncés FAQ,
+    false_accepts = matchs sur un énoncé hors FAQ ou sur la mauvaise FAQ.
+    """
+    top1 = store.search_batch([u for u, _ in labeled], include_low=include_low, top_k=1)
+    expected_pos = sum(1 for _, fid in labeled if fid)
+    report: List[Dict[str, Any]] = []
+    for t in thresholds:
+        predicted = matched_ok = correct = 0
+        for (_u, expected), results in zip(labeled, top1, strict=True):
+            pred = results[0].faq_id if results and results[0].score >= t else None
+            if pred is not None:
+                predicted += 1
+                matched_ok += int(pred == expected)
+            correct += int(pred == (expected or None))
+        precision = matched_ok / predicted if predicted else 1.0
+        recall = matched_ok / expected_pos if expected_pos else 1.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        report.append({
+            "threshold": round(float(t), 4),
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "accuracy": round(correct / len(labeled), 4) if labeled else 0.0,
+            "false_accepts": predicted - matched_ok,
+        })
+    return report
+
+
+def best_threshold(report: List[Dict[str, Any]]) -> Optional[float]:
+    """Seuil au meilleur F1 ; à égalité, le plus strict (moins de faux matchs)."""
+    if not report:
+        return None
+    return max(report, key=lambda r: (r["f1"], r["accuracy"], r["threshold"]))["threshold"]
+
+
 def default_faq_store() -> FaqStore:
     """
     FAQ avec plusieurs variations pour chaque question.
@@ -222,54 +384,141 @@ def _detect_category(category_name: str) -> Optional[str]:
     return None
 
 
+# Variantes pré-normalisées (une fois au chargement du module)
+_CATEGORY_VARIATIONS_NORM: Dict[str, List[Tuple[str, str]]] = {
+    key: [(v, _norm(v)) for v in variations] for key, variations in _CATEGORY_VARIATIONS.items()
+}
+
+
+def _build_tenant_store(faq_categories: List[Dict[str, Any]], threshold: Optional[float] = None) -> Optional[FaqStore]:
+    """FAQ dashboard (catégories normalisées) → FaqStore avec variantes par catégorie ; None si aucun item actif."""
+    items: List[FaqItem] = []
+    for cat in faq_categories:
+        if not isinstance(cat, dict):
+            continue
+        cat_name = str(cat.get("category") or "").strip()
+        cat_key = _detect_category(cat_name)
+        variations = _CATEGORY_VARIATIONS_NORM.get(cat_key) if cat_key else None
+
+        for item in (cat.get("items") or []):
+            if not isinstance(item, dict):
+                continue
+            if not item.get("active", True):
+                continue
+            question = str(item.get("question") or "").strip()
+            answer = str(item.get("answer") or "").strip()
+            if not question or not answer:
+                continue
+            faq_id = str(item.get("id") or "").strip() or "FAQ_TENANT"
+            items.append(FaqItem(faq_id=faq_id, question=question, answer=answer))
+
+            if variations:
+                seen = {_norm(question)}
+                for variation, variation_norm in variations:
+                    if variation_norm not in seen:
+                        seen.add(variation_norm)
+                        items.append(FaqItem(faq_id=faq_id, question=variation, answer=answer))
+    return FaqStore(items=items, threshold=threshold) if items else None
+
+
+# ---------- Index compilé par tenant ----------
+# tenant_id → (version, vérifié à (monotonic), FaqStore). version = hash de faq_json + sector + faq_threshold :
+# tant que la FAQ ne change pas, l'index est réutilisé. La version n'est recalculée (get_params)
+# qu'au plus toutes les FAQ_INDEX_CHECK_SEC ; les PUT / reset FAQ reconstruisent l'index immédiatement.
+_FAQ_INDEX_CHECK_SEC = float(os.getenv("FAQ_INDEX_CHECK_SEC", "30"))
+_tenant_index: Dict[int, Tuple[str, float, FaqStore]] = {}
+_tenant_index_lock = threading.Lock()
+_default_store: Optional[FaqStore] = None
+
+
+def default_faq_index() -> FaqStore:
+    """FaqStore par défaut construit une fois (lecture seule, partagé entre appels)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = default_faq_store()
+    return _default_store
+
+
+def _faq_threshold(params: Dict[str, Any]) -> Optional[float]:
+    """Seuil FAQ du tenant (params faq_threshold, réglé via scripts/tune_faq_threshold.py) ; None si absent / invalide."""
+    try:
+        value = float(params.get("faq_threshold"))
+    except (TypeError, ValueError):
+        return None
+    return value if 0.0 < value <= 1.0 else None
+
+
+def _faq_version(params: Dict[str, Any]) -> str:
+    raw = json.dumps([params.get("faq_json"), params.get("sector"), params.get("faq_threshold")], sort_keys=True, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _compile_tenant_index(tenant_id: int) -> Tuple[str, FaqStore]:
+    from backend.tenant_config import get_faq, get_params
+    params = get_params(tenant_id)
+    version = _faq_version(params)
+    faq_categories = get_faq(tenant_id)
+    store = _build_tenant_store(faq_categories, _faq_threshold(params)) if faq_categories else None
+    if store is None:
+        logger.debug("tenant_faq_store: no active FAQ for tenant %s, using default", tenant_id)
+        store = default_faq_index()
+    else:
+        logger.debug("tenant_faq_store: compiled %d items (with variations) for tenant %s", len(store.items), tenant_id)
+    return version, store
+
+
+def rebuild_tenant_faq_index(tenant_id: int) -> None:
+    """
+    Reconstruit l'index FAQ du tenant (après PUT / reset FAQ).
+    Invalide d'abord le cache params (diffusé aux autres instances) pour relire la FAQ écrite.
+    En cas d'échec, l'index est retiré : le prochain tenant_faq_store le recompile.
+    """
+    from backend.tenant_config import invalidate_params_cache
+    try:
+        invalidate_params_cache(tenant_id)
+        version, store = _compile_tenant_index(tenant_id)
+    except Exception as e:
+        logger.warning("rebuild_tenant_faq_index failed for tenant %s: %s", tenant_id, e)
+        invalidate_tenant_faq_index(tenant_id)
+        return
+    with _tenant_index_lock:
+        _tenant_index[tenant_id] = (version, time.monotonic(), store)
+
+
+def invalidate_tenant_faq_index(tenant_id: Optional[int] = None) -> None:
+    with _tenant_index_lock:
+        if tenant_id is None:
+            _tenant_index.clear()
+        else:
+            _tenant_index.pop(tenant_id, None)
+
+
 def tenant_faq_store(tenant_id: Optional[int] = None) -> FaqStore:
     """
-    Construit un FaqStore à partir de la FAQ du tenant (dashboard).
-    Ajoute des variantes automatiques par catégorie pour améliorer le fuzzy matching.
-    Fallback sur default_faq_store() si aucune FAQ tenant trouvée.
+    FaqStore compilé du tenant (FAQ dashboard + variantes automatiques par catégorie).
+    Réutilisé tant que la version (faq_json + sector) ne change pas.
+    Fallback sur la FAQ par défaut si aucune FAQ tenant trouvée.
     """
     if tenant_id is None or tenant_id <= 0:
-        return default_faq_store()
+        return default_faq_index()
 
-    try:
-        from backend.tenant_config import get_faq
-        faq_categories = get_faq(tenant_id)
-        if not faq_categories:
-            logger.debug("tenant_faq_store: no FAQ for tenant %s, using default", tenant_id)
-            return default_faq_store()
-
-        items: List[FaqItem] = []
-        for cat in faq_categories:
-            if not isinstance(cat, dict):
-                continue
-            cat_name = str(cat.get("category") or "").strip()
-            cat_key = _detect_category(cat_name)
+    now = time.monotonic()
+    with _tenant_index_lock:
+        cached = _tenant_index.get(tenant_id)
+    if cached is not None and now - cached[1] < _FAQ_INDEX_CHECK_SEC:
+        return cached[2]
 
-            for item in (cat.get("items") or []):
-                if not isinstance(item, dict):
-                    continue
-                if not item.get("active", True):
-                    continue
-                question = str(item.get("question") or "").strip()
-                answer = str(item.get("answer") or "").strip()
-                if not question or not answer:
-                    continue
-                faq_id = str(item.get("id") or "").strip() or "FAQ_TENANT"
-                items.append(FaqItem(faq_id=faq_id, question=question, answer=answer))
-
-                if cat_key and cat_key in _CATEGORY_VARIATIONS:
-                    seen = {_norm(question)}
-                    for variation in _CATEGORY_VARIATIONS[cat_key]:
-                        if _norm(variation) not in seen:
-                            seen.add(_norm(variation))
-                            items.append(FaqItem(faq_id=faq_id, question=variation, answer=answer))
-
-        if not items:
-            logger.debug("tenant_faq_store: 0 active items for tenant %s, using default", tenant_id)
-            return default_faq_store()
-
-        logger.debug("tenant_faq_store: loaded %d items (with variations) for tenant %s", len(items), tenant_id)
-        return FaqStore(items=items)
+    try:
+        if cached is not None:
+            from backend.tenant_config import get_params
+            if _faq_version(get_params(tenant_id)) == cached[0]:
+                with _tenant_index_lock:
+                    _tenant_index[tenant_id] = (cached[0], now, cached[2])
+                return cached[2]
+        version, store = _compile_tenant_index(tenant_id)
+        with _tenant_index_lock:
+            _tenant_index[tenant_id] = (version, now, store)
+        return store
     except Exception as e:
         logger.warning("tenant_faq_store failed for tenant %s: %s (using default)", tenant_id, e)
-        return default_faq_store()
+        return cached[2] if cached is not None else default_faq_index()
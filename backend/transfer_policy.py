@@ -11,6 +11,7 @@ import re
 from typing import Literal
 
 from backend.intent_parser import normalize_stt_text
+from backend.pattern_detector import MultiPatternDetector
 
 # Mots normalisés (normalize_stt_text : accents → ascii, apostrophe → espace)
 SHORT_KEYWORDS = {
@@ -36,6 +37,9 @@ EXPLICIT_PATTERNS = [
     r"\b(transferez|transfere|transferer)\b",
     r"\bje veux\b.*\b(un humain|parler|quelqu un|un conseiller|un agent)\b",
 ]
+_EXPLICIT_DETECTOR = MultiPatternDetector(regexes={"EXPLICIT": EXPLICIT_PATTERNS})
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+_SPACES_RE = re.compile(r"\s+")
 
 
 def classify_transfer_request(text: str) -> Literal["SHORT", "EXPLICIT", "NONE"]:
@@ -47,13 +51,12 @@ def classify_transfer_request(text: str) -> Literal["SHORT", "EXPLICIT", "NONE"]
     if not raw:
         return "NONE"
     t = normalize_stt_text(raw).lower().strip()
-    t_compact = re.sub(r"[^a-z0-9\s]", " ", t)
-    t_compact = re.sub(r"\s+", " ", t_compact).strip()
+    t_compact = _NON_ALNUM_RE.sub(" ", t)
+    t_compact = _SPACES_RE.sub(" ", t_compact).strip()
 
     # Explicite d'abord
-    for pat in EXPLICIT_PATTERNS:
-        if re.search(pat, t_compact):
-            return "EXPLICIT"
+    if _EXPLICIT_DETECTOR.first(t_compact) is not None:
+        return "EXPLICIT"
 
     # Courte / mot seul
     if len(t_compact) <= 14:
@@ -0,0 +1,289 @@
+# backend/turn_trace.py
+"""
+Traçage de latence par tour : spans par étape, histogrammes Prometheus, trace par appel.
+
+Un tour (Vapi /chat/completions, /tool, web /chat via Engine.handle_message) ouvre une trace
+(begin/end ou turn()) portée par un ContextVar ; engine_executor.run copie le contexte, la trace
+suit donc le tour dans le thread engine. Les étapes sont mesurées par span(stage) / @traced(stage) :
+  session_load, medical_triage, faq, intent_router, calendar_fetch, booking, journal_write, response_build
+(+ "turn" / "tool" pour le total). Un span imbriqué de la même étape n'est compté qu'une fois.
+
+À la fin du tour :
+  - chaque span alimente l'histogramme uwi_turn_stage_seconds{stage, tenant, channel, state}
+    (state = état de la conversation au début du tour) → GET /metrics (format texte Prometheus) ;
+  - le tour (spans + total) est ajouté à la trace de l'appel dans le cache partagé "call_traces"
+    (TURN_TRACE_TTL_S, 50 derniers tours) → détail d'appel admin (_get_call_detail) ;
+  - au-delà de TURN_LATENCY_BUDGET_MS, un log [TURN_SLOW] donne l'étape la plus lente.
+Un span hors tour (tâche de fond) alimente seulement l'histogramme.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bornes des buckets (secondes) : de 5 ms au timeout Vapi (~20 s)
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+_MAX_SPANS_PER_TURN = 100
+_MAX_TURNS_PER_CALL = 50
+_METRIC = "uwi_turn_stage_seconds"
+_LABELS = ("stage", "tenant", "channel", "state")
+
+
+def _float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+
+# ---------- Histogrammes ----------
+
+class _Histogram:
+    __slots__ = ("counts", "total", "n")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.n = 0
+
+
+_hist: Dict[Tuple[str, str, str, str], _Histogram] = {}
+_hist_lock = threading.Lock()
+
+
+def observe(stage: str, seconds: float, tenant: Any = None, channel: Any = None, state: Any = None) -> None:
+    key = (stage, str(tenant or ""), str(channel or ""), str(state or ""))
+    with _hist_lock:
+        h = _hist.get(key)
+        if h is None:
+            h = _hist[key] = _Histogram()
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h.counts[i] += 1
+        h.total += seconds
+        h.n += 1
+
+
+def _label_value(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus() -> str:
+    """Histogrammes au format texte Prometheus 0.0.4 (buckets cumulés)."""
+    with _hist_lock:
+        items = sorted((k, list(h.counts), h.total, h.n) for k, h in _hist.items())
+    lines = [
+        f"# HELP {_METRIC} Latence par étape d'un tour (secondes)",
+        f"# TYPE {_METRIC} histogram",
+    ]
+    for key, counts, total, n in items:
+        labels = ",".join(f'{name}="{_label_value(v)}"' for name, v in zip(_LABELS, key, strict=True))
+        for bound, c in zip(BUCKETS, counts, strict=True):
+            lines.append(f'{_METRIC}_bucket{{{labels},le="{bound:g}"}} {c}')
+        lines.append(f'{_METRIC}_bucket{{{labels},le="+Inf"}} {n}')
+        lines.append(f"{_METRIC}_sum{{{labels}}} {total:.6f}")
+        lines.append(f"{_METRIC}_count{{{labels}}} {n}")
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    with _hist_lock:
+        _hist.clear()
+
+
+# ---------- Trace du tour ----------
+
+class TurnTrace:
+    def __init__(self, kind: str, call_id: str, labels: Dict[str, Any]):
+        self.kind = kind
+        self.call_id = call_id or ""
+        self.tenant_id = labels.get("tenant_id")
+        self.channel = labels.get("channel")
+        self.state = labels.get("state")
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._active: List[str] = []
+
+    def tag(self, call_id: Optional[str] = None, tenant_id: Any = None, channel: Optional[str] = None,
+            state: Optional[str] = None) -> None:
+        """call_id / tenant / canal : dernière valeur connue ; state : état au début du tour (1re valeur)."""
+        if call_id:
+            self.call_id = call_id
+        if tenant_id is not None:
+            self.tenant_id = tenant_id
+        if channel:
+            self.channel = channel
+        if state and not self.state:
+            self.state = state
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def to_dict(self, total_ms: float) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "started_at": self.started_at,
+            "tenant_id": self.tenant_id,
+            "channel": self.channel,
+            "state": self.state,
+            "total_ms": round(total_ms, 1),
+            "spans": self.spans,
+        }
+
+
+_current: ContextVar[Optional[TurnTrace]] = ContextVar("turn_trace", default=None)
+
+
+def current() -> Optional[TurnTrace]:
+    return _current.get()
+
+
+def begin(call_id: str = "", kind: str = "turn", **labels: Any) -> Optional[Token]:
+    """Ouvre la trace du tour ; si un tour est déjà ouvert (appel imbriqué), le rejoint (None)."""
+    existing = _current.get()
+    if existing is not None:
+        existing.tag(call_id=call_id, **labels)
+        return None
+    return _current.set(TurnTrace(kind, call_id, labels))
+
+
+def end(token: Optional[Token]) -> None:
+    """Ferme la trace ouverte par begin() (no-op pour un tour rejoint)."""
+    if token is None:
+        return
+    trace = _current.get()
+    _current.reset(token)
+    if trace is not None:
+        _finish(trace)
+
+
+def detach(token: Optional[Token]) -> Optional[TurnTrace]:
+    """
+    Retire du contexte la trace ouverte par begin() sans la fermer, pour la confier à un flux SSE
+    (traced_stream) qui la fermera en fin de flux. None pour un tour rejoint.
+    """
+    if token is None:
+        return None
+    trace = _current.get()
+    _current.reset(token)
+    return trace
+
+
+async def traced_stream(trace: Optional[TurnTrace], agen: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Itère agen avec trace comme tour courant (spans et engine_executor.run rattachés au tour),
+    puis ferme le tour en fin de flux : total = requête → dernier chunk.
+    """
+    token = _current.set(trace) if trace is not None else None
+    try:
+        async for chunk in agen:
+            yield chunk
+    finally:
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:  # flux fermé depuis un autre contexte (client déconnecté, GC)
+                pass
+            _finish(trace)
+
+
+@contextmanager
+def turn(call_id: str = "", kind: str = "turn", **labels: Any) -> Iterator[Optional[TurnTrace]]:
+    token = begin(call_id, kind, **labels)
+    try:
+        yield _current.get()
+    finally:
+        end(token)
+
+
+def tag(**labels: Any) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.tag(**labels)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    trace = _current.get()
+    if trace is not None and stage in trace._active:
+        yield  # même étape déjà mesurée plus haut dans la pile
+        return
+    start_ms = trace.elapsed_ms() if trace is not None else 0.0
+    t0 = time.perf_counter()
+    if trace is not None:
+        trace._active.append(stage)
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - t0
+        if trace is None:
+            observe(stage, seconds)
+        else:
+            trace._active.remove(stage)
+            if len(trace.spans) < _MAX_SPANS_PER_TURN:
+                trace.spans.append({"stage": stage, "start_ms": round(start_ms, 1), "duration_ms": round(seconds * 1000, 1)})
+
+
+def traced(stage: str) -> Callable:
+    """Décorateur : la fonction entière est un span de l'étape stage."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def _finish(trace: TurnTrace) -> None:
+    total_ms = trace.elapsed_ms()
+    labels = (trace.tenant_id, trace.channel, trace.state)
+    observe(trace.kind, total_ms / 1000, *labels)
+    for s in trace.spans:
+        observe(s["stage"], s["duration_ms"] / 1000, *labels)
+    budget_ms = _float_env("TURN_LATENCY_BUDGET_MS", 3000)
+    if total_ms > budget_ms:
+        slowest = max(trace.spans, key=lambda s: s["duration_ms"], default=None)
+        logger.warning(
+            "[TURN_SLOW] call_id=%s kind=%s tenant_id=%s state=%s total_ms=%.0f budget_ms=%.0f slowest=%s:%sms",
+            trace.call_id[:24], trace.kind, trace.tenant_id, trace.state, total_ms, budget_ms,
+            slowest["stage"] if slowest else "-", slowest["duration_ms"] if slowest else "-",
+        )
+    if trace.call_id:
+        try:
+            _record_call_turn(trace.call_id, trace.to_dict(total_ms))
+        except Exception as e:
+            logger.debug("[TURN_TRACE] store failed call_id=%s err=%s", trace.call_id[:24], e)
+
+
+# ---------- Trace par appel (cache partagé) ----------
+
+def _trace_cache():
+    from backend.shared_cache import get_cache
+    return get_cache("call_traces", ttl_seconds=_float_env("TURN_TRACE_TTL_S", 6 * 3600), max_entries=5000)
+
+
+def _record_call_turn(call_id: str, turn_dict: Dict[str, Any]) -> None:
+    cache = _trace_cache()
+    turns = list(cache.get(call_id) or [])
+    turns.append(turn_dict)
+    cache.set(call_id, turns[-_MAX_TURNS_PER_CALL:])
+
+
+def call_trace(call_id: str, tenant_id: Any = None) -> List[Dict[str, Any]]:
+    """Tours tracés d'un appel (plus ancien d'abord) ; filtrés sur tenant_id si fourni."""
+    if not call_id:
+        return []
+    turns = _trace_cache().get(call_id) or []
+    if tenant_id is None:
+        return list(turns)
+    return [t for t in turns if t.get("tenant_id") is None or str(t.get("tenant_id")) == str(tenant_id)]
@@ -0,0 +1,101 @@
+# backend/utterance.py
+"""
+Énoncé utilisateur d'un tour : formes normalisées, tokens, chiffres, contrainte horaire, intents
+et entités calculés à la demande puis mémoïsés (une seule fois par tour).
+
+Engine.handle_message crée le NormalizedUtterance du tour et le publie dans un ContextVar ;
+utterance_for(text) le renvoie tant que le texte demandé est bien celui du tour (sinon objet neuf,
+non partagé). Tout ce qui est mémoïsé ne dépend que du texte (et de l'état pour intent()),
+un objet réutilisé hors de son tour reste donc exact.
+"""
+from __future__ import annotations
+
+from contextvars import ContextVar
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from backend.entity_extraction import ExtractedEntities
+    from backend.time_constraints import TimeConstraint
+
+
+class NormalizedUtterance:
+    """Texte brut d'un tour + dérivés paresseux (imports locaux : entity_extraction dépend de ce module)."""
+
+    def __init__(self, raw: Optional[str]):
+        self.raw: str = raw if isinstance(raw, str) else ""
+        self._intents: Dict[str, str] = {}
+
+    def __repr__(self) -> str:
+        return f"NormalizedUtterance({self.raw[:40]!r})"
+
+    @cached_property
+    def lower(self) -> str:
+        """strip + lower (forme des détecteurs médicaux, entités, FSM2)."""
+        return self.raw.strip().lower()
+
+    @cached_property
+    def stt(self) -> str:
+        """intent_parser.normalize_stt_text : ponctuation/apostrophes/tirets → espace, accents → ascii."""
+        from backend.intent_parser import normalize_stt_text
+        return normalize_stt_text(self.raw)
+
+    @cached_property
+    def tokens(self) -> List[str]:
+        return self.stt.split()
+
+    @cached_property
+    def digits(self) -> str:
+        """Chiffres dictés ("zéro six douze…" → "0612…")."""
+        from backend.intent_parser import words_to_digits
+        return words_to_digits(self.raw)
+
+    @cached_property
+    def time_constraint(self) -> Optional["TimeConstraint"]:
+        from backend.time_constraints import extract_time_constraint
+        return extract_time_constraint(self.raw)
+
+    @cached_property
+    def strong_intent(self) -> Optional[str]:
+        """Intent préemptif (TRANSFER > CANCEL > MODIFY > ABANDON > ORDONNANCE > FAQ) ou None."""
+        from backend.intent_parser import detect_strong_intent
+        r = detect_strong_intent(self.raw, "")
+        return r.value if r else None
+
+    def intent(self, state: str = "") -> str:
+        """intent_parser.detect_intent(...).value, mémoïsé par état."""
+        state = state or ""
+        cached = self._intents.get(state)
+        if cached is None:
+            from backend.intent_parser import detect_intent
+            cached = self._intents[state] = detect_intent(self.raw, state).value
+        return cached
+
+    @cached_property
+    def entities(self) -> "ExtractedEntities":
+        from backend.entity_extraction import extract_entities
+        return extract_entities(self)
+
+    @cached_property
+    def red_flag(self) -> Optional[str]:
+        from backend.guards_medical_triage import detect_medical_red_flag
+        return detect_medical_red_flag(self.raw)
+
+    @cached_property
+    def medical_class(self) -> Optional[str]:
+        from backend.guards_medical_triage import classify_medical_symptoms
+        return classify_medical_symptoms(self.raw)
+
+
+# Énoncé du tour en cours (posé par Engine.handle_message)
+current_utterance: ContextVar[Optional[NormalizedUtterance]] = ContextVar("current_utterance", default=None)
+
+
+def utterance_for(text: Optional[str]) -> NormalizedUtterance:
+    """Énoncé du tour si text est le texte du tour, sinon un NormalizedUtterance neuf."""
+    if isinstance(text, NormalizedUtterance):
+        return text
+    current = current_utterance.get()
+    if current is not None and current.raw == (text or ""):
+        return current
+    return NormalizedUtterance(text)
@@ -8,7 +8,7 @@ from __future__ import annotations
 import logging
 import os
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
 from backend.pg_pool import pg_connection
 
@@ -163,3 +163,30 @@ def insert_call_transcript(
     except Exception as e:
         logger.warning("vapi_calls_pg: insert transcript failed tenant_id=%s call_id=%s: %s", tenant_id, (call_id or "")[:24], e)
         return False
+
+
+def call_volume_by_tenant(days: int = 7) -> Dict[int, Tuple[int, int]]:
+    """
+    Volume d'appels récent par tenant : {tenant_id: (appels dernière heure, appels sur days jours)}.
+    Tenants sans appel absents ; {} si PG indisponible.
+    """
+    if not _pg_url():
+        return {}
+    try:
+        with pg_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT tenant_id,
+                           COUNT(*) FILTER (WHERE created_at >= now() - interval '1 hour') AS last_hour,
+                           COUNT(*) AS recent
+                    FROM vapi_calls
+                    WHERE created_at >= now() - make_interval(days => %s)
+                    GROUP BY tenant_id
+                    """,
+                    (int(days),),
+                )
+                return {int(r["tenant_id"]): (int(r["last_hour"]), int(r["recent"])) for r in cur.fetchall()}
+    except Exception as e:
+        logger.warning("vapi_calls_pg: call volume failed: %s", e)
+        return {}
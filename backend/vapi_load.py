@@ -0,0 +1,327 @@
+# backend/vapi_load.py
+"""
+Générateur de charge Vapi (scripts/load_vapi.py) : N appels simulés en parallèle sur
+/api/vapi/webhook, /api/vapi/chat/completions (streaming ou non) et /api/vapi/tool.
+
+Cycle d'un appel simulé : assistant-request → status-update ringing / in-progress → tours
+chat/completions (scénarios call_replay.SYNTHETIC_SCENARIOS, historique messages complet) avec
+tool-calls get_slots / book → end-of-call-report → status-update ended.
+
+Mesures : latence par endpoint (p50/p95/p99), erreurs (HTTP >= 500 ou exception), timeouts,
+débit ; échantillons mémoire périodiques (RSS, tracemalloc, STREAMS, sessions en mémoire de
+l'engine, cache tool_result) pour repérer une croissance sur un soak long.
+En process (ASGITransport) le calendrier est le faux de call_replay ; contre un serveur externe
+(--url), les compteurs viennent de GET /health.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from backend.call_replay import SYNTHETIC_SCENARIOS, percentile
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "/api/vapi"
+DEFAULT_TO_NUMBER = "+33100000000"
+
+
+# ---------- Payloads ----------
+
+def _call(call_id: str, to_number: str, customer: str, status: Optional[str] = None) -> Dict[str, Any]:
+    call: Dict[str, Any] = {
+        "id": call_id,
+        "assistantId": "load-test",
+        "phoneNumber": {"number": to_number},
+        "customer": {"number": customer},
+    }
+    if status:
+        call["status"] = status
+    return call
+
+
+def webhook_payload(msg_type: str, call_id: str, to_number: str = DEFAULT_TO_NUMBER,
+                    customer: str = "+33600000000", **message: Any) -> Dict[str, Any]:
+    """message.type = assistant-request / status-update / end-of-call-report / tool-calls."""
+    return {"message": {"type": msg_type, "call": _call(call_id, to_number, customer, message.get("status")), **message}}
+
+
+def end_of_call_report(call_id: str, duration_s: float, **kw: Any) -> Dict[str, Any]:
+    return webhook_payload(
+        "end-of-call-report", call_id, endedReason="customer-ended-call",
+        durationSeconds=round(duration_s, 1), cost=round(duration_s * 0.002, 4), **kw,
+    )
+
+
+def chat_payload(call_id: str, messages: List[Dict[str, str]], stream: bool,
+                 to_number: str = DEFAULT_TO_NUMBER, customer: str = "+33600000000") -> Dict[str, Any]:
+    return {"call": _call(call_id, to_number, customer), "messages": messages, "stream": stream}
+
+
+def tool_payload(call_id: str, arguments: Dict[str, Any], to_number: str = DEFAULT_TO_NUMBER,
+                 customer: str = "+33600000000") -> Dict[str, Any]:
+    """Payload tool Vapi (message.toolCallList, function_tool)."""
+    return {
+        "message": {
+            "type": "tool-calls",
+            "call": _call(call_id, to_number, customer),
+            "toolCallList": [{
+                "id": f"tc_{uuid.uuid4().hex[:16]}",
+                "function": {"name": "function_tool", "arguments": arguments},
+            }],
+        },
+    }
+
+
+# ---------- Statistiques ----------
+
+@dataclass
+class LoadStats:
+    started: float = field(default_factory=time.perf_counter)
+    latencies: Dict[str, List[float]] = field(default_factory=dict)
+    ttfb: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=dict)
+    timeouts: Dict[str, int] = field(default_factory=dict)
+    calls: int = 0
+    memory: List[Dict[str, Any]] = field(default_factory=list)
+
+    def record(self, endpoint: str, ms: float, ok: bool = True, timeout: bool = False) -> None:
+        self.latencies.setdefault(endpoint, []).append(ms)
+        if timeout:
+            self.timeouts[endpoint] = self.timeouts.get(endpoint, 0) + 1
+        elif not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        total = sum(len(v) for v in self.latencies.values())
+        endpoints = {}
+        for ep, values in sorted(self.latencies.items()):
+            endpoints[ep] = {
+                "requests": len(values),
+                "p50": round(percentile(values, 50), 1),
+                "p95": round(percentile(values, 95), 1),
+                "p99": round(percentile(values, 99), 1),
+                "max": round(max(values), 1),
+                "error_rate": round(self.errors.get(ep, 0) / len(values), 4),
+                "timeout_rate": round(self.timeouts.get(ep, 0) / len(values), 4),
+            }
+        out: Dict[str, Any] = {
+            "elapsed_s": round(elapsed, 1),
+            "calls": self.calls,
+            "requests": total,
+            "rps": round(total / elapsed, 1),
+            "calls_per_s": round(self.calls / elapsed, 2),
+            "error_rate": round(sum(self.errors.values()) / total, 4) if total else 0.0,
+            "timeout_rate": round(sum(self.timeouts.values()) / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+        if self.ttfb:
+            out["stream_ttfb_ms"] = {"p50": round(percentile(self.ttfb, 50), 1), "p95": round(percentile(self.ttfb, 95), 1)}
+        if len(self.memory) >= 2:
+            out["memory"] = memory_growth(self.memory)
+        return out
+
+
+def memory_growth(samples: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Par compteur : premier, dernier, max, et pente par 1000 appels (régression linéaire)."""
+    out = {}
+    keys = [k for k in samples[-1] if k not in ("t", "calls") and isinstance(samples[-1][k], (int, float))]
+    xs = [s.get("calls", 0) for s in samples]
+    for k in keys:
+        ys = [s.get(k) for s in samples]
+        pts = [(x, y) for x, y in zip(xs, ys, strict=True) if isinstance(y, (int, float))]
+        slope = 0.0
+        if len(pts) >= 2:
+            mx = sum(x for x, _ in pts) / len(pts)
+            my = sum(y for _, y in pts) / len(pts)
+            var = sum((x - mx) ** 2 for x, _ in pts)
+            if var:
+                slope = sum((x - mx) * (y - my) for x, y in pts) / var * 1000
+        out[k] = {"first": pts[0][1], "last": pts[-1][1], "max": max(y for _, y in pts), "per_1000_calls": round(slope, 1)}
+    return out
+
+
+# ---------- Sondes mémoire ----------
+
+def _rss_kib() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        import resource
+        return pages * resource.getpagesize() // 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def inprocess_probe() -> Dict[str, Any]:
+    """Compteurs du process courant (app montée en ASGI dans ce même process)."""
+    from backend.engine import ENGINE
+    from backend.main import STREAMS
+    from backend.routes.voice import _TOOL_RESULT_CACHE
+
+    sample: Dict[str, Any] = {
+        "rss_kib": _rss_kib(),
+        "streams": len(STREAMS),
+        "engine_sessions": len(getattr(ENGINE.session_store, "_memory_cache", None) or {}),
+        "tool_result_cache": len(_TOOL_RESULT_CACHE),
+    }
+    if tracemalloc.is_tracing():
+        sample["traced_kib"] = tracemalloc.get_traced_memory()[0] // 1024
+    return sample
+
+
+def health_probe(client: httpx.AsyncClient) -> Callable[[], Awaitable[Dict[str, Any]]]:
+    """Compteurs d'un serveur distant via GET /health (streams, sessions, caches partagés)."""
+    async def probe() -> Dict[str, Any]:
+        r = await client.get("/health", timeout=10)
+        data = r.json()
+        namespaces = (data.get("shared_cache") or {}).get("namespaces") or {}
+        return {
+            "streams": data.get("streams"),
+            "engine_sessions": data.get("engine_sessions"),
+            "tool_result_cache": (namespaces.get("tool_result") or {}).get("size"),
+        }
+    return probe
+
+
+# ---------- Appel simulé ----------
+
+async def _post(client: httpx.AsyncClient, stats: LoadStats, endpoint: str, path: str,
+                payload: Dict[str, Any], timeout: float, stream: bool = False) -> Optional[httpx.Response]:
+    t0 = time.perf_counter()
+    try:
+        if stream:
+            async with client.stream("POST", path, json=payload, timeout=timeout) as r:
+                first = None
+                async for _ in r.aiter_raw():
+                    if first is None:
+                        first = time.perf_counter()
+                if first is not None:
+                    stats.ttfb.append((first - t0) * 1000)
+        else:
+            r = await client.post(path, json=payload, timeout=timeout)
+    except httpx.TimeoutException:
+        stats.record(endpoint, (time.perf_counter() - t0) * 1000, ok=False, timeout=True)
+        return None
+    except Exception as e:
+        logger.debug("[LOAD] %s failed: %s", endpoint, e)
+        stats.record(endpoint, (time.perf_counter() - t0) * 1000, ok=False)
+        return None
+    stats.record(endpoint, (time.perf_counter() - t0) * 1000, ok=r.status_code < 500)
+    return r
+
+
+def _assistant_text(r: Optional[httpx.Response]) -> str:
+    if r is None:
+        return ""
+    try:
+        return ((r.json().get("choices") or [{}])[0].get("message") or {}).get("content") or ""
+    except (ValueError, json.JSONDecodeError):
+        return ""
+
+
+async def simulate_call(client: httpx.AsyncClient, stats: LoadStats, rng: random.Random, *,
+                        to_number: str = DEFAULT_TO_NUMBER, stream_ratio: float = 0.5,
+                        tool_ratio: float = 0.5, timeout: float = 20.0, think_s: float = 0.0) -> None:
+    call_id = f"load-{uuid.uuid4().hex[:16]}"
+    customer = f"+336{rng.randint(10_000_000, 99_999_999)}"
+    turns = SYNTHETIC_SCENARIOS[rng.choice(sorted(SYNTHETIC_SCENARIOS))]
+    t_call = time.perf_counter()
+    wh = f"{PREFIX}/webhook"
+    await _post(client, stats, "webhook:assistant-request", wh, webhook_payload("assistant-request", call_id, to_number, customer), timeout)
+    for status in ("ringing", "in-progress"):
+        await _post(client, stats, "webhook:status-update", wh, webhook_payload("status-update", call_id, to_number, customer, status=status), timeout)
+
+    messages: List[Dict[str, str]] = []
+    for text in turns:
+        messages.append({"role": "user", "content": text})
+        stream = rng.random() < stream_ratio
+        endpoint = "chat:stream" if stream else "chat"
+        r = await _post(client, stats, endpoint, f"{PREFIX}/chat/completions",
+                        chat_payload(call_id, list(messages), stream, to_number, customer), timeout, stream=stream)
+        messages.append({"role": "assistant", "content": "" if stream else _assistant_text(r)})
+        if think_s:
+            await asyncio.sleep(rng.uniform(0, think_s))
+
+    if rng.random() < tool_ratio:
+        args = {"action": "get_slots", "patient_name": "Test Charge", "motif": "consultation", "preference": rng.choice(["matin", "après-midi"])}
+        await _post(client, stats, "tool:get_slots", f"{PREFIX}/tool", tool_payload(call_id, args, to_number, customer), timeout)
+        args = {"action": "book", "selected_slot": "1", "patient_name": "Test Charge", "patient_phone": customer, "motif": "consultation"}
+        await _post(client, stats, "tool:book", f"{PREFIX}/tool", tool_payload(call_id, args, to_number, customer), timeout)
+
+    await _post(client, stats, "webhook:end-of-call-report", wh,
+                end_of_call_report(call_id, time.perf_counter() - t_call, to_number=to_number, customer=customer), timeout)
+    await _post(client, stats, "webhook:status-update", wh, webhook_payload("status-update", call_id, to_number, customer, status="ended"), timeout)
+    stats.calls += 1
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    *,
+    concurrency: int = 10,
+    calls: Optional[int] = None,
+    duration_s: Optional[float] = None,
+    probe: Optional[Callable[[], Any]] = None,
+    sample_every_s: float = 5.0,
+    seed: int = 0,
+    **call_kwargs: Any,
+) -> LoadStats:
+    """
+    concurrency appels simulés en parallèle jusqu'à calls appels au total ou duration_s secondes (soak).
+    probe (sync ou async) est échantillonné toutes les sample_every_s secondes, plus au début et à la fin.
+    """
+    if calls is None and duration_s is None:
+        calls = concurrency
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration_s if duration_s else None
+    remaining = [calls if calls is not None else -1]
+    done = asyncio.Event()
+
+    async def _sample() -> None:
+        if probe is None:
+            return
+        try:
+            snap = probe()
+            if asyncio.iscoroutine(snap):
+                snap = await snap
+            stats.memory.append({"t": round(time.perf_counter() - stats.started, 1), "calls": stats.calls, **snap})
+        except Exception as e:
+            logger.debug("[LOAD] probe failed: %s", e)
+
+    async def _sampler() -> None:
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), timeout=sample_every_s)
+            except asyncio.TimeoutError:
+                await _sample()
+
+    async def _worker(i: int) -> None:
+        rng = random.Random(seed * 1000 + i)
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if remaining[0] == 0:
+                return
+            if remaining[0] > 0:
+                remaining[0] -= 1
+            await simulate_call(client, stats, rng, **call_kwargs)
+
+    await _sample()
+    sampler = asyncio.create_task(_sampler())
+    try:
+        await asyncio.gather(*(_worker(i) for i in range(concurrency)))
+    finally:
+        done.set()
+        await sampler
+    await _sample()
+    return stats
@@ -13,7 +13,7 @@ import logging
 import threading
 from typing import Any, Dict, List, Optional, Tuple, Union
 
-from backend import prompts, tools_booking
+from backend import engine_executor, prompts, slot_prefetch, tools_booking, turn_trace
 from backend.slot_choice import detect_slot_choice_early
 from backend.vapi_contact_state import get_contact_state, sync_contact_state, validate_contact as validate_contact_state
 
@@ -81,6 +81,7 @@ def _normalize_preferred_time_type(value: Optional[str]) -> str:
     return "around"
 
 
+@turn_trace.traced("calendar_fetch")
 def handle_get_slots(
     session: Any,
     preference: Optional[str],
@@ -174,10 +175,9 @@ def handle_get_slots(
                 )
 
             try:
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                    # En prod, une lecture Google multi-jours peut prendre ~6s.
-                    # On laisse plus de marge ici tout en restant sous le hard cap global du webhook.
-                    slots = ex.submit(_load_slots_sync).result(timeout=_VOICE_SYNC_FETCH_TIMEOUT_S)
+                # En prod, une lecture Google multi-jours peut prendre ~6s.
+                # On laisse plus de marge ici tout en restant sous le hard cap global du webhook.
+                slots = engine_executor.run_sync(_load_slots_sync, timeout=_VOICE_SYNC_FETCH_TIMEOUT_S)
             except concurrent.futures.TimeoutError:
                 slots = None
                 logger.warning(
@@ -199,20 +199,25 @@ def handle_get_slots(
                 )
 
         if slots is None:
-            # On garde un refresh asynchrone pour les tours suivants si la tentative courte a échoué.
-            def _refresh_cache_async() -> None:
-                try:
-                    tools_booking.get_slots_for_display(
-                        limit=3,
-                        pref=pref or None,
-                        session=session,
-                        exclude_start_iso=exclude_start_iso or None,
-                        exclude_end_iso=exclude_end_iso or None,
-                    )
-                except Exception:
-                    pass
-
-            threading.Thread(target=_refresh_cache_async, daemon=True).start()
+            # Refresh asynchrone pour les tours suivants si la tentative courte a échoué.
+            # Sans contrainte ni exclusion : via slot_prefetch (pool borné, rejoint le calcul en vol).
+            # Le fetch sync encore en cours partage de toute façon son appel Google (single-flight).
+            if not cache_disabled and not (exclude_start_iso or exclude_end_iso):
+                slot_prefetch.prefetch(tenant_id, [pref or None])
+            else:
+                def _refresh_cache_async() -> None:
+                    try:
+                        tools_booking.get_slots_for_display(
+                            limit=3,
+                            pref=pref or None,
+                            session=session,
+                            exclude_start_iso=exclude_start_iso or None,
+                            exclude_end_iso=exclude_end_iso or None,
+                        )
+                    except Exception:
+                        pass
+
+                threading.Thread(target=_refresh_cache_async, daemon=True).start()
             logger.warning(
                 "CALENDAR_FETCH_CACHE_MISS_FAST_FAIL call_id=%s tenant_id=%s pref=%s",
                 call_id[:24] if call_id else "",
@@ -380,6 +385,7 @@ def _build_booking_event_context(
     return json.dumps(payload, ensure_ascii=False)
 
 
+@turn_trace.traced("booking")
 def handle_book(
     session: Any,
     selected_slot: Optional[str],
@@ -10,6 +10,9 @@ import os
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from backend.billing_cache import invalidate_usage, record_call_usage
+from backend.pg_pool import pg_connection
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,9 +40,9 @@ def upsert_vapi_call_usage(
         return False
     vapi_call_id = (vapi_call_id or "").strip()
     try:
-        import psycopg
+        from psycopg.rows import tuple_row
         from psycopg.types.json import Json
-        with psycopg.connect(url) as conn:
+        with pg_connection(url, row_factory=tuple_row) as conn:
             with conn.cursor() as cur:
                 cur.execute(
                     "SELECT 1 FROM vapi_call_usage WHERE tenant_id = %s AND vapi_call_id = %s",
@@ -76,6 +79,11 @@ def upsert_vapi_call_usage(
                     logger.info("VAPI_USAGE_UPDATED existing row tenant_id=%s vapi_call_id=%s", tenant_id, vapi_call_id[:32])
                 else:
                     logger.info("VAPI_USAGE_INSERTED tenant_id=%s vapi_call_id=%s", tenant_id, vapi_call_id[:32])
+        # Compteur quota du mois (billing_cache) : +durée sur nouvel appel ; resync si ligne existante modifiée
+        if existed:
+            invalidate_usage(tenant_id)
+        else:
+            record_call_usage(tenant_id, ended_at, duration_sec)
         return True
     except Exception as e:
         if "does not exist" in str(e).lower() or "vapi_call_usage" in str(e):
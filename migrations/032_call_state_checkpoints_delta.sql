@@ -0,0 +1,12 @@
+-- Checkpoints delta (backend/checkpoint_delta.py, CALL_CHECKPOINT_DELTA=true)
+-- kind = 'full'  : state_json = snapshot packé complet
+-- kind = 'delta' : state_json = patch JSON (RFC 6902) à appliquer sur le checkpoint prev_seq
+-- Lignes existantes : kind 'full' par défaut, lecture inchangée.
+
+ALTER TABLE call_state_checkpoints ADD COLUMN IF NOT EXISTS kind TEXT NOT NULL DEFAULT 'full';
+ALTER TABLE call_state_checkpoints ADD COLUMN IF NOT EXISTS prev_seq INT;
+
+-- Reprise : dernier full de l'appel puis deltas suivants
+CREATE INDEX IF NOT EXISTS idx_call_state_checkpoints_full
+    ON call_state_checkpoints (tenant_id, call_id, seq DESC)
+    WHERE kind = 'full';
@@ -0,0 +1,37 @@
+-- Rollups quotidiens des dashboards admin / tenant (backend/stats_rollup.py, STATS_ROLLUP_ENABLED)
+-- ivr_events_daily : par (tenant, jour UTC, event) nb d'events et d'appels distincts ;
+--   events synthétiques '__all__', '__abandon__', '__transfer__', '__refuse_booked__'.
+-- stats_daily : métriques numériques par (tenant, jour) (vapi_calls, usage_sec, usage_cost_usd, session_minutes).
+-- stats_rollup_watermarks : dernier horodatage source agrégé (refresh incrémental).
+
+CREATE TABLE IF NOT EXISTS ivr_events_daily (
+    client_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    event TEXT NOT NULL,
+    events BIGINT NOT NULL DEFAULT 0,
+    calls BIGINT NOT NULL DEFAULT 0,
+    last_at TIMESTAMPTZ,
+    PRIMARY KEY (client_id, day, event)
+);
+CREATE INDEX IF NOT EXISTS idx_ivr_events_daily_day ON ivr_events_daily (day, event);
+
+CREATE TABLE IF NOT EXISTS stats_daily (
+    tenant_id INTEGER NOT NULL,
+    day DATE NOT NULL,
+    metric TEXT NOT NULL,
+    value DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant_id, day, metric)
+);
+CREATE INDEX IF NOT EXISTS idx_stats_daily_day ON stats_daily (day, metric);
+
+CREATE TABLE IF NOT EXISTS stats_rollup_watermarks (
+    source TEXT PRIMARY KEY,
+    watermark TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Scans incrémentaux (jours touchés depuis le watermark)
+CREATE INDEX IF NOT EXISTS idx_ivr_events_created ON ivr_events (created_at);
+CREATE INDEX IF NOT EXISTS idx_vapi_call_usage_updated ON vapi_call_usage (updated_at);
+CREATE INDEX IF NOT EXISTS idx_vapi_calls_updated ON vapi_calls (updated_at);
+CREATE INDEX IF NOT EXISTS idx_call_sessions_updated ON call_sessions (updated_at);
@@ -0,0 +1,23 @@
+-- Outbox email durable (backend/email_outbox.py, EMAIL_OUTBOX=auto|true|false)
+-- idempotency_key UNIQUE : une même clé (ex. daily_report:tenant:client:jour) n'est mise en file qu'une fois.
+-- status : pending → sending (réservé, locked_at) → sent | failed (retry à next_attempt_at) | dead.
+
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT '',
+    to_addr TEXT NOT NULL,
+    from_addr TEXT NOT NULL DEFAULT '',
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    locked_at TIMESTAMPTZ,
+    last_error TEXT,
+    provider_message_id TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    sent_at TIMESTAMPTZ
+);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (next_attempt_at) WHERE status IN ('pending', 'failed');
+CREATE INDEX IF NOT EXISTS idx_email_outbox_sending ON email_outbox (locked_at) WHERE status = 'sending';
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# scripts/bench_faq_index.py
+"""
+Coût par requête FAQ : ancien chemin (FaqStore reconstruit à chaque tool call : catégories →
+items + variantes, normalisation, liste de candidats refaite par search) contre l'index compilé
+(construit une fois, partitions priority pré-calculées, match exact par table de hachage).
+FAQ synthétiques de 50 / 500 / 5000 items ; requêtes fuzzy (paraphrases) et exactes.
+
+Usage:
+  python scripts/bench_faq_index.py
+  python scripts/bench_faq_index.py --sizes 50,500,5000 --queries 200
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.tools_faq import (  # noqa: E402
+    _CATEGORY_VARIATIONS,
+    FaqItem,
+    FaqStore,
+    _build_tenant_store,
+)
+
+_WORDS = (
+    "rendez-vous horaires tarif consultation adresse cabinet parking métro ordonnance mutuelle "
+    "carte vitale remboursement urgence annulation samedi dimanche matin soir docteur analyse"
+).split()
+_CATEGORIES = list(_CATEGORY_VARIATIONS) + ["divers"]
+
+
+def _faq(n_items: int, seed: int = 0):
+    rng = random.Random(seed)
+    cats = {name: [] for name in _CATEGORIES}
+    for i in range(n_items):
+        cat = rng.choice(_CATEGORIES)
+        question = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 7))) + f" {i}"
+        cats[cat].append({"id": f"faq_{i}", "question": question, "answer": f"Réponse {i}", "active": True})
+    return [{"category": name, "items": items} for name, items in cats.items() if items]
+
+
+def _legacy_store(faq_categories) -> FaqStore:
+    """Ancien tenant_faq_store : variantes normalisées à chaque item."""
+    items = []
+    for cat in faq_categories:
+        cat_key = next((k for k in _CATEGORY_VARIATIONS if k in cat["category"].lower()), None)
+        for item in cat["items"]:
+            items.append(FaqItem(faq_id=item["id"], question=item["question"], answer=item["answer"]))
+            if cat_key:
+                seen = {item["question"].strip().lower()}
+                for variation in _CATEGORY_VARIATIONS[cat_key]:
+                    if variation.strip().lower() not in seen:
+                        seen.add(variation.strip().lower())
+                        items.append(FaqItem(faq_id=item["id"], question=variation, answer=item["answer"]))
+    return FaqStore(items=items)
+
+
+def _time_us(fn, queries):
+    t0 = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - t0) * 1e6 / len(queries)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark index FAQ compilé")
+    parser.add_argument("--sizes", default="50,500,5000")
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'items':>6} {'requête':<7} {'legacy µs':>11} {'index µs':>10} {'speedup':>8}")
+    for n_items in [int(x) for x in args.sizes.split(",")]:
+        faq = _faq(n_items)
+        index = _build_tenant_store(faq)
+        questions = [it.question for it in index.items]
+        fuzzy = [" ".join(rng.choice(_WORDS) for _ in range(4)) for _ in range(args.queries)]
+        exact = [rng.choice(questions) for _ in range(args.queries)]
+        for label, queries in (("fuzzy", fuzzy), ("exact", exact)):
+            # Le tool call FAQ (routes/voice) reconstruisait le store à chaque requête
+            legacy_us = _time_us(lambda q, faq=faq: _legacy_store(faq).search(q), queries)
+            index_us = _time_us(lambda q, index=index: index.search(q), queries)
+            print(f"{n_items:>6} {label:<7} {legacy_us:>11.0f} {index_us:>10.0f} {legacy_us / index_us:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
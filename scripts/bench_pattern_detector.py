@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# scripts/bench_pattern_detector.py
+"""
+Micro-benchmark des détecteurs mot-clé / regex d'un tour (backend/pattern_detector.py) contre les
+anciennes boucles `any(k in t ...)` / `re.search` par motif : triage médical, intents forts +
+oui/répète/booking, transfert. Corpus = énoncés réalistes de longueurs variées.
+
+Usage:
+  python scripts/bench_pattern_detector.py
+  python scripts/bench_pattern_detector.py --repeat 200
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend import guards_medical_triage as triage  # noqa: E402
+from backend import intent_parser as ip  # noqa: E402
+from backend import transfer_policy  # noqa: E402
+
+UTTERANCES = [
+    "oui",
+    "bonjour je voudrais prendre rendez-vous pour mon fils",
+    "euh je sais pas trop plutôt le matin si possible",
+    "j'ai mal à la gorge depuis trois jours et un peu de fièvre",
+    "je veux annuler mon rendez-vous de jeudi",
+    "vous pouvez répéter s'il vous plaît",
+    "je veux parler à quelqu'un du cabinet",
+    "quels sont vos horaires le samedi et est-ce qu'il y a un parking",
+    "j'ai une douleur dans la poitrine et je n'arrive plus à respirer",
+    "alors voilà c'est pour un renouvellement d'ordonnance, mon médecin habituel est en vacances "
+    "et je voudrais savoir si c'est possible de passer la semaine prochaine en fin d'après-midi",
+]
+
+
+def _legacy_turn(text):
+    t = text.lower()
+    for patterns in triage.RED_FLAG_CATEGORIES.values():
+        for pattern in patterns:
+            if re.search(pattern, t):
+                break
+    any(k in t for k in triage.CAUTION_KEYWORDS)
+    any(k in t for k in triage.NON_URGENT_KEYWORDS)
+    n = ip.normalize_stt_text(text)
+    for lexicon in (ip._TRANSFER_LEXICON, ip._CANCEL_LEXICON, ip._MODIFY_LEXICON, ip._ABANDON_LEXICON,
+                    ip._ORDONNANCE_LEXICON, ip._FAQ_STRONG_LEXICON, ip._YES_LEXICON,
+                    ip._BOOKING_START_BLACKLIST, ip._BOOKING_MARKERS, ip._FAQ_KEYWORDS):
+        any(p in n for p in lexicon)
+    for pat in transfer_policy.EXPLICIT_PATTERNS:
+        re.search(pat, n)
+
+
+def _detector_turn(text):
+    triage.detect_medical_red_flag(text)
+    triage.classify_medical_symptoms(text)
+    ip._lexicon_categories.__wrapped__(ip.normalize_stt_text(text))
+    transfer_policy.classify_transfer_request(text)
+
+
+def _time_us(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for u in UTTERANCES:
+            fn(u)
+    return (time.perf_counter() - t0) * 1e6 / (repeat * len(UTTERANCES))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark détecteur multi-motifs")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    legacy_us = _time_us(_legacy_turn, args.repeat)
+    detector_us = _time_us(_detector_turn, args.repeat)
+    speedup = legacy_us / detector_us if detector_us else float("inf")
+    print(f"{'legacy µs/tour':>15} {'détecteur µs/tour':>18} {'speedup':>8}")
+    print(f"{legacy_us:>15.1f} {detector_us:>18.1f} {speedup:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
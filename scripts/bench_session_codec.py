@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# scripts/bench_session_codec.py
+"""
+Benchmark taille / vitesse du codec session (backend/session_codec.py) contre les anciens formats :
+  - pickle  : base64(pickle.dumps(session)) (ancienne colonne SQLite session_pickle)
+  - json v1 : json.dumps(session_to_dict(session)) (ancien state_json checkpoints / web_sessions)
+  - v2 ckpt : packed_to_json(pack_session(session)) (state_json actuel)
+  - v2 snap : encode_session(session) (snapshot SQLite actuel, messages inclus)
+
+Usage:
+  python scripts/bench_session_codec.py
+  python scripts/bench_session_codec.py --iterations 5000
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import pickle
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.session import Session  # noqa: E402
+from backend.session_codec import (  # noqa: E402
+    decode_session,
+    encode_session,
+    pack_session,
+    packed_to_json,
+    session_from_dict,
+    session_to_dict,
+)
+
+
+def _sample_session() -> Session:
+    """Session typique en WAIT_CONFIRM (3 créneaux proposés, ~8 messages d'historique)."""
+    s = Session(conv_id="bench-call-0001")
+    s.state = "WAIT_CONFIRM"
+    s.channel = "vocal"
+    s.tenant_id = 12
+    s.customer_phone = "+33612345678"
+    s.qualif_data.name = "Jean Dupont"
+    s.qualif_data.motif = "consultation"
+    s.qualif_data.pref = "matin"
+    s.turn_count = 6
+    s.pending_slots = [
+        {"id": i, "slot_id": i, "start": f"2026-03-0{i}T09:00:00", "end": f"2026-03-0{i}T09:15:00",
+         "label": f"lundi {i} mars à 9h", "source": "google", "event_id": f"evt{i}"}
+        for i in range(1, 4)
+    ]
+    for _ in range(4):
+        s.add_message("user", "Oui je voudrais un rendez-vous le matin si possible")
+        s.add_message("agent", "Très bien. J'ai trois créneaux : lundi 9h, mardi 9h ou mercredi 9h. Lequel vous convient ?")
+    return s
+
+
+def _time(fn, iterations: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - t0) * 1e6 / iterations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark codec session")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.iterations
+    s = _sample_session()
+
+    pickled = base64.b64encode(pickle.dumps(s))
+    v1 = json.dumps(session_to_dict(s))
+    v2_ckpt = packed_to_json(pack_session(s))
+    v2_snap = encode_session(s)
+
+    rows = [
+        ("pickle", len(pickled),
+         _time(lambda: base64.b64encode(pickle.dumps(s)), n),
+         _time(lambda: pickle.loads(base64.b64decode(pickled)), n)),
+        ("json v1", len(v1.encode()),
+         _time(lambda: json.dumps(session_to_dict(s)), n),
+         _time(lambda: session_from_dict(s.conv_id, json.loads(v1)), n)),
+        ("v2 ckpt", len(v2_ckpt.encode()),
+         _time(lambda: packed_to_json(pack_session(s)), n),
+         _time(lambda: session_from_dict(s.conv_id, json.loads(v2_ckpt)), n)),
+        ("v2 snap", len(v2_snap),
+         _time(lambda: encode_session(s), n),
+         _time(lambda: decode_session(s.conv_id, v2_snap), n)),
+    ]
+    print(f"{'format':<8} {'octets':>7} {'encode µs':>10} {'decode µs':>10}")
+    for name, size, enc, dec in rows:
+        print(f"{name:<8} {size:>7} {enc:>10.1f} {dec:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
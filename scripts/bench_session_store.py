@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# scripts/bench_session_store.py
+"""
+Benchmark coût de sauvegarde SQLiteSessionStore par tour.
+Compare :
+  - legacy : sqlite3.connect + INSERT OR REPLACE + commit + close à chaque save (ancien comportement)
+  - store  : SQLiteSessionStore actuel (connexion persistante WAL, statements réutilisés, dirty tracking)
+Un "tour" = N saves (Engine._save_session appelle save plusieurs fois par tour), dont un seul avec
+un changement d'état réel.
+
+Usage:
+  python scripts/bench_session_store.py
+  python scripts/bench_session_store.py --turns 500 --saves-per-turn 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("MULTI_TENANT_MODE", "false")
+
+from backend.session import Session  # noqa: E402
+from backend.session_store_sqlite import _UPSERT_SQL, SQLiteSessionStore  # noqa: E402
+
+
+def _legacy_save(store: SQLiteSessionStore, session: Session) -> None:
+    data = store._serialize_session(session)
+    conn = sqlite3.connect(store.db_path)
+    conn.execute(_UPSERT_SQL, (
+        data["conv_id"], data["state"], data["channel"], data["customer_phone"],
+        data["name"], data["motif"], data["pref"], data["contact"], data["contact_type"],
+        data["no_match_turns"], data["confirm_retry_count"], data["contact_retry_count"],
+        data["partial_phone_digits"],
+        data["pending_slots_json"], data["pending_slot_choice"], data["pending_cancel_slot_json"],
+        data["extracted_name"], data["extracted_motif"], data["extracted_pref"], data["motif_help_used"],
+        data["last_seen_at"], data["created_at"], data["session_pickle"], data["pending_slots_display_json"]
+    ))
+    conn.commit()
+    conn.close()
+
+
+def _run(label: str, save, turns: int, saves_per_turn: int) -> float:
+    session = Session(conv_id=f"bench-{label}")
+    t0 = time.perf_counter()
+    for turn in range(turns):
+        session.add_message("user", f"message {turn}")
+        session.qualif_data.name = f"Client {turn % 7}"
+        for _ in range(saves_per_turn):
+            save(session)
+    elapsed = time.perf_counter() - t0
+    per_turn_ms = elapsed * 1000 / turns
+    print(f"{label:<8} {turns} tours x {saves_per_turn} saves : {elapsed * 1000:8.1f} ms total, {per_turn_ms:6.3f} ms/tour")
+    return per_turn_ms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=300)
+    parser.add_argument("--saves-per-turn", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(db_path=os.path.join(tmp, "bench_sessions.db"))
+        legacy_ms = _run("legacy", lambda s: _legacy_save(store, s), args.turns, args.saves_per_turn)
+        store_ms = _run("store", store.save, args.turns, args.saves_per_turn)
+        store.close()
+    print(f"speedup x{legacy_ms / store_ms:.1f}" if store_ms else "speedup n/a")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
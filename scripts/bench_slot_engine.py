@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# scripts/bench_slot_engine.py
+"""
+Micro-benchmark du calcul de créneaux libres (backend/slot_engine.py) contre l'ancien balayage
+créneaux × events de GoogleCalendarService.get_free_slots_range.
+Calendriers de 10 / 100 / 1000 events répartis sur l'horizon, horizons de 1 / 7 / 30 jours.
+Deux profils : pool vocal (3 créneaux, 1 par jour) et liste complète (tous les créneaux libres).
+
+Usage:
+  python scripts/bench_slot_engine.py
+  python scripts/bench_slot_engine.py --repeat 50 --events 10,100,1000 --days 1,7,30
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.slot_engine import BusyTimeline, iter_free_slots  # noqa: E402
+
+TZ = ZoneInfo("Europe/Paris")
+DURATION = 15
+BUFFER = 5
+START_HOUR, END_HOUR = 9, 18
+
+
+def _legacy(events, days, limit, per_day_limit):
+    out = []
+    buffer_td = timedelta(minutes=BUFFER)
+    for day in days:
+        current = day.replace(hour=START_HOUR)
+        day_end = day.replace(hour=END_HOUR)
+        day_count = 0
+        while current < day_end:
+            slot_end = current + timedelta(minutes=DURATION)
+            effective_end = slot_end + buffer_td
+            if effective_end > day_end:
+                break
+            if all(not (current < e_end and effective_end > e_start) for e_start, e_end in events):
+                out.append((current, slot_end))
+                day_count += 1
+                if len(out) >= limit or day_count >= per_day_limit:
+                    break
+            current += timedelta(minutes=DURATION)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def _engine(events, days, limit, per_day_limit):
+    busy = BusyTimeline(events)
+    return list(islice(
+        iter_free_slots(busy, days, start_hour=START_HOUR, end_hour=END_HOUR,
+                        duration_minutes=DURATION, buffer_minutes=BUFFER, per_day_limit=per_day_limit),
+        limit,
+    ))
+
+
+def _calendar(n_events, days, seed=0):
+    rng = random.Random(seed)
+    events = []
+    for _ in range(n_events):
+        day = rng.choice(days)
+        start = day.replace(hour=rng.randint(8, 17), minute=rng.choice([0, 15, 30, 45]))
+        events.append((start, start + timedelta(minutes=rng.choice([15, 30, 45, 60]))))
+    return events
+
+
+def _time_ms(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) * 1000 / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark moteur de créneaux")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--events", default="10,100,1000")
+    parser.add_argument("--days", default="1,7,30")
+    args = parser.parse_args()
+
+    base = datetime(2026, 3, 2, tzinfo=TZ)
+    profiles = [("pool", 3, 1), ("full", 10**6, 10**6)]
+    print(f"{'profil':<6} {'events':>6} {'jours':>5} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for profile, limit, per_day_limit in profiles:
+        for n_events in [int(x) for x in args.events.split(",")]:
+            for n_days in [int(x) for x in args.days.split(",")]:
+                days = [base + timedelta(days=i) for i in range(n_days)]
+                events = _calendar(n_events, days)
+                assert _legacy(events, days, limit, per_day_limit) == _engine(events, days, limit, per_day_limit)
+                legacy_ms = _time_ms(
+                    lambda e=events, d=days, lim=limit, pdl=per_day_limit: _legacy(e, d, lim, pdl), args.repeat,
+                )
+                engine_ms = _time_ms(
+                    lambda e=events, d=days, lim=limit, pdl=per_day_limit: _engine(e, d, lim, pdl), args.repeat,
+                )
+                speedup = legacy_ms / engine_ms if engine_ms else float("inf")
+                print(f"{profile:<6} {n_events:>6} {n_days:>5} {legacy_ms:>10.3f} {engine_ms:>10.3f} {speedup:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
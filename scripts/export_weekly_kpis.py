@@ -2,6 +2,8 @@
 # scripts/export_weekly_kpis.py (v2)
 """
 Export hebdomadaire KPIs par tenant (ivr_events SQLite).
+- Semaine alignée sur des jours : compteurs lus dans les rollups ivr_events_daily (backend/stats_rollup.py)
+  s'ils sont prêts (--raw pour forcer ivr_events) ; le CSV details reste calculé sur ivr_events
 - Tous les tenants actifs, même avec 0 appel (JOIN tenants)
 - convert_after_refuse_pref : parmi les calls avec slot_refuse_pref_asked, combien ont booking_confirmed
 - 3 CSV : kpi_weekly_*.csv + kpi_weekly_details_*.csv + kpi_weekly_digest_*.csv (résumé client)
@@ -12,6 +14,7 @@ Usage:
   python scripts/export_weekly_kpis.py --last-week  # auto calcule semaine précédente
   python scripts/export_weekly_kpis.py --last-week --force  # override si déjà généré
   DATABASE_URL=postgres://... python scripts/export_weekly_kpis.py --last-week  # prod: lit Postgres
+  python scripts/export_weekly_kpis.py --last-week --raw  # ignore les rollups
 """
 from __future__ import annotations
 
@@ -22,8 +25,10 @@ import sys
 import sqlite3
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 DEFAULT_DB_PATH = os.environ.get("UWI_DB_PATH", "agent.db")
 
@@ -58,6 +63,21 @@ CANCEL_FAILED_EVENTS = {"cancel_failed"}
 
 DETAIL_EVENTS = {"recovery_step", "intent_router_trigger"}
 
+# Colonnes « appels avec event » du CSV KPI
+MAP_EVENTS: Dict[str, set] = {
+    "bookings": BOOKING_CONFIRMED_EVENTS,
+    "transfers": TRANSFER_EVENTS,
+    "abandons": ABANDON_EVENTS,
+    "repeat": REPEAT_EVENTS,
+    "yes_ambiguous_router": YES_AMBIGUOUS_ROUTER_EVENTS,
+    "slot_refuse_pref": SLOT_REFUSE_PREF_EVENTS,
+    "empty_message": EMPTY_MESSAGE_EVENTS,
+    "anti_loop": ANTI_LOOP_EVENTS,
+    "intent_router": INTENT_ROUTER_EVENTS,
+    "cancel_done": CANCEL_DONE_EVENTS,
+    "cancel_failed": CANCEL_FAILED_EVENTS,
+}
+
 
 @dataclass
 class TenantInfo:
@@ -157,6 +177,11 @@ def parse_args() -> argparse.Namespace:
         default=os.environ.get("DATABASE_URL") or os.environ.get("PG_EVENTS_URL"),
         help="Postgres URL for ivr_events (prod). If set, read from PG instead of SQLite.",
     )
+    p.add_argument(
+        "--raw",
+        action="store_true",
+        help="Always aggregate raw ivr_events (ignore daily rollups)",
+    )
     return p.parse_args()
 
 
@@ -341,6 +366,45 @@ def fetch_convert_after_refuse_pref(
     return out
 
 
+def fetch_rollup_kpis(
+    conn: Any, start: str, end: str, is_pg: bool,
+) -> Optional[Tuple[Dict[int, int], Dict[str, Dict[int, int]], Dict[int, Tuple[int, int]]]]:
+    """
+    (calls_total, maps, convert_map) depuis ivr_events_daily. None si la fenêtre n'est pas alignée
+    sur des jours UTC ou si les rollups ne sont pas prêts → requêtes brutes.
+    Appels distincts additionnés jour par jour (un appel à cheval sur minuit compte 2 fois).
+    conn : connexion à tuples (sqlite3.Row ou psycopg par défaut).
+    """
+    try:
+        from backend import stats_rollup
+    except ImportError:
+        return None
+    days = stats_rollup.aligned_days(start, end)
+    if not days or not stats_rollup.ready(conn=conn, is_pg=is_pg):
+        return None
+    groups = {
+        frozenset(stats_rollup.TRANSFER_EVENTS): stats_rollup.TRANSFER,
+        frozenset(stats_rollup.ABANDON_EVENTS): stats_rollup.ABANDON,
+    }
+    keys: Dict[str, str] = {}
+    for name, events in MAP_EVENTS.items():
+        key = next(iter(events)) if len(events) == 1 else groups.get(frozenset(events))
+        if key is None:
+            return None
+        keys[name] = key
+    counts = stats_rollup.event_counts(*days, by="tenant", conn=conn, is_pg=is_pg)
+
+    def calls(key: str) -> Dict[int, int]:
+        out = {tid: by_event.get(key, (0, 0))[1] for tid, by_event in counts.items()}
+        return {tid: n for tid, n in out.items() if n}
+
+    refuse_key = next(iter(SLOT_REFUSE_PREF_EVENTS))
+    den = calls(refuse_key)
+    num = calls(stats_rollup.REFUSE_BOOKED)
+    convert_map = {tid: (num.get(tid, 0), d) for tid, d in den.items()}
+    return calls(stats_rollup.ALL), {name: calls(key) for name, key in keys.items()}, convert_map
+
+
 def _extract_reason(context: Optional[str], reason: Optional[str]) -> str:
     """Combine context + reason (ivr_events n'a pas payload_json)."""
     parts = []
@@ -635,27 +699,24 @@ def main() -> None:
         print("No tenants found. Ensure tenants table exists and has rows.")
         return
 
-    calls_total = fetch_calls_total(conn_ivr, start, end, is_pg)
-
-    maps = {
-        "bookings": fetch_event_calls(conn_ivr, start, end, BOOKING_CONFIRMED_EVENTS, is_pg),
-        "transfers": fetch_event_calls(conn_ivr, start, end, TRANSFER_EVENTS, is_pg),
-        "abandons": fetch_event_calls(conn_ivr, start, end, ABANDON_EVENTS, is_pg),
-        "repeat": fetch_event_calls(conn_ivr, start, end, REPEAT_EVENTS, is_pg),
-        "yes_ambiguous_router": fetch_event_calls(
-            conn_ivr, start, end, YES_AMBIGUOUS_ROUTER_EVENTS, is_pg
-        ),
-        "slot_refuse_pref": fetch_event_calls(
-            conn_ivr, start, end, SLOT_REFUSE_PREF_EVENTS, is_pg
-        ),
-        "empty_message": fetch_event_calls(conn_ivr, start, end, EMPTY_MESSAGE_EVENTS, is_pg),
-        "anti_loop": fetch_event_calls(conn_ivr, start, end, ANTI_LOOP_EVENTS, is_pg),
-        "intent_router": fetch_event_calls(conn_ivr, start, end, INTENT_ROUTER_EVENTS, is_pg),
-        "cancel_done": fetch_event_calls(conn_ivr, start, end, CANCEL_DONE_EVENTS, is_pg),
-        "cancel_failed": fetch_event_calls(conn_ivr, start, end, CANCEL_FAILED_EVENTS, is_pg),
-    }
-
-    convert_map = fetch_convert_after_refuse_pref(conn_ivr, start, end, is_pg)
+    rolled = None
+    if not args.raw:
+        if use_pg:
+            import psycopg
+            with psycopg.connect(args.db_pg_url.strip()) as conn_rollup:
+                rolled = fetch_rollup_kpis(conn_rollup, start, end, True)
+        else:
+            rolled = fetch_rollup_kpis(conn_sqlite, start, end, False)
+    if rolled is not None:
+        calls_total, maps, convert_map = rolled
+        print("KPIs from daily rollups (ivr_events_daily)")
+    else:
+        calls_total = fetch_calls_total(conn_ivr, start, end, is_pg)
+        maps = {
+            name: fetch_event_calls(conn_ivr, start, end, events, is_pg)
+            for name, events in MAP_EVENTS.items()
+        }
+        convert_map = fetch_convert_after_refuse_pref(conn_ivr, start, end, is_pg)
     rows = build_kpis(tenants, calls_total, maps, convert_map, start, end)
 
     s = start.replace(":", "").replace(" ", "_").replace("-", "")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# scripts/load_vapi.py
+"""
+Charge / soak des endpoints Vapi (backend/vapi_load.py) : N appels simulés en parallèle
+(webhook assistant-request, status-update, end-of-call-report, chat/completions streaming ou non,
+tool get_slots / book). Rapport : débit, latence p50/p95/p99 par endpoint, taux d'erreur / timeout,
+croissance mémoire (RSS, STREAMS, sessions engine, cache tool_result) par 1000 appels.
+
+Cibles :
+  (défaut)          app montée en process (ASGI), faux calendrier + SQLite temporaire (call_replay)
+  --url URL         serveur déjà lancé (compteurs mémoire via GET /health)
+  --serve PORT      lance seulement l'app locale avec le faux calendrier (à viser ensuite avec --url)
+
+Usage:
+  python scripts/load_vapi.py --concurrency 20 --calls 200
+  python scripts/load_vapi.py --concurrency 50 --duration 1800 --sample-every 30 --tracemalloc   # soak 30 min
+  python scripts/load_vapi.py --serve 8011 &
+  python scripts/load_vapi.py --url http://127.0.0.1:8011 --concurrency 100 --duration 600 --max-error-rate 0.01
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from backend import call_replay, vapi_load  # noqa: E402
+
+
+def _print_summary(summary: dict) -> None:
+    print(
+        f"{summary['calls']} appels, {summary['requests']} requêtes en {summary['elapsed_s']} s — "
+        f"{summary['rps']} req/s, {summary['calls_per_s']} appels/s, "
+        f"erreurs {summary['error_rate']:.2%}, timeouts {summary['timeout_rate']:.2%}"
+    )
+    print(f"{'endpoint':<28} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err':>7} {'tmo':>7}")
+    for ep, d in summary["endpoints"].items():
+        print(f"{ep:<28} {d['requests']:>6} {d['p50']:>8.1f} {d['p95']:>8.1f} {d['p99']:>8.1f} {d['max']:>8.1f} "
+              f"{d['error_rate']:>7.2%} {d['timeout_rate']:>7.2%}")
+    if "stream_ttfb_ms" in summary:
+        print(f"TTFB streaming ms : p50={summary['stream_ttfb_ms']['p50']} p95={summary['stream_ttfb_ms']['p95']}")
+    for name, d in (summary.get("memory") or {}).items():
+        print(f"mémoire {name:<20} {d['first']} → {d['last']} (max {d['max']}, {d['per_1000_calls']:+} / 1000 appels)")
+
+
+async def _run(args) -> dict:
+    kwargs = {
+        "concurrency": args.concurrency, "calls": args.calls, "duration_s": args.duration,
+        "sample_every_s": args.sample_every, "seed": args.seed, "to_number": args.to_number,
+        "stream_ratio": args.stream_ratio, "tool_ratio": args.tool_ratio, "timeout": args.timeout,
+        "think_s": args.think,
+    }
+    if args.url:
+        limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+            stats = await vapi_load.run_load(client, probe=vapi_load.health_probe(client), **kwargs)
+    else:
+        from backend.main import app
+        transport = httpx.ASGITransport(app=app)
+        with call_replay.replay_env(args.store, call_replay.InMemoryCalendar.seeded(latency_ms=args.calendar_latency_ms)):
+            async with httpx.AsyncClient(transport=transport, base_url="http://load.local") as client:
+                stats = await vapi_load.run_load(client, probe=vapi_load.inprocess_probe, **kwargs)
+    return stats.summary()
+
+
+def _serve(args) -> int:
+    import uvicorn
+
+    from backend.main import app
+    with call_replay.replay_env(args.store, call_replay.InMemoryCalendar.seeded(latency_ms=args.calendar_latency_ms)):
+        uvicorn.run(app, host="127.0.0.1", port=args.serve, log_level="warning")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Charge / soak des endpoints Vapi")
+    parser.add_argument("--url")
+    parser.add_argument("--serve", type=int, metavar="PORT")
+    parser.add_argument("--store", choices=call_replay.STORES, default="sqlite")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--calls", type=int, help="nombre total d'appels simulés")
+    parser.add_argument("--duration", type=float, help="durée du soak (s) ; prioritaire sur --calls")
+    parser.add_argument("--sample-every", type=float, default=5.0, help="période d'échantillonnage mémoire (s)")
+    parser.add_argument("--tracemalloc", action="store_true", help="ajoute la mémoire Python tracée (en process)")
+    parser.add_argument("--to-number", default=vapi_load.DEFAULT_TO_NUMBER)
+    parser.add_argument("--stream-ratio", type=float, default=0.5)
+    parser.add_argument("--tool-ratio", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=20.0)
+    parser.add_argument("--think", type=float, default=0.0, help="pause max entre deux tours (s)")
+    parser.add_argument("--calendar-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="écrire le rapport JSON")
+    parser.add_argument("--max-error-rate", type=float, help="échec si taux d'erreur + timeout au-delà")
+    parser.add_argument("--max-p99-ms", type=float, help="échec si un endpoint dépasse ce p99")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+    if args.serve:
+        return _serve(args)
+    if args.duration:
+        args.calls = None
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    summary = asyncio.run(_run(args))
+    _print_summary(summary)
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    failures = []
+    if args.max_error_rate is not None and summary["error_rate"] + summary["timeout_rate"] > args.max_error_rate:
+        failures.append(f"taux d'erreur {summary['error_rate'] + summary['timeout_rate']:.2%} > {args.max_error_rate:.2%}")
+    if args.max_p99_ms is not None:
+        failures += [f"{ep} p99 {d['p99']} ms > {args.max_p99_ms:g}" for ep, d in summary["endpoints"].items() if d["p99"] > args.max_p99_ms]
+    for f in failures:
+        print(f"ÉCHEC {f}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# scripts/replay_calls.py
+"""
+Rejeu hors ligne d'appels (backend/call_replay.py) : latence par tour p50/p95/p99, requêtes DB
+et allocations par tour, durée par étape. Faux calendrier en mémoire, base SQLite temporaire
+(ou PG local avec --store pg). Code de sortie 1 si une régression dépasse le seuil (CI).
+
+Sources :
+  --synthetic N                 N appels tirés des scénarios intégrés (défaut si rien d'autre)
+  --file calls.jsonl            {"call_id", "tenant_id", "turns": [...]} ou {"messages": [{"role", "text"}]}
+  --pg-tenant 12 [--pg-table call_transcripts] [--limit 100]   transcripts stockés (DATABASE_URL)
+
+Usage:
+  python scripts/replay_calls.py --synthetic 100 --alloc
+  python scripts/replay_calls.py --mode voice --file calls.jsonl --save-baseline replay_baseline.json
+  python scripts/replay_calls.py --mode voice --file calls.jsonl --baseline replay_baseline.json --max-regression 0.2
+  python scripts/replay_calls.py --synthetic 50 --max-p95-ms 50 --calendar-latency-ms 80
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend import call_replay  # noqa: E402
+
+
+def _print_summary(summary: dict) -> None:
+    print(f"{summary['calls']} appels, {summary['turns']} tours mesurés")
+    print(f"{'métrique':<22} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    rows = [("latence ms", summary["latency_ms"]), ("requêtes DB", summary["db_roundtrips"])]
+    if "alloc_kib" in summary:
+        rows.append(("pic alloc KiB", summary["alloc_kib"]))
+    rows += [(f"  {stage} ms", d) for stage, d in summary["stages_ms"].items()]
+    for name, d in rows:
+        print(f"{name:<22} {d['p50']:>9.2f} {d['p95']:>9.2f} {d['p99']:>9.2f} {d['max']:>9.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rejeu d'appels et benchmark par tour")
+    parser.add_argument("--mode", choices=call_replay.MODES, default="engine")
+    parser.add_argument("--store", choices=call_replay.STORES, default="sqlite")
+    parser.add_argument("--synthetic", type=int, default=0)
+    parser.add_argument("--file")
+    parser.add_argument("--pg-tenant", type=int)
+    parser.add_argument("--pg-table", choices=("call_messages", "call_transcripts"), default="call_messages")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--tenant-id", type=int, default=1, help="tenant des appels synthétiques / fichier sans tenant_id")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warmup", type=int, default=1, help="appels joués sans mesure")
+    parser.add_argument("--alloc", action="store_true", help="mesurer le pic d'allocation par tour (tracemalloc, plus lent)")
+    parser.add_argument("--calendar-latency-ms", type=float, default=0.0, help="latence simulée par appel calendrier")
+    parser.add_argument("--baseline", help="summary JSON de référence")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="hausse relative tolérée (0.2 = +20%%)")
+    parser.add_argument("--max-p95-ms", type=float, help="budget absolu de latence p95 par tour")
+    parser.add_argument("--save-baseline", help="écrire le summary JSON (nouvelle référence)")
+    parser.add_argument("--dump", help="écrire les mesures par tour (JSONL)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    calls = []
+    if args.file:
+        calls += call_replay.load_jsonl(args.file, args.tenant_id)
+    if args.pg_tenant is not None:
+        calls += call_replay.load_pg_calls(args.pg_tenant, args.limit, args.pg_table)
+    if args.synthetic or not calls:
+        calls += call_replay.synthetic_calls(args.synthetic or 50, args.tenant_id, args.seed)
+
+    calendar = call_replay.InMemoryCalendar.seeded(seed=args.seed, latency_ms=args.calendar_latency_ms)
+    samples = call_replay.replay(
+        calls, mode=args.mode, store=args.store, track_alloc=args.alloc, calendar=calendar, warmup_calls=args.warmup,
+    )
+    summary = call_replay.summarize(samples)
+    summary["mode"], summary["store"] = args.mode, args.store
+    _print_summary(summary)
+
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            for s in samples:
+                f.write(json.dumps(asdict(s), ensure_ascii=False) + "\n")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"baseline écrite : {args.save_baseline}")
+
+    failures = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        failures += call_replay.compare(summary, baseline, args.max_regression)
+    if args.max_p95_ms is not None and summary["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"latency_ms.p95: {summary['latency_ms']['p95']:g} > budget {args.max_p95_ms:g}")
+    for f in failures:
+        print(f"RÉGRESSION {f}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# scripts/rollup_stats.py
+"""
+Rafraîchit les rollups journaliers des dashboards (backend/stats_rollup.py) hors du serveur :
+backfill initial, reconstruction complète après correction de données, ou cron si le job de
+fond est désactivé (STATS_ROLLUP_ENABLED=false côté serveur).
+
+Usage:
+  python scripts/rollup_stats.py                       # incrémental depuis les watermarks
+  python scripts/rollup_stats.py --backfill-days 365   # premier passage sur 1 an
+  python scripts/rollup_stats.py --rebuild --backfill-days 90
+  DATABASE_URL=postgres://... python scripts/rollup_stats.py
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend import stats_rollup  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rafraîchit les rollups journaliers (ivr_events_daily, stats_daily)")
+    parser.add_argument(
+        "--backfill-days", type=int, default=stats_rollup.BACKFILL_DAYS,
+        help=f"profondeur sans watermark / avec --rebuild (défaut {stats_rollup.BACKFILL_DAYS})",
+    )
+    parser.add_argument("--rebuild", action="store_true", help="ignorer les watermarks et tout recalculer sur la profondeur")
+    args = parser.parse_args()
+
+    summary = stats_rollup.refresh(backfill_days=args.backfill_days, rebuild=args.rebuild)
+    print(json.dumps(summary, indent=2, default=str))
+    return 1 if any("error" in s for s in summary["sources"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
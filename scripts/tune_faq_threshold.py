@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# scripts/tune_faq_threshold.py
+"""
+Réglage hors ligne du seuil FAQ d'un tenant : un jeu d'énoncés étiquetés passe par le scoring groupé
+(FaqStore.search_batch, process.cdist) puis précision / rappel / F1 / faux matchs sont calculés
+pour chaque seuil. Le meilleur seuil (F1, puis le plus strict) peut être enregistré dans
+params_json.faq_threshold (--apply), pris en compte par tenant_faq_store à la place de config.FAQ_THRESHOLD.
+
+Fichier étiqueté : JSONL, une ligne par énoncé :
+  {"utterance": "vous ouvrez à quelle heure", "faq_id": "FAQ_HORAIRES"}
+  {"utterance": "je voudrais un rendez-vous", "faq_id": null}      # hors FAQ : ne doit pas matcher
+
+Usage:
+  python scripts/tune_faq_threshold.py labeled.jsonl                  # FAQ par défaut
+  python scripts/tune_faq_threshold.py labeled.jsonl --tenant-id 12   # FAQ du tenant (DB)
+  python scripts/tune_faq_threshold.py labeled.jsonl --tenant-id 12 --min 0.6 --max 0.95 --step 0.05 --apply
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend import config  # noqa: E402
+from backend.tools_faq import (  # noqa: E402
+    best_threshold,
+    default_faq_index,
+    evaluate_thresholds,
+    tenant_faq_store,
+)
+
+
+def _load(path: str):
+    labeled = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            row = json.loads(line)
+            utterance = str(row.get("utterance") or "").strip()
+            if not utterance:
+                print(f"ligne {n} ignorée : utterance vide", file=sys.stderr)
+                continue
+            labeled.append((utterance, (row.get("faq_id") or None)))
+    return labeled
+
+
+def _apply(tenant_id: int, threshold: float) -> bool:
+    params = {"faq_threshold": str(threshold)}
+    if config.USE_PG_TENANTS:
+        from backend.tenants_pg import pg_update_tenant_params
+        if not pg_update_tenant_params(tenant_id, params):
+            return False
+    else:
+        from backend.tenant_config import set_params
+        set_params(tenant_id, params)
+    from backend.tools_faq import rebuild_tenant_faq_index
+    rebuild_tenant_faq_index(tenant_id)
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Réglage du seuil FAQ par tenant")
+    parser.add_argument("labeled", help="Fichier JSONL {utterance, faq_id|null}")
+    parser.add_argument("--tenant-id", type=int, default=None)
+    parser.add_argument("--min", type=float, default=0.60)
+    parser.add_argument("--max", type=float, default=0.95)
+    parser.add_argument("--step", type=float, default=0.025)
+    parser.add_argument("--exclude-low", action="store_true", help="Comme l'engine (include_low=False)")
+    parser.add_argument("--apply", action="store_true", help="Enregistre le meilleur seuil dans params_json du tenant")
+    args = parser.parse_args()
+
+    labeled = _load(args.labeled)
+    if not labeled:
+        print("Aucun énoncé étiqueté.", file=sys.stderr)
+        return 1
+    store = tenant_faq_store(args.tenant_id) if args.tenant_id else default_faq_index()
+    steps = int(round((args.max - args.min) / args.step)) + 1
+    thresholds = [round(args.min + i * args.step, 4) for i in range(max(1, steps))]
+    report = evaluate_thresholds(store, labeled, thresholds, include_low=not args.exclude_low)
+
+    current = store.threshold if store.threshold is not None else config.FAQ_THRESHOLD
+    print(f"{len(labeled)} énoncés, {len(store.items)} questions FAQ, seuil actuel {current:.3f}")
+    print(f"{'seuil':>6} {'précision':>9} {'rappel':>7} {'F1':>6} {'exact.':>7} {'faux':>5}")
+    for r in report:
+        print(f"{r['threshold']:>6.3f} {r['precision']:>9.3f} {r['recall']:>7.3f} {r['f1']:>6.3f} {r['accuracy']:>7.3f} {r['false_accepts']:>5}")
+    best = best_threshold(report)
+    print(f"Seuil recommandé : {best:.3f}")
+
+    if args.apply:
+        if not args.tenant_id:
+            print("--apply nécessite --tenant-id", file=sys.stderr)
+            return 1
+        if not _apply(args.tenant_id, best):
+            print("Échec de l'enregistrement du seuil.", file=sys.stderr)
+            return 1
+        print(f"faq_threshold={best} enregistré pour le tenant {args.tenant_id}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -41,3 +41,13 @@ def admin_db_sqlite(request, tmp_path, monkeypatch):
         conn.commit()
     finally:
         conn.close()
+
+
+@pytest.fixture(autouse=True)
+def clear_billing_cache():
+    """Le cache billing (suspension/quota) est process-wide : repartir d'un cache vide à chaque test."""
+    from backend import billing_cache
+
+    billing_cache.clear()
+    yield
+    billing_cache.clear()
@@ -0,0 +1,55 @@
+"""
+Cache billing (suspension / quota) du hot path vocal : 1 lecture PG par TTL, compteur minutes incrémental.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from backend import billing_cache
+
+
+@patch("backend.billing_pg.get_tenant_suspension", return_value=(False, None, "hard"))
+def test_suspension_cached_until_invalidated(mock_get_suspension):
+    assert billing_cache.get_tenant_suspension(5) == (False, None, "hard")
+    assert billing_cache.get_tenant_suspension(5) == (False, None, "hard")
+    assert mock_get_suspension.call_count == 1
+
+    mock_get_suspension.return_value = (True, "manual", "soft")
+    billing_cache.invalidate_tenant_billing_state(5)
+    assert billing_cache.get_tenant_suspension(5) == (True, "manual", "soft")
+    assert mock_get_suspension.call_count == 2
+
+
+@patch("backend.billing_pg.get_quota_included_minutes", return_value=100)
+@patch("backend.billing_pg.get_quota_snapshot_month", return_value=(100, 10.0))
+def test_quota_counter_incremented_without_requery(mock_snapshot, mock_included):
+    assert billing_cache.get_quota_snapshot_month(6, "2026-03") == (100, 10.0)
+
+    billing_cache.record_call_usage(6, datetime(2026, 3, 14, 9, 30, tzinfo=timezone.utc), 120)
+    # Appel d'un autre mois : ignoré par le compteur du mois en cache
+    billing_cache.record_call_usage(6, datetime(2026, 2, 27, 9, 30), 600)
+
+    assert billing_cache.get_quota_snapshot_month(6, "2026-03") == (100, 12.0)
+    assert mock_snapshot.call_count == 1
+    mock_included.assert_not_called()
+
+
+@patch("backend.billing_pg.get_quota_included_minutes", return_value=300)
+@patch("backend.billing_pg.get_quota_snapshot_month", return_value=(100, 10.0))
+def test_invalidation_refreshes_included_keeps_usage_counter(mock_snapshot, mock_included):
+    billing_cache.get_quota_snapshot_month(7, "2026-03")
+    billing_cache.record_call_usage(7, datetime(2026, 3, 14, 9, 30), 60)
+
+    billing_cache.invalidate_tenant_billing_state(7)
+
+    assert billing_cache.get_quota_snapshot_month(7, "2026-03") == (300, 11.0)
+    assert mock_snapshot.call_count == 1
+    mock_included.assert_called_once_with(7)
+
+
+@patch("backend.billing_pg.get_quota_snapshot_month", side_effect=[(100, 10.0), (100, 15.0)])
+def test_month_rollover_reseeds_counter(mock_snapshot):
+    billing_cache.get_quota_snapshot_month(8, "2026-03")
+    assert billing_cache.get_quota_snapshot_month(8, "2026-04") == (100, 15.0)
+    assert mock_snapshot.call_count == 2
@@ -0,0 +1,70 @@
+# tests/test_cache_warmup.py
+"""
+Warmup des caches tous tenants : horaires booking_rules, priorité au volume d'appels, cibles de
+fraîcheur par tenant, tenants épinglés, recalcul des créneaux seulement quand l'entrée vieillit.
+"""
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from backend import cache_warmup, call_replay, slot_prefetch, tools_booking
+
+RULES = {"start_hour": 9, "end_hour": 18, "booking_days": [0, 1, 2, 3, 4]}
+MONDAY_10H = datetime(2026, 10, 12, 10, 0)
+
+
+@pytest.fixture(autouse=True)
+def _reset_state():
+    cache_warmup._last_warm.clear()
+    yield
+    cache_warmup._last_warm.clear()
+
+
+def test_in_booking_hours_with_lead():
+    assert cache_warmup.in_booking_hours(RULES, MONDAY_10H)
+    assert cache_warmup.in_booking_hours(RULES, datetime(2026, 10, 12, 8, 40), lead_min=30)
+    assert not cache_warmup.in_booking_hours(RULES, datetime(2026, 10, 12, 8, 0), lead_min=30)
+    assert not cache_warmup.in_booking_hours(RULES, datetime(2026, 10, 12, 18, 0))
+    assert not cache_warmup.in_booking_hours(RULES, datetime(2026, 10, 11, 10, 0))  # dimanche
+
+
+def test_plan_orders_by_volume_and_skips_closed_tenants():
+    closed = dict(RULES, booking_days=[5])
+    with patch.object(cache_warmup, "active_tenants", return_value=[10, 11, 12, 13]), \
+            patch.object(cache_warmup, "pinned_tenants", return_value=[1]), \
+            patch.object(cache_warmup, "call_volume", return_value={11: (0, 40), 12: (3, 5), 13: (9, 90)}), \
+            patch("backend.tenant_config.get_booking_rules", side_effect=lambda tid: closed if tid == 13 else RULES):
+        plans, n_closed = cache_warmup.plan(MONDAY_10H)
+    assert [p.tenant_id for p in plans] == [12, 11, 1, 10]
+    assert n_closed == 1
+    targets = {p.tenant_id: p.target_s for p in plans}
+    assert targets == {12: cache_warmup.HOT_S, 11: cache_warmup.WARM_S, 1: cache_warmup.HOT_S, 10: cache_warmup.COLD_S}
+
+
+def test_run_once_warms_only_due_tenants_with_bounded_cycle():
+    plans = [cache_warmup.TenantPlan(t, calls_last_hour=1) for t in (5, 6, 7)]
+    with patch.object(cache_warmup, "plan", return_value=(plans, 2)), \
+            patch.object(cache_warmup, "warm_tenant", side_effect=lambda tid, target: {"tenant_id": tid, "slots_refreshed": ["none"]}) as warm, \
+            patch.object(cache_warmup, "JITTER_S", 0), \
+            patch.object(cache_warmup, "MAX_PER_CYCLE", 2):
+        first = cache_warmup.run_once()
+        second = cache_warmup.run_once()
+    assert first["warmed"] == [5, 6] and first["closed"] == 2 and first["tenants"] == 5
+    assert second["warmed"] == [7]  # 5 et 6 encore frais
+    assert warm.call_count == 3
+    assert cache_warmup.stats()["last_run"]["warmed"] == [7]
+
+
+def test_warm_tenant_refreshes_only_stale_slot_entries():
+    with call_replay.replay_env(calendar=call_replay.InMemoryCalendar.seeded()), \
+            patch.object(tools_booking, "_DISABLE_SLOT_CACHE", False):
+        tools_booking._set_cached_slots(["fresh"], 4, pref="matin")
+        with patch.object(slot_prefetch, "refresh", wraps=slot_prefetch.refresh) as refresh, \
+                patch("backend.tenant_flags_cache.get_tenant_flags") as flags:
+            out = cache_warmup.warm_tenant(4, target_s=60)
+        flags.assert_called_once_with(4)
+        assert sorted(out["slots_refreshed"], key=str) == ["après-midi", "none"]
+        assert refresh.call_count == 2
+        assert tools_booking._get_cached_slots(3, 4, pref=None)  # recalculé et remis en cache
+        assert tools_booking._get_cached_slots(3, 4, pref="matin") == ["fresh"]
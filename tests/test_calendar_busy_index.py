@@ -0,0 +1,159 @@
+# tests/test_calendar_busy_index.py
+"""
+Index des plages occupées Google : full sync paginée, sync incrémentale par syncToken
+(events annulés retirés), 410 → full sync, créneaux calculés localement sans nouvel appel API.
+"""
+import time
+from datetime import datetime, timedelta
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from backend.calendar_busy_index import CalendarBusyIndex
+from backend.google_calendar import CALENDAR_TZ, GoogleCalendarService
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+TZ = ZoneInfo(CALENDAR_TZ)
+
+
+def _day(offset=1):
+    return (datetime.now(TZ) + timedelta(days=offset)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _event(event_id, start, minutes, status="confirmed"):
+    return {
+        "id": event_id,
+        "status": status,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat()},
+    }
+
+
+class _Exec:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return self._fn()
+
+
+class FakeGoogle:
+    """events().list : full sync paginée (2 events / page), incrémental = changements en attente."""
+
+    def __init__(self, events):
+        self.events_db = {e["id"]: e for e in events}
+        self.pending_changes = []
+        self.calls = []
+        self.expire_token = False
+
+    def events(self):
+        return self
+
+    def list(self, **kwargs):
+        self.calls.append(kwargs)
+
+        def _run():
+            if "syncToken" in kwargs:
+                if self.expire_token:
+                    self.expire_token = False
+                    raise HttpError(httplib2.Response({"status": 410}), b"gone")
+                changes, self.pending_changes = self.pending_changes, []
+                return {"items": changes, "nextSyncToken": f"tok-{len(self.calls)}"}
+            items = sorted(self.events_db.values(), key=lambda e: e["start"]["dateTime"])
+            page = int(kwargs.get("pageToken") or 0)
+            out = {"items": items[page:page + 2]}
+            if page + 2 < len(items):
+                out["nextPageToken"] = str(page + 2)
+            else:
+                out["nextSyncToken"] = "tok-full"
+            return out
+
+        return _Exec(_run)
+
+    def change(self, event):
+        if event["status"] == "cancelled":
+            self.events_db.pop(event["id"], None)
+        else:
+            self.events_db[event["id"]] = event
+        self.pending_changes.append(event)
+
+
+def _index(google):
+    return CalendarBusyIndex(google, "cal@test", TZ)
+
+
+def test_full_sync_paginates_and_merges_overlaps():
+    d = _day().replace(hour=9)
+    google = FakeGoogle([_event("a", d, 30), _event("b", d + timedelta(minutes=15), 30), _event("c", d + timedelta(hours=3), 15)])
+    idx = _index(google)
+    busy = idx.busy_between(d, d + timedelta(hours=9))
+    assert busy == [(d, d + timedelta(minutes=45)), (d + timedelta(hours=3), d + timedelta(hours=3, minutes=15))]
+    assert len(google.calls) == 2 and "syncToken" not in google.calls[0]
+    idx.busy_between(d, d + timedelta(hours=2))
+    assert len(google.calls) == 2  # index frais : pas d'appel API
+
+
+def test_incremental_sync_applies_changes_and_410_forces_full_sync():
+    d = _day().replace(hour=10)
+    google = FakeGoogle([_event("a", d, 30)])
+    idx = _index(google)
+    idx.busy_between(d, d + timedelta(hours=1))
+
+    google.change(_event("a", d, 30, status="cancelled"))
+    google.change(_event("n", d + timedelta(hours=1), 15))
+    idx._synced_at = time.monotonic() - 1000  # au-delà de MAX_STALE → sync dans l'appelant
+    busy = idx.busy_between(d, d + timedelta(hours=3))
+    assert google.calls[-1]["syncToken"] == "tok-full"
+    assert busy == [(d + timedelta(hours=1), d + timedelta(hours=1, minutes=15))]
+
+    google.expire_token = True
+    idx._synced_at = time.monotonic() - 1000
+    idx.busy_between(d, d + timedelta(hours=3))
+    assert "syncToken" not in google.calls[-1]
+    assert idx.stats()["full_syncs"] == 2
+
+
+def test_past_or_far_ranges_are_not_indexed():
+    idx = _index(FakeGoogle([]))
+    assert idx.busy_between(_day(-2), _day(-1)) is None
+    assert idx.busy_between(_day(100), _day(101)) is None
+
+
+@pytest.fixture
+def service(monkeypatch):
+    google = FakeGoogle([_event("busy", _day(1).replace(hour=9), 60)])
+    monkeypatch.setattr(GoogleCalendarService, "_build_service", lambda self: google)
+    svc = GoogleCalendarService(calendar_id="cal@test")
+    return svc, google
+
+
+def test_slots_for_any_preference_computed_from_index(service):
+    svc, google = service
+    dates = [_day(1), _day(2)]
+    morning = svc.get_free_slots_range(dates=dates, start_hour=9, end_hour=12, limit=2)
+    afternoon = svc.get_free_slots_range(dates=dates, start_hour=14, end_hour=18, limit=2)
+    day = svc.get_free_slots(date=_day(1), start_hour=9, end_hour=18, limit=1)
+    assert len(google.calls) == 1
+    assert morning[0]["start"] == _day(1).replace(hour=10).isoformat()
+    assert afternoon[0]["start"] == _day(1).replace(hour=14).isoformat()
+    assert day[0]["start"] == _day(1).replace(hour=10).isoformat()
+
+
+def test_booking_is_reflected_without_resync(service, monkeypatch):
+    svc, google = service
+    svc.get_free_slots_range(dates=[_day(1)], start_hour=9, end_hour=12, limit=1)
+    monkeypatch.setattr(google, "insert", lambda calendarId=None, body=None: _Exec(lambda: {"id": "new"}), raising=False)
+    start = _day(1).replace(hour=10)
+    svc.book_appointment(
+        start_time=start.replace(tzinfo=None).isoformat(),
+        end_time=(start + timedelta(minutes=15)).replace(tzinfo=None).isoformat(),
+        patient_name="Jean", patient_contact="", motif="",
+    )
+    slots = svc.get_free_slots_range(dates=[_day(1)], start_hour=9, end_hour=12, limit=1)
+    assert slots[0]["start"] == _day(1).replace(hour=10, minute=15).isoformat()
+    assert len(google.calls) == 1
@@ -0,0 +1,80 @@
+# tests/test_calendar_single_flight.py
+"""
+Fusion des lectures Google concurrentes (tools_booking._calendar_flights) : un seul appel par
+(tenant, pref, contrainte horaire), résultat partagé, compteur de requêtes fusionnées exposé.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from backend import call_replay, single_flight, tools_booking, vapi_tool_handlers
+
+
+def _session(tenant_id=1, constraint="", minute=-1):
+    return SimpleNamespace(
+        tenant_id=tenant_id, rejected_slot_starts=[], time_constraint_type=constraint, time_constraint_minute=minute,
+    )
+
+
+def test_concurrent_cold_fetches_share_one_google_call():
+    real = tools_booking._get_slots_from_google_calendar
+    calls = []
+    gate = threading.Event()
+
+    def slow_google(*args, **kwargs):
+        calls.append(kwargs.get("pref"))
+        gate.wait(2)
+        return real(*args, **kwargs)
+
+    before = single_flight.stats().get("calendar_fetch", {}).get("coalesced", 0)
+    with call_replay.replay_env(calendar=call_replay.InMemoryCalendar.seeded()), \
+            patch.object(tools_booking, "_get_slots_from_google_calendar", side_effect=slow_google):
+        with ThreadPoolExecutor(4) as pool:
+            futs = [pool.submit(tools_booking.get_slots_for_display, 3, "matin", _session()) for _ in range(4)]
+            deadline = time.time() + 2
+            while not calls and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.1)
+            gate.set()
+            results = [f.result(5) for f in futs]
+    assert calls == ["matin"]
+    assert results[0] and all(r == results[0] for r in results)
+    assert results[0] is not results[1]  # chaque appelant reçoit sa propre liste
+    assert single_flight.stats()["calendar_fetch"]["coalesced"] - before == 3
+    assert 'uwi_single_flight_coalesced_total{flight="calendar_fetch"}' in single_flight.render_prometheus()
+
+
+def test_distinct_time_constraints_are_not_coalesced():
+    keys = []
+    gate = threading.Event()
+
+    def slow_google(calendar, limit, pref=None, tenant_id=1, preferred_minute=None, preferred_time_type=None):
+        keys.append((pref, preferred_time_type, preferred_minute))
+        gate.wait(2)
+        return []
+
+    with call_replay.replay_env(calendar=call_replay.InMemoryCalendar.seeded()), \
+            patch.object(tools_booking, "_get_slots_from_google_calendar", side_effect=slow_google):
+        with ThreadPoolExecutor(2) as pool:
+            a = pool.submit(tools_booking.get_slots_for_display, 3, None, _session(constraint="after", minute=17 * 60))
+            b = pool.submit(tools_booking.get_slots_for_display, 3, None, _session(constraint="before", minute=10 * 60))
+            deadline = time.time() + 2
+            while len(keys) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            gate.set()
+            a.result(5), b.result(5)
+    assert sorted(keys) == [(None, "after", 17 * 60), (None, "before", 10 * 60)]
+
+
+def test_handle_get_slots_timeout_refreshes_through_prefetch():
+    session = _session(tenant_id=3)
+    with patch.object(tools_booking, "_get_cached_slots", return_value=None), \
+            patch.object(vapi_tool_handlers.engine_executor, "run_sync", side_effect=vapi_tool_handlers.concurrent.futures.TimeoutError), \
+            patch.object(vapi_tool_handlers.slot_prefetch, "prefetch") as prefetch, \
+            patch.object(vapi_tool_handlers.threading, "Thread") as thread:
+        slots, _, err, reason = vapi_tool_handlers.handle_get_slots(session, "matin", "call-sf")
+    assert slots is None and reason == "timeout"
+    prefetch.assert_called_once_with(3, ["matin"])
+    thread.assert_not_called()
@@ -0,0 +1,129 @@
+# tests/test_call_journal_writebehind.py
+"""
+Journal d'appel write-behind : coalescence par appel, INSERT multi-lignes en une transaction,
+flush synchrone sur changement d'état, backpressure file pleine.
+"""
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+
+from backend import call_journal
+from backend.session import Session
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._row = None
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((" ".join(sql.split()), params))
+        if "RETURNING last_seq" in sql:
+            self.conn.last_seq += params[0]
+            self._row = (self.conn.last_seq,)
+
+    def fetchone(self):
+        return self._row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeConn:
+    def __init__(self):
+        self.executed = []
+        self.last_seq = 0
+        self.checkouts = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+@pytest.fixture
+def fake_pg(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgres://fake")
+    conn = FakeConn()
+
+    @contextmanager
+    def _fake_pg_connection(url, tenant_id=None, row_factory=None):
+        conn.checkouts += 1
+        yield conn
+
+    with patch("backend.call_journal.pg_connection", _fake_pg_connection), patch(
+        "backend.call_journal._ensure_worker"
+    ):
+        yield conn
+    call_journal.flush()
+
+
+def _sql(conn, prefix):
+    return [(sql, params) for sql, params in conn.executed if sql.startswith(prefix)]
+
+
+def test_turn_is_flushed_in_one_transaction_with_multirow_insert(fake_pg):
+    call_journal.ensure_call_session(1, "call-A", "START")
+    call_journal.add_message(1, "call-A", "user", "Bonjour")
+    call_journal.add_message(1, "call-A", "agent", "Bonjour, je vous écoute")
+    call_journal.update_last_state(1, "call-A", "QUALIF_NAME")
+    call_journal.write_checkpoint(1, "call-A", {"state": "QUALIF_NAME"})
+    assert call_journal.pending() == 5
+
+    call_journal.flush()
+
+    assert call_journal.pending() == 0
+    assert fake_pg.checkouts == 1
+    inserts = _sql(fake_pg, "INSERT INTO call_messages")
+    assert len(inserts) == 1
+    params = inserts[0][1]
+    assert params[2] == 1 and params[3] == "user"
+    assert params[8] == 2 and params[9] == "agent"
+    updates = _sql(fake_pg, "UPDATE call_sessions")
+    assert updates[0][1][:2] == (2, "QUALIF_NAME")
+    checkpoint = _sql(fake_pg, "INSERT INTO call_state_checkpoints")
+    assert checkpoint[0][1][2] == 2  # seq du message agent
+
+
+def test_checkpoint_without_new_message_uses_current_last_seq(fake_pg):
+    fake_pg.last_seq = 7
+    call_journal.write_checkpoint(1, "call-B", {"state": "WAIT_CONFIRM"})
+    call_journal.flush()
+    assert not _sql(fake_pg, "INSERT INTO call_messages")
+    assert _sql(fake_pg, "INSERT INTO call_state_checkpoints")[0][1][2] == 7
+
+
+def test_agent_response_flushes_only_on_state_change(fake_pg):
+    from backend.routes.voice import _call_journal_agent_response
+
+    session = Session(conv_id="call-C")
+    session.state = "WAIT_CONFIRM"
+    _call_journal_agent_response(1, "call-C", session, "Voici trois créneaux", "WAIT_CONFIRM", should_checkpoint=True)
+    assert call_journal.pending() > 0
+    assert fake_pg.checkouts == 0
+
+    session.state = "QUALIF_CONTACT"
+    _call_journal_agent_response(1, "call-C", session, "Votre numéro ?", "WAIT_CONFIRM", should_checkpoint=True)
+    assert call_journal.pending() == 0
+    assert fake_pg.checkouts == 1
+    assert len(_sql(fake_pg, "INSERT INTO call_messages")[0][1]) == 12
+    assert len(_sql(fake_pg, "INSERT INTO call_state_checkpoints")) == 1
+
+
+def test_queue_full_flushes_synchronously(fake_pg):
+    small = call_journal.queue.Queue(maxsize=2)
+    with patch.object(call_journal, "_queue", small):
+        for i in range(3):
+            call_journal.add_message(1, "call-D", "user", f"m{i}")
+        assert small.qsize() == 1
+    assert fake_pg.checkouts == 1
+    assert call_journal.stats()["queue_full"] >= 1
+
+
+def test_no_database_url_enqueues_nothing(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("PG_EVENTS_URL", raising=False)
+    call_journal.add_message(1, "call-E", "user", "Bonjour")
+    assert call_journal.pending() == 0
@@ -0,0 +1,74 @@
+# tests/test_call_replay.py
+"""
+Rejeu d'appels : faux calendrier en mémoire, chargement JSONL, mesures par tour (latence, requêtes DB,
+étapes), percentiles et détection de régression par rapport à une baseline.
+"""
+import json
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from backend import call_replay
+from backend.call_replay import InMemoryCalendar, ReplayCall, TurnSample
+
+
+def _tomorrow(hour):
+    d = datetime.now(ZoneInfo("Europe/Paris")) + timedelta(days=1)
+    return d.replace(hour=hour, minute=0, second=0, microsecond=0)
+
+
+def test_in_memory_calendar_slots_and_conflicts():
+    start = _tomorrow(9)
+    cal = InMemoryCalendar(busy=[(start, start + timedelta(hours=1))])
+    slots = cal.get_free_slots(date=start, duration_minutes=15, start_hour=9, end_hour=12, limit=2)
+    assert [s["start"][11:16] for s in slots] == ["10:00", "10:15"]
+    assert cal.book_appointment(slots[0]["start"], slots[0]["end"], "Jean", "jean@example.com", "x")
+    assert cal.book_appointment(slots[0]["start"], slots[0]["end"], "Paul", "", "x") is None
+    assert any("Jean" in ev["summary"] for ev in cal.list_upcoming_events())
+
+
+def test_load_jsonl_turns_and_messages(tmp_path):
+    path = tmp_path / "calls.jsonl"
+    path.write_text("\n".join([
+        json.dumps({"call_id": "c1", "tenant_id": 3, "turns": ["je veux un rdv", " "]}),
+        json.dumps({"messages": [{"role": "assistant", "text": "Bonjour"}, {"role": "user", "text": "oui"}]}),
+        json.dumps({"call_id": "vide", "messages": [{"role": "assistant", "text": "Bonjour"}]}),
+    ]), encoding="utf-8")
+    calls = call_replay.load_jsonl(str(path))
+    assert [(c.call_id, c.tenant_id, c.turns) for c in calls] == [("c1", 3, ["je veux un rdv"]), ("replay-file-0002", 1, ["oui"])]
+
+
+@pytest.mark.parametrize("mode", call_replay.MODES)
+def test_replay_measures_each_turn(mode):
+    turns = call_replay.SYNTHETIC_SCENARIOS["booking"]
+    calls = [ReplayCall("warm", ["bonjour"]), ReplayCall(f"replay-test-{mode}", list(turns))]
+    samples = call_replay.replay(calls, mode=mode, track_alloc=True)
+    assert [s.turn for s in samples] == list(range(len(turns)))
+    assert all(s.ms > 0 and s.db_roundtrips >= 0 and s.alloc_kib is not None for s in samples)
+    assert any("session_load" in s.stages for s in samples)
+    summary = call_replay.summarize(samples)
+    assert summary["turns"] == len(turns) and summary["calls"] == 1
+    assert summary["latency_ms"]["p50"] <= summary["latency_ms"]["p95"] <= summary["latency_ms"]["p99"]
+
+
+def test_engine_replay_offers_slots_from_fake_calendar():
+    cal = InMemoryCalendar()
+    samples = call_replay.replay(
+        [ReplayCall("replay-slots", call_replay.SYNTHETIC_SCENARIOS["booking"][:5])], calendar=cal, warmup_calls=0,
+    )
+    assert any("calendar_fetch" in s.stages for s in samples)
+    assert any("Créneaux disponibles" in s.response or "créneau" in s.response.lower() for s in samples)
+
+
+def test_percentile_and_regression_gate():
+    assert call_replay.percentile([], 95) == 0.0
+    assert call_replay.percentile([1, 2, 3, 4, 5], 50) == 3
+    assert call_replay.percentile([0, 10], 95) == pytest.approx(9.5)
+    base = call_replay.summarize([TurnSample("c", i, "", "", 10.0, 2) for i in range(20)])
+    same = call_replay.summarize([TurnSample("c", i, "", "", 10.5, 2) for i in range(20)])
+    slow = call_replay.summarize([TurnSample("c", i, "", "", 20.0, 6) for i in range(20)])
+    assert call_replay.compare(same, base) == []
+    regressions = call_replay.compare(slow, base, max_regression=0.2)
+    assert any(r.startswith("latency_ms.p95") for r in regressions)
+    assert any(r.startswith("db_roundtrips.mean") for r in regressions)
@@ -0,0 +1,193 @@
+# tests/test_checkpoint_delta.py
+"""
+Checkpoints delta : patch JSON aller-retour, full tous les N, reconstruction base + deltas
+(chaîne cassée → dernier état cohérent), écriture via le journal write-behind, lecture flag coupé.
+"""
+import json
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+
+from backend import call_journal, checkpoint_delta
+from backend.checkpoint_delta import KIND_DELTA, KIND_FULL, apply_patch, fold, make_patch
+from backend.session import Session
+from backend.session_codec import pack_session, packed_to_json, session_from_dict
+
+
+@pytest.fixture(autouse=True)
+def _delta_mode(monkeypatch):
+    monkeypatch.setenv("CALL_CHECKPOINT_DELTA", "true")
+    monkeypatch.setenv("CALL_CHECKPOINT_BASE_EVERY", "4")
+    checkpoint_delta.reset()
+    yield
+    checkpoint_delta.reset()
+
+
+def _turns(n):
+    """n sessions successives d'un appel long (créneaux reproposés à chaque tour)."""
+    s = Session(conv_id="delta-call")
+    s.qualif_data.name = "Henri"
+    out = []
+    for i in range(n):
+        s.turn_count = i + 1
+        s.state = "WAIT_CONFIRM" if i % 2 else "QUALIF_PREF"
+        s.pending_slots = [{"id": k, "start": f"2026-03-0{k}T09:00:00", "label": f"créneau {k}"} for k in range(1, 4)]
+        s.rejected_slot_starts = [f"2026-03-0{k}T09:00:00" for k in range(1, 1 + i % 3)]
+        out.append(pack_session(s))
+    return out
+
+
+def _write_chain(packs):
+    rows = []
+    for seq, packed in enumerate(packs, start=1):
+        ck = checkpoint_delta.plan(1, "delta-call", seq * 2, packed)
+        rows.append((ck.seq, ck.kind, ck.prev_seq, json.loads(packed_to_json(ck.payload))))
+        checkpoint_delta.commit(ck)
+    return rows
+
+
+def test_patch_round_trip_nested_and_escaped_keys():
+    old = {"s": "START", "f": {"3": [1, 2], "7": "x"}, "x": {"a/b": 1, "c~d": {"e": 1}}}
+    new = {"s": "WAIT_CONFIRM", "f": {"3": [1, 2, 3], "9": None}, "x": {"a/b": 2, "c~d": {}}}
+    assert apply_patch(old, make_patch(old, new)) == new
+    assert make_patch(new, new) == []
+    assert old["f"]["7"] == "x"  # apply_patch ne modifie pas l'original
+
+
+def test_full_every_n_and_deltas_reconstruct_each_state():
+    packs = _turns(9)
+    rows = _write_chain(packs)
+    assert [r[1] for r in rows] == [KIND_FULL, KIND_DELTA, KIND_DELTA, KIND_DELTA] * 2 + [KIND_FULL]
+    for i in range(len(rows)):
+        base = max(j for j in range(i + 1) if rows[j][1] == KIND_FULL)
+        seq, packed = fold(rows[base:i + 1])
+        assert seq == rows[i][0]
+        assert packed == json.loads(packed_to_json(packs[i]))
+    delta_bytes = max(len(packed_to_json(r[3])) for r in rows if r[1] == KIND_DELTA)
+    assert delta_bytes < len(packed_to_json(packs[-1])) / 2
+
+
+def test_broken_chain_stops_at_last_consistent_state():
+    packs = _turns(4)
+    rows = _write_chain(packs)
+    del rows[2]  # delta manquant
+    seq, packed = fold(rows)
+    assert seq == rows[1][0]
+    assert session_from_dict("delta-call", packed).turn_count == 2
+    assert fold([r for r in rows if r[1] == KIND_DELTA]) is None
+
+
+def test_same_seq_or_failed_write_restarts_from_full():
+    packs = _turns(3)
+    first = checkpoint_delta.plan(1, "c", 5, packs[0])
+    checkpoint_delta.commit(first)
+    assert checkpoint_delta.plan(1, "c", 5, packs[1]).kind == KIND_FULL
+    assert checkpoint_delta.plan(1, "c", 6, packs[1]).kind == KIND_DELTA
+    checkpoint_delta.forget(1, "c")
+    assert checkpoint_delta.plan(1, "c", 7, packs[2]).kind == KIND_FULL
+
+
+def test_legacy_rows_without_kind_are_full():
+    packed = pack_session(Session(conv_id="legacy"))
+    assert fold([(3, None, None, packed)]) == (3, packed)
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._row = None
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((" ".join(sql.split()), params))
+        if "RETURNING last_seq" in sql:
+            self.conn.last_seq += params[0]
+            self._row = (self.conn.last_seq,)
+
+    def fetchone(self):
+        return self._row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _FakeConn:
+    def __init__(self):
+        self.executed = []
+        self.last_seq = 0
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+def test_call_journal_writes_delta_rows(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgres://fake")
+    conn = _FakeConn()
+
+    @contextmanager
+    def _fake_pg_connection(url, tenant_id=None, row_factory=None):
+        yield conn
+
+    packs = _turns(3)
+    with patch("backend.call_journal.pg_connection", _fake_pg_connection), patch("backend.call_journal._ensure_worker"):
+        for packed in packs:
+            call_journal.add_message(1, "journal-call", "user", "oui")
+            call_journal.write_checkpoint(1, "journal-call", packed)
+            call_journal.flush()
+
+    upserts = [p for sql, p in conn.executed if sql.startswith("INSERT INTO call_state_checkpoints")]
+    assert [(p[2], p[4], p[5]) for p in upserts] == [(1, KIND_FULL, None), (2, KIND_DELTA, 1), (3, KIND_DELTA, 2)]
+    rows = [(p[2], p[4], p[5], json.loads(p[3])) for p in upserts]
+    assert fold(rows)[1] == json.loads(packed_to_json(packs[-1]))
+
+
+class _ChainCursor:
+    """call_state_checkpoints en mémoire : sert _CHAIN_SQL (dernier full + suivants)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.sql = []
+        self._result = []
+
+    def execute(self, sql, params=None):
+        self.sql.append(" ".join(sql.split()))
+        if "kind = 'full'" in sql:
+            start = max((r[0] for r in self.rows if r[1] == KIND_FULL), default=0)
+            self._result = [(r[0], r[1], r[2], json.dumps(r[3])) for r in self.rows if r[0] >= start]
+
+    def fetchall(self):
+        return self._result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+def test_read_with_flag_off_folds_remaining_deltas(monkeypatch):
+    from backend import session_pg
+
+    packs = _turns(3)
+    rows = _write_chain(packs)
+    assert [r[1] for r in rows] == [KIND_FULL, KIND_DELTA, KIND_DELTA]
+    monkeypatch.setenv("CALL_CHECKPOINT_DELTA", "false")
+    monkeypatch.setenv("DATABASE_URL", "postgres://fake")
+    cur = _ChainCursor(rows)
+
+    class _Conn:
+        def cursor(self):
+            return cur
+
+    @contextmanager
+    def _fake_pg_connection(url, tenant_id=None, row_factory=None):
+        yield _Conn()
+
+    with patch.object(session_pg, "pg_connection", _fake_pg_connection):
+        seq, state = session_pg.pg_get_latest_checkpoint(1, "delta-call")
+    assert seq == rows[-1][0]
+    assert state == json.loads(packed_to_json(packs[-1]))
+    assert not any("LIMIT 1" in s for s in cur.sql)
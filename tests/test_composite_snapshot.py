@@ -0,0 +1,107 @@
+# tests/test_composite_snapshot.py
+"""
+Snapshots admin composites (backend/composite_snapshot.py) : sections en parallèle, timeout par
+section avec valeur par défaut, stale-while-revalidate, meta exposée par /admin/stats/dashboard-payload.
+"""
+import threading
+import time
+import uuid
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from backend import composite_snapshot
+from backend.composite_snapshot import Section
+
+
+def _name() -> str:
+    return f"test_{uuid.uuid4().hex[:8]}"
+
+
+def _slow(value, delay):
+    def fn():
+        time.sleep(delay)
+        return value
+    return fn
+
+
+def test_sections_run_in_parallel():
+    t0 = time.monotonic()
+    values, meta = composite_snapshot.assemble(_name(), {
+        "a": Section(_slow(1, 0.3)),
+        "b": Section(_slow(2, 0.3)),
+        "c": Section(_slow(3, 0.3)),
+    })
+    assert time.monotonic() - t0 < 0.8
+    assert values == {"a": 1, "b": 2, "c": 3}
+    assert {m["status"] for m in meta.values()} == {"computed"}
+    assert meta["a"]["duration_ms"] >= 250
+
+
+def test_timeout_returns_default_then_cache_filled():
+    name = _name()
+    sections = {"fast": Section(lambda: "ok"), "slow": Section(_slow("late", 0.4), timeout_s=0.1, default="dflt")}
+    values, meta = composite_snapshot.assemble(name, sections)
+    assert values == {"fast": "ok", "slow": "dflt"}
+    assert meta["slow"]["status"] == "timeout" and meta["slow"]["computed_at"] is None
+    time.sleep(0.5)
+    values, meta = composite_snapshot.assemble(name, sections)
+    assert values == {"fast": "ok", "slow": "late"}
+    assert meta["slow"]["status"] == "fresh" and meta["fast"]["status"] == "fresh"
+
+
+def test_error_isolated_to_section():
+    def boom():
+        raise RuntimeError("db down")
+    values, meta = composite_snapshot.assemble(_name(), {
+        "ok": Section(lambda: 1),
+        "ko": Section(boom, default={}),
+    })
+    assert values == {"ok": 1, "ko": {}}
+    assert meta["ko"]["status"] == "error" and "db down" in meta["ko"]["error"]
+
+
+def test_stale_served_while_refreshed_in_background():
+    name = _name()
+    calls = []
+    done = threading.Event()
+
+    def fn():
+        calls.append(1)
+        if len(calls) > 1:
+            done.set()
+        return len(calls)
+
+    stale = Section(fn, ttl_s=0.05, stale_s=60)
+    assert composite_snapshot.assemble(name, {"s": stale})[0] == {"s": 1}
+    time.sleep(0.1)
+    values, meta = composite_snapshot.assemble(name, {"s": stale})
+    assert values == {"s": 1} and meta["s"]["status"] == "stale"
+    assert done.wait(2)
+    time.sleep(0.05)
+    section = Section(fn, ttl_s=60, stale_s=60)
+    values, meta = composite_snapshot.assemble(name, {"s": section})
+    assert values == {"s": 2} and meta["s"]["status"] == "fresh"
+    assert composite_snapshot.assemble(name, {"s": section}, refresh=True)[1]["s"]["status"] == "computed"
+
+
+def test_dashboard_payload_exposes_section_meta():
+    from backend.main import app
+    from backend.routes import admin
+
+    app.dependency_overrides[admin._verify_admin] = lambda: None
+    try:
+        with patch.object(admin, "_get_global_stats", return_value={"calls_total": 4}), \
+                patch.object(admin, "_get_stats_timeseries", side_effect=RuntimeError("boom")), \
+                patch.object(admin, "_get_stats_top_tenants", side_effect=lambda m, w, lim: {"metric": m, "window_days": w, "items": []}), \
+                patch.object(admin, "_get_billing_snapshot", return_value={}), \
+                patch.object(admin, "_get_activation_queue", return_value={"items": [], "summary": {}}):
+            r = TestClient(app).get("/api/admin/stats/dashboard-payload?window_days=17&refresh=true")
+    finally:
+        app.dependency_overrides.clear()
+    assert r.status_code == 200
+    body = r.json()
+    assert body["global"] == {"calls_total": 4}
+    assert body["timeseries"] == {"metric": "calls", "days": 17, "points": []}
+    assert body["meta"]["timeseries"]["status"] == "error"
+    assert body["meta"]["topTenantsCost"]["status"] == "computed"
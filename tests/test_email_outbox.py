@@ -0,0 +1,129 @@
+# tests/test_email_outbox.py
+"""
+Outbox email (backend/email_outbox.py) : mise en file idempotente, envoi batch Postmark via le client
+httpx partagé, retry avec backoff puis dead, reprise des messages restés en sending, rétention.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend import db, email_outbox
+from backend.services import email_service
+
+
+class _Resp:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self._body = body
+        self.text = str(body)
+
+    def json(self):
+        return self._body
+
+
+class _FakeHttp:
+    def __init__(self, responder):
+        self.responder = responder
+        self.posts = []
+
+    def post(self, url, json=None, headers=None):
+        self.posts.append((url, json))
+        return self.responder(json)
+
+
+@pytest.fixture
+def outbox(monkeypatch, tmp_path):
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "agent.db"))
+    for var in ("DATABASE_URL", "PG_TENANTS_URL", "PG_EVENTS_URL", "SMTP_EMAIL", "SMTP_PASSWORD"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("POSTMARK_SERVER_TOKEN", "tok")
+    monkeypatch.setenv("EMAIL_FROM", "noreply@uwi.fr")
+    monkeypatch.setattr(email_outbox, "MODE", "true")
+    return monkeypatch
+
+
+def _rows():
+    with email_outbox.connect() as (conn, _):
+        return conn.execute(
+            "SELECT idempotency_key, status, attempts, last_error, provider_message_id FROM email_outbox ORDER BY id"
+        ).fetchall()
+
+
+def test_enqueue_idempotent_and_send_queues_instead_of_http(outbox):
+    http = _FakeHttp(lambda payload: _Resp(200, {}))
+    outbox.setattr(email_service, "_http", http)
+    assert email_outbox.enqueue("a@x.fr", "S", "<p>1</p>", kind="daily_report", idempotency_key="daily_report:1:1:d")
+    assert email_outbox.enqueue("a@x.fr", "S", "<p>1</p>", kind="daily_report", idempotency_key="daily_report:1:1:d")
+    ok, err = email_service.send_onboarding_link_email("b@x.fr", "Dr B", "https://uwi.fr/onb")
+    assert (ok, err) == (True, None)
+    assert http.posts == []
+    rows = _rows()
+    assert [(r[0].split(":")[0], r[1]) for r in rows] == [("daily_report", "pending"), ("onboarding_link", "pending")]
+
+
+def test_run_once_sends_single_batch_and_marks_permanent_dead(outbox):
+    http = _FakeHttp(lambda payload: _Resp(200, [
+        {"ErrorCode": 0, "MessageID": "m1"},
+        {"ErrorCode": 0, "MessageID": "m2"},
+        {"ErrorCode": 406, "Message": "Inactive recipient"},
+    ]))
+    outbox.setattr(email_service, "_http", http)
+    for i in range(3):
+        email_outbox.enqueue(f"u{i}@x.fr", "S", "<p/>", kind="payment_link", from_addr="noreply@uwi.fr")
+    out = email_outbox.run_once()
+    assert {k: out[k] for k in ("claimed", "sent", "failed", "dead")} == {"claimed": 3, "sent": 2, "failed": 0, "dead": 1}
+    assert len(http.posts) == 1
+    url, payload = http.posts[0]
+    assert url == email_service.POSTMARK_BATCH_URL
+    assert [m["To"] for m in payload] == ["u0@x.fr", "u1@x.fr", "u2@x.fr"] and payload[0]["Tag"] == "payment_link"
+    assert [(r[1], r[4]) for r in _rows()] == [("sent", "m1"), ("sent", "m2"), ("dead", None)]
+    assert email_outbox.run_once()["claimed"] == 0
+
+
+def test_transient_failure_backs_off_then_dead_after_max_attempts(outbox):
+    http = _FakeHttp(lambda payload: _Resp(500, "boom"))
+    outbox.setattr(email_service, "_http", http)
+    outbox.setattr(email_outbox, "MAX_ATTEMPTS", 2)
+    email_outbox.enqueue("a@x.fr", "S", "<p/>", kind="password_reset", from_addr="noreply@uwi.fr")
+    assert email_outbox.run_once()["failed"] == 1
+    assert email_outbox.run_once()["claimed"] == 0  # backoff : pas encore dû
+    with email_outbox.connect() as (conn, _):
+        conn.execute("UPDATE email_outbox SET next_attempt_at = '2000-01-01 00:00:00.000000'")
+    assert email_outbox.run_once()["dead"] == 1
+    status, attempts, last_error = _rows()[0][1:4]
+    assert (status, attempts) == ("dead", 2) and "Postmark 500" in last_error
+    assert len(http.posts) == 2
+
+
+def test_stale_sending_reclaimed_and_shared_client_reused(outbox):
+    http = _FakeHttp(lambda payload: _Resp(200, [{"ErrorCode": 0, "MessageID": f"m{i}"} for i in range(len(payload))]))
+    outbox.setattr(email_service, "_http", http)
+    email_outbox.enqueue("a@x.fr", "S", "<p/>", kind="daily_report", from_addr="noreply@uwi.fr")
+    email_outbox.enqueue("b@x.fr", "S", "<p/>", kind="daily_report", from_addr="noreply@uwi.fr")
+    stale = (datetime.now(timezone.utc) - timedelta(seconds=email_outbox.STALE_LOCK_S + 5)).strftime("%Y-%m-%d %H:%M:%S.%f")
+    fresh = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    with email_outbox.connect() as (conn, _):
+        conn.execute("UPDATE email_outbox SET status = 'sending', attempts = 1, locked_at = ? WHERE to_addr = 'a@x.fr'", (stale,))
+        conn.execute("UPDATE email_outbox SET status = 'sending', attempts = 1, locked_at = ? WHERE to_addr = 'b@x.fr'", (fresh,))
+    out = email_outbox.run_once()
+    assert (out["claimed"], out["sent"]) == (1, 1)
+    assert [r[1] for r in _rows()] == ["sent", "sending"]
+    assert email_service._http_client() is http
+    assert email_outbox.stats()["active"] is True
+
+
+def test_sent_html_cleared_purge_and_dead_key_not_reported_queued(outbox):
+    http = _FakeHttp(lambda payload: _Resp(200, [{"ErrorCode": 0, "MessageID": "m1"}, {"ErrorCode": 406, "Message": "x"}]))
+    outbox.setattr(email_service, "_http", http)
+    email_outbox.enqueue("a@x.fr", "S", "<a href='reset'>", kind="password_reset", idempotency_key="k-sent")
+    email_outbox.enqueue("b@x.fr", "S", "<p/>", kind="daily_report", idempotency_key="k-dead")
+    email_outbox.run_once()
+    with email_outbox.connect() as (conn, _):
+        assert [r[0] for r in conn.execute("SELECT html FROM email_outbox ORDER BY id")] == ["", ""]
+    assert email_outbox.enqueue("b@x.fr", "S", "<p/>", kind="daily_report", idempotency_key="k-dead") is False
+    assert email_outbox.enqueue("a@x.fr", "S", "<p/>", kind="password_reset", idempotency_key="k-sent") is True
+    assert email_outbox.purge() == 0
+    with email_outbox.connect() as (conn, _):
+        conn.execute("UPDATE email_outbox SET created_at = '2000-01-01 00:00:00.000000'")
+    assert email_outbox.purge() == 2
+    assert _rows() == []
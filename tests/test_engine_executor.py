@@ -0,0 +1,80 @@
+# tests/test_engine_executor.py
+"""
+Engine executor : un tour en vol par conv_id, backpressure (EngineBusy), timeout effectif, métriques.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from backend import engine_executor
+from backend.engine_executor import EngineBusy, EngineExecutor
+
+
+def test_same_conversation_is_serialized_other_runs_in_parallel():
+    ex = EngineExecutor(max_workers=4, max_pending=10)
+    active = {"conv-1": 0}
+    overlap = []
+    release = threading.Event()
+    lock = threading.Lock()
+
+    def turn(conv_id):
+        with lock:
+            active[conv_id] = active.get(conv_id, 0) + 1
+            overlap.append(active[conv_id])
+        release.wait(1)
+        time.sleep(0.01)
+        with lock:
+            active[conv_id] -= 1
+        return conv_id
+
+    futs = [ex.submit("conv-1", turn, "conv-1") for _ in range(3)]
+    other = ex.submit("conv-2", turn, "conv-2")
+    assert other.result(timeout=2) == "conv-2"  # pas bloqué par conv-1
+    release.set()
+    assert [f.result(timeout=2) for f in futs] == ["conv-1"] * 3
+    assert max(overlap) == 1
+    stats = ex.stats()
+    assert stats["completed"] == 4 and stats["pending"] == 0 and stats["active_conversations"] == 0
+    ex.shutdown()
+
+
+def test_backpressure_rejects_when_saturated():
+    ex = EngineExecutor(max_workers=1, max_pending=2)
+    gate = threading.Event()
+    ex.submit("a", gate.wait, 1)
+    ex.submit("b", gate.wait, 1)
+    with pytest.raises(EngineBusy):
+        ex.submit("c", gate.wait, 1)
+    assert ex.stats()["rejected"] == 1
+    gate.set()
+    ex.shutdown()
+
+
+def test_exception_propagates_and_key_is_released():
+    ex = EngineExecutor(max_workers=2, max_pending=10)
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        ex.submit("conv", boom).result(timeout=2)
+    assert ex.submit("conv", lambda: 42).result(timeout=2) == 42
+    assert ex.stats()["failed"] == 1
+    ex.shutdown()
+
+
+def test_run_sync_timeout_does_not_wait_for_task():
+    gate = threading.Event()
+    t0 = time.monotonic()
+    with pytest.raises(concurrent.futures.TimeoutError):
+        engine_executor.run_sync(gate.wait, 2, timeout=0.05)
+    assert time.monotonic() - t0 < 1.0
+    gate.set()
+
+
+def test_async_run_returns_result():
+    assert asyncio.run(engine_executor.run("conv-async", lambda x: x * 2, 21)) == 42
+    assert engine_executor.stats()["workers"] >= 1
@@ -0,0 +1,101 @@
+# tests/test_faq_batch.py
+"""
+Scoring FAQ groupé : top-1 identique à search(), top-k dédupliqué par faq_id, meilleure hypothèse
+parmi plusieurs formulations, seuil par store, évaluation hors ligne des seuils.
+"""
+import sys
+
+import pytest
+
+from backend import config, tools_faq
+from backend.tools_faq import (
+    FaqItem,
+    FaqStore,
+    best_threshold,
+    default_faq_store,
+    evaluate_thresholds,
+)
+
+QUERIES = [
+    "quels sont vos horaires", "vous etes ouvert le samedi", "combien ça coûte", "bonjour",
+    "je veux annuler mon rendez vous", "c'est où le cabinet", "xyz", "", "paiement par carte ?",
+]
+
+
+@pytest.fixture(params=["cdist", "extract"])
+def scoring_path(request, monkeypatch):
+    if request.param == "cdist":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setitem(sys.modules, "numpy", None)  # import numpy → ImportError
+    return request.param
+
+
+@pytest.mark.parametrize("include_low", [True, False])
+def test_batch_top1_matches_single_search(include_low, scoring_path):
+    store = default_faq_store()
+    batch = store.search_batch(QUERIES, include_low=include_low, top_k=1)
+    for query, results in zip(QUERIES, batch, strict=True):
+        single = store.search(query, include_low=include_low)
+        if not query:
+            assert results == []
+            continue
+        assert results[0].score == pytest.approx(single.score)
+        assert results[0].match == single.match
+        if single.match:
+            assert (results[0].faq_id, results[0].answer) == (single.faq_id, single.answer)
+
+
+def test_top_k_dedups_faq_ids(scoring_path):
+    results = default_faq_store().search_batch(["horaires d'ouverture"], top_k=3)[0]
+    ids = [r.faq_id for r in results]
+    assert ids[0] == "FAQ_HORAIRES" and len(ids) == 3 and len(set(ids)) == 3
+    assert [r.score for r in results] == sorted((r.score for r in results), reverse=True)
+
+
+def test_search_best_picks_strongest_hypothesis(scoring_path, monkeypatch):
+    monkeypatch.setattr(tools_faq, "_CDIST_WORKERS", 4)  # chemin matriciel même sur une machine mono-cœur
+    store = default_faq_store()
+    best = store.search_best(["euh bah je sais pas trop", "quels sont vos tarifs"])
+    assert best.match and best.faq_id == "FAQ_TARIFS" and best.score == 1.0
+    assert store.search_best(["xyz qwerty"]) == store.search("xyz qwerty")
+    assert store.search_best(["", "  "]).match is False
+
+
+def test_store_threshold_overrides_config(monkeypatch):
+    monkeypatch.setattr(config, "FAQ_THRESHOLD", 0.80)
+    items = [FaqItem(faq_id="FAQ_PARKING", question="où se garer", answer="Parking rue X.")]
+    lenient = FaqStore(items, threshold=0.5)
+    strict = FaqStore(items, threshold=0.99)
+    query = "ou se garer pres du cabinet"
+    assert lenient.search(query).match is True
+    assert strict.search(query).match is False
+    assert strict.search("où se garer").match is True  # match exact
+
+
+def test_evaluate_thresholds_and_best():
+    labeled = [
+        ("quels sont vos horaires", "FAQ_HORAIRES"),
+        ("vous êtes ouvert quand", "FAQ_HORAIRES"),
+        ("le prix", "FAQ_TARIFS"),
+        ("je voudrais parler au docteur martin", None),
+    ]
+    report = evaluate_thresholds(default_faq_store(), labeled, [0.5, 0.8, 1.0])
+    assert [r["threshold"] for r in report] == [0.5, 0.8, 1.0]
+    by_t = {r["threshold"]: r for r in report}
+    assert by_t[1.0]["recall"] == 1.0 and by_t[1.0]["false_accepts"] == 0
+    assert by_t[0.5]["false_accepts"] >= by_t[1.0]["false_accepts"]
+    assert best_threshold(report) == 1.0
+    assert best_threshold([]) is None
+
+
+def test_voice_faq_hypotheses_from_tool_payload():
+    from backend.routes.voice import _faq_hypotheses
+    payload = {"message": {"artifact": {"messages": [
+        {"role": "user", "message": "euh c'est ouvert le samedi"},
+        {"role": "bot", "message": "Un instant."},
+    ]}}}
+    assert _faq_hypotheses(payload, "Euh, horaires du samedi") == [
+        "Euh, horaires du samedi", "horaires du samedi", "euh c'est ouvert le samedi",
+    ]
+    assert _faq_hypotheses({}, "Horaires") == ["Horaires"]
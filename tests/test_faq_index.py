@@ -0,0 +1,84 @@
+# tests/test_faq_index.py
+"""
+Index FAQ compilé : parité avec l'ancien scoring (match exact / fuzzy, priority), index tenant
+réutilisé tant que la version (faq_json + sector) ne change pas, reconstruction immédiate après PUT.
+"""
+import pytest
+from rapidfuzz import fuzz, process
+
+from backend import config, tools_faq
+from backend.tools_faq import (
+    FaqResult,
+    default_faq_store,
+    rebuild_tenant_faq_index,
+    tenant_faq_store,
+)
+
+
+def _legacy_search(store, query, include_low=True):
+    q = (query or "").strip().lower()
+    if not q:
+        return FaqResult(match=False, score=0.0)
+    candidates = [((i.question or "").strip().lower(), i) for i in store.items]
+    if not include_low:
+        candidates = [(qn, it) for (qn, it) in candidates if it.priority == "normal"]
+    result = process.extractOne(q, [qn for qn, _ in candidates], scorer=fuzz.WRatio)
+    score = float(result[1]) / 100.0
+    if score >= config.FAQ_THRESHOLD:
+        item = candidates[result[2]][1]
+        return FaqResult(match=True, score=score, faq_id=item.faq_id, answer=item.answer)
+    return FaqResult(match=False, score=score)
+
+
+@pytest.mark.parametrize("include_low", [True, False])
+def test_compiled_search_matches_legacy(include_low):
+    store = default_faq_store()
+    queries = [i.question for i in store.items] + [
+        "Horaires", "  bonjour ", "vous etes ouvert le samedi ?", "combien ça coûte", "je veux un rdv", "xyz",
+    ]
+    for q in queries:
+        assert store.search(q, include_low=include_low) == _legacy_search(store, q, include_low), q
+
+
+@pytest.fixture
+def tenant_params(monkeypatch):
+    from backend import tenant_config
+    params = {7: {"faq_json": [{"category": "Horaires", "items": [{"id": "h1", "question": "Vos horaires ?", "answer": "9h-18h"}]}]}}
+    calls = {"get_faq": 0}
+    real_get_faq = tenant_config.get_faq
+
+    def fake_get_faq(tid):
+        calls["get_faq"] += 1
+        return real_get_faq(tid)
+
+    monkeypatch.setattr(tenant_config, "get_params", lambda tid=None: dict(params.get(tid, {})))
+    monkeypatch.setattr(tenant_config, "get_faq", fake_get_faq)
+    tools_faq.invalidate_tenant_faq_index()
+    yield params, calls
+    tools_faq.invalidate_tenant_faq_index()
+
+
+def test_tenant_index_reused_until_version_changes(tenant_params, monkeypatch):
+    params, calls = tenant_params
+    store = tenant_faq_store(7)
+    assert store.search("horaires").answer == "9h-18h"
+    assert tenant_faq_store(7) is store and calls["get_faq"] == 1
+
+    monkeypatch.setattr(tools_faq, "_FAQ_INDEX_CHECK_SEC", 0.0)
+    assert tenant_faq_store(7) is store and calls["get_faq"] == 1  # version inchangée
+    params[7]["faq_json"][0]["items"][0]["answer"] = "8h-20h"
+    assert tenant_faq_store(7).search("horaires").answer == "8h-20h"
+    assert calls["get_faq"] == 2
+
+
+def test_rebuild_applies_put_immediately(tenant_params):
+    params, calls = tenant_params
+    assert tenant_faq_store(7).search("horaires").answer == "9h-18h"
+    params[7]["faq_json"][0]["items"][0]["answer"] = "10h-17h"
+    assert tenant_faq_store(7).search("horaires").answer == "9h-18h"  # dans la fenêtre de vérification
+    rebuild_tenant_faq_index(7)
+    assert tenant_faq_store(7).search("horaires").answer == "10h-17h"
+
+
+def test_default_index_is_built_once():
+    assert tenant_faq_store(None) is tenant_faq_store(0)
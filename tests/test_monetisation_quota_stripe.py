@@ -115,13 +115,15 @@ def test_already_suspended_quota_check_never_called_no_resuspend(
 
 
 @patch.dict("os.environ", {"STRIPE_SECRET_KEY": "sk_test_fake"})
-@patch("backend.billing_pg.get_tenant_billing")
-@patch("backend.stripe_usage.try_acquire_usage_push")
+@patch("backend.stripe_usage.record_usage_push_outcomes")
+@patch("backend.stripe_usage._billing_by_tenant")
+@patch("backend.stripe_usage.try_acquire_usage_pushes")
 @patch("backend.stripe_usage._aggregate_usage_by_tenant_for_day")
 def test_push_daily_usage_idempotent_second_run_skips_stripe_call(
     mock_aggregate,
     mock_try_acquire,
     mock_get_billing,
+    mock_record,
 ):
     """1er run : try_acquire True → Stripe.UsageRecord.create appelé. 2e run : try_acquire False → create pas rappelé."""
     import sys
@@ -136,11 +138,11 @@ def test_push_daily_usage_idempotent_second_run_skips_stripe_call(
 
         d = date(2025, 6, 15)
         mock_aggregate.return_value = [(1, 10)]
-        mock_get_billing.return_value = {
+        mock_get_billing.return_value = {1: {
             "stripe_subscription_id": "sub_1",
             "stripe_metered_item_id": "si_1",
-        }
-        mock_try_acquire.side_effect = [True, False]
+        }}
+        mock_try_acquire.side_effect = [{1}, set()]
 
         out1 = push_daily_usage_to_stripe(d)
         out2 = push_daily_usage_to_stripe(d)
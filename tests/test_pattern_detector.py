@@ -0,0 +1,219 @@
+# tests/test_pattern_detector.py
+"""
+Détecteur multi-motifs : toutes les catégories en un passage (chevauchements, préfixes, regex),
+priorité de first(), et parité avec les anciennes boucles mot-clé / re.search de chaque détecteur
+(triage médical, intents forts, oui/répète/booking, transfert, préférence horaire, anglais STT).
+"""
+import random
+import re
+
+import pytest
+
+from backend import guards, stt_common, transfer_policy
+from backend import guards_medical_triage as triage
+from backend import intent_parser as ip
+from backend.pattern_detector import MultiPatternDetector
+
+# ---- Références : implémentations d'avant le détecteur ----
+
+def _legacy_red_flag(text):
+    if not text:
+        return None
+    normalized = text.lower()
+    for category, patterns in triage.RED_FLAG_CATEGORIES.items():
+        for pattern in patterns:
+            if re.search(pattern, normalized):
+                return category
+    return None
+
+
+def _legacy_symptoms(text):
+    if not text:
+        return None
+    t = text.lower()
+    has_caution = any(k in t for k in triage.CAUTION_KEYWORDS)
+    has_symptom = any(k in t for k in triage.NON_URGENT_KEYWORDS)
+    if has_caution and has_symptom:
+        return "CAUTION"
+    if has_symptom:
+        return "NON_URGENT"
+    return None
+
+
+def _pattern_in_text(t, patterns):
+    return any(p and (p in t or t == p) for p in patterns)
+
+
+def _legacy_strong_intent(text):
+    if not text or not text.strip():
+        return None
+    t = ip.normalize_stt_text(text)
+    if not t:
+        return None
+    if _pattern_in_text(t, ip._TRANSFER_LEXICON):
+        return ip.Intent.TRANSFER
+    if _pattern_in_text(t, ip._CANCEL_LEXICON):
+        return ip.Intent.CANCEL
+    if _pattern_in_text(t, ip._MODIFY_LEXICON):
+        return ip.Intent.MODIFY
+    if _pattern_in_text(t, ip._ABANDON_LEXICON):
+        if len(t) < ip._ABANDON_MIN_LEN or t in ip._ABANDON_EXCLUDED:
+            return None
+        return ip.Intent.ABANDON
+    if _pattern_in_text(t, ip._ORDONNANCE_LEXICON):
+        return ip.Intent.ORDONNANCE
+    if _pattern_in_text(t, ip._FAQ_STRONG_LEXICON):
+        return ip.Intent.FAQ
+    return None
+
+
+def _legacy_is_yes(text):
+    t = ip.normalize_stt_text(text)
+    if not t:
+        return False
+    if any(p in t or t == p or t.startswith(p + " ") or t.startswith(p + ",") for p in ip._YES_LEXICON):
+        return True
+    return t in ("oui", "ui", "wi", "ouais", "ouai", "ok", "okay", "d accord", "daccord")
+
+
+def _legacy_is_repeat(text):
+    t = ip.normalize_stt_text(text)
+    if not t:
+        return False
+    if any(w in ip._REPEAT_SINGLE_WORDS for w in t.split()):
+        return True
+    for p in ip._REPEAT_LEXICON:
+        if " " in p and (p in t or t == p):
+            return True
+        if t == p:
+            return True
+    return False
+
+
+def _legacy_booking_blacklist(text):
+    t = ip.normalize_stt_text(text)
+    if not t:
+        return False
+    if t == "non" or t.startswith("non "):
+        return True
+    return any(bl in t for bl in ip._BOOKING_START_BLACKLIST)
+
+
+def _legacy_transfer(text):
+    raw = (text or "").strip()
+    if not raw:
+        return "NONE"
+    t = ip.normalize_stt_text(raw).lower().strip()
+    t_compact = re.sub(r"\s+", " ", re.sub(r"[^a-z0-9\s]", " ", t)).strip()
+    for pat in transfer_policy.EXPLICIT_PATTERNS:
+        if re.search(pat, t_compact):
+            return "EXPLICIT"
+    if len(t_compact) <= 14:
+        if t_compact in transfer_policy.SHORT_KEYWORDS:
+            return "SHORT"
+        toks = t_compact.split()
+        if len(toks) <= 2 and any(tok in transfer_policy.SHORT_KEYWORDS for tok in toks):
+            return "SHORT"
+    return "NONE"
+
+
+def _legacy_time_keyword(text):
+    t = guards.normalize_pref(text)
+    if any(k in t for k in guards.MORNING_KEYWORDS):
+        return "morning"
+    if any(k in t for k in guards.AFTERNOON_KEYWORDS):
+        return "afternoon"
+    if any(k in t for k in guards.NEUTRAL_KEYWORDS):
+        return "neutral"
+    return None
+
+
+def _corpus(n=600, seed=7):
+    """Énoncés mêlant mots-clés de tous les lexiques (y compris tronqués) et bruit."""
+    keywords = [
+        *triage.CAUTION_KEYWORDS, *triage.NON_URGENT_KEYWORDS,
+        *ip._TRANSFER_LEXICON, *ip._CANCEL_LEXICON, *ip._MODIFY_LEXICON, *ip._ABANDON_LEXICON,
+        *ip._ORDONNANCE_LEXICON, *ip._FAQ_STRONG_LEXICON, *ip._YES_LEXICON, *ip._REPEAT_LEXICON,
+        *ip._BOOKING_START_BLACKLIST, *transfer_policy.SHORT_KEYWORDS,
+        *guards.MORNING_KEYWORDS, *guards.AFTERNOON_KEYWORDS, *guards.NEUTRAL_KEYWORDS,
+        *stt_common.ENGLISH_PHRASES,
+        "j ai mal a la poitrine", "je n arrive plus a respirer", "il saigne beaucoup", "je veux parler a un humain",
+        "transferez moi", "vers 14h", "bonjour", "euh", "merci", "le cabinet", "demain", "you would believe",
+    ]
+    filler = ["", "je", "euh", "alors", "bon", "s il vous plait", "mon fils", "c est urgent", "de", "la"]
+    rng = random.Random(seed)
+    out = list(keywords)
+    for _ in range(n):
+        parts = []
+        for _ in range(rng.randint(1, 4)):
+            k = rng.choice(keywords)
+            if rng.random() < 0.2 and len(k) > 3:
+                k = k[: rng.randint(2, len(k) - 1)]
+            parts.append(k)
+            parts.append(rng.choice(filler))
+        out.append(rng.choice([" ", "", ", "]).join(p for p in parts if p is not None))
+    return out
+
+
+CORPUS = _corpus()
+
+
+# ---- Moteur ----
+
+def test_overlapping_and_prefix_keywords_all_reported():
+    d = MultiPatternDetector(literals={"A": ["rendez", "rendez vous"], "B": ["vous"], "C": ["ez v"], "D": ["zzz"]})
+    assert d.categories("un rendez vous") == {"A", "B", "C"}
+    assert d.categories("rendez") == {"A"}
+    assert d.categories("") == frozenset()
+
+
+def test_first_respects_declaration_order_literals_then_regexes():
+    d = MultiPatternDetector(literals={"LOW": ["mal"]}, regexes={"HIGH": [r"\bpoitrine\b"]})
+    assert d.order == ("LOW", "HIGH")
+    assert d.first("mal a la poitrine") == "LOW"
+    d = MultiPatternDetector(regexes={"HIGH": [r"\bpoitrine\b"], "MID": [r"\bmal\b"], "LOW": [r"\bla\b"]})
+    assert d.first("mal a la poitrine") == "HIGH"
+    assert d.first("mal a la tete") == "MID"
+    assert d.first("la tete") == "LOW"
+    assert d.first("rien") is None
+
+
+def test_literals_with_regex_metacharacters_are_escaped():
+    d = MultiPatternDetector(literals={"Q": ["c'est où ?", "a.b"]})
+    assert d.has("alors c'est où ? merci", "Q")
+    assert not d.has("axb", "Q")
+
+
+# ---- Parité avec les anciennes boucles ----
+
+def _english_phrase(text):
+    return " ".join(re.findall(r"[a-zàâäéèêëïîôùûüç]+", text.lower()))
+
+
+def _time_keyword(text):
+    return guards.infer_time_preference(text) if _legacy_time_keyword(text) is not None else None
+
+
+@pytest.mark.parametrize("new, legacy", [
+    (triage.detect_medical_red_flag, _legacy_red_flag),
+    (triage.classify_medical_symptoms, _legacy_symptoms),
+    (ip.detect_strong_intent, _legacy_strong_intent),
+    (ip._is_yes, _legacy_is_yes),
+    (ip._is_repeat, _legacy_is_repeat),
+    (ip._is_booking_blacklist, _legacy_booking_blacklist),
+    (transfer_policy.classify_transfer_request, _legacy_transfer),
+    (_time_keyword, _legacy_time_keyword),
+    (
+        lambda t: stt_common._ENGLISH_PHRASE_DETECTOR.first(_english_phrase(t)) is not None,
+        lambda t: any(p in _english_phrase(t) for p in stt_common.ENGLISH_PHRASES),
+    ),
+], ids=["red_flag", "symptoms", "strong_intent", "yes", "repeat", "booking_blacklist", "transfer",
+        "time_pref", "english_phrase"])
+def test_parity_with_legacy_scans(new, legacy):
+    mismatches = [(t, new(t), legacy(t)) for t in CORPUS if new(t) != legacy(t)]
+    assert not mismatches, mismatches[:5]
+
+
+def test_red_flags_real_phrases():
+    assert triage.detect_medical_red_flag("J'ai très mal à la poitrine") == _legacy_red_flag("J'ai très mal à la poitrine")
+    assert triage.detect_medical_red_flag("bonjour je voudrais un rendez-vous") is None
@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+from backend import pg_pool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class FakeConn:
+    def __init__(self):
+        self.executed = []
+        self.row_factory = "dict"
+        self.closed = False
+        self.committed = False
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.rollback()
+        else:
+            self.commit()
+        return False
+
+
+class FakePool:
+    name = "pg-test"
+
+    def __init__(self):
+        self.conn = FakeConn()
+        self.returned = 0
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        self.returned += 1
+
+    def get_stats(self):
+        return {"pool_min": 1, "pool_max": 4, "pool_size": 1, "pool_available": 1, "requests_num": 3}
+
+
+def test_pool_settings_read_from_env(monkeypatch):
+    monkeypatch.setenv("PG_POOL_MIN_SIZE", "2")
+    monkeypatch.setenv("PG_POOL_MAX_SIZE", "12")
+    monkeypatch.setenv("PG_POOL_TIMEOUT_SEC", "1.5")
+    settings = pg_pool._pool_settings()
+    assert settings["min_size"] == 2
+    assert settings["max_size"] == 12
+    assert settings["timeout"] == 1.5
+
+
+def test_pool_settings_max_never_below_min(monkeypatch):
+    monkeypatch.setenv("PG_POOL_MIN_SIZE", "8")
+    monkeypatch.setenv("PG_POOL_MAX_SIZE", "oops")
+    settings = pg_pool._pool_settings()
+    assert settings["max_size"] >= settings["min_size"] == 8
+
+
+def test_pg_connection_applies_tenant_context_and_restores_row_factory():
+    pool = FakePool()
+    with patch("backend.pg_pool.get_pool", return_value=pool), patch(
+        "backend.pg_pool._dict_row_factory", return_value="dict"
+    ):
+        with pg_pool.pg_connection("postgres://test", tenant_id=7, row_factory="tuple") as conn:
+            assert conn.row_factory == "tuple"
+    assert pool.conn.executed == ["SET LOCAL app.current_tenant_id = '7'"]
+    assert pool.conn.committed is True
+    assert pool.conn.row_factory == "dict"
+    assert pool.returned == 1
+
+
+def test_pg_connection_rolls_back_and_returns_conn_on_error():
+    pool = FakePool()
+    with patch("backend.pg_pool.get_pool", return_value=pool):
+        try:
+            with pg_pool.pg_connection("postgres://test"):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+    assert pool.conn.rolled_back is True
+    assert pool.returned == 1
+
+
+def test_pool_stats_exposes_each_pool():
+    with patch.dict(pg_pool._pools, {"postgres://test": FakePool()}, clear=True):
+        stats = pg_pool.pool_stats()
+    assert stats["pools"][0]["name"] == "pg-test"
+    assert stats["pools"][0]["max_size"] == 4
+    assert stats["pools"][0]["requests"] == 3
+
+
+def test_get_pool_passes_check_only_when_enabled(monkeypatch):
+    import sys
+    import types
+
+    created = []
+
+    class _Pool:
+        check_connection = staticmethod(lambda conn: None)
+
+        def __init__(self, **kwargs):
+            created.append(kwargs)
+
+    monkeypatch.setitem(sys.modules, "psycopg_pool", types.SimpleNamespace(ConnectionPool=_Pool))
+    monkeypatch.setattr(pg_pool, "_pools", {})
+    monkeypatch.delenv("PG_POOL_CHECK", raising=False)
+    assert pg_pool.get_pool("postgresql://a") is not None
+    monkeypatch.setenv("PG_POOL_CHECK", "true")
+    assert pg_pool.get_pool("postgresql://b") is not None
+    assert "check" not in created[0]
+    assert created[1]["check"] is _Pool.check_connection
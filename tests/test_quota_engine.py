@@ -0,0 +1,195 @@
+# tests/test_quota_engine.py
+"""
+Quota ensembliste (backend/quota_engine.py) : résolution du plan, nombre de requêtes constant,
+job alertes 80 % / overview billing / gate vocal branchés sur snapshot_month.
+"""
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+
+from backend import billing_pg, quota_alerts, quota_engine
+from backend.quota_engine import TenantQuota
+from backend.routes import admin
+
+PLANS = {"starter": 400, "pro": 1200, "custom": 0, "free": 0}
+
+
+class _FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+        self._last = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        if "FROM billing_plans" in sql:
+            self._last = [{"plan_key": k, "included_minutes_month": v} for k, v in PLANS.items()]
+        elif "WITH ids" in sql:
+            self._last = self.rows
+        elif "FROM quota_alert_log" in sql:
+            self._last = [{"tenant_id": 2}]
+        else:
+            self._last = []
+
+    def fetchall(self):
+        return self._last
+
+
+def test_resolve_included_billing_first_then_params_and_custom():
+    assert quota_engine.resolve_included("starter", {"plan_key": "pro"}, PLANS) == ("starter", 400, "plan")
+    assert quota_engine.resolve_included(None, {"plan_key": "Pro"}, PLANS) == ("pro", 1200, "plan")
+    assert quota_engine.resolve_included("", {}, PLANS) == ("free", 0, "plan")
+    assert quota_engine.resolve_included("custom", {"custom_included_minutes_month": "300"}, PLANS) == ("custom", 300, "custom")
+    assert quota_engine.resolve_included("custom", {"custom_included_minutes_month": "x"}, PLANS) == ("custom", 0, "plan")
+    assert quota_engine.month_bounds("2026-12") == ("2026-12-01 00:00:00", "2027-01-01 00:00:00")
+    assert quota_engine.month_bounds("2026-13") is None
+
+
+@pytest.mark.parametrize("n_tenants", [3, 300])
+def test_snapshot_month_constant_query_count(monkeypatch, n_tenants):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://fake")
+    rows = [
+        {
+            "tenant_id": tid, "name": f"Cabinet {tid}", "status": "active", "billing_plan_key": "starter",
+            "billing_status": "active", "stripe_customer_id": "cus_x", "stripe_subscription_id": "",
+            "current_period_end": None,
+            "params_json": '{"contact_email": "Doc@Ex.fr", "business_name": "Dr X"}' if tid == 1 else None,
+            "minutes": 350, "cost_usd": 1.5,
+        }
+        for tid in range(1, n_tenants + 1)
+    ]
+    cur = _FakeCursor(rows)
+
+    @contextmanager
+    def fake_conn(url, **kwargs):
+        class _Conn:
+            def cursor(self):
+                return cur
+        yield _Conn()
+
+    with patch.object(quota_engine, "pg_connection", fake_conn):
+        out = quota_engine.snapshot_month("2026-10")
+    assert len(out) == n_tenants
+    assert len([s for s in cur.statements if "SAVEPOINT" not in s]) == 3  # billing_plans + snapshot + alert log
+    q1, q2 = out[1], out[2]
+    assert (q1.included_minutes, q1.used_minutes, round(q1.usage_pct, 1)) == (400, 350.0, 87.5)
+    assert q1.email == "doc@ex.fr" and q1.business_name == "Dr X" and q1.stripe_subscription_id is None
+    assert q2.alert_80_sent and not q1.alert_80_sent
+
+
+def test_snapshot_sql_split_events_db_and_targeted_gate_query():
+    split = quota_engine._snapshot_sql(targeted=False, join_usage=False)
+    assert "vapi_call_usage" not in split and "FROM tenants" in split
+    gate = quota_engine._snapshot_sql(targeted=True, join_usage=True)
+    assert "vapi_call_usage" in gate
+    assert "quota_alert_log" not in gate and "tenants t" not in gate
+
+
+def test_gate_split_dbs_reads_usage_from_events_db(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "")
+    monkeypatch.setenv("PG_TENANTS_URL", "postgresql://tenants")
+    monkeypatch.setenv("PG_EVENTS_URL", "postgresql://events")
+    cur = _FakeCursor([{"tenant_id": 5, "billing_plan_key": "pro", "params_json": None}])
+
+    @contextmanager
+    def fake_conn(url, **kwargs):
+        assert url == "postgresql://tenants"
+
+        class _Conn:
+            def cursor(self):
+                return cur
+        yield _Conn()
+
+    with patch.object(quota_engine, "pg_connection", fake_conn), \
+            patch.object(quota_engine, "_usage_by_tenant", return_value={5: (90.0, 0.3)}) as usage:
+        out = quota_engine.snapshot_month("2026-10", tenant_ids=[5])
+    usage.assert_called_once_with("postgresql://events", "2026-10-01 00:00:00", "2026-11-01 00:00:00", [5])
+    assert (out[5].included_minutes, out[5].used_minutes) == (1200, 90.0)
+    assert not any("vapi_call_usage" in s or "quota_alert_log" in s for s in cur.statements)
+
+
+def test_run_quota_alerts_80_uses_single_snapshot():
+    quotas = {
+        1: TenantQuota(1, name="A", included_minutes=100, used_minutes=85, email="a@x.fr"),
+        2: TenantQuota(2, name="B", included_minutes=100, used_minutes=90, email="b@x.fr", alert_80_sent=True),
+        3: TenantQuota(3, name="C", included_minutes=100, used_minutes=95),
+        4: TenantQuota(4, name="D", included_minutes=100, used_minutes=120, email="d@x.fr"),
+        5: TenantQuota(5, name="E", included_minutes=0, used_minutes=50, email="e@x.fr"),
+        6: TenantQuota(6, name="F", included_minutes=100, used_minutes=10, email="f@x.fr"),
+    }
+    with patch.object(quota_engine, "snapshot_month", return_value=quotas) as snap, \
+            patch("backend.services.email_service.send_quota_alert_80_email", return_value=(True, None)) as send, \
+            patch.object(quota_alerts, "_quota_alert_80_mark_sent") as mark:
+        out = quota_alerts.run_quota_alerts_80("2026-10")
+    assert out == {"sent": 1, "skipped": 2, "errors": []}
+    snap.assert_called_once_with("2026-10")
+    send.assert_called_once()
+    assert send.call_args.kwargs["to_email"] == "a@x.fr"
+    mark.assert_called_once_with(1, "2026-10")
+
+
+def test_gate_and_billing_overview_read_snapshot():
+    quotas = {
+        7: TenantQuota(7, name="Zeta", plan_key="pro", included_minutes=1200, used_minutes=12.5, cost_usd=0.4,
+                       billing_status="active"),
+        8: TenantQuota(8, name="Alpha", plan_key="custom", included_minutes=300, quota_source="custom",
+                       billing_status="past_due"),
+    }
+    with patch.object(quota_engine, "snapshot_month", return_value=quotas) as snap:
+        assert billing_pg.get_quota_snapshot_month(7, "2026-10") == (1200, 12.5)
+        assert billing_pg.get_quota_snapshot_month(9, "2026-10") == (0, 0.0)
+        snap.assert_called_with("2026-10", tenant_ids=[9])
+        with patch.dict("os.environ", {"DATABASE_URL": "postgresql://fake"}):
+            overview = admin._get_billing_overview("2026-10")
+    assert [t["name"] for t in overview["tenants"]] == ["Alpha", "Zeta"]
+    assert overview["tenants"][0]["quota"] == {"included": 300, "used": 0}
+    assert overview["summary"] == {"mrr_eur_total": 199, "tenants_past_due_count": 1, "cost_usd_month_total": 0.4}
+
+
+def test_alert_log_unreadable_fails_closed(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql://fake")
+
+    class _NoAlertLog(_FakeCursor):
+        def execute(self, sql, params=None):
+            if "FROM quota_alert_log" in sql:
+                raise RuntimeError('relation "quota_alert_log" does not exist')
+            super().execute(sql, params)
+
+    cur = _NoAlertLog([{"tenant_id": 1, "billing_plan_key": "starter", "params_json": None, "minutes": 350}])
+
+    @contextmanager
+    def fake_conn(url, **kwargs):
+        class _Conn:
+            def cursor(self):
+                return cur
+        yield _Conn()
+
+    with patch.object(quota_engine, "pg_connection", fake_conn):
+        quotas = quota_engine.snapshot_month("2026-10")
+    assert quotas[1].alert_80_sent is None and quotas[1].usage_pct == 87.5
+    with patch.object(quota_engine, "snapshot_month", return_value=quotas), \
+            patch("backend.services.email_service.send_quota_alert_80_email") as send:
+        out = quota_alerts.run_quota_alerts_80("2026-10")
+    send.assert_not_called()
+    assert out["sent"] == 0 and out["errors"] == ["quota_alert_log unreadable"]
+
+
+def test_included_minutes_fall_back_to_plan_defaults_when_snapshot_empty(monkeypatch):
+    for var in ("DATABASE_URL", "PG_TENANTS_URL", "PG_EVENTS_URL"):
+        monkeypatch.delenv(var, raising=False)
+    with patch.object(quota_engine, "snapshot_month", return_value={}), \
+            patch.object(billing_pg, "get_tenant_billing", return_value={"plan_key": "growth"}), \
+            patch("backend.tenant_config.get_params", return_value={}):
+        assert billing_pg.get_quota_included_minutes(3) == 800
+        assert billing_pg.get_quota_snapshot_month(3, "2026-10") == (800, 0.0)
+    with patch.object(quota_engine, "snapshot_month", return_value={}), \
+            patch.object(billing_pg, "get_tenant_billing", return_value=None), \
+            patch("backend.tenant_config.get_params", return_value={"plan_key": "custom", "custom_included_minutes_month": "250"}):
+        assert billing_pg.get_quota_included_minutes(3) == 250
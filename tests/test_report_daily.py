@@ -51,8 +51,11 @@ def test_daily_report_202_accepted_and_send_email_in_background(monkeypatch):
     import time
     sent = []
 
-    def _fake_send(to, client_name, date_str, data):
-        sent.append({"to": to, "client_name": client_name, "date_str": date_str, "data_keys": list(data.keys())})
+    def _fake_send(to, client_name, date_str, data, idempotency_key=None):
+        sent.append({
+            "to": to, "client_name": client_name, "date_str": date_str, "data_keys": list(data.keys()),
+            "idempotency_key": idempotency_key,
+        })
         return True, None
 
     monkeypatch.setenv("REPORT_SECRET", "test_secret_rapport")
@@ -76,6 +79,7 @@ def test_daily_report_202_accepted_and_send_email_in_background(monkeypatch):
     assert len(sent) >= 1
     assert sent[0]["to"] == "admin@test.fr"
     assert "calls_total" in sent[0]["data_keys"]
+    assert sent[0]["idempotency_key"].startswith("daily_report:")
 
 
 # ============== Service email (construction + envoi mocké) ==============
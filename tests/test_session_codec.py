@@ -0,0 +1,138 @@
+# tests/test_session_codec.py
+"""
+Codec session versionné : round-trip (propriété sur sessions aléatoires), migration v1 → v2,
+compatibilité avant (index / version inconnus), snapshot SQLite sans pickle.
+"""
+import random
+import sqlite3
+import string
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.session import Session
+from backend.session_codec import (
+    _FIELDS_V2,
+    SCHEMA_VERSION,
+    checkpoint_state,
+    decode_session,
+    encode_session,
+    pack_session,
+    session_from_dict,
+    session_to_dict,
+    unpack_session,
+)
+
+_STATES = ["START", "QUALIF_NAME", "QUALIF_PREF", "WAIT_CONFIRM", "QUALIF_CONTACT", "CONFIRMED", "TRANSFERRED"]
+
+
+def _text(rng, n=12):
+    return "".join(rng.choice(string.ascii_letters + " éàç'") for _ in range(rng.randint(0, n)))
+
+
+def _random_session(rng: random.Random) -> Session:
+    s = Session(conv_id=f"conv-{rng.randint(0, 10**6)}")
+    s.state = rng.choice(_STATES)
+    s.channel = rng.choice(["web", "vocal"])
+    s.tenant_id = rng.randint(1, 50)
+    s.customer_phone = rng.choice([None, "+33612345678"])
+    s.qualif_data.name = rng.choice([None, _text(rng)])
+    s.qualif_data.motif = rng.choice([None, "consultation"])
+    s.qualif_data.contact = rng.choice([None, "jean@example.com"])
+    s.qualif_data.contact_type = rng.choice([None, "email", "phone"])
+    s.turn_count = rng.randint(0, 30)
+    s.name_fails = rng.randint(0, 3)
+    s.transfer_budget_remaining = rng.randint(0, 2)
+    s.time_constraint_minute = rng.choice([-1, 540, 1020])
+    s.speaking_until_ts = rng.random() * 1e9
+    s.last_noise_ts = rng.choice([None, rng.random() * 1e9])
+    s.awaiting_confirmation = rng.choice([None, "CONFIRM_SLOT", "CONFIRM_CONTACT"])
+    s.rejected_slot_starts = [f"2026-03-0{i}T09:00:00" for i in range(1, rng.randint(1, 4))]
+    s.pending_slot_choice = rng.choice([None, 1, 2, 3])
+    s.flags_effective = {"LLM_ASSIST": rng.random() > 0.5}
+    s.last_say_kwargs = rng.choice([None, {"name": _text(rng)}])
+    s.recovery["name"]["fails"] = rng.randint(0, 2)
+    start = datetime(2026, 3, 2, 9, 0) + timedelta(minutes=15 * rng.randint(0, 40))
+    s.pending_slots = [
+        {
+            "id": i, "start": (start + timedelta(hours=i)).isoformat(), "end": (start + timedelta(hours=i, minutes=15)).isoformat(),
+            "start_iso": (start + timedelta(hours=i)).isoformat(), "end_iso": (start + timedelta(hours=i, minutes=15)).isoformat(),
+            "slot_id": i, "event_id": None, "label": f"créneau {i}", "label_vocal": f"créneau {i}",
+            "day": "lundi", "source": "sqlite",
+        }
+        for i in range(1, rng.randint(1, 4))
+    ]
+    for _ in range(rng.randint(0, 5)):
+        s.add_message(rng.choice(["user", "agent"]), _text(rng, 40))
+    if rng.random() > 0.5:
+        s.reconstruct_count = 1  # attribut dynamique (hors dataclass)
+    return s
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_encode_decode_round_trip_property(seed):
+    rng = random.Random(seed)
+    original = _random_session(rng)
+    restored = decode_session(original.conv_id, encode_session(original))
+
+    assert pack_session(restored, include_messages=True) == pack_session(original, include_messages=True)
+    assert restored.conv_id == original.conv_id
+    assert restored.last_seen_at == original.last_seen_at
+    assert restored.last_messages() == original.last_messages()
+    assert getattr(restored, "reconstruct_count", None) == getattr(original, "reconstruct_count", None)
+
+
+def test_v1_checkpoint_dict_is_migrated():
+    s = Session(conv_id="legacy")
+    s.state = "WAIT_CONFIRM"
+    s.qualif_data.name = "Henri"
+    s.pending_slots = [{"start": "2026-02-16T09:00:00", "label": "Lundi 9h", "slot_id": 42, "id": 42, "source": "sqlite"}]
+    s.transfer_budget_remaining = 1
+    v1 = session_to_dict(s)
+    restored = session_from_dict("legacy", v1)
+    assert restored.state == "WAIT_CONFIRM"
+    assert restored.qualif_data.name == "Henri"
+    assert restored.pending_slots[0]["slot_id"] == 42
+    assert restored.transfer_budget_remaining == 1
+    assert pack_session(restored)["v"] == SCHEMA_VERSION
+
+
+def test_packed_checkpoint_is_smaller_and_state_readable():
+    s = _random_session(random.Random(7))
+    packed = pack_session(s)
+    assert "m" not in packed  # checkpoints : messages déjà dans call_messages
+    assert checkpoint_state(packed) == s.state
+    assert checkpoint_state(session_to_dict(s)) == s.state
+    assert len(encode_session(s)) < len(str(session_to_dict(s))) + 200
+
+
+def test_forward_compat_ignores_unknown_fields_and_versions():
+    s = Session(conv_id="fwd")
+    s.turn_count = 4
+    packed = pack_session(s)
+    packed["v"] = SCHEMA_VERSION + 1
+    packed["f"] += [len(_FIELDS_V2) + 3, "champ futur"]
+    restored = unpack_session("fwd", packed)
+    assert restored.turn_count == 4
+
+
+def test_sqlite_store_uses_codec_and_ignores_legacy_pickle(tmp_path):
+    from backend.session_store_sqlite import SQLiteSessionStore
+
+    db_path = str(tmp_path / "sessions.db")
+    store = SQLiteSessionStore(db_path=db_path)
+    s = _random_session(random.Random(3))
+    store.save(s)
+    store._memory_cache.clear()
+    assert pack_session(store.get(s.conv_id)) == pack_session(s)
+
+    # Ancienne ligne base64(pickle) : reconstruction par colonnes, jamais de pickle.loads
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE sessions SET session_pickle = ? WHERE conv_id = ?", ("gASVAAAA", s.conv_id))
+    conn.commit()
+    conn.close()
+    store._memory_cache.clear()
+    legacy = store.get(s.conv_id)
+    assert legacy.state == s.state
+    assert legacy.qualif_data.name == s.qualif_data.name
+    store.close()
@@ -0,0 +1,73 @@
+# tests/test_session_store_sqlite.py
+"""
+SQLiteSessionStore : connexion persistante par thread (WAL), dirty tracking, rechargement depuis la DB.
+"""
+import threading
+
+from backend.session import Session
+from backend.session_store_sqlite import SQLiteSessionStore
+
+
+def _store(tmp_path):
+    return SQLiteSessionStore(db_path=str(tmp_path / "sessions.db"))
+
+
+def test_connection_reused_and_wal_enabled(tmp_path):
+    store = _store(tmp_path)
+    conn = store._conn()
+    assert store._conn() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    store.close()
+
+
+def test_unchanged_session_is_not_rewritten(tmp_path):
+    store = _store(tmp_path)
+    session = Session(conv_id="dirty-1")
+    store.save(session)
+    statements = []
+    store._conn().set_trace_callback(statements.append)
+
+    store.save(session)
+    assert not any("INSERT" in sql for sql in statements)
+
+    session.qualif_data.name = "Henri"
+    store.save(session)
+    assert sum("INSERT" in sql for sql in statements) == 1
+    store.close()
+
+
+def test_saved_session_reloads_from_db_and_delete_resets_tracking(tmp_path):
+    store = _store(tmp_path)
+    session = Session(conv_id="reload-1")
+    session.state = "QUALIF_NAME"
+    store.save(session)
+
+    store._memory_cache.clear()
+    loaded = store.get("reload-1")
+    assert loaded is not None and loaded.state == "QUALIF_NAME"
+
+    store.delete("reload-1")
+    assert store.get("reload-1") is None
+    store.save(session)  # même contenu qu'avant le delete → doit être réécrit
+    store._memory_cache.clear()
+    assert store.get("reload-1") is not None
+    store.close()
+
+
+def test_each_thread_gets_its_own_connection(tmp_path):
+    store = _store(tmp_path)
+    main_conn = store._conn()
+    seen = []
+
+    def worker():
+        seen.append(store._conn())
+        store.save(Session(conv_id="thread-1"))
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert seen and seen[0] is not main_conn
+    store._memory_cache.clear()
+    assert store.get("thread-1") is not None
+    store.close()
@@ -0,0 +1,91 @@
+# tests/test_shared_cache.py
+"""
+Cache partagé : LRU mémoire (TTL, taille max, stats), tier SQLite partagé entre instances,
+invalidations reçues par NOTIFY, diffusion de invalidate_slots_cache / invalidate_params_cache.
+"""
+import json
+from contextlib import contextmanager
+
+from backend import shared_cache, tools_booking
+from backend.shared_cache import SharedCache, apply_remote_invalidation, cache_key, get_cache
+from backend.tenant_config import invalidate_params_cache
+
+
+def test_memory_lru_ttl_and_stats():
+    cache = SharedCache("t_mem", ttl_seconds=60, max_entries=2, backend="memory")
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" devient le plus récent
+    cache.set("c", 3)  # évince "b"
+    assert cache.get("b") is None
+    cache.set("d", 4, ttl_seconds=-1)
+    assert cache.get("d", "absent") == "absent"
+    st = cache.stats()
+    assert (st["hits"], st["misses"], st["evictions"], st["expirations"]) == (1, 2, 2, 1)
+    assert st["size"] == 1 and st["backend"] == "memory"
+
+
+def test_sqlite_tier_is_shared_between_instances(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_SQLITE_PATH", str(tmp_path / "cache.db"))
+    worker_a = SharedCache("t_sql", ttl_seconds=60, max_entries=100, backend="sqlite")
+    worker_b = SharedCache("t_sql", ttl_seconds=60, max_entries=100, backend="sqlite")
+    worker_a.set(cache_key(4, "matin"), {"slots": [1, 2]})
+    worker_a.set(cache_key(42, "matin"), {"slots": [3]})
+    assert worker_b.get(cache_key(4, "matin")) == {"slots": [1, 2]}
+    assert worker_b.invalidate_prefix(cache_key(4, ""), broadcast=False) == 1
+    assert worker_a.get(cache_key(4, "matin")) is None
+    assert worker_a.get(cache_key(42, "matin")) == {"slots": [3]}
+
+
+def test_sqlite_tier_trims_to_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setenv("SHARED_CACHE_SQLITE_PATH", str(tmp_path / "cache.db"))
+    cache = SharedCache("t_trim", ttl_seconds=60, max_entries=10, backend="sqlite")
+    for i in range(shared_cache._SQLITE_TRIM_EVERY):
+        cache.set(f"k{i}", i)
+    assert len(cache) == 10
+    assert cache.stats()["evictions"] == shared_cache._SQLITE_TRIM_EVERY - 10
+
+
+def test_remote_invalidation_applies_to_registered_namespace():
+    cache = get_cache("t_remote", ttl_seconds=60)
+    cache.set("1:matin", "x")
+    cache.set("2:matin", "y")
+    own = json.dumps({"o": shared_cache._ORIGIN, "ns": "t_remote", "op": "prefix", "k": "1:"})
+    assert apply_remote_invalidation(own) is False
+    other = json.dumps({"o": "other", "ns": "t_remote", "op": "prefix", "k": "1:"})
+    assert apply_remote_invalidation(other) is True
+    assert cache.get("1:matin") is None and cache.get("2:matin") == "y"
+    assert cache.stats()["remote_invalidations"] == 1
+    assert apply_remote_invalidation("not json") is False
+
+
+def test_slot_and_params_invalidations_are_broadcast(monkeypatch):
+    sent = []
+
+    class _Cur:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params):
+            sent.append(json.loads(params[1]))
+
+    class _Conn:
+        def cursor(self):
+            return _Cur()
+
+    @contextmanager
+    def fake_pg_connection(url):
+        yield _Conn()
+
+    monkeypatch.setenv("SHARED_CACHE_PG_NOTIFY", "true")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://test")
+    monkeypatch.setattr("backend.pg_pool.pg_connection", fake_pg_connection)
+
+    tools_booking._set_cached_slots(["slot"], tenant_id=7, pref="matin")
+    tools_booking.invalidate_slots_cache(7)
+    invalidate_params_cache(7)
+    assert tools_booking._get_cached_slots(3, tenant_id=7, pref="matin") is None
+    assert [(m["ns"], m["op"], m["k"]) for m in sent] == [("slots", "prefix", "7:"), ("tenant_params", "delete", "7")]
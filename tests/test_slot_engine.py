@@ -0,0 +1,101 @@
+# tests/test_slot_engine.py
+"""
+Moteur de créneaux : parité avec l'ancien balayage créneaux × events (calendriers aléatoires,
+buffer, limite par jour), fusion des plages, fenêtre horaire préférence / contrainte.
+"""
+import random
+from datetime import datetime, timedelta
+from itertools import islice
+
+import pytest
+
+from backend.slot_engine import BusyTimeline, iter_free_slots, merge_intervals, slot_window
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # pragma: no cover
+    ZoneInfo = None
+
+TZ = ZoneInfo("Europe/Paris")
+
+
+def _legacy_scan(events, days, start_hour, end_hour, duration, buffer, limit, per_day_limit):
+    """Ancienne boucle de GoogleCalendarService.get_free_slots_range (référence)."""
+    out = []
+    buffer_td = timedelta(minutes=buffer)
+    for day in days:
+        day_start = day.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+        day_end = day.replace(hour=end_hour, minute=0, second=0, microsecond=0)
+        current, day_count = day_start, 0
+        while current < day_end:
+            slot_end = current + timedelta(minutes=duration)
+            effective_end = slot_end + buffer_td
+            if effective_end > day_end:
+                break
+            if all(not (current < e_end and effective_end > e_start) for e_start, e_end in events):
+                out.append((current, slot_end))
+                day_count += 1
+                if len(out) >= limit or day_count >= per_day_limit:
+                    break
+            current += timedelta(minutes=duration)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def _random_calendar(rng, days, n_events):
+    events = []
+    for _ in range(n_events):
+        day = rng.choice(days)
+        start = day.replace(hour=rng.randint(7, 19), minute=rng.choice([0, 5, 10, 15, 20, 30, 45, 50]))
+        events.append((start, start + timedelta(minutes=rng.choice([5, 15, 30, 45, 60, 90, 240]))))
+    return events
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_parity_with_legacy_scan(seed):
+    rng = random.Random(seed)
+    days = [datetime(2026, 3, 2, tzinfo=TZ) + timedelta(days=i) for i in range(rng.randint(1, 10))]
+    events = _random_calendar(rng, days, rng.randint(0, 60))
+    duration = rng.choice([10, 15, 20, 30, 45])
+    buffer = rng.choice([0, 0, 5, 10, 15])
+    start_hour, end_hour = rng.choice([(9, 18), (9, 12), (14, 18), (8, 20)])
+    limit = rng.randint(1, 40)
+    per_day_limit = rng.choice([1, 2, 4, 100])
+
+    expected = _legacy_scan(events, days, start_hour, end_hour, duration, buffer, limit, per_day_limit)
+    got = list(islice(
+        iter_free_slots(
+            BusyTimeline(events), days, start_hour=start_hour, end_hour=end_hour,
+            duration_minutes=duration, buffer_minutes=buffer, per_day_limit=per_day_limit,
+        ),
+        limit,
+    ))
+    assert got == expected
+
+
+def test_merge_and_lookup():
+    d = datetime(2026, 3, 2, 9, tzinfo=TZ)
+    merged = merge_intervals([(d + timedelta(hours=2), d + timedelta(hours=3)), (d, d + timedelta(minutes=30)), (d + timedelta(minutes=30), d + timedelta(hours=1))])
+    assert merged == [(d, d + timedelta(hours=1)), (d + timedelta(hours=2), d + timedelta(hours=3))]
+    timeline = BusyTimeline(merged, merged=True)
+    assert timeline.is_free(d + timedelta(hours=1), d + timedelta(hours=2))
+    assert timeline.conflict(d + timedelta(minutes=50), d + timedelta(minutes=65)) == merged[0]
+    assert timeline.between(d + timedelta(minutes=30), d + timedelta(hours=2, minutes=1)) == merged
+
+
+def test_accept_predicate_filters_without_stopping_the_sweep():
+    day = datetime(2026, 3, 2, tzinfo=TZ)
+    got = list(iter_free_slots(BusyTimeline([]), [day], start_hour=9, end_hour=11, duration_minutes=30, accept=lambda s: s.minute == 30))
+    assert [s.strftime("%H:%M") for s, _ in got] == ["09:30", "10:30"]
+
+
+def test_slot_window_pref_and_constraints():
+    assert slot_window(9, 18) == (9, 18)
+    assert slot_window(8, 18, "matin") == (9, 12)
+    assert slot_window(9, 17, "après-midi") == (14, 17)
+    assert slot_window(9, 18, "soir") == (18, 18)
+    assert slot_window(9, 18, "matin", preferred_minute=16 * 60 + 30, preferred_time_type="after") == (16, 18)
+    assert slot_window(9, 18, None, preferred_minute=11 * 60, preferred_time_type="before") == (9, 12)
+    assert slot_window(9, 18, None, preferred_minute=10 * 60, preferred_time_type="exact") == (10, 11)
+    assert slot_window(9, 18, None, preferred_minute=10 * 60, preferred_time_type="around") == (10, 13)
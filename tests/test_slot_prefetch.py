@@ -0,0 +1,105 @@
+# tests/test_slot_prefetch.py
+"""
+Préchargement des créneaux en début d'appel : single-flight par (tenant, pref), préférence
+historique du client, une seule fois par call_id, déclenché par le webhook Vapi et par
+prefetch_slots_for_pref_question.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import slot_prefetch, tools_booking
+from backend.single_flight import SingleFlight
+
+
+def test_single_flight_shares_one_execution_and_exception():
+    flights = SingleFlight("t")
+    calls = []
+    gate = threading.Event()
+
+    def slow():
+        calls.append(1)
+        gate.wait(2)
+        return "ok"
+
+    with ThreadPoolExecutor(4) as pool:
+        futs = [pool.submit(flights.do, "k", slow) for _ in range(4)]
+        time.sleep(0.05)
+        assert flights.inflight() == 1
+        gate.set()
+        assert [f.result() for f in futs] == ["ok"] * 4
+    assert len(calls) == 1 and flights.inflight() == 0
+
+    def boom():
+        raise ValueError("x")
+
+    with pytest.raises(ValueError):
+        flights.do("k", boom)
+    assert flights.do("k", lambda: 2) == 2  # clé libérée après l'échec
+
+
+def test_likely_prefs_uses_client_history():
+    client = SimpleNamespace(preferred_time="aprem")
+    with patch("backend.client_memory.HybridClientMemory.get_by_phone", return_value=client):
+        assert slot_prefetch.likely_prefs(1, "+33612345678") == ["après-midi", None]
+    with patch("backend.client_memory.HybridClientMemory.get_by_phone", return_value=None):
+        assert slot_prefetch.likely_prefs(1, "+33612345678") == [None, "matin", "après-midi"]
+    assert slot_prefetch.likely_prefs(1, None) == [None, "matin", "après-midi"]
+
+
+def test_prefetch_for_call_once_per_call_and_coalesced():
+    computed = []
+    gate = threading.Event()
+
+    def fake_compute(tenant_id, pref):
+        computed.append((tenant_id, pref))
+        gate.wait(2)
+        return [f"slot-{pref}"]
+
+    call_id = f"call-{uuid.uuid4().hex[:8]}"
+    with patch.object(slot_prefetch, "_compute", side_effect=fake_compute), \
+            patch.object(slot_prefetch, "enabled", return_value=True):
+        assert slot_prefetch.prefetch_for_call(42, call_id, None) is True
+        assert slot_prefetch.prefetch_for_call(42, call_id, None) is False
+        # Un autre appel du même tenant pendant le calcul rejoint les mêmes exécutions
+        assert slot_prefetch.prefetch_for_call(42, f"{call_id}-b", None) is True
+        deadline = time.time() + 2
+        while len(computed) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        waiter = threading.Thread(target=lambda: computed.append(("fetch", slot_prefetch.fetch(42, "matin"))))
+        waiter.start()
+        gate.set()
+        waiter.join(2)
+    assert sorted(computed[:3], key=str) == sorted([(42, None), (42, "matin"), (42, "après-midi")], key=str)
+    assert computed[3:] == [("fetch", ["slot-matin"])]
+
+
+def test_pref_question_joins_call_prefetch():
+    session = SimpleNamespace(tenant_id=7, rejected_slot_starts=[], time_constraint_type="", time_constraint_minute=-1)
+    with patch.object(slot_prefetch, "fetch", side_effect=lambda tid, pref: [f"{tid}-{pref}"]) as fetch, \
+            patch.object(tools_booking, "_DISABLE_SLOT_CACHE", False):
+        tools_booking.prefetch_slots_for_pref_question(session)
+        deadline = time.time() + 2
+        while getattr(session, "_prefetch_afternoon", None) is None and time.time() < deadline:
+            time.sleep(0.01)
+    assert session._prefetch_morning == ["7-matin"] and session._prefetch_afternoon == ["7-après-midi"]
+    assert fetch.call_count == 2
+
+
+def test_webhook_starts_prefetch_on_assistant_request_and_ringing():
+    from backend.main import app
+
+    client = TestClient(app)
+    with patch.object(slot_prefetch, "prefetch_for_vapi_payload", return_value=True) as start:
+        for msg in ({"type": "assistant-request"}, {"type": "status-update", "status": "ringing"}):
+            msg["call"] = {"id": "call-prefetch-wh"}
+            r = client.post("/api/vapi/webhook", json={"message": msg})
+            assert r.status_code == 200
+    assert start.call_count == 2
@@ -0,0 +1,104 @@
+# tests/test_stats_rollup.py
+"""
+Rollups journaliers des dashboards (backend/stats_rollup.py) sur SQLite : incrément à l'écriture,
+recalcul des appels distincts et des groupes au refresh, watermark incrémental, lecture admin /
+export KPI identique aux requêtes brutes.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import backend.db as db
+from backend import stats_rollup
+from backend.routes import admin
+from scripts import export_weekly_kpis as kpis
+
+
+@pytest.fixture(autouse=True)
+def _sqlite(tmp_path, monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    monkeypatch.delenv("PG_EVENTS_URL", raising=False)
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "rollup.db"))
+    stats_rollup.reset_ready()
+    yield
+    stats_rollup.reset_ready()
+
+
+def _today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+def _seed():
+    for call_id, event in [
+        ("c1", "call_started"), ("c1", "slot_refuse_pref_asked"), ("c1", "booking_confirmed"),
+        ("c2", "call_started"), ("c2", "slot_refuse_pref_asked"), ("c2", "user_abandon"), ("c2", "hangup"),
+        ("c3", "call_started"), ("c3", "transferred"), ("c3", "anti_loop_trigger"),
+    ]:
+        db.create_ivr_event(5, call_id, event)
+    db.create_ivr_event(6, "c9", "transferred_human")
+
+
+def test_create_ivr_event_increments_today():
+    db.create_ivr_event(5, "c1", "call_started")
+    db.create_ivr_event(5, "c1", "user_abandon")
+    db.create_ivr_event(5, "c1", "hangup")
+    counts = stats_rollup.event_counts(_today(), _today(), tenant_id=5)[None]
+    assert counts["call_started"] == (1, 1)
+    assert counts[stats_rollup.ALL][0] == 3
+    assert counts[stats_rollup.ABANDON][0] == 2
+    assert not stats_rollup.ready()  # appels distincts pas encore recalculés
+
+
+def test_refresh_recomputes_distinct_calls_and_groups():
+    _seed()
+    stats_rollup.refresh()
+    assert stats_rollup.ready()
+    counts = stats_rollup.event_counts(_today(), _today(), by="tenant")
+    assert counts[5][stats_rollup.ALL] == (10, 3)
+    assert counts[5][stats_rollup.ABANDON] == (2, 1)
+    assert counts[5][stats_rollup.TRANSFER] == (1, 1)
+    assert counts[5][stats_rollup.REFUSE_BOOKED][1] == 1
+    assert counts[6][stats_rollup.TRANSFER] == (1, 1)
+    assert stats_rollup.last_activity(_today(), _today(), 6)
+
+
+def test_watermark_makes_refresh_incremental(monkeypatch):
+    monkeypatch.setattr(stats_rollup, "LAG_S", 0)
+    _seed()
+    first = stats_rollup.refresh()["sources"][0]
+    assert first["tenant_days"] == 2
+    db.create_ivr_event(6, "c10", "call_started")
+    second = stats_rollup.refresh()["sources"][0]
+    assert second["tenant_days"] == 1
+    third = stats_rollup.refresh()["sources"][0]
+    assert third["tenant_days"] == 0
+    assert stats_rollup.event_counts(_today(), _today(), tenant_id=6)[None][stats_rollup.ALL] == (2, 2)
+
+
+def test_admin_and_export_rollup_reads_match_raw(monkeypatch):
+    # Events une minute dans le passé : les bornes brutes (« maintenant » à la seconde) les incluent
+    past = datetime.utcnow() - timedelta(minutes=1)
+    with monkeypatch.context() as m:
+        m.setattr(db, "datetime", type("FrozenDatetime", (datetime,), {"utcnow": staticmethod(lambda: past)}))
+        _seed()
+    monkeypatch.setattr(admin, "_get_tenant_detail", lambda tid: {"name": f"T{tid}"})
+    raw_stats = admin._get_tenant_stats(5, 7)
+    raw_series = admin._get_stats_timeseries("calls", 3)
+    raw_top = admin._get_stats_top_tenants("calls", 7, 10)
+    start = datetime.utcnow().strftime("%Y-%m-%d 00:00:00")
+    end = (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+    conn = db.get_conn()
+    try:
+        raw_calls = kpis.fetch_calls_total(conn, start, end, False)
+        raw_transfers = kpis.fetch_event_calls(conn, start, end, kpis.TRANSFER_EVENTS, False)
+        raw_convert = kpis.fetch_convert_after_refuse_pref(conn, start, end, False)
+        assert kpis.fetch_rollup_kpis(conn, start, end, False) is None  # pas encore prêts
+
+        stats_rollup.refresh()
+        assert admin._get_tenant_stats(5, 7) == raw_stats
+        assert admin._get_stats_timeseries("calls", 3) == raw_series
+        assert admin._get_stats_top_tenants("calls", 7, 10) == raw_top
+        calls, maps, convert = kpis.fetch_rollup_kpis(conn, start, end, False)
+    finally:
+        conn.close()
+    assert calls == raw_calls and maps["transfers"] == raw_transfers and convert == raw_convert
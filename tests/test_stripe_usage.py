@@ -6,12 +6,16 @@ Tests push usage Stripe : UsageRecord (legacy) vs MeterEvent (STRIPE_USE_METER_E
 from __future__ import annotations
 
 import sys
+import threading
+import time
 from datetime import date
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
 
 from backend import stripe_usage
+from backend.token_bucket import TokenBucket
 
 
 @pytest.fixture
@@ -19,10 +23,9 @@ def mock_pg_and_billing():
     """Billing avec subscription + metered_item + customer pour push usage."""
     with patch("backend.stripe_usage._pg_url", return_value="postgresql://test"):
         with patch("backend.stripe_usage._pg_events_url", return_value="postgresql://test"):
-            with patch("backend.stripe_usage.try_acquire_usage_push", return_value=True):
-                with patch("backend.stripe_usage.mark_usage_push_sent"):
-                    with patch("backend.stripe_usage.mark_usage_push_failed"):
-                        yield
+            with patch("backend.stripe_usage.try_acquire_usage_pushes", side_effect=lambda d, items: {t for t, _ in items}):
+                with patch("backend.stripe_usage.record_usage_push_outcomes"):
+                    yield
 
 
 def test_push_daily_usage_uses_usage_record_when_meter_events_disabled(mock_pg_and_billing):
@@ -35,12 +38,12 @@ def test_push_daily_usage_uses_usage_record_when_meter_events_disabled(mock_pg_a
     with patch.dict("os.environ", {"STRIPE_SECRET_KEY": "sk_test_fake"}, clear=False):
         with patch.object(stripe_usage, "_stripe_use_meter_events", return_value=False):
             with patch("backend.stripe_usage._aggregate_usage_by_tenant_for_day", return_value=[(1, 30)]):
-                with patch("backend.billing_pg.get_tenant_billing") as mock_billing:
-                    mock_billing.return_value = {
+                with patch("backend.stripe_usage._billing_by_tenant") as mock_billing:
+                    mock_billing.return_value = {1: {
                         "stripe_subscription_id": "sub_xxx",
                         "stripe_customer_id": "cus_xxx",
                         "stripe_metered_item_id": "si_xxx",
-                    }
+                    }}
                     with patch.dict(sys.modules, {"stripe": mock_stripe}):
                         result = push_daily_usage_to_stripe(date(2025, 2, 1))
                     assert result.get("pushed") == 1
@@ -58,12 +61,12 @@ def test_push_daily_usage_uses_meter_event_when_meter_events_enabled(mock_pg_and
     with patch.dict("os.environ", {"STRIPE_SECRET_KEY": "sk_test_fake", "STRIPE_USE_METER_EVENTS": "true"}, clear=False):
         with patch.object(stripe_usage, "_stripe_use_meter_events", return_value=True):
             with patch("backend.stripe_usage._aggregate_usage_by_tenant_for_day", return_value=[(1, 25)]):
-                with patch("backend.billing_pg.get_tenant_billing") as mock_billing:
-                    mock_billing.return_value = {
+                with patch("backend.stripe_usage._billing_by_tenant") as mock_billing:
+                    mock_billing.return_value = {1: {
                         "stripe_subscription_id": "sub_yyy",
                         "stripe_customer_id": "cus_yyy",
                         "stripe_metered_item_id": "si_yyy",
-                    }
+                    }}
                     with patch("backend.stripe_usage.push_usage_via_meter_events", return_value=True) as mock_meter:
                         result = push_daily_usage_to_stripe(date(2025, 2, 2))
                     assert result.get("pushed") == 1
@@ -101,3 +104,108 @@ def test_push_usage_via_meter_events_failure_returns_false():
         with patch.dict(sys.modules, {"stripe": mock_stripe}):
             ok = stripe_usage.push_usage_via_meter_events(2, 10, date(2025, 2, 1), stripe_customer_id="cus_xyz")
         assert ok is False
+
+
+# ---------- Pipeline : prefetch billing, pushes concurrents, token bucket, résultats en bloc ----------
+
+
+class _StripeStub:
+    """Stripe local : latence fixe, 429 au premier appel des tenants listés, appels enregistrés."""
+
+    class RateLimitError(Exception):
+        http_status = 429
+
+    def __init__(self, latency=0.05, rate_limited=(), failing=()):
+        self.latency = latency
+        self.rate_limited = set(rate_limited)
+        self.failing = set(failing)
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.api_key = None
+        self.UsageRecord = SimpleNamespace(create=self._usage_record)
+        self.billing = SimpleNamespace(MeterEvent=SimpleNamespace(create=self._meter_event))
+
+    def _call(self, key):
+        with self._lock:
+            self.calls.append(key)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if key in self.failing:
+                raise RuntimeError(f"card_declined {key}")
+            with self._lock:
+                if key in self.rate_limited:
+                    self.rate_limited.discard(key)
+                    raise self.RateLimitError("Too many requests")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _usage_record(self, subscription_item, quantity, timestamp, action):
+        self._call(subscription_item)
+        return SimpleNamespace(id=f"ur_{subscription_item}_{timestamp}")
+
+    def _meter_event(self, event_name, payload, timestamp, identifier):
+        self._call(payload["stripe_customer_id"])
+
+
+@pytest.fixture
+def pipeline_env(monkeypatch):
+    monkeypatch.setenv("STRIPE_SECRET_KEY", "sk_test_fake")
+    monkeypatch.setattr(stripe_usage, "_limiter", TokenBucket(1000))
+    monkeypatch.setattr(stripe_usage, "_RETRY_BASE_S", 0.01)
+    monkeypatch.setattr(stripe_usage, "_WORKERS", 8)
+    billing = {t: {"stripe_subscription_id": f"sub_{t}", "stripe_customer_id": f"cus_{t}", "stripe_metered_item_id": f"si_{t}"}
+               for t in range(1, 21)}
+    with patch.object(stripe_usage, "_billing_by_tenant", return_value=billing) as billing_mock, \
+            patch.object(stripe_usage, "try_acquire_usage_pushes", side_effect=lambda d, items: {t for t, _ in items}), \
+            patch.object(stripe_usage, "record_usage_push_outcomes") as record:
+        yield billing_mock, record
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(50, burst=1)
+    t0 = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - t0 >= 0.18
+    assert not TokenBucket(1, burst=1).acquire(2, timeout=0.05)
+    assert bucket.stats()["acquired"] == 11
+
+
+def test_pipeline_pushes_concurrently_and_records_in_bulk(pipeline_env):
+    billing_mock, record = pipeline_env
+    stub = _StripeStub(latency=0.05, rate_limited={"si_3"})
+    rows = [(t, 10 + t) for t in range(1, 21)] + [(99, 5)]  # 99 : pas de billing
+    with patch.object(stripe_usage, "_stripe_use_meter_events", return_value=False), \
+            patch.object(stripe_usage, "_aggregate_usage_by_tenant_for_day", return_value=rows), \
+            patch.dict(sys.modules, {"stripe": stub}):
+        t0 = time.monotonic()
+        result = stripe_usage.push_daily_usage_to_stripe(date(2026, 10, 1))
+        elapsed = time.monotonic() - t0
+    assert result == {"pushed": 20, "skipped": 1, "errors": []}
+    assert elapsed < 20 * 0.05 / 2  # concurrent, pas 20 × latence
+    assert stub.max_in_flight > 1
+    assert stub.calls.count("si_3") == 2  # 429 → retry
+    billing_mock.assert_called_once()
+    record.assert_called_once()
+    assert len(record.call_args.kwargs["sent"]) == 20 and record.call_args.kwargs["failed"] == []
+
+
+def test_retry_48h_single_pipeline_records_failures(pipeline_env):
+    billing_mock, record = pipeline_env
+    stub = _StripeStub(latency=0.0, failing={"cus_2", "si_2"})  # meter event puis fallback UsageRecord en échec
+    with patch.object(stripe_usage, "_stripe_use_meter_events", return_value=True), \
+            patch.object(stripe_usage, "_aggregate_usage_by_tenant_for_day", return_value=[(1, 30), (2, 40)]), \
+            patch.object(stripe_usage, "run_upgrade_suggestions", return_value={"checked": 0, "suggestions": []}), \
+            patch.dict(sys.modules, {"stripe": stub}):
+        out = stripe_usage.push_daily_usage_with_retry_48h(date(2026, 10, 3))
+    assert (out["sent"], out["failed"]) == (2, 2)
+    billing_mock.assert_called_once()  # billing lu une fois pour les deux jours
+    assert record.call_count == 2
+    failed = record.call_args.kwargs["failed"]
+    assert failed[0][0] == 2 and "card_declined si_2" in failed[0][1]
+    assert sorted(stub.calls) == ["cus_1", "cus_1", "cus_2", "cus_2", "si_2", "si_2"]
@@ -48,13 +48,12 @@ def test_pg_create_tenant_user_hashes_password():
         def commit(self):
             executed["committed"] = True
 
-    fake_psycopg = types.SimpleNamespace(connect=lambda url: FakeConn())
     fake_bcrypt = types.SimpleNamespace(
         gensalt=lambda: b"salt",
         hashpw=lambda password, salt: b"hashed-password",
     )
 
-    with patch.dict(sys.modules, {"psycopg": fake_psycopg, "bcrypt": fake_bcrypt}):
+    with patch.dict(sys.modules, {"bcrypt": fake_bcrypt}), patch("backend.auth_pg.pg_connection", return_value=FakeConn()):
         with patch("backend.auth_pg._pg_url", return_value="postgres://test"):
             ok = auth_pg.pg_create_tenant_user(12, "Cabinet@Test.fr", role="owner", password="TempPass123")
 
@@ -0,0 +1,144 @@
+# tests/test_turn_trace.py
+"""
+Traçage par tour : spans par étape (imbrication, hors tour), histogrammes Prometheus, trace d'appel
+dans le cache partagé, propagation via engine_executor.run, tours streamés fermés en fin de flux,
+tags posés par Engine, GET /metrics.
+"""
+import asyncio
+import time
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import engine_executor, turn_trace
+from backend.engine import create_engine
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    turn_trace.reset_metrics()
+    yield
+    turn_trace.reset_metrics()
+
+
+def _cid(prefix="trace"):
+    return f"{prefix}-{uuid.uuid4().hex[:10]}"
+
+
+def test_turn_records_spans_once_per_stage():
+    call_id = _cid()
+    with turn_trace.turn(call_id, channel="vocal") as trace:
+        turn_trace.tag(tenant_id=7, state="START")
+        turn_trace.tag(state="QUALIF_NAME")  # état au début du tour conservé
+        with turn_trace.span("faq"):
+            with turn_trace.span("faq"):  # même étape imbriquée : ignorée
+                pass
+            with turn_trace.span("calendar_fetch"):
+                pass
+    assert [s["stage"] for s in trace.spans] == ["calendar_fetch", "faq"]
+    assert turn_trace.current() is None
+    turns = turn_trace.call_trace(call_id)
+    assert len(turns) == 1
+    assert turns[0]["tenant_id"] == 7 and turns[0]["state"] == "START" and turns[0]["channel"] == "vocal"
+    assert turn_trace.call_trace(call_id, tenant_id=7) == turns
+    assert turn_trace.call_trace(call_id, tenant_id=8) == []
+
+
+def test_nested_begin_joins_existing_turn():
+    call_id = _cid()
+    with turn_trace.turn(call_id) as outer:
+        token = turn_trace.begin(call_id, channel="web")
+        assert token is None and turn_trace.current() is outer
+        turn_trace.end(token)
+        assert turn_trace.current() is outer
+    assert outer.channel == "web"
+    assert len(turn_trace.call_trace(call_id)) == 1
+
+
+def test_prometheus_histogram_is_cumulative():
+    turn_trace.observe("booking", 0.03, tenant=1, channel="vocal", state="WAIT_CONFIRM")
+    turn_trace.observe("booking", 3.0, tenant=1, channel="vocal", state="WAIT_CONFIRM")
+    text = turn_trace.render_prometheus()
+    labels = 'stage="booking",tenant="1",channel="vocal",state="WAIT_CONFIRM"'
+    assert "# TYPE uwi_turn_stage_seconds histogram" in text
+    assert f'uwi_turn_stage_seconds_bucket{{{labels},le="0.025"}} 0' in text
+    assert f'uwi_turn_stage_seconds_bucket{{{labels},le="0.05"}} 1' in text
+    assert f'uwi_turn_stage_seconds_bucket{{{labels},le="5"}} 2' in text
+    assert f'uwi_turn_stage_seconds_bucket{{{labels},le="+Inf"}} 2' in text
+    assert f"uwi_turn_stage_seconds_count{{{labels}}} 2" in text
+
+
+def test_span_outside_turn_only_feeds_histogram():
+    @turn_trace.traced("journal_write")
+    def write():
+        return "ok"
+
+    assert write() == "ok"
+    assert 'stage="journal_write",tenant="",channel="",state=""' in turn_trace.render_prometheus()
+
+
+def test_engine_executor_run_propagates_trace():
+    async def scenario():
+        with turn_trace.turn(_cid()) as trace:
+            await engine_executor.run("k-trace", lambda: turn_trace.tag(tenant_id=42))
+            await engine_executor.run("k-trace", turn_trace.traced("session_load")(lambda: None))
+        return trace
+
+    trace = asyncio.run(scenario())
+    assert trace.tenant_id == 42
+    assert [s["stage"] for s in trace.spans] == ["session_load"]
+
+
+def test_handle_message_tags_turn_with_session_state():
+    engine = create_engine()
+    conv = _cid("conv")
+    engine.handle_message(conv, "Je veux un rdv")
+    turns = turn_trace.call_trace(conv)
+    assert len(turns) == 1
+    assert turns[0]["state"] == "START" and turns[0]["kind"] == "turn"
+    assert "session_load" in {s["stage"] for s in turns[0]["spans"]}
+    assert 'stage="turn"' in turn_trace.render_prometheus()
+
+
+def test_metrics_endpoint_and_token(monkeypatch):
+    from backend.main import app
+
+    turn_trace.observe("faq", 0.01)
+    client = TestClient(app)
+    monkeypatch.delenv("METRICS_TOKEN", raising=False)
+    r = client.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert 'stage="faq"' in r.text
+    monkeypatch.setenv("METRICS_TOKEN", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_streamed_turn_closed_at_end_of_stream():
+    call_id = _cid("stream")
+
+    async def body():
+        yield "a"
+        await engine_executor.run("k-stream", turn_trace.traced("session_load")(lambda: time.sleep(0.05)))
+        yield "b"
+
+    async def handler():
+        token = turn_trace.begin(call_id, channel="vocal")
+        trace = turn_trace.detach(token)
+        assert turn_trace.current() is None and turn_trace.call_trace(call_id) == []
+        return trace
+
+    async def scenario():
+        trace = await handler()
+        # Starlette itère le flux dans une autre tâche (contexte copié sans tour courant)
+        return await asyncio.create_task(_drain(turn_trace.traced_stream(trace, body())))
+
+    async def _drain(agen):
+        return [chunk async for chunk in agen]
+
+    assert asyncio.run(scenario()) == ["a", "b"]
+    turns = turn_trace.call_trace(call_id)
+    assert len(turns) == 1
+    assert [s["stage"] for s in turns[0]["spans"]] == ["session_load"]
+    assert turns[0]["total_ms"] >= 50
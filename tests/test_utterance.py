@@ -0,0 +1,88 @@
+# tests/test_utterance.py
+"""
+NormalizedUtterance : dérivés identiques aux fonctions d'origine, calculés une fois par tour,
+partagés via current_utterance pendant Engine.handle_message puis retirés.
+"""
+import uuid
+from unittest.mock import patch
+
+from backend import intent_parser
+from backend.engine import create_engine, detect_intent, detect_strong_intent
+from backend.entity_extraction import extract_entities
+from backend.guards_medical_triage import classify_medical_symptoms, detect_medical_red_flag
+from backend.time_constraints import extract_time_constraint
+from backend.utterance import NormalizedUtterance, current_utterance, utterance_for
+
+TEXTS = [
+    "", "oui", "Je m'appelle Jean Dupont, j'ai mal au dos, plutôt lundi matin",
+    "je voudrais annuler mon rendez-vous", "je finis à 17h", "zéro six douze trente-quatre",
+    "j'ai mal à la poitrine", "c'est grave ? j'ai de la fièvre", "Vous pouvez répéter ?",
+]
+
+
+def test_derived_forms_match_source_functions():
+    for text in TEXTS:
+        u = NormalizedUtterance(text)
+        assert u.stt == intent_parser.normalize_stt_text(text)
+        assert u.tokens == intent_parser.tokenize(text)
+        assert u.digits == intent_parser.words_to_digits(text)
+        assert u.time_constraint == extract_time_constraint(text)
+        assert u.entities == extract_entities(text)
+        assert u.red_flag == detect_medical_red_flag(text)
+        assert u.medical_class == classify_medical_symptoms(text)
+        r = intent_parser.detect_strong_intent(text)
+        assert u.strong_intent == (r.value if r else None)
+        for state in ("START", "WAIT_CONFIRM", "QUALIF_NAME"):
+            assert u.intent(state) == intent_parser.detect_intent(text, state).value
+
+
+def test_intent_memoized_per_state():
+    u = NormalizedUtterance("oui")
+    with patch.object(intent_parser, "detect_intent", wraps=intent_parser.detect_intent) as spy:
+        assert u.intent("START") == "UNCLEAR"
+        assert u.intent("START") == "UNCLEAR"
+        assert u.intent("WAIT_CONFIRM") == "YES"
+    assert spy.call_count == 2
+
+
+def test_utterance_for_reuses_only_the_turn_text():
+    turn = NormalizedUtterance("je veux un rdv")
+    token = current_utterance.set(turn)
+    try:
+        assert utterance_for("je veux un rdv") is turn
+        assert utterance_for(turn) is turn
+        other = utterance_for("autre chose")
+        assert other is not turn and other.raw == "autre chose"
+    finally:
+        current_utterance.reset(token)
+    assert utterance_for("je veux un rdv") is not turn
+
+
+def test_engine_wrappers_delegate_to_turn_utterance():
+    turn = NormalizedUtterance("je veux parler a un humain")
+    token = current_utterance.set(turn)
+    try:
+        assert detect_strong_intent("je veux parler a un humain") == "TRANSFER"
+        assert detect_intent("je veux parler a un humain", "START") == "TRANSFER"
+        assert turn.__dict__["strong_intent"] == "TRANSFER"
+        assert turn._intents == {"START": "TRANSFER"}
+    finally:
+        current_utterance.reset(token)
+
+
+def test_handle_message_normalizes_turn_once():
+    engine = create_engine()
+    conv = f"conv_utt_{uuid.uuid4().hex[:8]}"
+    seen = []
+    real = intent_parser.detect_intent
+
+    def spy(text, state=""):
+        seen.append((text, state, current_utterance.get()))
+        return real(text, state)
+
+    with patch.object(intent_parser, "detect_intent", side_effect=spy):
+        engine.handle_message(conv, "Je veux un rdv")
+    assert seen, "detect_intent doit être appelé pendant le tour"
+    assert len({(t, s) for t, s, _ in seen}) == len(seen)  # jamais recalculé pour (texte, état)
+    assert all(u is not None and u.raw == "Je veux un rdv" for _, _, u in seen)
+    assert current_utterance.get() is None
@@ -0,0 +1,47 @@
+# tests/test_vapi_load.py
+"""
+Générateur de charge Vapi : appels simulés contre l'app en process (faux calendrier), couverture des
+endpoints, absence d'erreurs, échantillons mémoire et pente de croissance par 1000 appels.
+"""
+import asyncio
+
+import httpx
+
+from backend import call_replay, vapi_load
+
+
+def test_run_load_inprocess_covers_all_endpoints():
+    from backend.main import app
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load.test") as client:
+            return await vapi_load.run_load(
+                client, concurrency=2, calls=3, probe=vapi_load.inprocess_probe, seed=1,
+                stream_ratio=0.5, tool_ratio=1.0,
+            )
+
+    with call_replay.replay_env():
+        stats = asyncio.run(scenario())
+    summary = stats.summary()
+    assert summary["calls"] == 3
+    assert summary["error_rate"] == 0.0 and summary["timeout_rate"] == 0.0
+    assert {"webhook:assistant-request", "webhook:status-update", "webhook:end-of-call-report",
+            "tool:get_slots", "tool:book"} <= set(summary["endpoints"])
+    assert {"chat", "chat:stream"} & set(summary["endpoints"])
+    assert len(stats.memory) >= 2 and "engine_sessions" in summary["memory"]
+
+
+def test_memory_growth_slope_per_1000_calls():
+    samples = [{"t": i, "calls": i * 100, "streams": 0, "sessions": i * 10} for i in range(5)]
+    growth = vapi_load.memory_growth(samples)
+    assert growth["streams"]["per_1000_calls"] == 0.0
+    assert growth["sessions"] == {"first": 0, "last": 40, "max": 40, "per_1000_calls": 100.0}
+
+
+def test_tool_payload_is_parsed_by_voice_route():
+    from backend.routes.voice import _tool_extract_call_id, _tool_extract_parameters
+
+    payload = vapi_load.tool_payload("load-1", {"action": "get_slots", "preference": "matin"})
+    assert _tool_extract_call_id(payload) == "load-1"
+    assert _tool_extract_parameters(payload)["action"] == "get_slots"